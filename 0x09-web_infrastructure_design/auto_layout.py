@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Layered Auto-Layout for Large Topologies
+Assigns nodes to tiers, minimizes edge crossings between tiers and collapses
+over-wide tiers, producing diagram_engine specs for fleets of any size.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NODE_WIDTH = 1.6
+NODE_HEIGHT = 0.8
+H_SPACING = 2.0
+V_SPACING = 2.0
+DEFAULT_MAX_WIDTH = 12
+DEFAULT_SWEEPS = 4
+
+
+def assign_tiers(node_ids, edges, fixed=None):
+    """Return {node: tier} using longest-path layering from the sources.
+
+    Nodes listed in fixed keep their tier; every other node sits one tier
+    below its deepest predecessor.
+    """
+    fixed = fixed or {}
+    preds = defaultdict(list)
+    indegree = dict.fromkeys(node_ids, 0)
+    succs = defaultdict(list)
+    for src, dst in edges:
+        succs[src].append(dst)
+        preds[dst].append(src)
+        indegree[dst] += 1
+
+    # Kahn's algorithm gives a topological order; cycles fall back to tier 0
+    order = [n for n in node_ids if indegree[n] == 0]
+    for node in order:
+        for nxt in succs[node]:
+            indegree[nxt] -= 1
+            if indegree[nxt] == 0:
+                order.append(nxt)
+    seen = set(order)
+    order.extend(n for n in node_ids if n not in seen)
+
+    tiers = {}
+    for node in order:
+        if node in fixed:
+            tiers[node] = fixed[node]
+        else:
+            tiers[node] = max((tiers[p] + 1 for p in preds[node] if p in tiers), default=0)
+    return tiers
+
+
+def aggregate_tiers(nodes, edges, tiers, max_width=DEFAULT_MAX_WIDTH):
+    """Collapse tiers wider than max_width into aggregate nodes.
+
+    Nodes that share a tier and exactly the same neighbours are
+    interchangeable in the picture, so each such group is split into as many
+    consecutive buckets as the tier has room for. Returns (nodes, edges, tiers)
+    where edges carry a 'count' of the original edges they stand for.
+    """
+    preds, succs = defaultdict(set), defaultdict(set)
+    for src, dst in edges:
+        succs[src].add(dst)
+        preds[dst].add(src)
+
+    by_tier = defaultdict(list)
+    for node_id in nodes:
+        by_tier[tiers[node_id]].append(node_id)
+
+    mapping = {node_id: node_id for node_id in nodes}
+    new_nodes = {}
+    for tier, members in by_tier.items():
+        if len(members) <= max_width:
+            for node_id in members:
+                new_nodes[node_id] = nodes[node_id]
+            continue
+
+        groups = defaultdict(list)
+        for node_id in members:
+            groups[(frozenset(preds[node_id]), frozenset(succs[node_id]))].append(node_id)
+        groups = sorted(groups.values(), key=len, reverse=True)
+
+        # Every group keeps at least one slot; the rest are shared by size
+        spare = max(max_width - len(groups), 0)
+        total = sum(len(g) for g in groups)
+        for group in groups:
+            slots = min(len(group), 1 + int(spare * len(group) / total))
+            for bucket in np.array_split(np.arange(len(group)), slots):
+                chunk = [group[i] for i in bucket]
+                if len(chunk) == 1:
+                    new_nodes[chunk[0]] = nodes[chunk[0]]
+                    continue
+                agg_id = f"{chunk[0]}..{chunk[-1]}"
+                first = nodes[chunk[0]].get('label', chunk[0]).split('\n')[0]
+                last = nodes[chunk[-1]].get('label', chunk[-1]).split('\n')[0]
+                new_nodes[agg_id] = {'label': f"{first} …\n{last}\n({len(chunk)} nodes)",
+                                     'style': nodes[chunk[0]].get('style'), 'count': len(chunk)}
+                for node_id in chunk:
+                    mapping[node_id] = agg_id
+
+    counts = defaultdict(int)
+    for src, dst in edges:
+        counts[(mapping[src], mapping[dst])] += 1
+    new_edges = [{'from': src, 'to': dst, 'count': count} for (src, dst), count in counts.items()]
+    new_tiers = {mapping[node_id]: tier for node_id, tier in tiers.items()}
+    return new_nodes, new_edges, new_tiers
+
+
+def count_crossings(upper_pos, lower_pos):
+    """Count crossings between two tiers' edges given endpoint positions.
+
+    Sorting edges by their upper endpoint turns crossings into inversions of
+    the lower endpoints, counted with a Fenwick tree in O(E log E).
+    """
+    if len(upper_pos) < 2:
+        return 0
+    order = np.lexsort((lower_pos, upper_pos))
+    ranks = np.unique(lower_pos, return_inverse=True)[1][order] + 1
+    size = int(ranks.max())
+    tree = [0] * (size + 1)
+    crossings = 0
+    for seen, rank in enumerate(ranks.tolist()):
+        # Earlier edges whose lower endpoint lies strictly to the right cross this one
+        index, not_greater = rank, 0
+        while index > 0:
+            not_greater += tree[index]
+            index -= index & -index
+        crossings += seen - not_greater
+        index = rank
+        while index <= size:
+            tree[index] += 1
+            index += index & -index
+    return crossings
+
+
+def minimize_crossings(tier_members, edge_array, sweeps=DEFAULT_SWEEPS):
+    """Order each tier by the barycenter heuristic, sweeping down then up.
+
+    tier_members is a list of node-index arrays per tier and edge_array an
+    (E, 2) array of node indices pointing down the tiers. Positions are
+    normalized to [0, 1] so tiers of different widths pull on each other
+    evenly; each pass is a bincount, so 500+ node tiers order in milliseconds.
+    """
+    n_nodes = int(max((m.max() for m in tier_members if len(m)), default=-1)) + 1
+    pos = np.zeros(n_nodes)
+    for members in tier_members:
+        pos[members] = np.linspace(0, 1, len(members)) if len(members) > 1 else 0.5
+
+    src, dst = edge_array[:, 0], edge_array[:, 1]
+    order = [members.copy() for members in tier_members]
+    for sweep in range(sweeps):
+        downward = sweep % 2 == 0
+        tiers = range(1, len(order)) if downward else range(len(order) - 2, -1, -1)
+        # Down sweeps pull nodes toward their predecessors, up sweeps toward successors
+        anchor, moved = (src, dst) if downward else (dst, src)
+        weight = np.bincount(moved, weights=pos[anchor], minlength=n_nodes)
+        degree = np.bincount(moved, minlength=n_nodes)
+        for tier in tiers:
+            members = order[tier]
+            if len(members) < 2:
+                continue
+            bary = np.where(degree[members] > 0,
+                            weight[members] / np.maximum(degree[members], 1), pos[members])
+            members = members[np.argsort(bary, kind='stable')]
+            order[tier] = members
+            pos[members] = np.linspace(0, 1, len(members))
+            # Refresh barycenters so the next tier sees this tier's new order
+            weight = np.bincount(moved, weights=pos[anchor], minlength=n_nodes)
+    return order
+
+
+def layered_layout(nodes, edges, max_width=DEFAULT_MAX_WIDTH, sweeps=DEFAULT_SWEEPS):
+    """Lay out a topology; return (positions, nodes, edges, stats).
+
+    nodes maps id -> {'label', 'style', optional 'tier'}; edges is a list of
+    (src, dst) pairs. positions maps each (possibly aggregated) node id to the
+    centre of its box.
+    """
+    start = time.perf_counter()
+    node_ids = list(nodes)
+    tiers = assign_tiers(node_ids, edges, {n: d['tier'] for n, d in nodes.items() if 'tier' in d})
+    nodes, edges, tiers = aggregate_tiers(nodes, edges, tiers, max_width)
+
+    node_ids = list(nodes)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    n_tiers = max(tiers.values(), default=0) + 1
+    tier_members = [[] for _ in range(n_tiers)]
+    for node_id in node_ids:
+        tier_members[tiers[node_id]].append(index[node_id])
+    tier_members = [np.array(members, dtype=np.intp) for members in tier_members]
+    edge_array = np.array([(index[e['from']], index[e['to']]) for e in edges], dtype=np.intp).reshape(-1, 2)
+
+    order = minimize_crossings(tier_members, edge_array, sweeps)
+
+    widest = max(len(members) for members in order)
+    positions = {}
+    for tier, members in enumerate(order):
+        offset = (widest - len(members)) * H_SPACING / 2
+        for slot, i in enumerate(members.tolist()):
+            positions[node_ids[i]] = (offset + slot * H_SPACING + H_SPACING / 2,
+                                      (n_tiers - tier - 1) * V_SPACING + V_SPACING / 2)
+
+    xs = np.array([positions[node_ids[i]][0] for i in range(len(node_ids))])
+    crossings = 0
+    for tier in range(n_tiers - 1):
+        mask = np.isin(edge_array[:, 0], order[tier]) & np.isin(edge_array[:, 1], order[tier + 1])
+        crossings += count_crossings(xs[edge_array[mask, 0]], xs[edge_array[mask, 1]])
+
+    stats = {'nodes': len(node_ids), 'edges': len(edges), 'tiers': n_tiers, 'widest_tier': widest,
+             'crossings': crossings, 'seconds': time.perf_counter() - start}
+    return positions, nodes, edges, stats
+
+
+def apply_layout(axes):
+    """Resolve an axes spec with a 'layout' entry into placed boxes.
+
+    Nodes keep their text and style, may pin a 'tier', and need no box;
+    'layout' may be "layered" or {"kind": "layered", "max_width": ..,
+    "sweeps": .., "edge_style": {..}}. Returns (axes spec, layout stats).
+    """
+    options = axes['layout'] if isinstance(axes['layout'], dict) else {'kind': axes['layout']}
+    if options.get('kind', 'layered') != 'layered':
+        raise ValueError(f"unsupported layout kind '{options['kind']}'")
+
+    nodes = {}
+    for node in axes.get('nodes', []):
+        data = {'label': node.get('text', node['id']), 'style': node.get('style')}
+        if 'tier' in node:
+            data['tier'] = node['tier']
+        nodes[node['id']] = data
+    edges = []
+    for edge in axes.get('edges', []):
+        path = edge.get('path') or [edge['from'], edge['to']]
+        edges.extend(zip(path, path[1:]))
+
+    positions, nodes, edges, stats = layered_layout(nodes, edges, options.get('max_width', DEFAULT_MAX_WIDTH),
+                                                    options.get('sweeps', DEFAULT_SWEEPS))
+    spec_nodes = []
+    for node_id, data in nodes.items():
+        x, y = positions[node_id]
+        node = {'id': node_id, 'box': [x - NODE_WIDTH / 2, y - NODE_HEIGHT / 2, NODE_WIDTH, NODE_HEIGHT],
+                'text': data['label'], 'fontsize': 7}
+        if data.get('style'):
+            node['style'] = data['style']
+        spec_nodes.append(node)
+
+    edge_style = {'color': 'gray', 'alpha': 0.6, **options.get('edge_style', {})}
+    spec_edges = [{'from': e['from'], 'to': e['to'], 'lw': 1 + float(np.log10(e['count'])), **edge_style}
+                  for e in edges]
+
+    laid_out = {key: value for key, value in axes.items() if key not in ('layout', 'nodes', 'edges')}
+    laid_out.update({
+        'nodes': spec_nodes,
+        'edges': spec_edges,
+        'xlim': [0, max(x for x, _ in positions.values()) + H_SPACING / 2],
+        'ylim': [0, max(y for _, y in positions.values()) + V_SPACING / 2],
+    })
+    return laid_out, stats
+
+
+def layout_spec(nodes, edges, title=None, max_width=DEFAULT_MAX_WIDTH, styles=None):
+    """Build a placed diagram_engine spec from an unplaced topology"""
+    axes = {
+        'layout': {'kind': 'layered', 'max_width': max_width},
+        'nodes': [{'id': node_id, 'text': data.get('label', node_id), 'style': data.get('style'),
+                   **({'tier': data['tier']} if 'tier' in data else {})} for node_id, data in nodes.items()],
+        'edges': [{'from': src, 'to': dst} for src, dst in edges],
+    }
+    spec, stats = apply_layout(axes)
+    width, height = spec['xlim'][1], spec['ylim'][1]
+    spec.update({
+        'name': 'auto_layout',
+        'figsize': [min(max(width * 0.9, 8), 40), min(max(height * 0.9, 6), 30)],
+        'styles': styles or {},
+    })
+    if title:
+        spec['title'] = title
+    return spec, stats
+
+
+def load_balancer_fleet(backends, lb_count=2, app_servers=1):
+    """Build the Task 3 topology with an arbitrary number of web servers"""
+    from topology import fleet
+    return fleet(backends, lb_count, app_servers).layout_input(exclude_roles=('client', 'dns'))
+
+
+FLEET_STYLES = {
+    'vip': {'facecolor': 'gold'},
+    'lb': {'facecolor': '#FF9800'},
+    'web': {'facecolor': '#9C27B0', 'color': 'white'},
+    'app': {'facecolor': '#E91E63'},
+    'db': {'facecolor': '#795548', 'color': 'white'},
+}
+
+
+def main(argv=None):
+    """Lay out and render a load balancer fleet of the requested size"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--backends', type=int, default=500, help='number of web servers (default: 500)')
+    parser.add_argument('--app-servers', type=int, default=1, help='number of application servers (default: 1)')
+    parser.add_argument('-w', '--max-width', type=int, default=DEFAULT_MAX_WIDTH,
+                        help='collapse tiers wider than this many nodes (default: 12)')
+    parser.add_argument('-o', '--output', default=os.path.join(BASE_DIR, 'build', 'fleet_layout_diagram.png'),
+                        help='output PNG (default: build/fleet_layout_diagram.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='output resolution (default: 150)')
+    parser.add_argument('--layout-only', action='store_true', help='report layout statistics without rendering')
+    args = parser.parse_args(argv)
+
+    nodes, edges = load_balancer_fleet(args.backends, app_servers=args.app_servers)
+    title = f"Load Balancer Cluster with {args.backends} Web Servers"
+    spec, stats = layout_spec(nodes, edges, title, args.max_width, FLEET_STYLES)
+    print(f"📐 Laid out {len(nodes)} nodes / {len(edges)} edges as {stats['nodes']} boxes in "
+          f"{stats['tiers']} tiers (widest {stats['widest_tier']}, {stats['crossings']} crossings) "
+          f"in {stats['seconds'] * 1000:.1f} ms")
+    if args.layout_only:
+        return True
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from diagram_engine import render_spec
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = render_spec(spec)
+    fig.savefig(args.output, dpi=args.dpi, bbox_inches='tight')
+    plt.close(fig)
+    print(f"- {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
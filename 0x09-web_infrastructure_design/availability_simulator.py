@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Availability Simulator
+Monte Carlo failure injection for the four infrastructure designs: every
+component fails and is repaired at random per its MTBF/MTTR over millions of
+simulated years, and the report gives availability, downtime per year and the
+component that dominates the risk, highlighted on the design's diagram.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, 'build')
+HOURS_PER_YEAR = 8766
+MINUTES_PER_YEAR = HOURS_PER_YEAR * 60
+PERCENTILES = (50, 95, 99)
+BATCH_TRIALS = 20000
+# Repair times are lognormal with this spread around the MTTR
+REPAIR_SIGMA = 1.0
+
+# Default (MTBF hours, MTTR hours) per component role
+ROLES = {
+    'network': (4380, 2.0),   # uplink / DNS path: twice a year, two hours
+    'host': (8760, 4.0),      # a whole server: hardware or OS, once a year
+    'lb': (4380, 1.0),        # HAProxy host
+    'firewall': (8760, 1.0),
+    'web': (2190, 0.5),       # Nginx + PHP-FPM host
+    'app': (2190, 1.0),
+    'db': (4380, 2.0),        # MySQL primary
+}
+
+# Each design as stages in series; a stage is up while at least `need` of its
+# paths are up, and a path is up while all its components are. Component ids
+# are the node ids in the design's spec, so results can be drawn on it.
+TOPOLOGIES = {
+    'simple': {
+        'spec': 'simple_web_stack',
+        'title': 'Task 0: Simple Web Stack',
+        'components': {'dns': 'network', 'server': 'host', 'nginx': 'web', 'app': 'app', 'db': 'db'},
+        'stages': [{'paths': [['dns']]}, {'paths': [['server']]}, {'paths': [['nginx']]},
+                   {'paths': [['app']]}, {'paths': [['db']]}],
+    },
+    'distributed': {
+        'spec': 'distributed_infrastructure',
+        'title': 'Task 1: Distributed Web Infrastructure',
+        'components': {'dns': 'network', 'lb': 'lb', 'web1': 'web', 'web2': 'web', 'db_primary': 'db'},
+        'stages': [{'paths': [['dns']]}, {'paths': [['lb']]}, {'paths': [['web1'], ['web2']], 'need': 1},
+                   {'paths': [['db_primary']]}],
+    },
+    'secured': {
+        'spec': 'secured_infrastructure',
+        'title': 'Task 2: Secured and Monitored Web Infrastructure',
+        'components': {'internet': 'network', 'firewall1': 'firewall', 'lb': 'lb', 'firewall2': 'firewall',
+                       'web1': 'web', 'firewall3': 'firewall', 'web2': 'web', 'db': 'db'},
+        'stages': [{'paths': [['internet']]}, {'paths': [['firewall1']]}, {'paths': [['lb']]},
+                   {'paths': [['firewall2', 'web1'], ['firewall3', 'web2']], 'need': 1}, {'paths': [['db']]}],
+    },
+    'scale_up': {
+        'spec': 'scale_up_infrastructure',
+        'title': 'Task 3: Scale Up Infrastructure',
+        'components': {'internet': 'network', 'lb_master': 'lb', 'lb_backup': 'lb', 'web1': 'web',
+                       'web2': 'web', 'app': 'app', 'db': 'db'},
+        'stages': [{'paths': [['internet']]}, {'paths': [['lb_master'], ['lb_backup']], 'need': 1},
+                   {'paths': [['web1'], ['web2']], 'need': 1}, {'paths': [['app']]}, {'paths': [['db']]}],
+    },
+}
+
+
+def component_rates(topology, mtbf=None, mttr=None):
+    """Return (ids, MTBF hours, MTTR hours) arrays; overrides are keyed by component id or role"""
+    ids = list(topology['components'])
+    mtbf, mttr = mtbf or {}, mttr or {}
+    roles = [topology['components'][c] for c in ids]
+    up = [mtbf.get(c, mtbf.get(role, ROLES[role][0])) for c, role in zip(ids, roles)]
+    down = [mttr.get(c, mttr.get(role, ROLES[role][1])) for c, role in zip(ids, roles)]
+    return ids, np.array(up, dtype=float), np.array(down, dtype=float)
+
+
+def system_down(down, topology, index):
+    """Evaluate the stage structure on a (rows, components) boolean down matrix; True where the site is down"""
+    failed = np.zeros(len(down), dtype=bool)
+    for stage in topology['stages']:
+        paths_up = sum(~down[:, [index[c] for c in path]].any(axis=1) for path in stage['paths'])
+        failed |= paths_up < stage.get('need', len(stage['paths']))
+    return failed
+
+
+def _repairs(rng, mttr, shape):
+    return rng.lognormal(np.log(mttr) - REPAIR_SIGMA ** 2 / 2, REPAIR_SIGMA, shape)
+
+
+def failure_intervals(rng, trials, mtbf, mttr, horizon):
+    """Return (trial, start, end) of one component's outages in each of trials timelines.
+
+    Up times are exponential and repairs lognormal. Each timeline starts in
+    the steady state: down with probability MTTR / (MTBF + MTTR). Outages are
+    generated a fixed number of cycles at a time and topped up for the rare
+    timelines that have not reached the horizon yet.
+    """
+    cycles = int(horizon / (mtbf + mttr) + 6 * np.sqrt(horizon / (mtbf + mttr)) + 4)
+    ups = rng.exponential(mtbf, (trials, cycles))
+    ups[:, 0] *= rng.random(trials) >= mttr / (mtbf + mttr)
+    downs = _repairs(rng, mttr, (trials, cycles))
+    ends = np.cumsum(ups + downs, axis=1)
+    while True:
+        short = ends[:, -1] < horizon
+        if not short.any():
+            break
+        more_ups = rng.exponential(mtbf, (trials, cycles))
+        more_downs = _repairs(rng, mttr, (trials, cycles))
+        ups, downs = np.hstack([ups, more_ups]), np.hstack([downs, more_downs])
+        ends = np.hstack([ends, ends[:, -1:] + np.cumsum(more_ups + more_downs, axis=1)])
+    starts = ends - downs
+    trial, cycle = np.nonzero(starts < horizon)
+    return trial, starts[trial, cycle], np.minimum(ends[trial, cycle], horizon)
+
+
+def simulate_batch(topology, mtbf, mttr, trials, horizon, seed):
+    """Simulate trials timelines of horizon hours; return per-trial downtime, outages and component blame.
+
+    Every outage start and end of every component becomes an event; events
+    are sorted by timeline and time, and a running sum per component gives
+    the full up/down state after each event. The site's state is then one
+    vectorized evaluation of the stage structure, and the time to the next
+    event is the duration it holds for. Downtime is blamed on the failed
+    components whose repair alone would bring the site back, or on every
+    failed component when no single repair would.
+    """
+    rng = np.random.default_rng(seed)
+    ids = list(topology['components'])
+    index = {c: i for i, c in enumerate(ids)}
+    trial_parts, time_parts, component_parts, delta_parts = [], [], [], []
+    for c in range(len(ids)):
+        trial, start, end = failure_intervals(rng, trials, mtbf[c], mttr[c], horizon)
+        trial_parts += [trial, trial]
+        time_parts += [start, end]
+        component_parts.append(np.full(2 * len(trial), c, dtype=np.int64))
+        delta_parts += [np.ones(len(trial), dtype=np.int8), -np.ones(len(trial), dtype=np.int8)]
+    trial = np.concatenate(trial_parts)
+    moment = np.concatenate(time_parts)
+    component = np.concatenate(component_parts)
+    delta = np.concatenate(delta_parts)
+    # Ends before starts at equal times, so a back-to-back outage never counts twice
+    order = np.lexsort((delta, moment, trial))
+    trial, moment, component, delta = trial[order], moment[order], component[order], delta[order]
+
+    changes = np.zeros((len(trial), len(ids)), dtype=np.int8)
+    changes[np.arange(len(trial)), component] = delta
+    # Every outage closes by the horizon, so running sums return to zero between timelines
+    down = np.cumsum(changes, axis=0, dtype=np.int8) > 0
+    site_down = system_down(down, topology, index)
+
+    held = np.empty(len(trial))
+    held[:-1] = moment[1:] - moment[:-1]
+    held[-1:] = horizon - moment[-1:]
+    last = np.r_[trial[1:] != trial[:-1], True]
+    held[last] = horizon - moment[last]
+    weight = held * site_down
+
+    downtime = np.bincount(trial, weights=weight, minlength=trials)
+    started = site_down & ~np.r_[False, site_down[:-1] & ~last[:-1]]
+    outages = np.bincount(trial, weights=started, minlength=trials)
+
+    critical = np.zeros_like(down)
+    for c in range(len(ids)):
+        repaired = down.copy()
+        repaired[:, c] = False
+        critical[:, c] = down[:, c] & site_down & ~system_down(repaired, topology, index)
+    shared = np.where(critical.any(axis=1, keepdims=True), critical, down & site_down[:, None])
+    blame = (shared / np.maximum(shared.sum(axis=1, keepdims=True), 1) * weight[:, None]).sum(axis=0)
+    return {'downtime': downtime, 'outages': outages, 'blame': blame}
+
+
+def simulate(topology, trials=200000, years=1.0, mtbf=None, mttr=None, workers=1, seed=0,
+             batch=BATCH_TRIALS):
+    """Run trials timelines of `years` each, in batches spread over worker processes"""
+    ids, up, down = component_rates(topology, mtbf, mttr)
+    horizon = years * HOURS_PER_YEAR
+    sizes = [min(batch, trials - start) for start in range(0, trials, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    start = time.perf_counter()
+    if workers > 1 and len(sizes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            parts = list(pool.map(simulate_batch, [topology] * len(sizes), [up] * len(sizes),
+                                  [down] * len(sizes), sizes, [horizon] * len(sizes), seeds))
+    else:
+        parts = [simulate_batch(topology, up, down, size, horizon, s) for size, s in zip(sizes, seeds)]
+    return {
+        'ids': ids, 'mtbf': up, 'mttr': down, 'years': years, 'horizon': horizon,
+        'downtime': np.concatenate([p['downtime'] for p in parts]),
+        'outages': np.concatenate([p['outages'] for p in parts]),
+        'blame': np.sum([p['blame'] for p in parts], axis=0),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def summarize(result, topology):
+    """Return availability, yearly downtime and per-component blame"""
+    downtime, horizon, years = result['downtime'], result['horizon'], result['years']
+    minutes = downtime / years * 60
+    availability = 1 - downtime.mean() / horizon
+    blame = result['blame'] / max(result['blame'].sum(), 1e-12)
+    components = {
+        c: {'role': topology['components'][c], 'mtbf_h': float(result['mtbf'][i]),
+            'mttr_h': float(result['mttr'][i]), 'share': float(blame[i]),
+            'downtime_min_per_year': float(result['blame'][i] / len(downtime) / years * 60)}
+        for i, c in enumerate(result['ids'])
+    }
+    return {
+        'title': topology['title'],
+        'timelines': len(downtime),
+        'years_each': years,
+        'availability': float(availability),
+        'nines': float(-np.log10(max(1 - availability, 1e-12))),
+        'downtime_min_per_year': float(minutes.mean()),
+        'downtime_percentiles': {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(minutes, PERCENTILES))},
+        'outages_per_year': float(result['outages'].mean() / years),
+        'outage_free_years': float(np.mean(result['outages'] == 0)) if years == 1 else None,
+        'dominant': max(components, key=lambda c: components[c]['share']),
+        'components': components,
+        'seconds': result['seconds'],
+    }
+
+
+def print_report(name, summary):
+    """Print availability and the per-component risk table"""
+    print(f"\n🛡️ {summary['title']} ({name}): {summary['timelines']:,} simulated years in "
+          f"{summary['seconds']:.1f}s")
+    p = summary['downtime_percentiles']
+    print(f"   Availability {summary['availability']:.5%} ({summary['nines']:.2f} nines), "
+          f"downtime {summary['downtime_min_per_year']:,.0f} min/year "
+          f"(p50 {p['p50']:,.0f}, p95 {p['p95']:,.0f}, p99 {p['p99']:,.0f}), "
+          f"{summary['outages_per_year']:.1f} outages/year")
+    print(f"{'Component':<14} {'Role':<9} {'MTBF h':>8} {'MTTR h':>7} {'Min/year':>9} {'Share':>7}")
+    print('-' * 58)
+    for c, info in sorted(summary['components'].items(), key=lambda item: -item[1]['share']):
+        mark = '  ← dominant risk' if c == summary['dominant'] else ''
+        print(f"{c:<14} {info['role']:<9} {info['mtbf_h']:>8,.0f} {info['mttr_h']:>7.1f} "
+              f"{info['downtime_min_per_year']:>9,.1f} {info['share']:>7.1%}{mark}")
+
+
+def create_availability_diagram(topology, summary):
+    """Render the design's diagram with each component outlined by its share of the downtime"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+    from diagram_engine import SPEC_DIR, axes_specs, load_spec, render_spec, resolve_layout
+    from diagram_panels import add_side_panel
+
+    spec = load_spec(os.path.join(SPEC_DIR, topology['spec'] + '.json'))
+    fig = render_spec(spec)
+    ax = fig.axes[0]
+    axes = axes_specs(spec)[0]
+    if 'layout' in axes:
+        from auto_layout import apply_layout
+        axes, _ = apply_layout(axes)
+    geometry = resolve_layout(axes)
+    cmap = plt.get_cmap('Reds')
+
+    for c, info in summary['components'].items():
+        geom = geometry.get(c)
+        if geom is None or geom[0] != 'box':
+            continue
+        _, x, y, w, h = geom
+        dominant = c == summary['dominant']
+        ax.add_patch(Rectangle((x - 0.15, y - 0.15), w + 0.3, h + 0.3, fill=False,
+                               edgecolor=cmap(0.35 + 0.65 * info['share']), linewidth=2 + 5 * info['share'],
+                               linestyle='-' if dominant else '--', zorder=10))
+        ax.text(x + w + 0.1, y + h + 0.1, f"{info['share']:.0%}" + (' DOMINANT' if dominant else ''),
+                fontsize=9 if dominant else 8, fontweight='bold', color='darkred', ha='left', va='bottom',
+                zorder=11, bbox=dict(boxstyle='round,pad=0.2', facecolor='white', edgecolor='darkred',
+                                     alpha=0.9))
+
+    (bar_ax,) = add_side_panel(fig, rows=1, width_ratio=0.5)
+    ranked = sorted(summary['components'].items(), key=lambda item: item[1]['downtime_min_per_year'])
+    bar_ax.barh([c for c, _ in ranked], [info['downtime_min_per_year'] for _, info in ranked],
+                color=[cmap(0.35 + 0.65 * info['share']) for _, info in ranked], edgecolor='black')
+    bar_ax.set_xlabel('Downtime blamed (minutes / year)', fontsize=10)
+    bar_ax.set_title('Where the Downtime Comes From', fontsize=12, fontweight='bold')
+    bar_ax.grid(axis='x', alpha=0.3)
+    p = summary['downtime_percentiles']
+    bar_ax.text(0.97, 0.03, f"Availability {summary['availability']:.4%}\n"
+                            f"{summary['downtime_min_per_year']:,.0f} min/year down (p99 {p['p99']:,.0f})\n"
+                            f"{summary['outages_per_year']:.1f} outages/year\n"
+                            f"{summary['timelines']:,} simulated years",
+                transform=bar_ax.transAxes, ha='right', va='bottom', fontsize=9, family='monospace',
+                bbox=dict(boxstyle='round,pad=0.4', facecolor='lightyellow', edgecolor='gray'))
+    return fig
+
+
+def _overrides(value):
+    """Parse 'db=8760,web1=1000' into {'db': 8760.0, 'web1': 1000.0}; keys are roles or component ids"""
+    known = set(ROLES) | {c for t in TOPOLOGIES.values() for c in t['components']}
+    overrides = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, sep, number = item.partition('=')
+        if not sep or name.strip() not in known:
+            raise argparse.ArgumentTypeError(f"expected name=hours with a role ({', '.join(ROLES)}) "
+                                             f"or component id: {item}")
+        overrides[name.strip()] = float(number)
+    return overrides
+
+
+def main(argv=None):
+    """Simulate failures for one or all designs, print the comparison and render the risk diagrams"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-t', '--topology', choices=('all',) + tuple(TOPOLOGIES), default='all',
+                        help='design to simulate (default: all four)')
+    parser.add_argument('-n', '--trials', type=int, default=200000,
+                        help='simulated timelines per design (default: 200,000)')
+    parser.add_argument('--years', type=float, default=1.0, help='length of each timeline (default: 1 year)')
+    parser.add_argument('--mtbf', type=_overrides, default={}, help='MTBF hours by role or component, e.g. db=8760')
+    parser.add_argument('--mttr', type=_overrides, default={}, help='MTTR hours by role or component, e.g. web=0.25')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the summaries as JSON')
+    parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR,
+                        help='directory for availability_<design>.png (default: build)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    args = parser.parse_args(argv)
+    if args.trials <= 0 or args.years <= 0:
+        parser.error('--trials and --years must be positive')
+
+    names = list(TOPOLOGIES) if args.topology == 'all' else [args.topology]
+    summaries = {}
+    for name in names:
+        result = simulate(TOPOLOGIES[name], args.trials, args.years, args.mtbf, args.mttr, args.workers, args.seed)
+        summaries[name] = summarize(result, TOPOLOGIES[name])
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return True
+    for name in names:
+        print_report(name, summaries[name])
+    if len(names) > 1:
+        print(f"\n{'Design':<12} {'Availability':>13} {'Min/year':>9} {'p99':>7} {'Dominant risk':<14}")
+        print('-' * 58)
+        for name, summary in summaries.items():
+            print(f"{name:<12} {summary['availability']:>13.4%} {summary['downtime_min_per_year']:>9,.0f} "
+                  f"{summary['downtime_percentiles']['p99']:>7,.0f} {summary['dominant']:<14}")
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name in names:
+        fig = create_availability_diagram(TOPOLOGIES[name], summaries[name])
+        path = os.path.join(args.output_dir, f"availability_{name}.png")
+        save_figure(fig, path, dpi=args.dpi)
+        plt.close(fig)
+        print(f"📊 Diagram saved to {path}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
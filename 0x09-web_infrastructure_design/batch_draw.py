@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Batched Diagram Drawing
+Draws homogeneous diagram elements (boxes, circles, arrows) as a handful of
+matplotlib collections built from NumPy coordinate arrays, instead of one
+patch or annotation artist per element.
+"""
+
+import argparse
+import functools
+import sys
+import time
+
+import numpy as np
+
+# Points per rounded corner and per circle outline
+CORNER_POINTS = 6
+CIRCLE_POINTS = 48
+
+
+def _column(values, count, dtype=float):
+    """Broadcast a scalar or per-element sequence to a length-count array"""
+    array = np.asarray(values, dtype=dtype)
+    return np.broadcast_to(array, (count,)) if array.ndim == 0 else array
+
+
+def _rgba(colors, alphas, count):
+    """Return an (N, 4) RGBA array with per-element alpha applied"""
+    from matplotlib.colors import to_rgba_array
+
+    if isinstance(colors, str):
+        colors = [colors]
+    rgba = to_rgba_array(colors)
+    rgba = np.broadcast_to(rgba, (count, 4)).copy() if len(rgba) == 1 else rgba.copy()
+    rgba[:, 3] *= _column(alphas, count)
+    return rgba
+
+
+def parse_boxstyle(boxstyle):
+    """Return (pad, rounding) for a FancyBboxPatch style string"""
+    name, _, args = boxstyle.partition(',')
+    options = dict(arg.split('=') for arg in args.split(',') if '=' in arg)
+    pad = float(options.get('pad', 0.3))
+    if name.strip() in ('square', 'sawtooth', 'roundtooth'):
+        return pad, 0.0
+    return pad, float(options.get('rounding_size', pad))
+
+
+def rounded_box_vertices(xy, wh, pad=0.1, rounding=None, corner_points=CORNER_POINTS):
+    """Return an (N, 4 * corner_points, 2) array of rounded-rectangle outlines.
+
+    Matches FancyBboxPatch('round,pad=...'): each box grows by pad on every
+    side and its corners are quarter circles of radius rounding (pad by
+    default), all computed at once for the whole batch.
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    wh = np.broadcast_to(np.asarray(wh, dtype=float), xy.shape)
+    count = len(xy)
+    pad = _column(pad, count)
+    radius = _column(pad if rounding is None else rounding, count)
+
+    x0, y0 = xy[:, 0] - pad, xy[:, 1] - pad
+    x1, y1 = xy[:, 0] + wh[:, 0] + pad, xy[:, 1] + wh[:, 1] + pad
+    centers = np.stack([
+        np.stack([x1 - radius, y0 + radius], axis=1),
+        np.stack([x1 - radius, y1 - radius], axis=1),
+        np.stack([x0 + radius, y1 - radius], axis=1),
+        np.stack([x0 + radius, y0 + radius], axis=1),
+    ], axis=1)                                                   # (N, 4, 2)
+
+    start = np.array([-0.5, 0.0, 0.5, 1.0]) * np.pi
+    angles = start[:, None] + np.linspace(0, np.pi / 2, corner_points)[None, :]
+    offsets = np.stack([np.cos(angles), np.sin(angles)], axis=-1)  # (4, k, 2)
+    vertices = centers[:, :, None, :] + radius[:, None, None, None] * offsets[None]
+    return vertices.reshape(count, 4 * corner_points, 2)
+
+
+def circle_vertices(centers, radii, points=CIRCLE_POINTS):
+    """Return an (N, points, 2) array of circle outlines"""
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = _column(radii, len(centers))
+    angles = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    ring = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    return centers[:, None, :] + radii[:, None, None] * ring[None]
+
+
+@functools.lru_cache(maxsize=None)
+def _refreshing(base):
+    """Return a subclass of collection class base that rebuilds its geometry when drawn"""
+    class Refreshing(base):
+        def __init__(self, refresh, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._refresh = refresh
+
+        def draw(self, renderer):
+            # The axes has applied its aspect and final position by now
+            self._refresh(self)
+            super().draw(renderer)
+
+    Refreshing.__name__ = Refreshing.__qualname__ = f"Refreshing{base.__name__}"
+    return Refreshing
+
+
+def _add_polygons(ax, vertices, facecolors, edgecolors, linewidths, alphas, zorder, refresh=None):
+    from matplotlib.collections import PolyCollection
+
+    count = len(vertices)
+    cls = PolyCollection if refresh is None else functools.partial(_refreshing(PolyCollection), refresh)
+    collection = cls(vertices, closed=True,
+                                facecolors=_rgba(facecolors, alphas, count),
+                                edgecolors=_rgba(edgecolors, alphas, count),
+                                linewidths=_column(linewidths, count), zorder=zorder)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def add_boxes(ax, xy, wh, pad=0.1, rounding=None, facecolors='white', edgecolors='black',
+              linewidths=1, alphas=1.0, zorder=1):
+    """Draw N rounded boxes as one PolyCollection"""
+    vertices = rounded_box_vertices(xy, wh, pad, rounding)
+    return _add_polygons(ax, vertices, facecolors, edgecolors, linewidths, alphas, zorder)
+
+
+def add_circles(ax, centers, radii, facecolors='white', edgecolors='black', linewidths=1,
+                alphas=1.0, zorder=1):
+    """Draw N circles as one PolyCollection.
+
+    Radii are in x data units. The outlines are rebuilt in points each time
+    the collection is drawn, so circles stay round whatever aspect, limits
+    or layout the axes ends up with.
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = _column(radii, len(centers))
+
+    def outlines(scale):
+        return circle_vertices(centers * scale, radii * abs(scale[0])) / scale
+
+    vertices = outlines(points_per_unit(ax))
+    return _add_polygons(ax, vertices, facecolors, edgecolors, linewidths, alphas, zorder,
+                         refresh=lambda collection: collection.set_verts(outlines(points_per_unit(ax))))
+
+
+def arrow_geometry(starts, ends, head_length, head_width, shrink=0.0, head='filled', both_ends=False):
+    """Compute shaft segments and head outlines for N arrows.
+
+    Returns (shafts, heads, barbs): shafts is (N, 2, 2); heads holds
+    triangles for filled heads and barbs holds the two strokes of open heads,
+    each empty when unused. Coordinates and lengths share one unit, which
+    should be the same on both axes (add_arrows uses points).
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    vector = ends - starts
+    length = np.hypot(vector[:, 0], vector[:, 1])
+    unit = vector / np.where(length > 0, length, 1)[:, None]
+    normal = np.stack([-unit[:, 1], unit[:, 0]], axis=1)
+
+    starts = starts + unit * shrink
+    ends = ends - unit * shrink
+    tips = [(ends, unit)] + ([(starts, -unit)] if both_ends else [])
+
+    heads, barbs = [], []
+    shaft_start, shaft_end = starts.copy(), ends.copy()
+    for tip, direction in tips:
+        base = tip - direction * head_length
+        side = normal * (head_width / 2)
+        if head == 'filled':
+            heads.append(np.stack([tip, base + side, base - side], axis=1))
+            # Stop the shaft at the head base so thick lines don't poke through
+            if direction is unit:
+                shaft_end = base
+            else:
+                shaft_start = base
+        elif head == 'open':
+            barbs.append(np.stack([base + side, tip], axis=1))
+            barbs.append(np.stack([base - side, tip], axis=1))
+
+    shafts = np.stack([shaft_start, shaft_end], axis=1)
+    heads = np.concatenate(heads) if heads else np.empty((0, 3, 2))
+    barbs = np.concatenate(barbs) if barbs else np.empty((0, 2, 2))
+    return shafts, heads, barbs
+
+
+def points_per_unit(ax):
+    """Return the (x, y) typographic points one data unit spans on ax.
+
+    Only final while the axes is being drawn: set_aspect, tight_layout and
+    later resizes all change it. The values are negative along inverted axes.
+    """
+    (x0, y0), (x1, y1) = ax.transData.transform([(0, 0), (1, 1)])
+    return np.array([x1 - x0, y1 - y0]) * 72 / ax.figure.dpi
+
+
+def add_arrows(ax, starts, ends, colors='black', linewidths=1, alphas=1.0, linestyles='solid',
+               arrowstyle='-|>', mutation_scale=15, shrink=2, zorder=2):
+    """Draw N arrows as one LineCollection plus one PolyCollection of heads.
+
+    arrowstyle, mutation_scale and shrink (both in points) follow
+    FancyArrowPatch: '-|>' filled heads, '->' open heads, '<->'/'<|-|>'
+    heads on both ends and '-' plain lines. The geometry is rebuilt in
+    points each time the collections are drawn and mapped back to data
+    units with each axis's own scale, so heads keep their shape whatever
+    aspect, limits or layout the axes ends up with.
+    """
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    count = len(starts)
+    head_length = 0.4 * mutation_scale
+    head_width = 0.8 * head_length
+    head = 'filled' if '|>' in arrowstyle else 'open' if '>' in arrowstyle else 'none'
+    both_ends = arrowstyle.startswith('<')
+
+    def geometry():
+        scale = points_per_unit(ax)
+        shafts, heads, barbs = (part / scale for part in arrow_geometry(
+            starts * scale, ends * scale, head_length, head_width, shrink, head, both_ends))
+        # Barbs are laid out [tip 1 left, tip 1 right, (tip 2 left, tip 2 right)] per arrow block
+        return (np.concatenate([shafts, barbs]) if len(barbs) else shafts), heads
+
+    segments, heads = geometry()
+    colors = _rgba(colors, alphas, count)
+    linewidths = _column(linewidths, count)
+    repeat = 2 if both_ends else 1
+
+    segment_colors, segment_widths = colors, linewidths
+    if len(segments) > count:
+        segment_colors = np.concatenate([colors, np.tile(colors, (2 * repeat, 1))])
+        segment_widths = np.concatenate([linewidths, np.tile(linewidths, 2 * repeat)])
+    lines = _refreshing(LineCollection)(
+        lambda collection: collection.set_segments(geometry()[0]),
+        segments, colors=segment_colors, linewidths=segment_widths,
+        linestyles=linestyles if isinstance(linestyles, str) else
+        list(linestyles) + ['solid'] * (len(segments) - count),
+        capstyle='round', zorder=zorder)
+    ax.add_collection(lines, autolim=False)
+
+    polys = None
+    if len(heads):
+        polys = _refreshing(PolyCollection)(
+            lambda collection: collection.set_verts(geometry()[1]),
+            heads, facecolors=np.tile(colors, (repeat, 1)),
+            edgecolors=np.tile(colors, (repeat, 1)), linewidths=0.5, zorder=zorder)
+        ax.add_collection(polys, autolim=False)
+    return lines, polys
+
+
+def count_artists(fig):
+    """Count the drawable artists (patches, collections, lines, texts) in a figure"""
+    total = len(fig.texts)
+    for ax in fig.axes:
+        total += (len(ax.patches) + len(ax.collections) + len(ax.lines) + len(ax.texts)
+                  + len(ax.artists) + (ax.get_legend() is not None))
+    return total
+
+
+def benchmark(nodes=1000, labels=True):
+    """Time per-artist vs batched drawing of an nodes-wide topology"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from auto_layout import layout_spec, load_balancer_fleet, FLEET_STYLES
+    from diagram_engine import render_spec
+
+    fleet_nodes, fleet_edges = load_balancer_fleet(nodes)
+    spec, _ = layout_spec(fleet_nodes, fleet_edges, max_width=nodes, styles=FLEET_STYLES)
+    if not labels:
+        for node in spec['nodes']:
+            node.pop('text', None)
+
+    results = {}
+    for batched in (False, True):
+        start = time.perf_counter()
+        fig = render_spec(spec, batched=batched)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        fig.canvas.draw()
+        draw = time.perf_counter() - start
+        results['batched' if batched else 'per-artist'] = {
+            'artists': count_artists(fig), 'build_seconds': build, 'draw_seconds': draw}
+        plt.close(fig)
+    return spec, results
+
+
+def main(argv=None):
+    """Benchmark per-artist vs batched drawing"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--nodes', type=int, default=1000,
+                        help='web servers in the synthetic topology (default: 1000)')
+    parser.add_argument('--no-labels', action='store_true',
+                        help='drop node labels to isolate shape drawing (text cannot be batched)')
+    args = parser.parse_args(argv)
+
+    spec, results = benchmark(args.nodes, labels=not args.no_labels)
+    print(f"📏 {len(spec['nodes'])} nodes, {len(spec['edges'])} edges"
+          f"{'' if not args.no_labels else ' (no labels)'}")
+    print(f"{'Mode':<12} {'Artists':>8} {'Build (s)':>10} {'Draw (s)':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['artists']:>8} {result['build_seconds']:>10.3f} {result['draw_seconds']:>10.3f}")
+    before, after = results['per-artist'], results['batched']
+    print(f"✅ {before['artists'] / after['artists']:.0f}x fewer artists, "
+          f"{(before['build_seconds'] + before['draw_seconds']) / (after['build_seconds'] + after['draw_seconds']):.1f}x "
+          f"faster build + draw")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Diagram Benchmark Suite
+Times every generator diagram and synthetic 10/100/1,000-node topologies in
+build, layout, draw and encode phases, records peak memory (native buffers
+included) and output size,
+and stores the results as JSON for comparison across commits.
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'build', 'benchmarks')
+DEFAULT_SIZES = (10, 100, 1000)
+PHASES = ('layout', 'build', 'draw', 'encode')
+DEFAULT_THRESHOLD = 0.10
+
+# Renders one case in a fresh interpreter so ru_maxrss belongs to that case alone
+MEMORY_PROBE = """
+import json
+import benchmark_diagrams
+print(json.dumps(benchmark_diagrams.probe_memory({case!r}, {dpi})))
+"""
+
+
+def synthetic_case(size):
+    """Return (name, phases, make_figure) for a size-node load-balanced fleet.
+
+    The layout phase is the auto-layout itself; nothing is aggregated, so a
+    1,000-node case really draws 1,000 boxes.
+    """
+    from auto_layout import FLEET_STYLES, layout_spec, load_balancer_fleet
+    from diagram_engine import render_spec
+
+    # The fleet adds an LB pair, an app server, a database and a client around the web tier
+    nodes, edges = load_balancer_fleet(max(1, size - 5))
+    start = time.perf_counter()
+    spec, _ = layout_spec(nodes, edges, max_width=len(nodes), styles=FLEET_STYLES)
+    layout_seconds = time.perf_counter() - start
+    return f"synthetic_{size}_nodes", {'layout': layout_seconds}, lambda: render_spec(spec)
+
+
+def generator_cases(modules=None):
+    """Yield (name, module, function) for every generator diagram"""
+    from render_all import discover_diagrams
+    for module_name, func_name in discover_diagrams(modules):
+        yield func_name, module_name, func_name
+
+
+def measure(make_figure, dpi, layout_seconds=0.0):
+    """Run one figure through every phase and return {phase: seconds, ...}.
+
+    build   the create_* call / spec render: artists, text, tight_layout
+    layout  auto-layout for synthetic cases; 0 for hand-placed diagrams
+    draw    Agg rasterization at dpi (fig.canvas.draw)
+    encode  PNG compression of the rendered buffer
+    """
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from PIL import Image
+
+    start = time.perf_counter()
+    fig = make_figure()
+    build = time.perf_counter() - start
+
+    fig.set_dpi(dpi)
+    start = time.perf_counter()
+    fig.canvas.draw()
+    draw = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).save(buffer, format='png')
+    encode = time.perf_counter() - start
+
+    plt.close(fig)
+    return {'layout': layout_seconds, 'build': build, 'draw': draw, 'encode': encode,
+            'output_bytes': buffer.tell()}
+
+
+def measure_memory(make_figure, dpi):
+    """Return (traced peak MB, RSS growth MB) for one full render.
+
+    tracemalloc only sees the Python heap, not the Agg canvas or PIL
+    buffers; measure_native_memory reports the peak including those.
+    """
+    import tracemalloc
+    from headless import rss_mb
+
+    gc.collect()
+    before = rss_mb()
+    tracemalloc.start()
+    measure(make_figure, dpi)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.collect()
+    return peak / 1024 / 1024, rss_mb() - before
+
+
+def case_figure(case):
+    """Return make_figure for a ('generator', 'module.function') or ('synthetic', size) case"""
+    import importlib
+
+    kind, target = case
+    if kind == 'synthetic':
+        return synthetic_case(target)[2]
+    module_name, func_name = target.split('.')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def probe_memory(case, dpi):
+    """Render case once and return its peak RSS in MB, native allocations included.
+
+    Meant for a fresh interpreter: ru_maxrss never goes down, so in a
+    process that already rendered a larger diagram it would report that one.
+    render_rss_mb is the rise over the peak after imports and layout.
+    """
+    from headless import peak_rss_mb, use_headless
+
+    use_headless()
+    import matplotlib.pyplot  # noqa: F401 (imports count towards the baseline)
+    from PIL import Image  # noqa: F401
+
+    make_figure = case_figure(case)
+    gc.collect()
+    before = peak_rss_mb()
+    measure(make_figure, dpi)
+    peak = peak_rss_mb()
+    return {'peak_rss_mb': peak, 'render_rss_mb': peak - before}
+
+
+def measure_native_memory(case, dpi):
+    """Return probe_memory(case, dpi) as measured in a fresh interpreter"""
+    probe = subprocess.run([sys.executable, '-c', MEMORY_PROBE.format(case=case, dpi=dpi)],
+                           cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return json.loads(probe.stdout.splitlines()[-1])
+
+
+def run_case(name, make_figure, dpi, repeat, layout_seconds=0.0, case=None):
+    """Benchmark one case: median phase times over repeat runs after a warm-up.
+
+    With case (see case_figure), the native peak is measured in a fresh
+    interpreter as well.
+    """
+    measure(make_figure, dpi)  # warm fonts and caches
+    runs = [measure(make_figure, dpi, layout_seconds) for _ in range(repeat)]
+    result = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+    result['total'] = sum(result[phase] for phase in PHASES)
+    result['output_bytes'] = runs[-1]['output_bytes']
+    result['peak_traced_mb'], result['rss_growth_mb'] = measure_memory(make_figure, dpi)
+    if case is not None:
+        result.update(measure_native_memory(case, dpi))
+    result['name'] = name
+    return result
+
+
+def environment():
+    """Describe the machine and code version the results came from"""
+    from importlib import metadata
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'matplotlib': metadata.version('matplotlib'),
+        'numpy': metadata.version('numpy'),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(dpi=100, repeat=3, sizes=DEFAULT_SIZES, diagrams=None, synthetic=True, progress=print):
+    """Run the suite and return the results document"""
+    import importlib
+    from headless import use_headless
+
+    use_headless()
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    results = []
+    for name, module_name, func_name in generator_cases():
+        if diagrams and name not in diagrams:
+            continue
+        create = getattr(importlib.import_module(module_name), func_name)
+        case = ('generator', f"{module_name}.{func_name}")
+        results.append({**run_case(name, create, dpi, repeat, case=case), 'kind': 'generator'})
+        progress(f"- {name}: {results[-1]['total']:.2f}s")
+    if synthetic:
+        for size in sizes:
+            name, phases, make_figure = synthetic_case(size)
+            results.append({**run_case(name, make_figure, dpi, repeat, phases['layout'], ('synthetic', size)),
+                            'kind': 'synthetic', 'nodes': size})
+            progress(f"- {name}: {results[-1]['total']:.2f}s")
+    return {'environment': environment(), 'dpi': dpi, 'repeat': repeat, 'results': results}
+
+
+def print_results(document):
+    """Print a results document as a table.
+
+    RSS MB is the render's peak resident memory including native buffers,
+    Heap MB the Python-heap peak seen by tracemalloc.
+    """
+    print(f"\n{'Case':<42} " + ' '.join(f"{p.capitalize():>8}" for p in PHASES)
+          + f" {'Total':>8} {'RSS MB':>8} {'Heap MB':>8} {'Size KB':>8}")
+    print('-' * 129)
+    for r in document['results']:
+        rss = f"{r['render_rss_mb']:>8.1f}" if 'render_rss_mb' in r else f"{'-':>8}"
+        print(f"{r['name']:<42} " + ' '.join(f"{r[p]:>8.3f}" for p in PHASES)
+              + f" {r['total']:>8.3f} {rss} {r['peak_traced_mb']:>8.1f} {r['output_bytes'] / 1024:>8.0f}")
+    env = document['environment']
+    print(f"\ncommit {env['commit']}, Python {env['python']}, matplotlib {env['matplotlib']}, "
+          f"{document['dpi']} dpi, median of {document['repeat']} run(s); "
+          f"RSS MB includes native buffers, Heap MB is Python allocations only")
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Print per-case total/peak changes; return the cases that regressed.
+
+    A case regresses when its total time or peak memory grows by more than
+    threshold (a fraction) over the baseline. Memory is the native-inclusive
+    render_rss_mb when both runs have it, else the traced Python heap.
+    """
+    before = {r['name']: r for r in baseline['results']}
+    regressions = []
+    print(f"\nComparing {baseline['environment']['commit']} → {current['environment']['commit']}")
+    print(f"{'Case':<42} {'Before':>8} {'After':>8} {'Change':>8} {'Peak Δ':>8}")
+    print('-' * 80)
+    for r in current['results']:
+        old = before.get(r['name'])
+        if old is None:
+            print(f"{r['name']:<42} {'-':>8} {r['total']:>8.3f} {'new':>8}")
+            continue
+        change = r['total'] / old['total'] - 1 if old['total'] else 0.0
+        memory = 'render_rss_mb' if 'render_rss_mb' in old and 'render_rss_mb' in r else 'peak_traced_mb'
+        peak_change = r[memory] / old[memory] - 1 if old[memory] else 0.0
+        flag = ''
+        if change > threshold or peak_change > threshold:
+            regressions.append(r['name'])
+            flag = '  ❌'
+        print(f"{r['name']:<42} {old['total']:>8.3f} {r['total']:>8.3f} {change:>+8.1%} {peak_change:>+8.1%}{flag}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as results_file:
+        return json.load(results_file)
+
+
+def main(argv=None):
+    """Run the benchmark suite or compare two result files"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('diagrams', nargs='*', help='only benchmark these diagram functions')
+    parser.add_argument('--dpi', type=int, default=100, help='raster resolution (default: 100)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='timed runs per case (default: 3)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='synthetic topology sizes (default: 10,100,1000)')
+    parser.add_argument('--no-synthetic', action='store_true', help='skip synthetic topologies')
+    parser.add_argument('-o', '--output', help='results file (default: build/benchmarks/<commit>.json)')
+    parser.add_argument('--compare', nargs='+', metavar='JSON',
+                        help='compare a baseline with a second file, or with a fresh run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD * 100,
+                        help='regression threshold in percent (default: 10)')
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) == 2:
+        current = load_results(args.compare[1])
+    else:
+        print("⏱️ Running diagram benchmarks...")
+        sizes = [int(size) for size in args.sizes.split(',') if size]
+        current = run_suite(args.dpi, args.repeat, sizes, args.diagrams, not args.no_synthetic)
+        output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"{current['environment']['commit']}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as results_file:
+            json.dump(current, results_file, indent=2)
+        print_results(current)
+        print(f"📄 Results saved to {output}")
+
+    if args.compare:
+        regressions = compare(load_results(args.compare[0]), current, args.threshold / 100)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0f}%: {', '.join(regressions)}")
+            return False
+        print(f"✅ No regressions over {args.threshold:.0f}%")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
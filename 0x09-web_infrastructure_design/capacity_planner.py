@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Capacity Planner
+Sizes the load balancer, web, app and database tiers of the scale-up stack for
+a target request rate with an M/M/c (Erlang C) model per node, vectorized over
+a grid of traffic levels, and renders the recommended allocation and its cost.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from scale_up_diagram_generator import COMPONENT_COLORS, COMPONENTS, CPU_CORES, RAM_GB, STORAGE_TYPE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'capacity_plan.png')
+DEFAULT_QPS = 200.0
+DEFAULT_SCALES = (1, 2, 5, 10)
+DEFAULT_MAX_UTILIZATION = 0.7
+
+# Monthly price of one core and one GB of RAM; the Task 3 stack comes to about $430/month
+CORE_MONTHLY = 12.5
+GB_MONTHLY = 4.0
+
+# Per tier: CPU time per visit on one core, visits per request (the app handles the
+# dynamic 60%, each of which makes 3 queries), mean response-time target per visit,
+# and nodes kept on top of the sized count (the passive load balancer)
+TIER_NAMES = ('lb', 'web', 'app', 'db')
+TIER_DEFAULTS = {
+    'lb': {'service_ms': 0.2, 'visits': 1.0, 'slo_ms': 5.0, 'standby': 1},
+    'web': {'service_ms': 2.0, 'visits': 1.0, 'slo_ms': 20.0, 'standby': 0},
+    'app': {'service_ms': 25.0, 'visits': 0.6, 'slo_ms': 100.0, 'standby': 0},
+    'db': {'service_ms': 4.0, 'visits': 1.8, 'slo_ms': 20.0, 'standby': 0},
+}
+
+
+def default_tiers():
+    """Return {tier: parameters} with the per-node resources of the scale-up diagram"""
+    tiers = {}
+    for name, component, cores, ram, storage, color in zip(TIER_NAMES, COMPONENTS, CPU_CORES, RAM_GB,
+                                                             STORAGE_TYPE, COMPONENT_COLORS):
+        tiers[name] = {**TIER_DEFAULTS[name], 'component': component, 'cores': cores, 'ram_gb': ram,
+                       'storage': storage, 'color': color}
+    return tiers
+
+
+def node_monthly_cost(tier):
+    return tier['cores'] * CORE_MONTHLY + tier['ram_gb'] * GB_MONTHLY
+
+
+def erlang_c(servers, offered):
+    """Return the M/M/c probability of queueing for c servers and offered load a = λ/μ.
+
+    Uses the Erlang B recursion, which is stable for any c, element-wise over
+    arrays; loads at or past saturation give 1.
+    """
+    servers = np.asarray(servers)
+    offered = np.asarray(offered, dtype=float)
+    blocking = np.ones(np.broadcast(servers, offered).shape)
+    for k in range(1, int(np.max(servers)) + 1):
+        blocking = np.where(k <= servers, offered * blocking / (k + offered * blocking), blocking)
+    rho = offered / servers
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(rho < 1, blocking / (1 - rho * (1 - blocking)), 1.0)
+
+
+def response_ms(tier, rate, nodes):
+    """Mean response time per visit when rate visits/s are spread evenly over nodes M/M/c nodes"""
+    mu = 1000.0 / tier['service_ms']
+    per_node = rate / nodes
+    spare = tier['cores'] * mu - per_node
+    with np.errstate(divide='ignore'):
+        wait = np.where(spare > 0, erlang_c(tier['cores'], per_node / mu) / spare, np.inf)
+    return (1 / mu + wait) * 1000
+
+
+def size_tier(tier, qps, max_utilization=DEFAULT_MAX_UTILIZATION):
+    """Return the fewest active nodes meeting the utilization cap and response target at each qps.
+
+    Starts from the utilization bound for the whole grid at once, then adds a
+    node wherever the Erlang C response time still misses the target.
+    """
+    if tier['service_ms'] >= tier['slo_ms']:
+        raise ValueError(f"{tier['component']}: {tier['service_ms']} ms of service cannot meet "
+                         f"a {tier['slo_ms']} ms target")
+    rate = np.asarray(qps, dtype=float) * tier['visits']
+    capacity = tier['cores'] * 1000.0 / tier['service_ms']
+    nodes = np.maximum(np.ceil(rate / (capacity * max_utilization) - 1e-9), 1).astype(int)
+    while True:
+        missing = response_ms(tier, rate, nodes) > tier['slo_ms']
+        if not missing.any():
+            return nodes
+        nodes = nodes + missing
+
+
+def plan(qps, tiers=None, max_utilization=DEFAULT_MAX_UTILIZATION):
+    """Size every tier for each traffic level in qps; return arrays keyed by tier and totals"""
+    tiers = tiers or default_tiers()
+    qps = np.atleast_1d(np.asarray(qps, dtype=float))
+    result = {'qps': qps, 'tiers': {}, 'monthly_cost': np.zeros(len(qps)), 'latency_ms': np.zeros(len(qps))}
+    for name, tier in tiers.items():
+        active = size_tier(tier, qps, max_utilization)
+        rate = qps * tier['visits']
+        latency = response_ms(tier, rate, active)
+        nodes = active + tier['standby']
+        cost = nodes * node_monthly_cost(tier)
+        result['tiers'][name] = {
+            'nodes': nodes, 'active': active,
+            'utilization': rate * tier['service_ms'] / 1000 / (active * tier['cores']),
+            'response_ms': latency, 'monthly_cost': cost,
+        }
+        result['monthly_cost'] += cost
+        result['latency_ms'] += tier['visits'] * latency
+    return result
+
+
+def level(result, i):
+    """Return traffic level i of a plan as plain Python values"""
+    return {
+        'qps': float(result['qps'][i]),
+        'monthly_cost': float(result['monthly_cost'][i]),
+        'latency_ms': float(result['latency_ms'][i]),
+        'tiers': {name: {key: values[i].item() for key, values in tier.items()}
+                  for name, tier in result['tiers'].items()},
+    }
+
+
+def breakpoints(result):
+    """Return the indexes where any tier's node count changes, i.e. where the bill steps up"""
+    counts = np.stack([tier['nodes'] for tier in result['tiers'].values()])
+    return [0] + (np.flatnonzero(np.any(np.diff(counts, axis=1) != 0, axis=0)) + 1).tolist()
+
+
+def print_plan(result, tiers, scales=None):
+    """Print nodes, utilization and cost per traffic level"""
+    base_cost = result['monthly_cost'][0]
+    header = ' '.join(f"{tiers[name]['component'].split()[0]:>12}" for name in result['tiers'])
+    header = f"{'Scale':>7} {'QPS':>9} {header} {'Latency':>9} {'$/month':>9} {'vs base':>8}"
+    print(f"\n{header}\n{'-' * len(header)}")
+    for i in range(len(result['qps'])):
+        scale = f"{scales[i]:g}x" if scales is not None else ''
+        cells = ' '.join(f"{tier['nodes'][i]:>5} @ {tier['utilization'][i]:>4.0%}"
+                         for tier in result['tiers'].values())
+        print(f"{scale:>7} {result['qps'][i]:>9,.0f} {cells} {result['latency_ms'][i]:>7.1f}ms "
+              f"{result['monthly_cost'][i]:>9,.0f} {result['monthly_cost'][i] / base_cost:>7.1f}x")
+
+
+def create_capacity_plan_diagram(result, tiers, scales, title=None):
+    """Draw the recommended allocation for the largest traffic level, like the resource optimization diagram"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+
+    fig, ax = plt.subplots(1, 1, figsize=(16, 10))
+    i = len(result['qps']) - 1
+    x_positions = [2, 5, 8, 11]
+
+    for x, (name, tier) in zip(x_positions, tiers.items()):
+        sized = result['tiers'][name]
+        nodes, active = int(sized['nodes'][i]), int(sized['active'][i])
+
+        comp_box = FancyBboxPatch((x - 1, 7.5), 2, 1.2, boxstyle="round,pad=0.1",
+                                  facecolor=tier['color'], edgecolor='black', linewidth=2)
+        ax.add_patch(comp_box)
+        ax.text(x, 8.1, f"{tier['component']}\n× {nodes}", ha='center', va='center', fontsize=10,
+                fontweight='bold')
+
+        # One square per node, the standby hatched; large tiers show the first rows and a count
+        shown = min(nodes, 24)
+        for j in range(shown):
+            row, col = divmod(j, 6)
+            node_box = FancyBboxPatch((x - 0.9 + col * 0.3, 6.9 - row * 0.3), 0.22, 0.22,
+                                      boxstyle="round,pad=0.02", facecolor=tier['color'], alpha=0.8,
+                                      edgecolor='black', linewidth=0.8, hatch='//' if j >= active else None)
+            ax.add_patch(node_box)
+        if nodes > shown:
+            ax.text(x, 5.65, f"+{nodes - shown} more", ha='center', va='center', fontsize=8)
+
+        cpu_bar = FancyBboxPatch((x - 0.8, 4.8), 1.6 * (tier['cores'] / max(CPU_CORES)), 0.4,
+                                 boxstyle="round,pad=0.02", facecolor='red', alpha=0.7, edgecolor='black')
+        ax.add_patch(cpu_bar)
+        ax.text(x, 5.3, f"{tier['cores']} Cores/node", ha='center', va='center', fontsize=8, fontweight='bold')
+
+        ram_bar = FancyBboxPatch((x - 0.8, 3.9), 1.6 * (tier['ram_gb'] / max(RAM_GB)), 0.4,
+                                 boxstyle="round,pad=0.02", facecolor='blue', alpha=0.7, edgecolor='black')
+        ax.add_patch(ram_bar)
+        ax.text(x, 4.4, f"{tier['ram_gb']}GB RAM/node", ha='center', va='center', fontsize=8, fontweight='bold')
+
+        utilization = float(sized['utilization'][i])
+        util_bar = FancyBboxPatch((x - 0.8, 3.0), 1.6 * min(utilization, 1.0), 0.4, boxstyle="round,pad=0.02",
+                                  facecolor='green' if utilization < 0.5 else 'orange', alpha=0.7,
+                                  edgecolor='black')
+        ax.add_patch(util_bar)
+        ax.text(x, 3.5, f"{utilization:.0%} busy, {float(sized['response_ms'][i]):.1f} ms", ha='center',
+                va='center', fontsize=8, fontweight='bold')
+
+        cost_box = FancyBboxPatch((x - 0.8, 1.6), 1.6, 0.8, boxstyle="round,pad=0.1",
+                                  facecolor='yellow', alpha=0.5, edgecolor='black')
+        ax.add_patch(cost_box)
+        ax.text(x, 2.0, f"${float(sized['monthly_cost'][i]):,.0f}/month", ha='center', va='center',
+                fontsize=9, fontweight='bold')
+
+    ax.text(6.5, 9.5, title or f"Capacity Plan for {result['qps'][i]:,.0f} QPS", ha='center', va='center',
+            fontsize=16, fontweight='bold')
+    ax.text(1, 7.0, 'Nodes:', ha='right', va='center', fontsize=10, fontweight='bold')
+    ax.text(1, 5.0, 'CPU:', ha='right', va='center', fontsize=10, fontweight='bold')
+    ax.text(1, 4.1, 'RAM:', ha='right', va='center', fontsize=10, fontweight='bold')
+    ax.text(1, 3.2, 'Load:', ha='right', va='center', fontsize=10, fontweight='bold')
+    ax.text(1, 2.0, 'Cost:', ha='right', va='center', fontsize=10, fontweight='bold')
+
+    short = {name: tier['component'].split()[0] for name, tier in tiers.items()}
+    rows = []
+    for j, scale in enumerate(scales):
+        counts = ' · '.join(f"{short[name]} {int(result['tiers'][name]['nodes'][j])}" for name in tiers)
+        rows.append(f"{scale:g}x  {result['qps'][j]:>7,.0f} QPS  ${result['monthly_cost'][j]:>7,.0f}\n      {counts}")
+    cost_text = "Cost by Traffic Level:\n\n" + '\n'.join(rows) + \
+        f"\n\n→ {scales[-1]:g}x traffic costs {result['monthly_cost'][i] / result['monthly_cost'][0]:.1f}x"
+    ax.text(13.3, 6.3, cost_text, ha='left', va='center', fontsize=9, family='monospace',
+            bbox=dict(boxstyle="round,pad=0.5", facecolor='lightblue', alpha=0.7))
+
+    model_text = "Model (per node M/M/c):\n\n" + '\n'.join(
+        f"{short[name]}: {tier['service_ms']:g} ms × {tier['visits']:g}/req, ≤ {tier['slo_ms']:g} ms"
+        + (f", +{tier['standby']} standby" if tier['standby'] else '') for name, tier in tiers.items())
+    ax.text(13.3, 1.8, model_text, ha='left', va='center', fontsize=9,
+            bbox=dict(boxstyle="round,pad=0.5", facecolor='lightgreen', alpha=0.7))
+
+    ax.set_xlim(0, 19)
+    ax.set_ylim(0.5, 10)
+    ax.axis('off')
+
+    plt.tight_layout()
+    return fig
+
+
+def _overrides(value, cast=float):
+    """Parse 'lb=0.5,app=30' into {'lb': 0.5, 'app': 30.0}"""
+    overrides = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, sep, number = item.partition('=')
+        if not sep or name.strip() not in TIER_NAMES:
+            raise argparse.ArgumentTypeError(f"expected tier=value with tier in {', '.join(TIER_NAMES)}: {item}")
+        overrides[name.strip()] = cast(number)
+    return overrides
+
+
+def _scales(value):
+    """Parse '1,2,5' into [1.0, 2.0, 5.0], rejecting an empty list"""
+    try:
+        scales = [float(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated numbers, got {value!r}")
+    if not scales:
+        raise argparse.ArgumentTypeError('expected at least one traffic multiplier')
+    return scales
+
+
+def main(argv=None):
+    """Size the tiers for a range of traffic levels, print the plan and render it"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--qps', type=float, default=DEFAULT_QPS, help='baseline requests per second (default: 200)')
+    parser.add_argument('--scale', type=_scales,
+                        default=list(DEFAULT_SCALES), help='traffic multipliers to plan for (default: 1,2,5,10)')
+    parser.add_argument('--service-ms', type=_overrides, default={},
+                        help='CPU ms per visit on one core, e.g. app=30,db=6')
+    parser.add_argument('--visits', type=_overrides, default={}, help='visits per request, e.g. db=3')
+    parser.add_argument('--slo-ms', type=_overrides, default={}, help='mean response target per visit, e.g. app=80')
+    parser.add_argument('--cores', type=lambda v: _overrides(v, int), default={}, help='cores per node, e.g. app=16')
+    parser.add_argument('--ram-gb', type=lambda v: _overrides(v, int), default={}, help='RAM per node, e.g. db=32')
+    parser.add_argument('--max-utilization', type=float, default=DEFAULT_MAX_UTILIZATION,
+                        help='CPU utilization cap per node (default: 0.7)')
+    parser.add_argument('--grid', type=int, metavar='N',
+                        help='also solve N traffic levels up to the largest scale and list where the cost steps')
+    parser.add_argument('--json', action='store_true', help='print the plan as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/capacity_plan.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print the plan only')
+    args = parser.parse_args(argv)
+    if not 0 < args.max_utilization < 1:
+        parser.error('--max-utilization must be between 0 and 1')
+
+    tiers = default_tiers()
+    for key in ('service_ms', 'visits', 'slo_ms', 'cores', 'ram_gb'):
+        for name, value in getattr(args, key).items():
+            tiers[name][key] = value
+    scales = sorted(args.scale)
+
+    try:
+        result = plan([args.qps * s for s in scales], tiers, args.max_utilization)
+        if args.json:
+            print(json.dumps([{'scale': s, **level(result, i)} for i, s in enumerate(scales)], indent=2))
+            return True
+        print_plan(result, tiers, scales)
+        if args.grid:
+            start = time.perf_counter()
+            grid = plan(np.geomspace(args.qps * scales[0], args.qps * scales[-1], args.grid), tiers,
+                        args.max_utilization)
+            print(f"\n📈 {args.grid:,} traffic levels solved in {(time.perf_counter() - start) * 1000:.1f} ms; "
+                  f"the bill steps at:")
+            steps = breakpoints(grid)
+            print_plan({**grid, 'qps': grid['qps'][steps], 'monthly_cost': grid['monthly_cost'][steps],
+                        'latency_ms': grid['latency_ms'][steps],
+                        'tiers': {name: {key: values[steps] for key, values in tier.items()}
+                                  for name, tier in grid['tiers'].items()}}, tiers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+
+    if not args.no_diagram:
+        from headless import use_headless
+        use_headless()
+        import matplotlib.pyplot as plt
+        from vector_output import save_figure
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        fig = create_capacity_plan_diagram(result, tiers, scales)
+        save_figure(fig, args.output, dpi=args.dpi)
+        plt.close(fig)
+        print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
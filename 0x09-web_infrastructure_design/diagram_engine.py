@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Declarative Diagram Engine
+Renders infrastructure diagrams from JSON/YAML specs describing nodes, tiers,
+edges, panels and annotations, instead of hand-placed patch calls.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPEC_DIR = os.path.join(BASE_DIR, 'specs')
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'build', 'specs')
+
+# Keys accepted at the top level of an axes spec
+AXES_KEYS = {'xlim', 'ylim', 'aspect', 'title', 'title_fontsize', 'styles', 'nodes', 'tiers',
+             'edges', 'panels', 'texts', 'lines', 'legend', 'legend_loc', 'legend_anchor', 'layout'}
+SPEC_KEYS = AXES_KEYS | {'name', 'description', 'output', 'figsize', 'dpi', 'axes'}
+
+NODE_DEFAULTS = {
+    'boxstyle': 'round,pad=0.1',
+    'facecolor': 'white',
+    'edgecolor': 'black',
+    'linewidth': 2,
+    'alpha': 1.0,
+    'fontsize': 9,
+    'weight': 'bold',
+    'color': 'black',
+}
+
+EDGE_DEFAULTS = {
+    'arrowstyle': '->',
+    'color': 'black',
+    'lw': 2,
+    'alpha': 1.0,
+    'linestyle': 'solid',
+    'mutation_scale': 15,
+    'shrink': 2,
+}
+
+
+class SpecError(ValueError):
+    """Raised when a diagram spec is malformed"""
+
+
+def load_spec(path):
+    """Load a diagram spec from a .json or .yaml/.yml file"""
+    with open(path, encoding='utf-8') as spec_file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise SpecError(f"{path}: PyYAML is required for YAML specs (pip install pyyaml)")
+            spec = yaml.safe_load(spec_file)
+        else:
+            spec = json.load(spec_file)
+    spec.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    return spec
+
+
+def spec_paths(spec_dir=SPEC_DIR):
+    """Return every spec file in spec_dir, sorted by name"""
+    patterns = ('*.json', '*.yaml', '*.yml')
+    return sorted(p for pattern in patterns for p in glob.glob(os.path.join(spec_dir, pattern)))
+
+
+def axes_specs(spec):
+    """Return the list of axes specs; a spec without 'axes' is a single axes"""
+    return spec['axes'] if 'axes' in spec else [spec]
+
+
+def validate_spec(spec):
+    """Return a list of problems found in a spec (empty when valid)"""
+    errors = []
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        errors.append(f"unknown top-level key(s): {', '.join(sorted(unknown))}")
+    if 'figsize' in spec and len(spec['figsize']) != 2:
+        errors.append("figsize must be [width, height]")
+
+    for index, axes in enumerate(axes_specs(spec)):
+        where = f"axes[{index}]" if 'axes' in spec else 'spec'
+        if 'axes' in spec:
+            unknown = set(axes) - AXES_KEYS
+            if unknown:
+                errors.append(f"{where}: unknown key(s): {', '.join(sorted(unknown))}")
+        styles = {**spec.get('styles', {}), **axes.get('styles', {})}
+        node_ids = set()
+        for node in axes.get('nodes', []):
+            node_id = node.get('id')
+            if not node_id:
+                errors.append(f"{where}: node without an id: {node}")
+                continue
+            if node_id in node_ids:
+                errors.append(f"{where}: duplicate node id '{node_id}'")
+            node_ids.add(node_id)
+            if isinstance(node.get('style'), str) and node['style'] not in styles:
+                errors.append(f"{where}: node '{node_id}' uses undefined style '{node['style']}'")
+        tiered = set()
+        for tier in axes.get('tiers', []):
+            for node_id in tier.get('nodes', []):
+                if node_id not in node_ids:
+                    errors.append(f"{where}: tier '{tier.get('id')}' references unknown node '{node_id}'")
+                tiered.add(node_id)
+        for node in axes.get('nodes', []):
+            if 'layout' in axes:
+                break
+            if node.get('id') and node['id'] not in tiered and 'box' not in node and 'center' not in node:
+                errors.append(f"{where}: node '{node['id']}' has no box/center and is in no tier")
+        for edge in axes.get('edges', []):
+            path = edge.get('path') or [edge.get('from'), edge.get('to')]
+            if 'points' in edge:
+                continue
+            for node_id in path:
+                if node_id not in node_ids:
+                    errors.append(f"{where}: edge references unknown node '{node_id}'")
+    return errors
+
+
+def _style(axes, spec, item, defaults):
+    """Merge defaults, a named/inline style and the item's own overrides"""
+    merged = dict(defaults)
+    style = item.get('style')
+    if isinstance(style, str):
+        styles = {**spec.get('styles', {}), **axes.get('styles', {})}
+        merged.update(styles.get(style, {}))
+    elif isinstance(style, dict):
+        merged.update(style)
+    merged.update({k: v for k, v in item.items() if k in defaults})
+    return merged
+
+
+def resolve_layout(axes):
+    """Return {node_id: geometry} with tier members placed in equal slots.
+
+    Box nodes resolve to ('box', x, y, w, h) and circle nodes to
+    ('circle', cx, cy, r). A tier spreads its nodes evenly across its x (or y)
+    range, so a tier of two web servers and a tier of twenty share one spec.
+    """
+    nodes = {node['id']: node for node in axes.get('nodes', [])}
+    geometry = {}
+
+    for node_id, node in nodes.items():
+        if 'center' in node:
+            cx, cy = node['center']
+            geometry[node_id] = ('circle', cx, cy, node.get('radius', 0.5))
+        elif 'box' in node:
+            geometry[node_id] = ('box', *node['box'])
+
+    for tier in axes.get('tiers', []):
+        members = [n for n in tier.get('nodes', []) if n not in geometry]
+        if not members:
+            continue
+        x0, x1 = tier['x']
+        y0, y1 = tier['y']
+        width, height = tier.get('node_size', [1.6, 0.8])
+        vertical = tier.get('direction', 'horizontal') == 'vertical'
+        count = len(members)
+        for slot, node_id in enumerate(members):
+            if vertical:
+                cx = (x0 + x1) / 2
+                cy = y1 - (y1 - y0) * (slot + 0.5) / count
+            else:
+                cx = x0 + (x1 - x0) * (slot + 0.5) / count
+                cy = (y0 + y1) / 2
+            geometry[node_id] = ('box', cx - width / 2, cy - height / 2, width, height)
+    return geometry
+
+
+def node_center(geom):
+    """Return the centre point of a resolved node geometry"""
+    if geom[0] == 'circle':
+        return geom[1], geom[2]
+    _, x, y, w, h = geom
+    return x + w / 2, y + h / 2
+
+
+def boundary_point(geom, toward):
+    """Return where the ray from a node's centre toward a point leaves the node"""
+    cx, cy = node_center(geom)
+    dx, dy = toward[0] - cx, toward[1] - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    if geom[0] == 'circle':
+        scale = geom[3] / math.hypot(dx, dy)
+        return cx + dx * scale, cy + dy * scale
+    half_w, half_h = geom[3] / 2, geom[4] / 2
+    scale = min(half_w / abs(dx) if dx else math.inf, half_h / abs(dy) if dy else math.inf)
+    return cx + dx * scale, cy + dy * scale
+
+
+def edge_segments(edge, geometry):
+    """Expand an edge spec into (start, end) point pairs"""
+    if 'points' in edge:
+        points = [tuple(p) for p in edge['points']]
+        return list(zip(points, points[1:]))
+    path = edge.get('path') or [edge['from'], edge['to']]
+    segments = []
+    for source, target in zip(path, path[1:]):
+        src, dst = geometry[source], geometry[target]
+        segments.append((boundary_point(src, node_center(dst)), boundary_point(dst, node_center(src))))
+    return segments
+
+
+def _text_kwargs(item, default_ha='center'):
+    kwargs = {
+        'fontsize': item.get('fontsize', 10),
+        'ha': item.get('ha', default_ha),
+        'va': item.get('va', 'center'),
+        'color': item.get('color', 'black'),
+    }
+    for key, kwarg in (('weight', 'fontweight'), ('fontstyle', 'style'), ('rotation', 'rotation')):
+        if key in item:
+            kwargs[kwarg] = item[key]
+    if 'bbox' in item:
+        kwargs['bbox'] = item['bbox']
+    return kwargs
+
+
+def _draw_shapes(ax, axes, spec, geometry, nodes):
+    """Draw tiers, panel boxes and nodes as one patch per element"""
+    from matplotlib.patches import Circle, FancyBboxPatch
+
+    for tier in axes.get('tiers', []):
+        if 'style' not in tier:
+            continue
+        style = _style(axes, spec, tier, NODE_DEFAULTS)
+        x0, x1 = tier['x']
+        y0, y1 = tier['y']
+        ax.add_patch(FancyBboxPatch((x0, y0), x1 - x0, y1 - y0, boxstyle=style['boxstyle'],
+                                    facecolor=style['facecolor'], edgecolor=style['edgecolor'],
+                                    linewidth=style['linewidth'], alpha=style['alpha']))
+    for panel in axes.get('panels', []):
+        style = _style(axes, spec, panel, NODE_DEFAULTS)
+        x, y, w, h = panel['box']
+        ax.add_patch(FancyBboxPatch((x, y), w, h, boxstyle=style['boxstyle'],
+                                    facecolor=style['facecolor'], edgecolor=style['edgecolor'],
+                                    linewidth=style['linewidth'], alpha=style['alpha']))
+    for node_id, geom in geometry.items():
+        style = _style(axes, spec, nodes[node_id], NODE_DEFAULTS)
+        if geom[0] == 'circle':
+            patch = Circle(geom[1:3], geom[3], facecolor=style['facecolor'],
+                           edgecolor=style['edgecolor'], linewidth=style['linewidth'], alpha=style['alpha'])
+        else:
+            patch = FancyBboxPatch(geom[1:3], geom[3], geom[4], boxstyle=style['boxstyle'],
+                                   facecolor=style['facecolor'], edgecolor=style['edgecolor'],
+                                   linewidth=style['linewidth'], alpha=style['alpha'])
+        ax.add_patch(patch)
+
+
+def _draw_shapes_batched(ax, axes, spec, geometry, nodes):
+    """Draw tiers, panel boxes and nodes as one collection per layer"""
+    import numpy as np
+    from batch_draw import add_boxes, add_circles, parse_boxstyle
+
+    def boxes(items):
+        if not items:
+            return
+        styles = [style for style, _ in items]
+        pads = [parse_boxstyle(style['boxstyle']) for style in styles]
+        rects = np.array([rect for _, rect in items], dtype=float)
+        add_boxes(ax, rects[:, :2], rects[:, 2:], pad=[p for p, _ in pads], rounding=[r for _, r in pads],
+                  facecolors=[s['facecolor'] for s in styles], edgecolors=[s['edgecolor'] for s in styles],
+                  linewidths=[s['linewidth'] for s in styles], alphas=[s['alpha'] for s in styles])
+
+    boxes([(_style(axes, spec, tier, NODE_DEFAULTS),
+            (tier['x'][0], tier['y'][0], tier['x'][1] - tier['x'][0], tier['y'][1] - tier['y'][0]))
+           for tier in axes.get('tiers', []) if 'style' in tier])
+    boxes([(_style(axes, spec, panel, NODE_DEFAULTS), panel['box']) for panel in axes.get('panels', [])])
+
+    node_boxes, circles = [], []
+    for node_id, geom in geometry.items():
+        style = _style(axes, spec, nodes[node_id], NODE_DEFAULTS)
+        (circles if geom[0] == 'circle' else node_boxes).append((style, geom[1:]))
+    boxes(node_boxes)
+    if circles:
+        styles = [style for style, _ in circles]
+        circle_geoms = np.array([geom for _, geom in circles], dtype=float)
+        add_circles(ax, circle_geoms[:, :2], circle_geoms[:, 2],
+                    facecolors=[s['facecolor'] for s in styles], edgecolors=[s['edgecolor'] for s in styles],
+                    linewidths=[s['linewidth'] for s in styles], alphas=[s['alpha'] for s in styles])
+
+
+def _draw_edges(ax, axes, spec, geometry):
+    """Draw every edge segment as its own FancyArrowPatch"""
+    from matplotlib.patches import FancyArrowPatch
+
+    for edge in axes.get('edges', []):
+        style = _style(axes, spec, edge, EDGE_DEFAULTS)
+        for start, end in edge_segments(edge, geometry):
+            ax.add_patch(FancyArrowPatch(start, end, arrowstyle=style['arrowstyle'],
+                                         mutation_scale=style['mutation_scale'],
+                                         color=style['color'], lw=style['lw'], alpha=style['alpha'],
+                                         linestyle=style['linestyle'],
+                                         shrinkA=style['shrink'], shrinkB=style['shrink']))
+
+
+def _draw_edges_batched(ax, axes, spec, geometry):
+    """Draw edge segments as one line collection per arrow style"""
+    from batch_draw import add_arrows
+
+    groups = {}
+    for edge in axes.get('edges', []):
+        style = _style(axes, spec, edge, EDGE_DEFAULTS)
+        group = groups.setdefault((style['arrowstyle'], style['mutation_scale'], style['shrink']), [])
+        group.extend((start, end, style) for start, end in edge_segments(edge, geometry))
+
+    for (arrowstyle, mutation_scale, shrink), segments in groups.items():
+        styles = [style for _, _, style in segments]
+        add_arrows(ax, [start for start, _, _ in segments], [end for _, end, _ in segments],
+                   colors=[s['color'] for s in styles], linewidths=[s['lw'] for s in styles],
+                   alphas=[s['alpha'] for s in styles], linestyles=[s['linestyle'] for s in styles],
+                   arrowstyle=arrowstyle, mutation_scale=mutation_scale, shrink=shrink, zorder=1)
+
+
+def draw_axes(ax, axes, spec, batched=True):
+    """Draw one axes spec onto a matplotlib Axes.
+
+    With batched=True (the default) shapes and arrows are drawn as a few
+    NumPy-backed collections; batched=False draws one patch per element.
+    """
+    from matplotlib.patches import Rectangle
+
+    if 'layout' in axes:
+        from auto_layout import apply_layout
+        axes, _ = apply_layout(axes)
+
+    geometry = resolve_layout(axes)
+    nodes = {node['id']: node for node in axes.get('nodes', [])}
+    # Limits and aspect first; batched heads and circles are resized at draw time anyway
+    ax.set_xlim(*axes.get('xlim', (0, 10)))
+    ax.set_ylim(*axes.get('ylim', (0, 10)))
+    if axes.get('aspect'):
+        ax.set_aspect(axes['aspect'])
+
+    # Tier backgrounds sit underneath everything else
+    (_draw_shapes_batched if batched else _draw_shapes)(ax, axes, spec, geometry, nodes)
+
+    for tier in axes.get('tiers', []):
+        if 'style' in tier and 'label' in tier:
+            x0, x1 = tier['x']
+            ax.text((x0 + x1) / 2, tier['y'][1] - tier.get('label_offset', 0.25), tier['label'],
+                    **_text_kwargs({'fontsize': 12, 'weight': 'bold', **tier.get('label_style', {})}))
+
+    for panel in axes.get('panels', []):
+        x, y, w, h = panel['box']
+        top = y + h - panel.get('title_offset', 0.3)
+        if 'title' in panel:
+            ax.text(x + w / 2, top, panel['title'],
+                    **_text_kwargs({'fontsize': panel.get('title_fontsize', 12), 'weight': 'bold',
+                                    'color': panel.get('title_color', 'black')}))
+        spacing = panel.get('spacing', 0.3)
+        first = top - panel.get('items_offset', spacing)
+        for row, item in enumerate(panel.get('items', [])):
+            ax.text(x + panel.get('indent', 0.2), first - row * spacing, item,
+                    **_text_kwargs({'fontsize': panel.get('item_fontsize', 10)}, default_ha='left'))
+
+    for node_id, geom in geometry.items():
+        node = nodes[node_id]
+        if node.get('text'):
+            style = _style(axes, spec, node, NODE_DEFAULTS)
+            x, y = node.get('text_xy', node_center(geom))
+            ax.text(x, y, node['text'], **_text_kwargs({
+                'fontsize': style['fontsize'], 'weight': style['weight'], 'color': style['color'],
+                **{k: node[k] for k in ('ha', 'va', 'fontstyle') if k in node}}))
+
+    (_draw_edges_batched if batched else _draw_edges)(ax, axes, spec, geometry)
+    for edge in axes.get('edges', []):
+        label = edge.get('label')
+        if label:
+            style = _style(axes, spec, edge, EDGE_DEFAULTS)
+            label = {'text': label} if isinstance(label, str) else label
+            if 'xy' in label:
+                x, y = label['xy']
+            else:
+                (x0, y0), (x1, y1) = edge_segments(edge, geometry)[0]
+                x, y = (x0 + x1) / 2, (y0 + y1) / 2 + 0.2
+            ax.text(x, y, label['text'], **_text_kwargs({'fontsize': 8, 'color': style['color'], **label}))
+
+    for line in axes.get('lines', []):
+        xs, ys = zip(*line['points'])
+        ax.plot(xs, ys, line.get('fmt', '-'), linewidth=line.get('lw', 1), color=line.get('color', 'black'))
+
+    for text in axes.get('texts', []):
+        ax.text(*text['xy'], text['text'], **_text_kwargs(text))
+
+    if 'legend' in axes:
+        handles = [Rectangle((0, 0), 1, 1, facecolor=entry['facecolor'], label=entry['label'])
+                   for entry in axes['legend']]
+        kwargs = {'loc': axes.get('legend_loc', 'upper right'), 'fontsize': 9}
+        if 'legend_anchor' in axes:
+            kwargs['bbox_to_anchor'] = tuple(axes['legend_anchor'])
+        ax.legend(handles=handles, **kwargs)
+
+    if 'title' in axes:
+        ax.set_title(axes['title'], fontsize=axes.get('title_fontsize', 16), fontweight='bold', pad=20)
+    ax.axis('off')
+
+
+def render_spec(spec, batched=True):
+    """Build a matplotlib figure from a spec"""
+    import matplotlib.pyplot as plt
+
+    errors = validate_spec(spec)
+    if errors:
+        raise SpecError(f"{spec.get('name', '<spec>')}: " + '; '.join(errors))
+
+    panes = axes_specs(spec)
+    fig, axs = plt.subplots(1, len(panes), figsize=tuple(spec.get('figsize', (12, 10))), squeeze=False)
+    for ax, axes in zip(axs[0], panes):
+        draw_axes(ax, axes, spec, batched)
+    plt.tight_layout()
+    return fig
+
+
+def output_file_for(spec, fmt='png'):
+    """Return the file name a spec renders to in fmt"""
+    from vector_output import with_format
+    return with_format(spec.get('output', spec['name'] + '.png'), fmt)
+
+
+def main(argv=None):
+    """Render spec files to PNG, SVG or PDF"""
+    from vector_output import DEFAULT_DPI, parse_formats, save_figure
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('specs', nargs='*', help='spec files to render (default: specs/*)')
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='directory for the rendered files (default: build/specs)')
+    parser.add_argument('-F', '--format', default='png', type=parse_formats,
+                        help='comma-separated output formats: svg, pdf, png (default: png)')
+    parser.add_argument('--dpi', type=int,
+                        help="PNG resolution (default: the spec's dpi, else 300)")
+    parser.add_argument('--per-artist', action='store_true',
+                        help='draw one patch per element instead of batched collections')
+    args = parser.parse_args(argv)
+
+    import warnings
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = args.specs or spec_paths()
+    print(f"🎨 Rendering {len(paths)} diagram spec(s)...")
+    ok = True
+    for path in paths:
+        try:
+            spec = load_spec(path)
+            fig = render_spec(spec, batched=not args.per_artist)
+            for fmt in args.format:
+                output = os.path.join(args.output_dir, output_file_for(spec, fmt))
+                save_figure(fig, output, fmt, args.dpi or spec.get('dpi', DEFAULT_DPI))
+                print(f"- {output}")
+            plt.close(fig)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -4,13 +4,17 @@ Simple Web Stack Infrastructure Diagram Generator
 This script generates a visual representation of the simple web stack infrastructure.
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import numpy as np
+from headless import format_memory, headless_requested, render_measured, use_headless
 
 def create_infrastructure_diagram():
     """Create a visual diagram of the simple web stack infrastructure."""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, ConnectionPatch
+    from topology import DOMAIN, simple_web_stack
+
+    stack = simple_web_stack()
+    user, dns, server = stack['user'], stack['dns'], stack['server']
+    nginx, app, files, db = stack['nginx'], stack['app'], stack['files'], stack['db']
     
     # Create figure and axis
     fig, ax = plt.subplots(1, 1, figsize=(12, 10))
@@ -19,9 +23,9 @@ def create_infrastructure_diagram():
     ax.axis('off')
     
     # Title
-    ax.text(5, 11.5, 'Simple Web Stack Infrastructure', 
+    ax.text(5, 11.5, stack.title, 
             fontsize=16, fontweight='bold', ha='center')
-    ax.text(5, 11, 'www.foobar.com (8.8.8.8)', 
+    ax.text(5, 11, f"{DOMAIN} ({server.ip})", 
             fontsize=12, ha='center', style='italic')
     
     # User's Computer
@@ -30,7 +34,7 @@ def create_infrastructure_diagram():
                               facecolor='lightblue', 
                               edgecolor='blue', linewidth=2)
     ax.add_patch(user_box)
-    ax.text(1.5, 9.5, "User's Computer", fontsize=10, ha='center', fontweight='bold')
+    ax.text(1.5, 9.5, user.label, fontsize=10, ha='center', fontweight='bold')
     
     # Internet/DNS Cloud
     dns_box = FancyBboxPatch((4, 9), 2, 1, 
@@ -38,9 +42,9 @@ def create_infrastructure_diagram():
                              facecolor='lightgray', 
                              edgecolor='gray', linewidth=2)
     ax.add_patch(dns_box)
-    ax.text(5, 9.5, 'DNS/Internet', fontsize=10, ha='center', fontweight='bold')
-    ax.text(5, 9.2, 'www.foobar.com', fontsize=8, ha='center')
-    ax.text(5, 9, '→ 8.8.8.8', fontsize=8, ha='center')
+    ax.text(5, 9.5, dns.label, fontsize=10, ha='center', fontweight='bold')
+    ax.text(5, 9.2, dns.detail, fontsize=8, ha='center')
+    ax.text(5, 9, f"→ {server.ip}", fontsize=8, ha='center')
     
     # Main Server Box
     server_box = FancyBboxPatch((3, 2), 4, 6, 
@@ -48,7 +52,7 @@ def create_infrastructure_diagram():
                                 facecolor='lightyellow', 
                                 edgecolor='orange', linewidth=3)
     ax.add_patch(server_box)
-    ax.text(5, 7.5, 'Server (8.8.8.8)', fontsize=12, ha='center', fontweight='bold')
+    ax.text(5, 7.5, f"{server.label} ({server.ip})", fontsize=12, ha='center', fontweight='bold')
     
     # Nginx Web Server
     nginx_box = FancyBboxPatch((3.2, 6.5), 3.6, 0.8, 
@@ -56,8 +60,8 @@ def create_infrastructure_diagram():
                                facecolor='lightgreen', 
                                edgecolor='green', linewidth=2)
     ax.add_patch(nginx_box)
-    ax.text(5, 6.9, 'Nginx Web Server', fontsize=10, ha='center', fontweight='bold')
-    ax.text(5, 6.6, '(Port 80/443)', fontsize=8, ha='center')
+    ax.text(5, 6.9, nginx.label, fontsize=10, ha='center', fontweight='bold')
+    ax.text(5, 6.6, f"({nginx.detail})", fontsize=8, ha='center')
     
     # Application Server
     app_box = FancyBboxPatch((3.2, 5.5), 3.6, 0.8, 
@@ -65,8 +69,8 @@ def create_infrastructure_diagram():
                              facecolor='lightcoral', 
                              edgecolor='red', linewidth=2)
     ax.add_patch(app_box)
-    ax.text(5, 5.9, 'Application Server', fontsize=10, ha='center', fontweight='bold')
-    ax.text(5, 5.6, '(PHP/Python/Node.js)', fontsize=8, ha='center')
+    ax.text(5, 5.9, app.label, fontsize=10, ha='center', fontweight='bold')
+    ax.text(5, 5.6, f"({app.detail})", fontsize=8, ha='center')
     
     # Application Files
     files_box = FancyBboxPatch((3.2, 4.5), 3.6, 0.8, 
@@ -74,8 +78,8 @@ def create_infrastructure_diagram():
                                facecolor='lightsalmon', 
                                edgecolor='darkorange', linewidth=2)
     ax.add_patch(files_box)
-    ax.text(5, 4.9, 'Application Files', fontsize=10, ha='center', fontweight='bold')
-    ax.text(5, 4.6, '(Code Base)', fontsize=8, ha='center')
+    ax.text(5, 4.9, files.label, fontsize=10, ha='center', fontweight='bold')
+    ax.text(5, 4.6, f"({files.detail})", fontsize=8, ha='center')
     
     # MySQL Database
     db_box = FancyBboxPatch((3.2, 3.5), 3.6, 0.8, 
@@ -83,8 +87,8 @@ def create_infrastructure_diagram():
                             facecolor='lightsteelblue', 
                             edgecolor='steelblue', linewidth=2)
     ax.add_patch(db_box)
-    ax.text(5, 3.9, 'MySQL Database', fontsize=10, ha='center', fontweight='bold')
-    ax.text(5, 3.6, '(Port 3306)', fontsize=8, ha='center')
+    ax.text(5, 3.9, db.label, fontsize=10, ha='center', fontweight='bold')
+    ax.text(5, 3.6, f"({db.detail})", fontsize=8, ha='center')
     
     # Arrows for request flow
     # User to DNS
@@ -92,14 +96,14 @@ def create_infrastructure_diagram():
                             arrowstyle="-|>", shrinkA=5, shrinkB=5, 
                             mutation_scale=20, fc="blue", alpha=0.6)
     ax.add_artist(arrow1)
-    ax.text(3.25, 9.7, 'DNS Query', fontsize=8, ha='center', color='blue')
+    ax.text(3.25, 9.7, stack.edge('user', 'dns'), fontsize=8, ha='center', color='blue')
     
     # DNS to Server
     arrow2 = ConnectionPatch((5, 9), (5, 8), "data", "data",
                             arrowstyle="-|>", shrinkA=5, shrinkB=5, 
                             mutation_scale=20, fc="green", alpha=0.6)
     ax.add_artist(arrow2)
-    ax.text(5.8, 8.5, 'HTTP Request', fontsize=8, ha='center', color='green')
+    ax.text(5.8, 8.5, stack.edge('dns', 'server'), fontsize=8, ha='center', color='green')
     
     # Internal server arrows
     # Nginx to App Server
@@ -143,6 +147,10 @@ def create_infrastructure_diagram():
 
 def create_request_flow_diagram():
     """Create a detailed request flow diagram."""
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from batch_draw import add_arrows, add_boxes
+    from topology import DOMAIN, PUBLIC_IP
     
     fig, ax = plt.subplots(1, 1, figsize=(12, 8))
     ax.set_xlim(0, 10)
@@ -155,8 +163,8 @@ def create_request_flow_diagram():
     
     # Steps
     steps = [
-        "1. User enters www.foobar.com",
-        "2. DNS resolves to 8.8.8.8",
+        f"1. User enters {DOMAIN}",
+        f"2. DNS resolves to {PUBLIC_IP}",
         "3. HTTP request sent to server",
         "4. Nginx receives request",
         "5. Nginx forwards to app server",
@@ -170,37 +178,33 @@ def create_request_flow_diagram():
     
     y_positions = np.linspace(6.5, 1, len(steps))
     
-    for i, (step, color, y_pos) in enumerate(zip(steps, colors, y_positions)):
-        # Step box
-        step_box = FancyBboxPatch((0.5, y_pos-0.2), 9, 0.4, 
-                                  boxstyle="round,pad=0.05", 
-                                  facecolor=color, 
-                                  edgecolor='gray', linewidth=1)
-        ax.add_patch(step_box)
+    # Step boxes and the arrows between them are drawn as one batch each
+    add_boxes(ax, np.column_stack([np.full(len(steps), 0.5), y_positions - 0.2]), (9, 0.4),
+              pad=0.05, facecolors=colors, edgecolors='gray', linewidths=1)
+    for step, y_pos in zip(steps, y_positions):
         ax.text(5, y_pos, step, fontsize=11, ha='center', fontweight='bold')
-        
-        # Arrow to next step
-        if i < len(steps) - 1:
-            arrow = ConnectionPatch((5, y_pos-0.2), (5, y_positions[i+1]+0.2), 
-                                   "data", "data",
-                                   arrowstyle="-|>", shrinkA=2, shrinkB=2, 
-                                   mutation_scale=15, fc="black", alpha=0.7)
-            ax.add_artist(arrow)
+
+    # Arrow to next step
+    add_arrows(ax, np.column_stack([np.full(len(steps) - 1, 5), y_positions[:-1] - 0.2]),
+               np.column_stack([np.full(len(steps) - 1, 5), y_positions[1:] + 0.2]),
+               colors='black', alphas=0.7, arrowstyle="-|>", mutation_scale=15, shrink=2)
     
     plt.tight_layout()
     return fig
 
 if __name__ == "__main__":
+    headless = headless_requested()
+    if headless:
+        use_headless()
+
     # Create and save the infrastructure diagram
-    fig1 = create_infrastructure_diagram()
-    plt.figure(fig1.number)
-    plt.savefig('simple_web_stack_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_infrastructure_diagram, 'simple_web_stack_diagram.png', headless)
     print("Infrastructure diagram saved as 'simple_web_stack_diagram.png'")
+    if headless:
+        print(format_memory(report))
     
     # Create and save the request flow diagram
-    fig2 = create_request_flow_diagram()
-    plt.figure(fig2.number)
-    plt.savefig('request_flow_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_request_flow_diagram, 'request_flow_diagram.png', headless)
     print("Request flow diagram saved as 'request_flow_diagram.png'")
-    
-    plt.show()
+    if headless:
+        print(format_memory(report))
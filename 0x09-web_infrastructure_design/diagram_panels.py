@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Diagram Panels
+Places result plots beside an existing diagram: the figure is widened, its
+drawing kept at the same size on the left, and new axes added on the right.
+"""
+
+
+def add_side_panel(fig, rows=1, width_ratio=0.7, pad=0.05, hspace=0.45, title=None, **title_kwargs):
+    """Widen fig by width_ratio of its width and return rows new axes stacked on the right.
+
+    Existing axes and figure texts (such as a suptitle) are squeezed into the
+    original left part by figure fraction, so the diagram keeps its size and
+    layout; call this after the diagram's own tight_layout. A title becomes
+    the figure's suptitle, centred right of the squeezed diagram's middle so it
+    spans the widened figure; title_kwargs go to fig.suptitle.
+    """
+    width, height = fig.get_size_inches()
+    scale = 1 / (1 + width_ratio)
+    fig.set_size_inches(width * (1 + width_ratio), height)
+    for ax in fig.axes:
+        box = ax.get_position()
+        ax.set_position([box.x0 * scale, box.y0, box.width * scale, box.height])
+    for text in fig.texts:
+        x, y = text.get_position()
+        text.set_position((x * scale, y))
+    grid = fig.add_gridspec(rows, 1, left=scale + pad * scale, right=0.97, top=0.9, bottom=0.1, hspace=hspace)
+    if title is not None:
+        fig.suptitle(title, x=1 - scale / 2, **title_kwargs)
+    return [fig.add_subplot(grid[row]) for row in range(rows)]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Diagram Command Line
+Lists, validates and renders every diagram. list and validate only parse
+sources and specs, so they never import matplotlib or NumPy.
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+
+from render_all import BASE_DIR, DIAGRAM_FUNCTION, GENERATOR_MODULES, discover_diagrams, output_file_for
+from render_cache import DEFAULT_CACHE_DIR, cached_parse
+import diagram_engine
+
+# Modules that must only be imported inside the functions that draw
+HEAVY_MODULES = ('matplotlib', 'numpy')
+VALIDATE_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'validate')
+# Bump when the checks change so cached results are recomputed
+VALIDATOR_VERSION = 1
+SAVE_CALL = re.compile(r'\.(show|savefig)\s*\(')
+
+
+def list_diagrams():
+    """Return one record per generator function and spec file"""
+    records = [{'kind': 'generator', 'source': f"{module_name}.py", 'diagram': func_name,
+                'output': output_file_for(func_name)}
+               for module_name, func_name in discover_diagrams()]
+    for path in diagram_engine.spec_paths():
+        try:
+            spec = diagram_engine.load_spec(path)
+            output = diagram_engine.output_file_for(spec)
+        except (OSError, ValueError) as e:
+            output = f"<unreadable: {e}>"
+        records.append({'kind': 'spec', 'source': os.path.relpath(path, BASE_DIR),
+                        'diagram': os.path.splitext(os.path.basename(path))[0], 'output': output})
+    return records
+
+
+def _is_heavy_import(node):
+    if isinstance(node, ast.Import):
+        return any(alias.name.split('.')[0] in HEAVY_MODULES for alias in node.names)
+    if isinstance(node, ast.ImportFrom):
+        return (node.module or '').split('.')[0] in HEAVY_MODULES
+    return False
+
+
+def _calls(nodes, *names):
+    """Yield calls among nodes to <anything>.<name>()"""
+    for node in nodes:
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in names:
+            yield node
+
+
+def _statements(nodes):
+    """Yield every statement among nodes and their nested bodies, skipping expressions"""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        for field in ('body', 'orelse', 'finalbody', 'handlers'):
+            stack.extend(getattr(node, field, ()))
+
+
+def _check_source(path):
+    """Return the problems found in one generator source file"""
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding='utf-8') as source:
+        text = source.read()
+    try:
+        tree = ast.parse(text, filename=path)
+    except SyntaxError as e:
+        return [f"{module_name}: {e}"]
+    lines = text.split('\n')
+
+    errors = []
+    for node in tree.body:
+        if _is_heavy_import(node):
+            errors.append(f"{module_name}:{node.lineno}: module-level import of "
+                          f"{ast.unparse(node)!r} slows every import; move it into the function")
+        elif ((isinstance(node, ast.Expr) and any(_calls(ast.walk(node), 'use', 'rc', 'update')))
+              or (isinstance(node, ast.Assign) and 'rcParams' in ast.unparse(node.targets[0]))):
+            errors.append(f"{module_name}:{node.lineno}: plotting style changed at import time")
+    for func in tree.body:
+        if not (isinstance(func, ast.FunctionDef) and DIAGRAM_FUNCTION.match(func.name)):
+            continue
+        where = f"{module_name}.{func.name}"
+        if not any(isinstance(n, ast.Return) and n.value is not None for n in _statements(func.body)):
+            errors.append(f"{where}: does not return its figure")
+        # Walk the expressions only when the source can contain such a call
+        if SAVE_CALL.search('\n'.join(lines[func.lineno - 1:func.end_lineno])):
+            for call in _calls(ast.walk(func), 'show', 'savefig'):
+                errors.append(f"{where}:{call.lineno}: calls {call.func.attr}(); leave saving to the caller")
+    return errors
+
+
+def validate_generator(module_name, base_dir=BASE_DIR):
+    """Return the problems found in one generator module, by static analysis.
+
+    Checks the contracts the renderers rely on: matplotlib/NumPy are only
+    imported inside functions, and every create_*_diagram function returns
+    its figure instead of saving or showing it. Results are cached by file
+    contents, so validating unchanged modules costs a hash, not a parse.
+    """
+    path = os.path.join(base_dir, module_name + '.py')
+    try:
+        return list(cached_parse(path, _check_source, VALIDATE_CACHE_DIR, VALIDATOR_VERSION))
+    except OSError as e:
+        return [f"{module_name}: {e}"]
+
+
+def validate_all():
+    """Return {source: [problems]} for every generator module and spec"""
+    problems = {f"{module_name}.py": validate_generator(module_name) for module_name in GENERATOR_MODULES}
+    outputs = {}
+    for record in list_diagrams():
+        outputs.setdefault(record['output'], []).append(record)
+    for path in diagram_engine.spec_paths():
+        source = os.path.relpath(path, BASE_DIR)
+        try:
+            problems[source] = diagram_engine.validate_spec(diagram_engine.load_spec(path))
+        except (OSError, ValueError) as e:
+            problems[source] = [str(e)]
+    # Two generators (or two specs) writing the same file would overwrite each other
+    for output, records in outputs.items():
+        for kind in ('generator', 'spec'):
+            owners = [r for r in records if r['kind'] == kind]
+            if len(owners) > 1:
+                problems[owners[0]['source']].append(
+                    f"{output} is written by {', '.join(r['diagram'] for r in owners)}")
+    return problems
+
+
+def cmd_list(args):
+    records = list_diagrams()
+    if args.json:
+        print(json.dumps(records, indent=2))
+        return True
+    print(f"{'Kind':<10} {'Source':<36} {'Diagram':<45} Output")
+    print('-' * 130)
+    for record in records:
+        print(f"{record['kind']:<10} {record['source']:<36} {record['diagram']:<45} {record['output']}")
+    print(f"\n{len(records)} diagram(s)")
+    return True
+
+
+def cmd_validate(args):
+    problems = validate_all()
+    failed = {source: errors for source, errors in problems.items() if errors}
+    for source in sorted(problems):
+        print(f"{'❌' if problems[source] else '✅'} {source}")
+        for error in problems[source]:
+            print(f"   - {error}")
+    print(f"\n{len(problems) - len(failed)}/{len(problems)} source(s) valid")
+    return not failed
+
+
+def cmd_render(args):
+    # Rendering is the only subcommand that pays for matplotlib
+    if args.specs:
+        import diagram_engine as renderer
+    else:
+        import render_all as renderer
+    return renderer.main(args.options)
+
+
+def main(argv=None):
+    """List, validate or render diagrams"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='list generator functions and spec files')
+    list_parser.add_argument('--json', action='store_true', help='print machine-readable JSON')
+    list_parser.set_defaults(handler=cmd_list)
+
+    validate_parser = commands.add_parser('validate', help='check generators and specs without drawing')
+    validate_parser.set_defaults(handler=cmd_validate)
+
+    render_parser = commands.add_parser(
+        'render', help='render diagrams (options are passed to render_all.py or diagram_engine.py)',
+        epilog='other options, e.g. -F svg,png -o build/ create_ssl_encryption_diagram, are passed on')
+    render_parser.add_argument('--specs', action='store_true', help='render spec files instead of generators')
+    render_parser.set_defaults(handler=cmd_render)
+
+    # Unknown options belong to the renderer; REMAINDER would not take them before a positional
+    args, options = parser.parse_known_args(argv)
+    if options and args.command != 'render':
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
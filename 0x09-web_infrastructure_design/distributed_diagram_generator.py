@@ -4,13 +4,16 @@ Distributed Web Infrastructure Diagram Generator
 This script generates visual representations of the distributed web infrastructure.
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch, Circle
-import numpy as np
+from headless import format_memory, headless_requested, render_measured, use_headless
 
 def create_distributed_infrastructure_diagram():
     """Create a visual diagram of the distributed web infrastructure."""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, ConnectionPatch
+    from topology import distributed_infrastructure
+
+    infra = distributed_infrastructure()
+    user, dns, lb, db = infra['user'], infra['dns'], infra['lb'], infra['db']
     
     # Create figure and axis
     fig, ax = plt.subplots(1, 1, figsize=(16, 12))
@@ -19,7 +22,7 @@ def create_distributed_infrastructure_diagram():
     ax.axis('off')
     
     # Title
-    ax.text(8, 13.5, 'Distributed Web Infrastructure', 
+    ax.text(8, 13.5, infra.title, 
             fontsize=18, fontweight='bold', ha='center')
     ax.text(8, 13, 'Three-Server Architecture with Load Balancing', 
             fontsize=14, ha='center', style='italic')
@@ -30,7 +33,7 @@ def create_distributed_infrastructure_diagram():
                               facecolor='lightblue', 
                               edgecolor='blue', linewidth=2)
     ax.add_patch(user_box)
-    ax.text(2.25, 11.5, "User's Computer", fontsize=11, ha='center', fontweight='bold')
+    ax.text(2.25, 11.5, user.label, fontsize=11, ha='center', fontweight='bold')
     
     # Internet/DNS Cloud
     dns_box = FancyBboxPatch((6.5, 11), 3, 1, 
@@ -38,9 +41,9 @@ def create_distributed_infrastructure_diagram():
                              facecolor='lightgray', 
                              edgecolor='gray', linewidth=2)
     ax.add_patch(dns_box)
-    ax.text(8, 11.7, 'Internet/DNS', fontsize=11, ha='center', fontweight='bold')
-    ax.text(8, 11.4, 'www.foobar.com', fontsize=9, ha='center')
-    ax.text(8, 11.1, '→ 8.8.8.8', fontsize=9, ha='center')
+    ax.text(8, 11.7, dns.label, fontsize=11, ha='center', fontweight='bold')
+    ax.text(8, 11.4, dns.detail, fontsize=9, ha='center')
+    ax.text(8, 11.1, f"→ {lb.ip}", fontsize=9, ha='center')
     
     # Load Balancer Server
     lb_box = FancyBboxPatch((6, 8.5), 4, 2, 
@@ -48,10 +51,10 @@ def create_distributed_infrastructure_diagram():
                             facecolor='orange', 
                             edgecolor='darkorange', linewidth=3)
     ax.add_patch(lb_box)
-    ax.text(8, 9.8, 'Load Balancer Server', fontsize=13, ha='center', fontweight='bold')
-    ax.text(8, 9.5, 'HAproxy', fontsize=11, ha='center', fontweight='bold')
-    ax.text(8, 9.2, 'Public IP: 8.8.8.8', fontsize=10, ha='center')
-    ax.text(8, 8.9, 'Round Robin Distribution', fontsize=9, ha='center', style='italic')
+    ax.text(8, 9.8, lb.label, fontsize=13, ha='center', fontweight='bold')
+    ax.text(8, 9.5, lb.software, fontsize=11, ha='center', fontweight='bold')
+    ax.text(8, 9.2, f"Public IP: {lb.ip}", fontsize=10, ha='center')
+    ax.text(8, 8.9, lb.detail, fontsize=9, ha='center', style='italic')
     
     # Web Server 1
     web1_box = FancyBboxPatch((1, 5), 3.5, 3, 
@@ -59,8 +62,9 @@ def create_distributed_infrastructure_diagram():
                               facecolor='lightgreen', 
                               edgecolor='green', linewidth=3)
     ax.add_patch(web1_box)
-    ax.text(2.75, 7.5, 'Web Server 1', fontsize=12, ha='center', fontweight='bold')
-    ax.text(2.75, 7.2, '(10.0.0.2)', fontsize=10, ha='center')
+    web1 = infra['web1']
+    ax.text(2.75, 7.5, web1.label, fontsize=12, ha='center', fontweight='bold')
+    ax.text(2.75, 7.2, f"({web1.ip})", fontsize=10, ha='center')
     
     # Nginx on Web Server 1
     nginx1_box = FancyBboxPatch((1.2, 6.5), 3.1, 0.4, 
@@ -68,7 +72,7 @@ def create_distributed_infrastructure_diagram():
                                 facecolor='darkgreen', 
                                 edgecolor='darkgreen', linewidth=1)
     ax.add_patch(nginx1_box)
-    ax.text(2.75, 6.7, 'Nginx (80/443)', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(2.75, 6.7, f"{infra['nginx1'].label} ({infra['nginx1'].detail})", fontsize=9, ha='center', color='white', fontweight='bold')
     
     # PHP-FPM on Web Server 1
     php1_box = FancyBboxPatch((1.2, 6), 3.1, 0.4, 
@@ -76,7 +80,7 @@ def create_distributed_infrastructure_diagram():
                               facecolor='darkblue', 
                               edgecolor='darkblue', linewidth=1)
     ax.add_patch(php1_box)
-    ax.text(2.75, 6.2, 'PHP-FPM', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(2.75, 6.2, infra['php1'].label, fontsize=9, ha='center', color='white', fontweight='bold')
     
     # App Files on Web Server 1
     app1_box = FancyBboxPatch((1.2, 5.5), 3.1, 0.4, 
@@ -84,7 +88,7 @@ def create_distributed_infrastructure_diagram():
                               facecolor='darkred', 
                               edgecolor='darkred', linewidth=1)
     ax.add_patch(app1_box)
-    ax.text(2.75, 5.7, 'Application Files', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(2.75, 5.7, infra['files1'].label, fontsize=9, ha='center', color='white', fontweight='bold')
     
     # Web Server 2
     web2_box = FancyBboxPatch((11.5, 5), 3.5, 3, 
@@ -92,8 +96,9 @@ def create_distributed_infrastructure_diagram():
                               facecolor='lightgreen', 
                               edgecolor='green', linewidth=3)
     ax.add_patch(web2_box)
-    ax.text(13.25, 7.5, 'Web Server 2', fontsize=12, ha='center', fontweight='bold')
-    ax.text(13.25, 7.2, '(10.0.0.3)', fontsize=10, ha='center')
+    web2 = infra['web2']
+    ax.text(13.25, 7.5, web2.label, fontsize=12, ha='center', fontweight='bold')
+    ax.text(13.25, 7.2, f"({web2.ip})", fontsize=10, ha='center')
     
     # Nginx on Web Server 2
     nginx2_box = FancyBboxPatch((11.7, 6.5), 3.1, 0.4, 
@@ -101,7 +106,7 @@ def create_distributed_infrastructure_diagram():
                                 facecolor='darkgreen', 
                                 edgecolor='darkgreen', linewidth=1)
     ax.add_patch(nginx2_box)
-    ax.text(13.25, 6.7, 'Nginx (80/443)', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(13.25, 6.7, f"{infra['nginx2'].label} ({infra['nginx2'].detail})", fontsize=9, ha='center', color='white', fontweight='bold')
     
     # PHP-FPM on Web Server 2
     php2_box = FancyBboxPatch((11.7, 6), 3.1, 0.4, 
@@ -109,7 +114,7 @@ def create_distributed_infrastructure_diagram():
                               facecolor='darkblue', 
                               edgecolor='darkblue', linewidth=1)
     ax.add_patch(php2_box)
-    ax.text(13.25, 6.2, 'PHP-FPM', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(13.25, 6.2, infra['php2'].label, fontsize=9, ha='center', color='white', fontweight='bold')
     
     # App Files on Web Server 2
     app2_box = FancyBboxPatch((11.7, 5.5), 3.1, 0.4, 
@@ -117,7 +122,7 @@ def create_distributed_infrastructure_diagram():
                               facecolor='darkred', 
                               edgecolor='darkred', linewidth=1)
     ax.add_patch(app2_box)
-    ax.text(13.25, 5.7, 'Application Files', fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(13.25, 5.7, infra['files2'].label, fontsize=9, ha='center', color='white', fontweight='bold')
     
     # Database Server
     db_box = FancyBboxPatch((5.5, 1.5), 5, 2.5, 
@@ -125,8 +130,8 @@ def create_distributed_infrastructure_diagram():
                             facecolor='lightsteelblue', 
                             edgecolor='steelblue', linewidth=3)
     ax.add_patch(db_box)
-    ax.text(8, 3.5, 'Database Server', fontsize=12, ha='center', fontweight='bold')
-    ax.text(8, 3.2, '(10.0.0.4)', fontsize=10, ha='center')
+    ax.text(8, 3.5, db.label, fontsize=12, ha='center', fontweight='bold')
+    ax.text(8, 3.2, f"({db.ip})", fontsize=10, ha='center')
     
     # Primary MySQL
     primary_db_box = FancyBboxPatch((5.7, 2.5), 2.1, 0.6, 
@@ -134,8 +139,9 @@ def create_distributed_infrastructure_diagram():
                                     facecolor='darkblue', 
                                     edgecolor='darkblue', linewidth=1)
     ax.add_patch(primary_db_box)
-    ax.text(6.75, 2.8, 'MySQL Primary', fontsize=9, ha='center', color='white', fontweight='bold')
-    ax.text(6.75, 2.6, '(Master)', fontsize=8, ha='center', color='white')
+    primary, replica = infra['db_primary'], infra['db_replica']
+    ax.text(6.75, 2.8, primary.label, fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(6.75, 2.6, f"({primary.detail})", fontsize=8, ha='center', color='white')
     
     # Replica MySQL
     replica_db_box = FancyBboxPatch((8.2, 2.5), 2.1, 0.6, 
@@ -143,15 +149,15 @@ def create_distributed_infrastructure_diagram():
                                     facecolor='purple', 
                                     edgecolor='purple', linewidth=1)
     ax.add_patch(replica_db_box)
-    ax.text(9.25, 2.8, 'MySQL Replica', fontsize=9, ha='center', color='white', fontweight='bold')
-    ax.text(9.25, 2.6, '(Slave)', fontsize=8, ha='center', color='white')
+    ax.text(9.25, 2.8, replica.label, fontsize=9, ha='center', color='white', fontweight='bold')
+    ax.text(9.25, 2.6, f"({replica.detail})", fontsize=8, ha='center', color='white')
     
     # Replication arrow
     repl_arrow = ConnectionPatch((7.8, 2.8), (8.2, 2.8), "data", "data",
                                 arrowstyle="-|>", shrinkA=2, shrinkB=2, 
                                 mutation_scale=15, fc="red", ec="red", alpha=0.8)
     ax.add_artist(repl_arrow)
-    ax.text(8, 3.05, 'Replication', fontsize=8, ha='center', color='red', fontweight='bold')
+    ax.text(8, 3.05, infra.edge('db_primary', 'db_replica'), fontsize=8, ha='center', color='red', fontweight='bold')
     
     # Connection arrows
     # User to DNS
@@ -159,14 +165,14 @@ def create_distributed_infrastructure_diagram():
                             arrowstyle="-|>", shrinkA=5, shrinkB=5, 
                             mutation_scale=20, fc="blue", alpha=0.7)
     ax.add_artist(arrow1)
-    ax.text(5, 11.8, 'DNS Query', fontsize=9, ha='center', color='blue')
+    ax.text(5, 11.8, infra.edge('user', 'dns'), fontsize=9, ha='center', color='blue')
     
     # DNS to Load Balancer
     arrow2 = ConnectionPatch((8, 11), (8, 10.5), "data", "data",
                             arrowstyle="-|>", shrinkA=5, shrinkB=5, 
                             mutation_scale=20, fc="green", alpha=0.7)
     ax.add_artist(arrow2)
-    ax.text(8.8, 10.7, 'HTTP Request', fontsize=9, ha='center', color='green')
+    ax.text(8.8, 10.7, infra.edge('dns', 'lb'), fontsize=9, ha='center', color='green')
     
     # Load Balancer to Web Servers
     arrow3 = ConnectionPatch((7, 8.5), (3.5, 8), "data", "data",
@@ -219,6 +225,12 @@ def create_distributed_infrastructure_diagram():
 
 def create_load_balancing_diagram():
     """Create a detailed load balancing flow diagram."""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, Circle
+    from batch_draw import add_arrows
+    from topology import distributed_infrastructure
+
+    infra = distributed_infrastructure()
     
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
     ax.set_xlim(0, 14)
@@ -232,17 +244,17 @@ def create_load_balancing_diagram():
     # Load Balancer
     lb_circle = Circle((7, 7), 1, facecolor='orange', edgecolor='darkorange', linewidth=3)
     ax.add_patch(lb_circle)
-    ax.text(7, 7, 'HAproxy\nLoad\nBalancer', fontsize=10, ha='center', fontweight='bold')
+    ax.text(7, 7, f"{infra['lb'].software}\nLoad\nBalancer", fontsize=10, ha='center', fontweight='bold')
     
     # Web Server 1
     ws1_circle = Circle((3, 4), 0.8, facecolor='lightgreen', edgecolor='green', linewidth=2)
     ax.add_patch(ws1_circle)
-    ax.text(3, 4, 'Web\nServer 1\n10.0.0.2', fontsize=9, ha='center', fontweight='bold')
+    ax.text(3, 4, infra['web1'].text().replace(' ', '\n', 1), fontsize=9, ha='center', fontweight='bold')
     
     # Web Server 2
     ws2_circle = Circle((11, 4), 0.8, facecolor='lightgreen', edgecolor='green', linewidth=2)
     ax.add_patch(ws2_circle)
-    ax.text(11, 4, 'Web\nServer 2\n10.0.0.3', fontsize=9, ha='center', fontweight='bold')
+    ax.text(11, 4, infra['web2'].text().replace(' ', '\n', 1), fontsize=9, ha='center', fontweight='bold')
     
     # Request sequence
     requests = [
@@ -257,23 +269,14 @@ def create_load_balancing_diagram():
     for i, (x, y, label, target_x) in enumerate(requests):
         # Request label
         ax.text(x, y, label, fontsize=10, fontweight='bold', color=colors[i])
-        
-        # Arrow to load balancer
-        arrow1 = ConnectionPatch((x + 0.8, y), (6, y), "data", "data",
-                                arrowstyle="-|>", shrinkA=2, shrinkB=2, 
-                                mutation_scale=15, fc=colors[i], ec=colors[i], alpha=0.7)
-        ax.add_artist(arrow1)
-        
-        # Arrow from load balancer to target server
-        if target_x == 3:
-            arrow2 = ConnectionPatch((6.2, 6.5), (3.6, 4.6), "data", "data",
-                                    arrowstyle="-|>", shrinkA=2, shrinkB=2, 
-                                    mutation_scale=15, fc=colors[i], ec=colors[i], alpha=0.7)
-        else:
-            arrow2 = ConnectionPatch((7.8, 6.5), (10.4, 4.6), "data", "data",
-                                    arrowstyle="-|>", shrinkA=2, shrinkB=2, 
-                                    mutation_scale=15, fc=colors[i], ec=colors[i], alpha=0.7)
-        ax.add_artist(arrow2)
+
+    # Arrows to the load balancer, then from it to each target server, in one batch
+    starts = [(x + 0.8, y) for x, y, _, _ in requests]
+    ends = [(6, y) for _, y, _, _ in requests]
+    starts += [(6.2, 6.5) if target_x == 3 else (7.8, 6.5) for _, _, _, target_x in requests]
+    ends += [(3.6, 4.6) if target_x == 3 else (10.4, 4.6) for _, _, _, target_x in requests]
+    add_arrows(ax, starts, ends, colors=colors * 2, alphas=0.7,
+               arrowstyle="-|>", mutation_scale=15, shrink=2)
     
     # Algorithm explanation
     algo_box = FancyBboxPatch((0.5, 1), 6, 2, 
@@ -304,6 +307,12 @@ def create_load_balancing_diagram():
 
 def create_database_replication_diagram():
     """Create a database replication diagram."""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, ConnectionPatch
+    from topology import distributed_infrastructure
+
+    infra = distributed_infrastructure()
+    primary, replica = infra['db_primary'], infra['db_replica']
     
     fig, ax = plt.subplots(1, 1, figsize=(12, 8))
     ax.set_xlim(0, 12)
@@ -320,14 +329,14 @@ def create_database_replication_diagram():
                               facecolor='lightgreen', 
                               edgecolor='green', linewidth=2)
     ax.add_patch(app1_box)
-    ax.text(1.5, 5.75, 'Web Server 1\nApplication', fontsize=10, ha='center', fontweight='bold')
+    ax.text(1.5, 5.75, f"{infra['web1'].label}\nApplication", fontsize=10, ha='center', fontweight='bold')
     
     app2_box = FancyBboxPatch((9.5, 5), 2, 1.5, 
                               boxstyle="round,pad=0.1", 
                               facecolor='lightgreen', 
                               edgecolor='green', linewidth=2)
     ax.add_patch(app2_box)
-    ax.text(10.5, 5.75, 'Web Server 2\nApplication', fontsize=10, ha='center', fontweight='bold')
+    ax.text(10.5, 5.75, f"{infra['web2'].label}\nApplication", fontsize=10, ha='center', fontweight='bold')
     
     # Primary Database
     primary_box = FancyBboxPatch((2, 2), 3, 2, 
@@ -335,8 +344,8 @@ def create_database_replication_diagram():
                                  facecolor='lightblue', 
                                  edgecolor='blue', linewidth=3)
     ax.add_patch(primary_box)
-    ax.text(3.5, 3.5, 'MySQL Primary', fontsize=12, ha='center', fontweight='bold')
-    ax.text(3.5, 3.2, '(Master)', fontsize=11, ha='center')
+    ax.text(3.5, 3.5, primary.label, fontsize=12, ha='center', fontweight='bold')
+    ax.text(3.5, 3.2, f"({primary.detail})", fontsize=11, ha='center')
     ax.text(3.5, 2.9, 'Port 3306', fontsize=10, ha='center')
     ax.text(3.5, 2.6, 'Writes & Reads', fontsize=10, ha='center', style='italic')
     ax.text(3.5, 2.3, 'Binary Logging', fontsize=9, ha='center', color='blue')
@@ -347,8 +356,8 @@ def create_database_replication_diagram():
                                  facecolor='lavender', 
                                  edgecolor='purple', linewidth=3)
     ax.add_patch(replica_box)
-    ax.text(8.5, 3.5, 'MySQL Replica', fontsize=12, ha='center', fontweight='bold')
-    ax.text(8.5, 3.2, '(Slave)', fontsize=11, ha='center')
+    ax.text(8.5, 3.5, replica.label, fontsize=12, ha='center', fontweight='bold')
+    ax.text(8.5, 3.2, f"({replica.detail})", fontsize=11, ha='center')
     ax.text(8.5, 2.9, 'Port 3307', fontsize=10, ha='center')
     ax.text(8.5, 2.6, 'Reads Only', fontsize=10, ha='center', style='italic')
     ax.text(8.5, 2.3, 'Relay Logging', fontsize=9, ha='center', color='purple')
@@ -402,6 +411,8 @@ def create_database_replication_diagram():
 
 def create_infrastructure_issues_diagram():
     """Create a diagram showing infrastructure issues."""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
     
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
     ax.set_xlim(0, 14)
@@ -511,30 +522,32 @@ def create_infrastructure_issues_diagram():
     return fig
 
 if __name__ == "__main__":
+    headless = headless_requested()
+    if headless:
+        use_headless()
+
     # Create and save all diagrams
     
     # Main infrastructure diagram
-    fig1 = create_distributed_infrastructure_diagram()
-    plt.figure(fig1.number)
-    plt.savefig('distributed_infrastructure_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_distributed_infrastructure_diagram, 'distributed_infrastructure_diagram.png', headless)
     print("Distributed infrastructure diagram saved as 'distributed_infrastructure_diagram.png'")
+    if headless:
+        print(format_memory(report))
     
     # Load balancing diagram
-    fig2 = create_load_balancing_diagram()
-    plt.figure(fig2.number)
-    plt.savefig('load_balancing_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_load_balancing_diagram, 'load_balancing_diagram.png', headless)
     print("Load balancing diagram saved as 'load_balancing_diagram.png'")
+    if headless:
+        print(format_memory(report))
     
     # Database replication diagram
-    fig3 = create_database_replication_diagram()
-    plt.figure(fig3.number)
-    plt.savefig('database_replication_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_database_replication_diagram, 'database_replication_diagram.png', headless)
     print("Database replication diagram saved as 'database_replication_diagram.png'")
+    if headless:
+        print(format_memory(report))
     
     # Infrastructure issues diagram
-    fig4 = create_infrastructure_issues_diagram()
-    plt.figure(fig4.number)
-    plt.savefig('infrastructure_issues_diagram.png', dpi=300, bbox_inches='tight')
+    report = render_measured(create_infrastructure_issues_diagram, 'infrastructure_issues_diagram.png', headless)
     print("Infrastructure issues diagram saved as 'infrastructure_issues_diagram.png'")
-    
-    plt.show()
+    if headless:
+        print(format_memory(report))
@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+"""
+Firewall Rule Engine
+Compiles the ufw rules that setup_secured_infrastructure.sh gives each server
+into lookup tables over address and port intervals, evaluates millions of
+flows between the security zones against them, reports what each zone can
+reach and which rules are shadowed or redundant, and colors the security
+layers diagram by what is actually allowed.
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import re
+import shlex
+import socket
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCRIPT = os.path.join(BASE_DIR, 'setup_secured_infrastructure.sh')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'firewall_engine.png')
+ADDRESS_SPACE = 1 << 32
+PORT_SPACE = 1 << 16
+PROTOCOLS = ('tcp', 'udp')
+DIRECTIONS = ('incoming', 'outgoing')
+# Whether a flow matching the rule gets through; limit allows (rate-limited)
+ACTIONS = {'allow': True, 'limit': True, 'deny': False, 'reject': False}
+# Checked in this order: a flow must leave its host, be routable, then be let in
+VERDICTS = ('allowed', 'blocked arriving', 'no route', 'blocked leaving')
+PRIVATE_NETWORKS = ('10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16')
+# Ports the synthetic flows mostly aim at: the stack's services plus common probes
+SERVICE_PORTS = (22, 80, 443, 8404, 3306, 3307, 25, 53, 3389, 8080)
+
+# The setup script's roles: the variable holding the host's address, its zone
+# and its firewall's node id in specs/security_layers.json
+ROLES = {
+    'load_balancer': {'address': 'LOAD_BALANCER_IP', 'zone': 'dmz', 'node': 'firewall1', 'label': 'LB'},
+    'web_server_1': {'address': 'WEB_SERVER_1_IP', 'zone': 'private', 'node': 'firewall2', 'label': 'Web 1'},
+    'web_server_2': {'address': 'WEB_SERVER_2_IP', 'zone': 'private', 'node': 'firewall3', 'label': 'Web 2'},
+    'database_server': {'address': 'DATABASE_SERVER_IP', 'zone': 'database', 'node': 'db_firewall', 'label': 'DB'},
+}
+# The internet is every public address that is not one of the servers
+ZONES = ('internet', 'dmz', 'private', 'database')
+
+
+def parse_address(text):
+    """Return the inclusive integer range of 'any', an address or a CIDR block"""
+    if text == 'any':
+        return 0, ADDRESS_SPACE - 1
+    network = ipaddress.ip_network(text, strict=False)
+    if network.version != 4:
+        raise ValueError(f"only IPv4 is modelled: {text}")
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def parse_ports(text):
+    """Return the sorted, merged inclusive ranges of '22', '80,443', '6000:6007' or a service name"""
+    ranges = []
+    for item in text.split(','):
+        lo, _, hi = item.partition(':')
+        lo = int(lo) if lo.isdigit() else socket.getservbyname(lo)
+        ranges.append((lo, int(hi) if hi else lo))
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def parse_rule(words):
+    """Parse the words of a ufw rule after 'ufw' (without 'comment ...') into a rule dict.
+
+    Both the simple form ('allow 22/tcp') and the full form ('allow in from
+    10.0.0.2 to any port 3306 proto tcp') are understood; 'on <interface>'
+    and logging options are accepted but not modelled.
+    """
+    words = [w for w in words if w not in ('log', 'log-all')]
+    rule = {'action': words[0], 'direction': 'incoming', 'src': parse_address('any'), 'dst': parse_address('any'),
+            'ports': [(0, PORT_SPACE - 1)], 'protos': PROTOCOLS, 'text': 'ufw ' + ' '.join(words)}
+    if rule['action'] not in ACTIONS:
+        raise ValueError(f"unknown action: {rule['text']}")
+    rest = words[1:]
+    if rest and rest[0] in ('in', 'out'):
+        rule['direction'] = 'incoming' if rest.pop(0) == 'in' else 'outgoing'
+    if len(rest) >= 2 and rest[0] == 'on':
+        rest = rest[2:]
+    if len(rest) == 1 and rest[0] not in ('from', 'to'):
+        port, _, proto = rest[0].partition('/')
+        rule['ports'] = parse_ports(port)
+        rule['protos'] = (proto,) if proto else PROTOCOLS
+        rest = []
+    side = None
+    while rest:
+        key = rest.pop(0)
+        if not rest:
+            raise ValueError(f"'{key}' needs a value: {rule['text']}")
+        value = rest.pop(0)
+        if key in ('from', 'to'):
+            side = key
+            rule['src' if key == 'from' else 'dst'] = parse_address(value)
+        elif key == 'port' and side == 'to':
+            rule['ports'] = parse_ports(value)
+        elif key == 'port':
+            raise ValueError(f"source ports are not modelled: {rule['text']}")
+        elif key == 'proto':
+            rule['protos'] = (value,)
+        else:
+            raise ValueError(f"unexpected '{key}': {rule['text']}")
+    if any(p not in PROTOCOLS for p in rule['protos']):
+        raise ValueError(f"only {'/'.join(PROTOCOLS)} are modelled: {rule['text']}")
+    return rule
+
+
+def load_script(path=DEFAULT_SCRIPT):
+    """Read the firewall each role gets from a setup script; return {role: firewall}.
+
+    ufw commands outside a case branch apply to every role, those inside a
+    '"role")' branch to the roles it names. Shell variables set at the top
+    of the script ($LOAD_BALANCER_IP) are substituted.
+    """
+    variables, commands, roles = {}, [], []
+    branch = None
+    with open(path, encoding='utf-8') as script:
+        for raw in script:
+            line = raw.strip()
+            assignment = re.fullmatch(r'([A-Z_][A-Z0-9_]*)="?([^"$]*)"?', line)
+            label = re.fullmatch(r'((?:"[\w-]+"\|?)+)\)', line)
+            if assignment:
+                variables[assignment.group(1)] = assignment.group(2)
+            elif label:
+                branch = re.findall(r'"([\w-]+)"', label.group(1))
+                roles.extend(r for r in branch if r not in roles)
+            elif line in (';;', 'esac'):
+                branch = None
+            elif line.startswith('ufw '):
+                line = re.sub(r'\$\{?(\w+)\}?', lambda m: variables.get(m.group(1), m.group(0)), line)
+                words = shlex.split(line, comments=True)[1:]
+                if 'comment' in words:
+                    words = words[:words.index('comment')]
+                commands.append((branch, words))
+
+    firewalls = {}
+    for role in roles:
+        if role not in ROLES or ROLES[role]['address'] not in variables:
+            continue
+        firewall = {'role': role, **ROLES[role], 'address': int(ipaddress.ip_address(variables[ROLES[role]['address']])),
+                    'defaults': {'incoming': 'deny', 'outgoing': 'allow'}, 'rules': []}
+        for branch, words in commands:
+            if branch is not None and role not in branch or not words:
+                continue
+            if words[0] == 'default' and len(words) >= 3:
+                firewall['defaults'][words[2]] = words[1]
+            elif words[0] in ACTIONS:
+                firewall['rules'].append(parse_rule(words))
+            elif words[0] == 'insert' and len(words) > 2:
+                firewall['rules'].insert(int(words[1]) - 1, parse_rule(words[2:]))
+            elif words[:2] == ['--force', 'reset'] or words[0] == 'reset':
+                firewall['rules'] = []
+                firewall['defaults'] = {'incoming': 'deny', 'outgoing': 'allow'}
+        for number, rule in enumerate(firewall['rules'], 1):
+            rule['number'] = number
+        firewalls[role] = firewall
+    return firewalls
+
+
+def _cells(breaks, lo, hi):
+    """Return the slice of elementary intervals covering [lo, hi]"""
+    return slice(np.searchsorted(breaks, lo), np.searchsorted(breaks, hi + 1))
+
+
+def compile_rules(rules, default):
+    """Compile first-match rules into a lookup table over elementary intervals.
+
+    Every rule boundary cuts its axis (source address, destination address,
+    destination port), so the same rules match throughout each cell of the
+    cross product. Filling the rules in from last to first leaves the first
+    match in every cell, and the match it displaced (the decision if that
+    rule were removed) behind it; -1 stands for the default policy.
+    """
+    breaks = []
+    for key, space in (('src', ADDRESS_SPACE), ('dst', ADDRESS_SPACE), ('ports', PORT_SPACE)):
+        ranges = [r for rule in rules for r in (rule['ports'] if key == 'ports' else [rule[key]])]
+        edges = [0] + [lo for lo, _ in ranges] + [hi + 1 for _, hi in ranges]
+        breaks.append(np.unique(np.array([e for e in edges if e < space], dtype=np.int64)))
+    shape = (len(PROTOCOLS),) + tuple(len(b) for b in breaks)
+    first = np.full(shape, -1, dtype=np.int32)
+    second = np.full(shape, -1, dtype=np.int32)
+    for i in range(len(rules) - 1, -1, -1):
+        rule = rules[i]
+        src, dst = _cells(breaks[0], *rule['src']), _cells(breaks[1], *rule['dst'])
+        for proto in rule['protos']:
+            for lo, hi in rule['ports']:
+                cell = (PROTOCOLS.index(proto), src, dst, _cells(breaks[2], lo, hi))
+                second[cell] = first[cell]
+                first[cell] = i
+    # allow[-1] is the default policy, so allow[first] works for unmatched cells too
+    allow = np.array([ACTIONS[rule['action']] for rule in rules] + [ACTIONS[default]])
+    return {'rules': rules, 'breaks': breaks, 'first': first, 'second': second, 'allow': allow}
+
+
+def lookup(compiled, src, dst, port, proto):
+    """Return the index of the first rule matching each flow (-1: the default policy)"""
+    src_breaks, dst_breaks, port_breaks = compiled['breaks']
+    return compiled['first'][proto, np.searchsorted(src_breaks, src, 'right') - 1,
+                             np.searchsorted(dst_breaks, dst, 'right') - 1,
+                             np.searchsorted(port_breaks, port, 'right') - 1]
+
+
+def first_match(rules, default, src, dst, port, proto):
+    """Reference engine: scan the rules in order for one flow; return (rule index or -1, allowed)"""
+    for i, rule in enumerate(rules):
+        if (rule['src'][0] <= src <= rule['src'][1] and rule['dst'][0] <= dst <= rule['dst'][1]
+                and PROTOCOLS[proto] in rule['protos'] and any(lo <= port <= hi for lo, hi in rule['ports'])):
+            return i, ACTIONS[rule['action']]
+    return -1, ACTIONS[default]
+
+
+def compile_firewalls(firewalls):
+    """Compile every firewall's incoming and outgoing rules in place"""
+    for firewall in firewalls.values():
+        firewall['compiled'] = {d: compile_rules([r for r in firewall['rules'] if r['direction'] == d],
+                                                 firewall['defaults'][d]) for d in DIRECTIONS}
+    return firewalls
+
+
+def _in_ranges(values, ranges):
+    """Return which values fall in any of the inclusive (lo, hi) ranges"""
+    inside = np.zeros(len(values), dtype=bool)
+    for lo, hi in ranges:
+        inside |= (values >= lo) & (values <= hi)
+    return inside
+
+
+def evaluate(firewalls, src, dst, port, proto, route=True):
+    """Return each flow's verdict (an index into VERDICTS) and {(role, direction): rule hit counts}.
+
+    A flow from a server passes its outgoing rules first; a flow from
+    outside the private networks cannot reach a private address; a flow to a
+    server passes its incoming rules. Hit counts (the last one is the
+    default policy) only count flows that reached the firewall. With
+    route=False, routing is ignored: what the firewalls alone allow.
+    """
+    roles = list(firewalls)
+    addresses = np.array([firewalls[r]['address'] for r in roles], dtype=np.int64)
+    order = np.argsort(addresses)
+
+    def host(values):
+        i = np.searchsorted(addresses[order], values).clip(max=len(roles) - 1)
+        return np.where(addresses[order][i] == values, order[i], -1)
+
+    src_host, dst_host = host(src), host(dst)
+    verdict = np.zeros(len(src), dtype=np.int8)
+    private = [parse_address(n) for n in PRIVATE_NETWORKS]
+    if route:
+        unroutable = (src_host < 0) & ~_in_ranges(src, private) & _in_ranges(dst, private)
+        verdict[unroutable] = VERDICTS.index('no route')
+    hits = {}
+    for direction, hosts, blocked in (('outgoing', src_host, 'blocked leaving'),
+                                      ('incoming', dst_host, 'blocked arriving')):
+        for h, role in enumerate(roles):
+            compiled = firewalls[role]['compiled'][direction]
+            reached = hosts == h
+            if direction == 'incoming':
+                reached &= verdict == 0
+            flows = np.flatnonzero(reached)
+            matched = lookup(compiled, src[flows], dst[flows], port[flows], proto[flows])
+            # -1 (the default policy) wraps round to the last bin
+            hits[(role, direction)] = np.bincount(matched % (len(compiled['rules']) + 1),
+                                                  minlength=len(compiled['rules']) + 1)
+            verdict[flows[~compiled['allow'][matched]]] = VERDICTS.index(blocked)
+    return verdict, hits
+
+
+def analyze(compiled):
+    """Find the rules that never change a decision; return [(index, kind, [indices of the rules deciding instead])].
+
+    A rule that is the first match nowhere is dead: 'shadowed' when earlier
+    rules with the opposite action cover it (it does not do what it says),
+    'redundant' when they all agree with it. A rule that is the first match
+    somewhere but decides exactly as the rule or default behind it would
+    is redundant too: removing it changes nothing. -1 is the default policy.
+    """
+    rules, first, second, allow = compiled['rules'], compiled['first'], compiled['second'], compiled['allow']
+    bins = len(rules) + 1
+    won = np.bincount((first % bins).ravel(), minlength=bins)
+    decides = np.bincount(first[allow[first] != allow[second]] % bins, minlength=bins)
+    src_breaks, dst_breaks, port_breaks = compiled['breaks']
+    findings = []
+    for i, rule in enumerate(rules):
+        if won[i]:
+            if not decides[i]:
+                findings.append((i, 'redundant', sorted(int(j) for j in np.unique(second[first == i]))))
+            continue
+        src, dst = _cells(src_breaks, *rule['src']), _cells(dst_breaks, *rule['dst'])
+        covering = np.unique(np.concatenate([first[PROTOCOLS.index(p), src, dst, _cells(port_breaks, lo, hi)].ravel()
+                                             for p in rule['protos'] for lo, hi in rule['ports']]))
+        kind = 'shadowed' if (allow[covering] != allow[i]).any() else 'redundant'
+        findings.append((i, kind, [int(j) for j in covering]))
+    return findings
+
+
+def zone_sources(firewalls, zone):
+    """Return source addresses that between them show every distinct behaviour of a zone's addresses"""
+    if zone != 'internet':
+        return np.array([f['address'] for f in firewalls.values() if f['zone'] == zone], dtype=np.int64)
+    excluded = sorted([parse_address(n) for n in PRIVATE_NETWORKS] + [(f['address'],) * 2 for f in firewalls.values()])
+    pieces, start = [], 0
+    for lo, hi in excluded:
+        if lo > start:
+            pieces.append((start, lo - 1))
+        start = max(start, hi + 1)
+    if start < ADDRESS_SPACE:
+        pieces.append((start, ADDRESS_SPACE - 1))
+    # Within a piece of the internet, behaviour only changes at a rule boundary
+    cuts = np.unique(np.concatenate([c['breaks'][0] for f in firewalls.values() for c in f['compiled'].values()]
+                                    + [np.array([lo for lo, _ in pieces], dtype=np.int64)]))
+    return cuts[_in_ranges(cuts, pieces)]
+
+
+def _intervals(points, mask):
+    """Turn a mask over interval start points into merged inclusive port ranges"""
+    ends = np.append(points[1:] - 1, PORT_SPACE - 1)
+    ranges = []
+    for lo, hi in zip(points[mask], ends[mask]):
+        if ranges and lo == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], int(hi))
+        else:
+            ranges.append((int(lo), int(hi)))
+    return ranges
+
+
+def reachability(firewalls, route=True):
+    """Return {(zone, role): {protocol: port ranges}} that at least one address in the zone can reach"""
+    ports = np.unique(np.concatenate([c['breaks'][2] for f in firewalls.values() for c in f['compiled'].values()]))
+    reach = {}
+    for zone in ZONES:
+        sources = zone_sources(firewalls, zone)
+        for role, firewall in firewalls.items():
+            src = sources[sources != firewall['address']]
+            if not len(src):
+                continue
+            src, port, proto = (a.ravel() for a in np.meshgrid(src, ports, np.arange(len(PROTOCOLS)), indexing='ij'))
+            verdict, _ = evaluate(firewalls, src, np.full(len(src), firewall['address']), port, proto, route)
+            allowed = (verdict == 0).reshape(-1, len(ports), len(PROTOCOLS)).any(axis=0)
+            reach[(zone, role)] = {p: _intervals(ports, allowed[:, j]) for j, p in enumerate(PROTOCOLS)}
+    return reach
+
+
+def format_ports(entry):
+    """Render {'tcp': ranges, 'udp': ranges} as '22/tcp, 80, 443' or '80, 443/tcp' ('-' when nothing is allowed)"""
+    protocols = {}
+    for proto, ranges in entry.items():
+        for r in ranges:
+            protocols.setdefault(r, []).append(proto)
+    parts, suffixes = [], {'' if len(names) == len(PROTOCOLS) else '/' + names[0] for names in protocols.values()}
+    for (lo, hi), names in sorted(protocols.items()):
+        text = 'all' if (lo, hi) == (0, PORT_SPACE - 1) else str(lo) if lo == hi else f"{lo}-{hi}"
+        parts.append(text if len(names) == len(PROTOCOLS) or len(suffixes) == 1 else f"{text}/{names[0]}")
+    # One protocol throughout is written once, at the end
+    return ', '.join(parts) + (suffixes.pop() if len(suffixes) == 1 else '') if parts else '-'
+
+
+def synthetic_flows(firewalls, count, seed=0, internet=0.7, services=0.8, udp=0.1):
+    """Draw flows to the servers: (src, dst, port, proto) arrays.
+
+    A share of the sources are random internet addresses, the rest other
+    servers; most ports are the stack's services and common probes, the rest
+    uniformly random.
+    """
+    rng = np.random.default_rng(seed)
+    addresses = np.array([f['address'] for f in firewalls.values()], dtype=np.int64)
+    target = rng.integers(0, len(addresses), count)
+    dst = addresses[target]
+    src = rng.integers(0, ADDRESS_SPACE, count, dtype=np.int64)
+    inside = np.flatnonzero(rng.random(count) >= internet)
+    other = rng.integers(0, len(addresses) - 1, len(inside))
+    src[inside] = addresses[other + (other >= target[inside])]
+    port = rng.integers(1, PORT_SPACE, count, dtype=np.int64)
+    known = np.flatnonzero(rng.random(count) < services)
+    port[known] = rng.choice(SERVICE_PORTS, len(known))
+    proto = (rng.random(count) < udp).astype(np.intp)
+    return src, dst, port, proto
+
+
+def rule_label(firewall, direction, index):
+    """Name a rule the way 'ufw status numbered' would, or the direction's default policy"""
+    if index < 0:
+        return f"default {firewall['defaults'][direction]} {direction}"
+    rule = firewall['compiled'][direction]['rules'][index]
+    return f"[{rule['number']}] {rule['text']}"
+
+
+def findings(firewalls):
+    """Return the shadowed and redundant rules of every firewall as printable lines"""
+    lines = []
+    for role, firewall in firewalls.items():
+        for direction in DIRECTIONS:
+            for i, kind, deciding in analyze(firewall['compiled'][direction]):
+                instead = ', '.join(rule_label(firewall, direction, j) for j in deciding)
+                lines.append(f"{firewall['label']}: {rule_label(firewall, direction, i)} is {kind} "
+                             f"({'decided by' if kind == 'shadowed' else 'same as'} {instead})")
+    return lines
+
+
+def print_report(firewalls, reach, routed_only, problems, verdict, hits, seconds):
+    """Print flow verdicts, what each zone reaches and the rule analysis"""
+    counts = np.bincount(verdict, minlength=len(VERDICTS))
+    print(f"⏱️ {len(verdict):,} flows in {seconds:.2f}s ({len(verdict) / seconds / 1e6:.1f}M flows/s): "
+          + ', '.join(f"{name} {count / len(verdict):.1%}" for name, count in zip(VERDICTS, counts)))
+    print("\n🧭 Reachable ports (from at least one address in the zone)")
+    for role, firewall in firewalls.items():
+        address = ipaddress.ip_address(firewall['address'])
+        print(f"   {firewall['label']} {address} ({firewall['zone']})")
+        for zone in ZONES:
+            if (zone, role) in reach:
+                extra = f"   ⚠️ firewall alone allows {routed_only[(zone, role)]}" if (zone, role) in routed_only else ''
+                print(f"      {zone:<9} {format_ports(reach[(zone, role)])}{extra}")
+    print("\n🔎 Rule analysis")
+    for line in problems or ['no shadowed or redundant rules']:
+        print(f"   {line}")
+    unused = [f"{firewalls[role]['label']}: {rule_label(firewalls[role], direction, i)}"
+              for (role, direction), counts in hits.items() for i in np.flatnonzero(counts[:-1] == 0)]
+    if unused:
+        print("\n💤 Rules no sampled flow matched")
+        for line in unused:
+            print(f"   {line}")
+
+
+def create_firewall_diagram(firewalls, reach, routed_only, verdict, dst):
+    """Render the security layers diagram with each firewall colored by what it lets in"""
+    import textwrap
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch, Rectangle
+    from diagram_engine import SPEC_DIR, axes_specs, load_spec, render_spec, resolve_layout
+    from diagram_panels import add_side_panel
+
+    exposure_colors = {'internet': '#F44336', 'internal': '#FF9800', 'closed': '#4CAF50', 'routing': '#BDBDBD'}
+
+    def exposure(zone, role):
+        if format_ports(reach.get((zone, role), {})) != '-':
+            return 'internet' if zone == 'internet' else 'internal'
+        return 'routing' if (zone, role) in routed_only else 'closed'
+
+    spec = load_spec(os.path.join(SPEC_DIR, 'security_layers.json'))
+    fig = render_spec(spec)
+    ax = fig.axes[0]
+    geometry = resolve_layout(axes_specs(spec)[0])
+    for role, firewall in firewalls.items():
+        geom = geometry.get(firewall['node'])
+        if geom is None or geom[0] != 'box':
+            continue
+        _, x, y, w, h = geom
+        levels = [exposure(zone, role) for zone in ZONES if (zone, role) in reach]
+        worst = next(level for level in ('internet', 'internal', 'routing', 'closed') if level in levels + ['closed'])
+        # Under the control's text, over its white box
+        ax.add_patch(Rectangle((x - 0.1, y - 0.1), w + 0.2, h + 0.2, facecolor=exposure_colors[worst], alpha=0.6,
+                               edgecolor='black', linewidth=1.5, zorder=1.5))
+        sources = [zone for zone in ZONES if exposure(zone, role) in ('internet', 'internal')]
+        ax.text(x + w / 2, y - 0.2, 'in from: ' + (', '.join(sources) or 'nothing'), fontsize=7, ha='center',
+                va='top', fontweight='bold', color='black')
+    ax.legend(handles=[Patch(facecolor=exposure_colors[k], alpha=0.6, edgecolor='black', label=text) for k, text in
+                       (('internet', 'open to the internet'), ('internal', 'open to other zones only'),
+                        ('routing', 'internet stopped only by routing'), ('closed', 'closed'))],
+              loc='upper center', bbox_to_anchor=(0.5, 0.01), ncol=2, fontsize=8, framealpha=0.95)
+
+    matrix_ax, flows_ax = add_side_panel(fig, rows=2, width_ratio=0.6, hspace=0.35)
+    roles = list(firewalls)
+    for i, zone in enumerate(ZONES):
+        for j, role in enumerate(roles):
+            level = exposure(zone, role) if (zone, role) in reach else None
+            matrix_ax.add_patch(Rectangle((j, i), 1, 1, facecolor=exposure_colors.get(level, 'white'), alpha=0.45,
+                                          edgecolor='black', hatch='//' if level == 'routing' else None))
+            text = '(self)' if level is None else format_ports(reach[(zone, role)])
+            if level == 'routing':
+                text = f"- (firewall: {routed_only[(zone, role)]})"
+            matrix_ax.text(j + 0.5, i + 0.5, textwrap.fill(text, 14), ha='center', va='center', fontsize=7)
+    matrix_ax.set_xlim(0, len(roles))
+    matrix_ax.set_ylim(len(ZONES), 0)
+    matrix_ax.set_xticks(np.arange(len(roles)) + 0.5)
+    matrix_ax.set_xticklabels([firewalls[r]['label'] for r in roles])
+    matrix_ax.set_yticks(np.arange(len(ZONES)) + 0.5)
+    matrix_ax.set_yticklabels(ZONES)
+    matrix_ax.xaxis.tick_top()
+    matrix_ax.set_title('Ports Each Zone Reaches', fontsize=12, fontweight='bold', pad=22)
+
+    verdict_colors = {'allowed': '#4CAF50', 'blocked arriving': '#F44336', 'no route': '#BDBDBD',
+                      'blocked leaving': '#9C27B0'}
+    left = np.zeros(len(roles))
+    for v, name in enumerate(VERDICTS):
+        counts = np.array([np.count_nonzero((dst == firewalls[r]['address']) & (verdict == v)) for r in roles])
+        flows_ax.barh([firewalls[r]['label'] for r in roles], counts, left=left, color=verdict_colors[name],
+                      edgecolor='black', label=name)
+        left += counts
+    flows_ax.invert_yaxis()
+    flows_ax.set_xlabel('Synthetic flows', fontsize=10)
+    flows_ax.set_title(f"{len(verdict):,} Flows by Destination", fontsize=12, fontweight='bold')
+    flows_ax.legend(fontsize=8, loc='lower right')
+    flows_ax.grid(axis='x', alpha=0.3)
+    return fig
+
+
+def random_rules(count, seed=0):
+    """Generate ufw rules over random sources and ports, for benchmarking"""
+    rng = np.random.default_rng(seed)
+    rules = []
+    for _ in range(count):
+        prefix = int(rng.choice([8, 16, 24, 32], p=[0.02, 0.18, 0.4, 0.4]))
+        network = int(rng.integers(0, ADDRESS_SPACE)) >> (32 - prefix) << (32 - prefix)
+        words = [str(rng.choice(list(ACTIONS), p=[0.6, 0.05, 0.3, 0.05])), 'from',
+                 f"{ipaddress.ip_address(network)}/{prefix}", 'to', 'any']
+        kind = rng.random()
+        if kind < 0.65:
+            words += ['port', str(rng.choice(SERVICE_PORTS))]
+        elif kind < 0.9:
+            lo = int(rng.integers(1, PORT_SPACE - 1000))
+            words += ['port', f"{lo}:{lo + int(rng.integers(1, 1000))}"]
+        if rng.random() < 0.7:
+            words += ['proto', str(rng.choice(PROTOCOLS))]
+        rules.append(parse_rule(words))
+    for number, rule in enumerate(rules, 1):
+        rule['number'] = number
+    return rules
+
+
+def benchmark(count, flows=2000000, checked=20000, seed=0):
+    """Time compiling and evaluating a random rule set and check the table against a linear scan"""
+    rules = random_rules(count, seed)
+    start = time.perf_counter()
+    compiled = compile_rules(rules, 'deny')
+    compile_s = time.perf_counter() - start
+    print(f"🧱 {count:,} rules compiled to {compiled['first'].size:,} cells in {compile_s * 1000:.0f} ms")
+
+    rng = np.random.default_rng(seed)
+    # Half the flows start inside a rule's source range, so most rules get exercised
+    src = rng.integers(0, ADDRESS_SPACE, flows, dtype=np.int64)
+    near = np.flatnonzero(rng.random(flows) < 0.5)
+    lo = np.array([r['src'][0] for r in rules], dtype=np.int64)
+    size = np.array([r['src'][1] - r['src'][0] + 1 for r in rules], dtype=np.int64)
+    pick = rng.integers(0, len(rules), len(near))
+    src[near] = lo[pick] + rng.integers(0, ADDRESS_SPACE, len(near)) % size[pick]
+    dst = rng.integers(0, ADDRESS_SPACE, flows, dtype=np.int64)
+    port = np.where(rng.random(flows) < 0.7, rng.choice(SERVICE_PORTS, flows), rng.integers(0, PORT_SPACE, flows))
+    proto = (rng.random(flows) < 0.5).astype(np.intp)
+
+    start = time.perf_counter()
+    matched = lookup(compiled, src, dst, port, proto)
+    allowed = compiled['allow'][matched]
+    table_s = time.perf_counter() - start
+    print(f"⏱️ table lookup  {flows / table_s / 1e6:8.2f}M flows/s, {allowed.mean():.1%} allowed")
+
+    start = time.perf_counter()
+    reference = [first_match(rules, 'deny', int(s), int(d), int(p), int(r))
+                 for s, d, p, r in zip(src[:checked], dst[:checked], port[:checked], proto[:checked])]
+    scan_s = time.perf_counter() - start
+    print(f"⏱️ linear scan   {checked / scan_s / 1e6:8.2f}M flows/s ({checked:,} flows)")
+    same = [i for i, _ in reference] == matched[:checked].tolist()
+    print(f"   Same first match for every checked flow: {'yes' if same else 'NO'}")
+
+    start = time.perf_counter()
+    kinds = [kind for _, kind, _ in analyze(compiled)]
+    print(f"🔎 {kinds.count('shadowed')} shadowed and {kinds.count('redundant')} redundant rules found in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    return same
+
+
+def main(argv=None):
+    """Compile the setup script's firewalls, evaluate flows and render the security layers"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--script', default=DEFAULT_SCRIPT,
+                        help='setup script with the ufw rules (default: setup_secured_infrastructure.sh)')
+    parser.add_argument('--flows', type=int, default=2000000, help='synthetic flows to evaluate (default: 2,000,000)')
+    parser.add_argument('--internet', type=float, default=0.7,
+                        help='share of flows from random internet addresses (default: 0.7)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print reachability, findings and verdicts as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/firewall_engine.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print the report only')
+    parser.add_argument('--benchmark', type=int, metavar='RULES',
+                        help='time compiling and evaluating a random rule set of this size')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark, seed=args.seed)
+    if args.flows < 1 or not 0 <= args.internet <= 1:
+        parser.error('--flows must be positive and --internet between 0 and 1')
+    try:
+        firewalls = compile_firewalls(load_script(args.script))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    if len(firewalls) < 2:
+        print(f"❌ {args.script} configures fewer than two of the roles {', '.join(ROLES)}")
+        return False
+
+    reach = reachability(firewalls)
+    alone = reachability(firewalls, route=False)
+    routed_only = {key: format_ports(ports) for key, ports in alone.items()
+                   if format_ports(ports) != format_ports(reach[key])}
+    problems = findings(firewalls)
+    src, dst, port, proto = synthetic_flows(firewalls, args.flows, args.seed, args.internet)
+    start = time.perf_counter()
+    verdict, hits = evaluate(firewalls, src, dst, port, proto)
+    seconds = time.perf_counter() - start
+
+    if args.json:
+        counts = np.bincount(verdict, minlength=len(VERDICTS))
+        print(json.dumps({'reachability': {f"{zone} -> {role}": format_ports(ports) for (zone, role), ports in reach.items()},
+                          'firewall_only': {f"{zone} -> {role}": ports for (zone, role), ports in routed_only.items()},
+                          'findings': problems, 'flows': len(verdict),
+                          'verdicts': dict(zip(VERDICTS, counts.tolist())), 'seconds': seconds}, indent=2))
+        return True
+    print(f"🔥 {len(firewalls)} firewalls from {os.path.basename(args.script)}: "
+          + ', '.join(f"{f['label']} {len(f['rules'])} rules" for f in firewalls.values()))
+    print_report(firewalls, reach, routed_only, problems, verdict, hits, seconds)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_firewall_diagram(firewalls, reach, routed_only, verdict, dst)
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
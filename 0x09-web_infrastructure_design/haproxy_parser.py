@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+HAProxy Config Parser
+Streams HAProxy configuration files (or directories of them) into a topology
+model of frontends, backends and servers, caches each file's parse by
+mtime/content hash, and renders the topology as a diagram.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from render_cache import DEFAULT_CACHE_DIR, cached_parse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(BASE_DIR, 'haproxy_config.cfg')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'haproxy_topology.png')
+PARSE_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'haproxy')
+# Bump when the per-file parse format changes so stale cache entries are ignored
+PARSER_VERSION = 4
+
+# What a defaults section falls back to for settings it does not set, as in HAProxy
+BUILTIN_DEFAULTS = {'mode': 'tcp', 'balance': 'roundrobin'}
+SECTIONS = {'global', 'defaults', 'frontend', 'backend', 'listen', 'peers', 'resolvers', 'userlist',
+            'cache', 'program', 'mailers', 'http-errors', 'ring', 'traces'}
+PROXY_SECTIONS = ('frontend', 'backend', 'listen')
+# Server keywords that take a value; the rest are flags such as check/backup/ssl
+SERVER_VALUE_OPTIONS = {'weight', 'inter', 'fastinter', 'downinter', 'rise', 'fall', 'port', 'maxconn',
+                        'minconn', 'maxqueue', 'cookie', 'crt', 'ca-file', 'verify', 'slowstart',
+                        'on-error', 'on-marked-down', 'addr', 'sni', 'alpn', 'proto', 'resolvers',
+                        'init-addr', 'observe', 'error-limit', 'agent-port', 'agent-inter', 'id'}
+
+TOPOLOGY_STYLES = {
+    'client': {'facecolor': 'lightblue', 'edgecolor': 'blue'},
+    'frontend': {'facecolor': 'orange', 'edgecolor': 'darkorange'},
+    'listen': {'facecolor': 'lightgray', 'edgecolor': 'gray'},
+    'backend': {'facecolor': 'lightyellow', 'edgecolor': 'orange'},
+    'server': {'facecolor': 'lightgreen', 'edgecolor': 'green'},
+    'backup': {'facecolor': 'lightcoral', 'edgecolor': 'red'},
+}
+
+_file_cache = {}
+_topology_cache = {}
+
+
+def tokenize(line):
+    """Split a config line into words, honouring quotes, backslash escapes and # comments"""
+    if '\\' not in line and '"' not in line and "'" not in line:
+        return line.split('#', 1)[0].split() if '#' in line else line.split()
+    words, word, quote, in_word = [], [], None, False
+    chars = iter(line)
+    for c in chars:
+        if quote:
+            if c == quote:
+                quote = None
+            elif c == '\\' and quote == '"':
+                word.append(next(chars, ''))
+            else:
+                word.append(c)
+        elif c == '\\':
+            word.append(next(chars, ''))
+            in_word = True
+        elif c in '"\'':
+            quote, in_word = c, True
+        elif c == '#' and not in_word:
+            break
+        elif c.isspace():
+            if in_word:
+                words.append(''.join(word))
+                word, in_word = [], False
+        else:
+            word.append(c)
+            in_word = True
+    if in_word:
+        words.append(''.join(word))
+    return words
+
+
+def iter_sections(path):
+    """Stream one file's sections as dicts with their directives.
+
+    The file is read line by line, so configs with thousands of server lines
+    never sit in memory as a whole.
+    """
+    section = None
+    with open(path, encoding='utf-8', errors='replace') as config:
+        for number, line in enumerate(config, 1):
+            words = tokenize(line)
+            if not words:
+                continue
+            if words[0] in SECTIONS:
+                if section is not None:
+                    yield section
+                section = {'type': words[0], 'name': words[1] if len(words) > 1 else '',
+                           'file': path, 'line': number, 'directives': [], 'numbers': []}
+            elif section is not None:
+                section['directives'].append(words)
+                section['numbers'].append(number)
+    if section is not None:
+        yield section
+
+
+def parse_file(path, cache_dir=PARSE_CACHE_DIR):
+    """Return a file's section records, reusing earlier parses.
+
+    An unchanged mtime and size hit the in-memory cache without reading the
+    file. Otherwise the content hash is looked up on disk, so touching or
+    reverting a file never re-parses it. cache_dir=None skips the disk cache.
+    """
+    return cached_parse(path, lambda p: [build_section(section) for section in iter_sections(p)],
+                        cache_dir, PARSER_VERSION, _file_cache)
+
+
+def config_files(paths):
+    """Expand files and directories (their *.cfg, sorted) like haproxy -f"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.cfg'))))
+        else:
+            files.append(path)
+    return files
+
+
+def server_options(words):
+    """Parse server keywords into {keyword: value}, with True for flags"""
+    options = {}
+    rest = iter(words)
+    for word in rest:
+        options[word] = next(rest, '') if word in SERVER_VALUE_OPTIONS else True
+    return options
+
+
+def parse_server(words, defaults=None):
+    """Turn 'server <name> <address>[:port] [options]' words into a server record.
+
+    Raises ValueError for a weight that is not an integer from 0 to 256.
+    """
+    name, address = words[1], words[2] if len(words) > 2 else ''
+    host, port = address, None
+    head, sep, tail = address.rpartition(':')
+    if sep and tail.isdigit():
+        host, port = head.strip('[]'), int(tail)
+    options = {**(defaults or {}), **server_options(words[3:])}
+    weight = str(options.get('weight', 1))
+    if not weight.isdigit() or int(weight) > 256:
+        raise ValueError(f"server {name}: weight must be an integer from 0 to 256, got {weight!r}")
+    return {
+        'name': name,
+        'address': host,
+        'port': port,
+        'weight': int(weight),
+        'check': bool(options.get('check')),
+        'backup': bool(options.get('backup')),
+        'disabled': bool(options.get('disabled')),
+        'options': {key: value for key, value in options.items() if key not in ('weight', 'check', 'backup')},
+    }
+
+
+def build_section(section):
+    """Turn one section's directives into a record.
+
+    Proxies (frontend/backend/listen) get their binds, routing rules and
+    parsed servers. mode and balance stay None unless set in the section,
+    so defaults from earlier files can still apply when files are combined.
+    A malformed server line raises ValueError with its file and line.
+    """
+    kind, directives = section['type'], section['directives']
+    if kind == 'global':
+        return {'type': kind, 'directives': directives}
+    if kind == 'defaults':
+        record = {'type': kind, 'mode': None, 'balance': None}
+        for words in directives:
+            if words[0] in ('mode', 'balance') and len(words) > 1:
+                record[words[0]] = ' '.join(words[1:])
+        return record
+    if kind not in PROXY_SECTIONS:
+        return {'type': kind, 'name': section['name']}
+
+    proxy = {
+        'name': section['name'], 'type': kind, 'file': section['file'], 'line': section['line'],
+        'mode': None, 'balance': None, 'binds': [], 'default_backend': None,
+        'use_backends': [], 'acls': {}, 'servers': [], 'health_check': None, 'stats': False,
+    }
+    server_defaults = {}
+    for number, words in zip(section['numbers'], directives):
+        keyword, args = words[0], words[1:]
+        if keyword == 'bind' and args:
+            proxy['binds'].append(' '.join(args))
+        elif keyword in ('mode', 'balance') and args:
+            proxy[keyword] = ' '.join(args)
+        elif keyword == 'default_backend' and args:
+            proxy['default_backend'] = args[0]
+        elif keyword == 'use_backend' and args:
+            proxy['use_backends'].append({'backend': args[0], 'condition': ' '.join(args[1:])})
+        elif keyword == 'acl' and args:
+            proxy['acls'][args[0]] = ' '.join(args[1:])
+        elif keyword == 'default-server':
+            server_defaults.update(server_options(args))
+        elif keyword == 'server' and len(args) >= 2:
+            try:
+                proxy['servers'].append(parse_server(words, server_defaults))
+            except ValueError as e:
+                raise ValueError(f"{section['file']}:{number}: {e}") from None
+        elif keyword == 'option' and args[:1] == ['httpchk']:
+            proxy['health_check'] = ' '.join(args[1:]) or 'OPTIONS /'
+        elif keyword == 'stats' and args[:1] == ['enable']:
+            proxy['stats'] = True
+    return proxy
+
+
+def build_topology(records):
+    """Assemble section records, in config order, into {'frontends', 'backends', 'listens', ...}.
+
+    A defaults section applies its mode and balance algorithm to every proxy
+    that follows it; like HAProxy, each one starts again from the built-in
+    defaults rather than inheriting the previous one. Proxies with the same name are merged. Records may come
+    from the parse cache, so they are copied rather than modified.
+    """
+    topology = {'global': [], 'frontends': {}, 'backends': {}, 'listens': {}, 'other': [], 'files': []}
+    defaults = dict(BUILTIN_DEFAULTS)
+    for record in records:
+        kind = record['type']
+        if kind == 'global':
+            topology['global'].extend(record['directives'])
+        elif kind == 'defaults':
+            defaults = {key: record[key] or BUILTIN_DEFAULTS[key] for key in BUILTIN_DEFAULTS}
+        elif kind not in PROXY_SECTIONS:
+            topology['other'].append(record)
+        else:
+            if record['file'] not in topology['files']:
+                topology['files'].append(record['file'])
+            proxies = topology[kind + 's']
+            existing = proxies.get(record['name'])
+            if existing is None:
+                proxies[record['name']] = {**record, **{key: record[key] or defaults[key] for key in defaults}}
+                continue
+            for key in ('binds', 'use_backends', 'servers'):
+                existing[key] = existing[key] + record[key]
+            existing['acls'] = {**existing['acls'], **record['acls']}
+            for key in ('mode', 'balance', 'default_backend', 'health_check'):
+                existing[key] = record[key] or existing[key]
+            existing['stats'] = existing['stats'] or record['stats']
+    return topology
+
+
+def load_topology(paths=(DEFAULT_CONFIG,), cache_dir=PARSE_CACHE_DIR):
+    """Parse one or more configs (files or directories) into a topology model.
+
+    The assembled model is memoized on every file's mtime and size, so asking
+    again with nothing changed costs one stat per file.
+    """
+    files = config_files(paths)
+    stamps = tuple((path, os.stat(path).st_mtime_ns, os.path.getsize(path)) for path in files)
+    if stamps in _topology_cache:
+        return _topology_cache[stamps]
+    sections = []
+    for path in files:
+        sections.extend(parse_file(path, cache_dir))
+    _topology_cache.clear()
+    _topology_cache[stamps] = build_topology(sections)
+    return _topology_cache[stamps]
+
+
+def routes(topology):
+    """Yield (frontend, backend, condition) for every frontend routing rule"""
+    for proxy in topology['frontends'].values():
+        for rule in proxy['use_backends']:
+            yield proxy['name'], rule['backend'], rule['condition']
+        if proxy['default_backend']:
+            yield proxy['name'], proxy['default_backend'], 'default'
+
+
+def topology_graph(topology):
+    """Return (nodes, edges) for auto_layout: clients → frontends → backends → servers"""
+    nodes = {'clients': {'label': 'Clients\n(Internet)', 'style': 'client', 'tier': 0}}
+    edges = []
+
+    def add_servers(proxy_id, servers):
+        for server in servers:
+            server_id = f"{proxy_id}/{server['name']}"
+            address = f"{server['address']}:{server['port']}" if server['port'] else server['address']
+            label = f"{server['name']}\n{address}" + (f"\nweight {server['weight']}" if server['weight'] != 1 else '')
+            nodes[server_id] = {'label': label, 'style': 'backup' if server['backup'] else 'server', 'tier': 3}
+            edges.append((proxy_id, server_id))
+
+    for kind in ('frontends', 'listens'):
+        for proxy in topology[kind].values():
+            proxy_id = f"{proxy['type']}:{proxy['name']}"
+            binds = ', '.join(b.split()[0] for b in proxy['binds']) or 'no bind'
+            role = f"\n{proxy['balance']}" if kind == 'listens' and proxy['servers'] else ''
+            nodes[proxy_id] = {'label': f"{proxy['name']}\n{binds}{role}", 'style': proxy['type'], 'tier': 1}
+            edges.append(('clients', proxy_id))
+            if kind == 'listens':
+                add_servers(proxy_id, proxy['servers'])
+    for proxy in topology['backends'].values():
+        proxy_id = f"backend:{proxy['name']}"
+        nodes[proxy_id] = {'label': f"{proxy['name']}\n{proxy['balance']}", 'style': 'backend', 'tier': 2}
+        add_servers(proxy_id, proxy['servers'])
+    for frontend, backend, _ in routes(topology):
+        if f"backend:{backend}" not in nodes:
+            nodes[f"backend:{backend}"] = {'label': f"{backend}\n(undefined)", 'style': 'backup', 'tier': 2}
+        edges.append((f"frontend:{frontend}", f"backend:{backend}"))
+    return nodes, list(dict.fromkeys(edges))
+
+
+def topology_spec(topology, title=None, max_width=12):
+    """Build a diagram_engine spec of the routing topology"""
+    from auto_layout import layout_spec
+
+    nodes, edges = topology_graph(topology)
+    servers = sum(len(p['servers']) for kind in ('backends', 'listens') for p in topology[kind].values())
+    title = title or f"HAProxy Topology: {len(topology['frontends'])} frontend(s), " \
+                     f"{len(topology['backends'])} backend(s), {servers} server(s)"
+    spec, _ = layout_spec(nodes, edges, title, max_width, TOPOLOGY_STYLES)
+    spec['name'] = 'haproxy_topology'
+    return spec
+
+
+def create_haproxy_topology_diagram(paths=(DEFAULT_CONFIG,), topology=None):
+    """Create the routing topology diagram straight from the HAProxy config"""
+    from diagram_engine import render_spec
+
+    return render_spec(topology_spec(topology or load_topology(paths)))
+
+
+def summarize(topology):
+    """Return one line per proxy describing its routing and servers"""
+    lines = []
+    for kind in ('frontends', 'listens', 'backends'):
+        for proxy in topology[kind].values():
+            servers = proxy['servers']
+            active = sum(1 for s in servers if not s['backup'] and not s['disabled'])
+            detail = []
+            if proxy['binds']:
+                detail.append(f"bind {', '.join(proxy['binds'])}")
+            if proxy['default_backend'] or proxy['use_backends']:
+                targets = [r['backend'] for r in proxy['use_backends']] + [proxy['default_backend'] or '']
+                detail.append(f"→ {', '.join(t for t in dict.fromkeys(targets) if t)}")
+            if servers:
+                detail.append(f"{proxy['balance']}, {active} active / {len(servers) - active} backup "
+                              f"server(s), {sum(1 for s in servers if s['check'])} checked")
+            lines.append(f"{proxy['type']:<9} {proxy['name']:<24} {'; '.join(detail)}")
+    return lines
+
+
+def write_sample_config(directory, servers, files=4):
+    """Write a multi-file config with the given number of servers, for benchmarking"""
+    os.makedirs(directory, exist_ok=True)
+    per_file = -(-servers // files)
+    with open(os.path.join(directory, '00-frontend.cfg'), 'w', encoding='utf-8') as config:
+        config.write("defaults\n    mode http\n    balance roundrobin\n\nfrontend web_frontend\n    bind *:80\n")
+        for i in range(files):
+            config.write(f"    acl is_pool{i} path_beg /pool{i}\n    use_backend pool{i} if is_pool{i}\n")
+        config.write("    default_backend pool0\n")
+    for i in range(files):
+        with open(os.path.join(directory, f"{i + 1:02d}-pool{i}.cfg"), 'w', encoding='utf-8') as config:
+            config.write(f"backend pool{i}\n    balance leastconn\n    option httpchk GET /health\n"
+                         f"    default-server inter 2000ms rise 2 fall 3\n")
+            for j in range(i * per_file, min(servers, (i + 1) * per_file)):
+                config.write(f"    server web{j + 1} 10.{j // 65536 % 256}.{j // 256 % 256}.{j % 256 + 1}:80 "
+                             f"check weight {100 + j % 3 * 50}\n")
+
+
+def benchmark(servers):
+    """Time cold, cached and one-file-edited parses of a generated multi-file config"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_dir = os.path.join(directory, 'haproxy.d')
+        cache_dir = os.path.join(directory, 'cache')
+        write_sample_config(config_dir, servers)
+        edited = config_files([config_dir])[-1]
+        for label in ('cold', 'memory cache', 'disk cache', 'one file edited'):
+            if label == 'disk cache':
+                # A fresh process: nothing in memory, every file found by hash on disk
+                _file_cache.clear()
+                _topology_cache.clear()
+            elif label == 'one file edited':
+                with open(edited, 'a', encoding='utf-8') as config:
+                    config.write("    server extra 10.255.255.1:80 check\n")
+            start = time.perf_counter()
+            topology = load_topology([config_dir], cache_dir)
+            print(f"⏱️ {label:<16} {(time.perf_counter() - start) * 1000:8.1f} ms "
+                  f"({sum(len(b['servers']) for b in topology['backends'].values())} servers)")
+    return True
+
+
+def main(argv=None):
+    """Parse HAProxy configs, print the topology and render its diagram"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('configs', nargs='*', default=[DEFAULT_CONFIG],
+                        help='config files or directories of *.cfg (default: haproxy_config.cfg)')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='diagram file, .png/.svg/.pdf (default: build/haproxy_topology.png)')
+    parser.add_argument('--spec', help='also write the diagram spec as JSON for diagram_engine.py')
+    parser.add_argument('--json', action='store_true', help='print the topology model as JSON')
+    parser.add_argument('--no-diagram', action='store_true', help='parse and summarize only')
+    parser.add_argument('--no-cache', action='store_true', help='always re-parse every file')
+    parser.add_argument('--benchmark', type=int, metavar='SERVERS',
+                        help='time cold and cached parses of a generated multi-file config')
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else PARSE_CACHE_DIR
+
+    if args.benchmark:
+        return benchmark(args.benchmark)
+
+    start = time.perf_counter()
+    try:
+        topology = load_topology(args.configs, cache_dir)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    seconds = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(topology, indent=2))
+        return True
+
+    print(f"📄 Parsed {len(topology['files'])} file(s) in {seconds * 1000:.1f} ms")
+    for line in summarize(topology):
+        print(f"   {line}")
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    if args.spec:
+        with open(args.spec, 'w', encoding='utf-8') as spec_file:
+            json.dump(topology_spec(topology), spec_file, indent=2)
+        print(f"📝 Spec saved to {args.spec}")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_haproxy_topology_diagram(topology=topology)
+    save_figure(fig, args.output, dpi=150)
+    plt.close(fig)
+    print(f"📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
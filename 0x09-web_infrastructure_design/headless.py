@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Headless Rendering Helpers
+Forces a non-interactive backend, saves and frees each figure as soon as it
+is drawn, and reports per-diagram memory so unattended renders stay flat.
+"""
+
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def headless_requested(argv=None):
+    """Return True when --headless is passed or MPLBACKEND is Agg"""
+    argv = sys.argv[1:] if argv is None else argv
+    return '--headless' in argv or os.environ.get('MPLBACKEND', '').lower() == 'agg'
+
+
+def use_headless():
+    """Switch matplotlib to Agg so plt.show() never blocks on a GUI"""
+    import warnings
+    import matplotlib
+
+    os.environ['MPLBACKEND'] = 'Agg'
+    matplotlib.use('Agg', force=True)
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+
+
+def rss_mb():
+    """Return the current resident set size in MB (0 when unknown)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def peak_rss_mb():
+    """Return the process's peak resident set size in MB (0 when unknown).
+
+    VmHWM is preferred: Linux carries ru_maxrss over from the parent on
+    fork, so a worker or subprocess would report its parent's peak.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def render_measured(create, filename, headless=True, dpi=300, trace=False):
+    """Build a figure, save it, show it unless headless, then free it.
+
+    Returns a memory/timing record: RSS after the figure is closed, the
+    change in RSS over the render, the process peak RSS and, with trace=True,
+    the peak of Python-level allocations seen by tracemalloc.
+    """
+    import gc
+    import tracemalloc
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    if trace:
+        tracemalloc.start()
+    before = rss_mb()
+    start = time.perf_counter()
+    fig = create()
+    save_figure(fig, filename, dpi=dpi)
+    if not headless:
+        plt.show()
+    plt.close(fig)
+    del fig
+    gc.collect()
+
+    record = {
+        'output': filename,
+        'seconds': time.perf_counter() - start,
+        'rss_mb': rss_mb(),
+        'rss_delta_mb': rss_mb() - before,
+        'peak_rss_mb': peak_rss_mb(),
+        'open_figures': len(plt.get_fignums()),
+    }
+    if trace:
+        record['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return record
+
+
+def format_memory(record):
+    """Return a one-line memory summary for a render record"""
+    line = (f"   💾 {record['seconds']:.2f}s, RSS {record['rss_mb']:.0f} MB "
+            f"({record['rss_delta_mb']:+.1f} MB), peak {record['peak_rss_mb']:.0f} MB, "
+            f"{record['open_figures']} open figure(s)")
+    if 'traced_peak_mb' in record:
+        line += f", traced peak {record['traced_peak_mb']:.1f} MB"
+    return line
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Health Check Model
+Models HAProxy server health checks at fleet scale: the check traffic every
+load balancer sends, how long a dead server keeps receiving requests, how
+long a recovered one waits, and how often transient check failures flap a
+healthy server, swept over backend counts and check settings.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'healthcheck_model.png')
+PERCENTILES = (50, 99)
+FAILURES = ('refused', 'hang')
+# HAProxy's server check defaults; fastinter and downinter fall back to inter
+CHECK_DEFAULTS = {'inter': 2000.0, 'rise': 2, 'fall': 3}
+TIME_UNITS = {'us': 0.001, 'ms': 1.0, 's': 1000.0, 'm': 60000.0, 'h': 3600000.0, 'd': 86400000.0}
+DAY_S = 86400
+
+# Parameters that take comma-separated lists; the sweep is their product.
+# None means: take it from the config (or from inter for the intervals).
+SWEEP = {
+    'servers': None,          # servers in the backend
+    'lbs': 2,                 # load balancers checking every server
+    'inter': None,            # ms between checks of an UP server
+    'fastinter': None,        # ms between checks while a server is changing state
+    'downinter': None,        # ms between checks of a DOWN server
+    'timeout': None,          # ms before a check counts as failed (timeout check; HAProxy uses inter)
+    'rise': None,
+    'fall': None,
+    'check_failure': 0.001,   # probability a check of a healthy server fails anyway
+}
+
+
+def parse_time(value, default_unit='ms'):
+    """Convert an HAProxy time such as '2000ms', '2s' or '500' (ms) to milliseconds"""
+    text = str(value).strip()
+    for unit in sorted(TIME_UNITS, key=len, reverse=True):
+        if text.endswith(unit) and text[:-len(unit)].replace('.', '', 1).isdigit():
+            return float(text[:-len(unit)]) * TIME_UNITS[unit]
+    return float(text) * TIME_UNITS[default_unit]
+
+
+def backend_checks(proxy):
+    """Return the check settings of a backend's checked servers (the most common ones) and their count"""
+    servers = [s for s in proxy['servers'] if s['check'] and not s['disabled']]
+    if not servers:
+        return None, 0
+    settings = []
+    for server in servers:
+        options = server['options']
+        inter = parse_time(options.get('inter', CHECK_DEFAULTS['inter']))
+        settings.append((inter, parse_time(options.get('fastinter', inter)), parse_time(options.get('downinter', inter)),
+                         int(options.get('rise', CHECK_DEFAULTS['rise'])),
+                         int(options.get('fall', CHECK_DEFAULTS['fall']))))
+    inter, fastinter, downinter, rise, fall = max(set(settings), key=settings.count)
+    return {'inter': inter, 'fastinter': fastinter, 'downinter': downinter, 'rise': rise, 'fall': fall}, len(servers)
+
+
+def sweep_grid(grid):
+    """Return {parameter: flat array} over every combination of the grid's value lists"""
+    names = list(grid)
+    mesh = np.meshgrid(*(np.asarray(grid[name], dtype=float) for name in names), indexing='ij')
+    return {name: values.ravel() for name, values in zip(names, mesh)}
+
+
+def check_model(params, failure='refused', rate=1000.0, check_bytes=400, check_cost_ms=2.0, cores=2):
+    """Evaluate the check model for every row of params at once; return {metric: array}.
+
+    Each load balancer checks each server independently every inter ms, so
+    a server sees lbs / inter checks per second. A server failing at a
+    random moment is next checked after a uniform wait of up to inter; the
+    check fails at once when refused, or after the timeout when the server
+    hangs, and the remaining fall - 1 failures come every fastinter after
+    the previous check ends. Every load balancer has its own phase, so the
+    last one to notice is the maximum of lbs uniform waits, whose quantile q
+    is inter * q ** (1 / lbs). Recovery takes a uniform wait of up to
+    downinter and rise - 1 more checks. A healthy server is marked down
+    falsely when fall checks in a row fail; such runs start at a rate of
+    (1 - p) * p ** fall per check, so flaps are Poisson at that rate.
+    """
+    inter = params['inter'] / 1000.0
+    fastinter = params['fastinter'] / 1000.0
+    downinter = params['downinter'] / 1000.0
+    lbs, servers, fall, rise = params['lbs'], params['servers'], params['fall'], params['rise']
+    failed_check = params['timeout'] / 1000.0 if failure == 'hang' else 0.0
+    after_first = fall * failed_check + (fall - 1) * fastinter
+
+    per_server = lbs / inter
+    result = {
+        'check_qps_per_server': per_server,
+        'check_qps_fleet': per_server * servers,
+        'check_mbps_fleet': per_server * servers * check_bytes * 8 / 1e6,
+        'check_cpu_pct': per_server * check_cost_ms / 1000.0 / cores * 100,
+        'detect_mean_s': inter / 2 + after_first,
+        'recover_mean_s': downinter / 2 + (rise - 1) * fastinter,
+        # Requests each load balancer keeps sending to the dead server until it notices
+        'errors_per_failure': rate / servers * (inter / 2 + after_first),
+    }
+    for p in PERCENTILES:
+        q = p / 100.0
+        result[f"detect_p{p}_s"] = q * inter + after_first
+        result[f"detect_all_p{p}_s"] = q ** (1 / lbs) * inter + after_first
+        result[f"recover_p{p}_s"] = q * downinter + (rise - 1) * fastinter
+    runs = (1 - params['check_failure']) * params['check_failure'] ** fall
+    flaps_per_day = runs * DAY_S / inter
+    result['flaps_per_server_day'] = flaps_per_day
+    result['flap_probability_day'] = -np.expm1(-flaps_per_day)
+    result['flaps_fleet_day'] = flaps_per_day * servers * lbs
+    return result
+
+
+def resolve_grid(grid, settings, servers):
+    """Return the flat sweep over grid, filling parameters left as None from the config or SWEEP.
+
+    fastinter, downinter and timeout follow each swept inter unless given
+    or configured to something else, as HAProxy falls back to inter.
+    """
+    config = {**settings, 'servers': servers}
+    given = {name: values for name, values in grid.items() if values is not None and len(values)}
+    resolved = {name: given.get(name, [config.get(name, default)]) for name, default in SWEEP.items()}
+    for name in ('fastinter', 'downinter', 'timeout'):
+        if name not in given and config.get(name, settings['inter']) == settings['inter']:
+            resolved[name] = [np.nan]
+    params = sweep_grid(resolved)
+    for name in ('fastinter', 'downinter', 'timeout'):
+        params[name] = np.where(np.isnan(params[name]), params['inter'], params[name])
+    return params
+
+
+def varying(params):
+    """Names of the parameters that differ between rows, leaving out intervals that just follow inter"""
+    return [name for name in SWEEP if len(np.unique(params[name])) > 1
+            and not (name in ('fastinter', 'downinter', 'timeout') and np.array_equal(params[name], params['inter']))]
+
+
+def label(params, row, names):
+    """Short description of one row by the parameters that vary"""
+    return ', '.join(f"{name}={params[name][row]:g}" for name in names) or 'config'
+
+
+def print_report(params, result, names, limit=20):
+    """Print a row per combination, or a spread of them for large sweeps"""
+    rows = len(params['inter'])
+    order = np.argsort(result['detect_p99_s'], kind='stable')
+    shown = order if rows <= limit else order[np.linspace(0, rows - 1, limit).astype(int)]
+    width = max([len(label(params, i, names)) for i in shown] + [11])
+    print(f"{'Combination':<{width}} {'Chk/s srv':>9} {'Chk/s all':>10} {'CPU %':>6} {'Detect p50':>10} "
+          f"{'p99 all LB':>10} {'Recover':>8} {'Errors':>8} {'Flaps/day':>10}")
+    print('-' * (width + 80))
+    for i in shown:
+        print(f"{label(params, i, names):<{width}} {result['check_qps_per_server'][i]:>9.2f} "
+              f"{result['check_qps_fleet'][i]:>10,.0f} {result['check_cpu_pct'][i]:>6.2f} "
+              f"{result['detect_p50_s'][i]:>9.1f}s {result['detect_all_p99_s'][i]:>9.1f}s "
+              f"{result['recover_p50_s'][i]:>7.1f}s {result['errors_per_failure'][i]:>8,.0f} "
+              f"{result['flaps_fleet_day'][i]:>10.3g}")
+    if rows > limit:
+        print(f"({limit} of {rows:,} combinations, spread from fastest to slowest detection)")
+
+
+def create_healthcheck_diagram(settings, servers, lbs, check_failure, failure, model_kwargs, title=None):
+    """Plot check load, detection time and flap rate beside the distributed infrastructure diagram"""
+    import matplotlib.pyplot as plt
+    from diagram_panels import add_side_panel
+    from distributed_diagram_generator import create_distributed_infrastructure_diagram
+
+    fig = create_distributed_infrastructure_diagram()
+    load_ax, detect_ax, flap_ax = add_side_panel(
+        fig, rows=3, width_ratio=0.8, hspace=0.6,
+        title=title or f"Health Checks: {servers:,} servers, inter {settings['inter']:g}ms "
+                       f"rise {settings['rise']} fall {settings['fall']}",
+        fontsize=14, fontweight='bold', y=0.99)
+    colors = plt.get_cmap('viridis')
+    base = {'lbs': [lbs], 'check_failure': [check_failure]}
+
+    counts = np.unique(np.geomspace(1, 10000, 60).astype(int))
+    inters = sorted({500.0, 1000.0, settings['inter'], 5000.0, 10000.0})
+    for k, inter in enumerate(inters):
+        params = resolve_grid({**base, 'servers': counts, 'inter': [inter]}, settings, servers)
+        qps = check_model(params, failure, **model_kwargs)['check_qps_fleet']
+        current = inter == settings['inter']
+        load_ax.plot(counts, qps, color=colors(k / len(inters)), linewidth=2.5 if current else 1.2,
+                     label=f"inter {inter / 1000:g}s" + (' (config)' if current else ''))
+    load_ax.scatter([servers], [lbs * servers / (settings['inter'] / 1000)], color='red', zorder=5)
+    load_ax.set_xscale('log')
+    load_ax.set_yscale('log')
+    load_ax.set_xlabel('Servers in the backend', fontsize=9)
+    load_ax.set_ylabel('Checks / s (all LBs)', fontsize=9)
+    load_ax.set_title(f"Check Traffic from {lbs} Load Balancer(s)", fontsize=11, fontweight='bold')
+    load_ax.grid(alpha=0.3, which='both')
+    load_ax.legend(fontsize=7)
+
+    grid_inter = np.geomspace(250, 20000, 80)
+    for k, fall in enumerate(sorted({1, 2, settings['fall'], 5})):
+        params = resolve_grid({**base, 'servers': [servers], 'inter': grid_inter, 'fall': [fall]},
+                              settings, servers)
+        model = check_model(params, failure, **model_kwargs)
+        current = fall == settings['fall']
+        detect_ax.plot(grid_inter / 1000, model['detect_all_p99_s'], color=colors(k / 4),
+                       linewidth=2.5 if current else 1.2, label=f"fall {fall}" + (' (config)' if current else ''))
+    params = resolve_grid({**base, 'servers': [servers]}, settings, servers)
+    point = check_model(params, failure, **model_kwargs)
+    detect_ax.scatter([settings['inter'] / 1000], point['detect_all_p99_s'], color='red', zorder=5)
+    detect_ax.annotate(f"{point['detect_all_p99_s'][0]:.1f}s", (settings['inter'] / 1000, point['detect_all_p99_s'][0]),
+                       textcoords='offset points', xytext=(6, -10), fontsize=8, color='red')
+    detect_ax.set_xscale('log')
+    detect_ax.set_yscale('log')
+    detect_ax.set_xlabel('Check interval inter (s)', fontsize=9)
+    detect_ax.set_ylabel('p99 until every LB\nmarks it DOWN (s)', fontsize=9)
+    detect_ax.set_title(f"Time to Detect a Dead Server ({failure})", fontsize=11, fontweight='bold')
+    detect_ax.grid(alpha=0.3, which='both')
+    detect_ax.legend(fontsize=7)
+
+    failure_rates = np.geomspace(1e-5, 0.2, 80)
+    for k, fall in enumerate(sorted({1, 2, settings['fall'], 5})):
+        params = resolve_grid({**base, 'servers': [servers], 'fall': [fall], 'check_failure': failure_rates},
+                              settings, servers)
+        flaps = check_model(params, failure, **model_kwargs)['flaps_fleet_day']
+        flap_ax.plot(failure_rates * 100, flaps, color=colors(k / 4), linewidth=2.5 if fall == settings['fall'] else 1.2,
+                     label=f"fall {fall}")
+    flap_ax.axhline(1, color='gray', linestyle=':', linewidth=1)
+    flap_ax.set_xscale('log')
+    flap_ax.set_yscale('log')
+    flap_ax.set_ylim(1e-4, None)
+    flap_ax.set_xlabel('Checks of a healthy server that fail anyway (%)', fontsize=9)
+    flap_ax.set_ylabel('False DOWNs / day\n(whole backend)', fontsize=9)
+    flap_ax.set_title('Flapping from Transient Check Failures', fontsize=11, fontweight='bold')
+    flap_ax.grid(alpha=0.3, which='both')
+    flap_ax.legend(fontsize=7)
+    return fig
+
+
+def _values(value):
+    return [parse_time(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    """Evaluate the health-check model for a config and a parameter sweep"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     epilog='Parameter options take comma-separated lists; the sweep covers every '
+                                            'combination. Intervals accept HAProxy units (2000ms, 2s).')
+    parser.add_argument('--config', action='append', help='HAProxy config file or directory (default: haproxy_config.cfg)')
+    parser.add_argument('--backend', help='backend (or listen) section (default: the first with checked servers)')
+    for name, default in SWEEP.items():
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=_values,
+                            help=f"default: {default if default is not None else 'from the config'}")
+    parser.add_argument('--failure', choices=FAILURES, default='refused',
+                        help='how a dead server fails its checks (default: refused)')
+    parser.add_argument('--rate', type=float, default=1000.0, help='requests per second over the backend (default: 1000)')
+    parser.add_argument('--check-bytes', type=int, default=400, help='bytes on the wire per check (default: 400)')
+    parser.add_argument('--check-cost-ms', type=float, default=2.0, help='server CPU per /health check (default: 2 ms)')
+    parser.add_argument('--cores', type=int, default=2, help='cores per server (default: 2)')
+    parser.add_argument('--json', action='store_true', help='print every combination as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/healthcheck_model.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    args = parser.parse_args(argv)
+
+    from haproxy_parser import DEFAULT_CONFIG, load_topology
+    try:
+        topology = load_topology(args.config or [DEFAULT_CONFIG])
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    proxies = {**topology['listens'], **topology['backends']}
+    candidates = [proxies[args.backend]] if args.backend in proxies else [] if args.backend else proxies.values()
+    settings, servers = next(((s, n) for s, n in map(backend_checks, candidates) if n), (None, 0))
+    if settings is None:
+        parser.error(f"no backend {args.backend or 'with checked servers'} in the config")
+
+    params = resolve_grid({name: getattr(args, name) for name in SWEEP}, settings, servers)
+    if min(params['inter'].min(), params['fastinter'].min(), params['downinter'].min()) <= 0:
+        parser.error('check intervals must be positive')
+    if min(params['rise'].min(), params['fall'].min(), params['lbs'].min(), params['servers'].min()) < 1:
+        parser.error('--rise, --fall, --lbs and --servers must be at least 1')
+    if params['timeout'].min() < 0 or not 0 <= params['check_failure'].min() <= params['check_failure'].max() < 1:
+        parser.error('--timeout must be non-negative and --check-failure between 0 and 1')
+
+    model_kwargs = {'rate': args.rate, 'check_bytes': args.check_bytes, 'check_cost_ms': args.check_cost_ms,
+                    'cores': args.cores}
+    result = check_model(params, args.failure, **model_kwargs)
+    names = varying(params)
+    if args.json:
+        rows = [{**{name: float(params[name][i]) for name in SWEEP},
+                 **{metric: float(values[i]) for metric, values in result.items()}} for i in range(len(params['inter']))]
+        print(json.dumps(rows, indent=2))
+        return True
+    print(f"🩺 {servers} checked server(s): inter {settings['inter']:g}ms fastinter {settings['fastinter']:g}ms "
+          f"downinter {settings['downinter']:g}ms rise {settings['rise']} fall {settings['fall']}; "
+          f"{args.failure} failures, {len(params['inter']):,} combination(s)")
+    print_report(params, result, names)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    shown = {name: float(params[name][0]) for name in ('inter', 'fastinter', 'downinter', 'timeout')}
+    shown.update(rise=int(params['rise'][0]), fall=int(params['fall'][0]))
+    fig = create_healthcheck_diagram(shown, int(params['servers'][0]), int(params['lbs'][0]),
+                                     float(params['check_failure'][0]), args.failure, model_kwargs)
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark
+Times module imports and non-rendering CLI commands in fresh interpreters and
+fails when they exceed a budget or pull in matplotlib/NumPy.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = [
+    'diagram_generator',
+    'distributed_diagram_generator',
+    'secured_diagram_generator',
+    'scale_up_diagram_generator',
+    'render_all',
+    'diagram_engine',
+    'diagrams_cli',
+]
+COMMANDS = [
+    ['diagrams_cli.py', 'list'],
+    ['diagrams_cli.py', 'validate'],
+]
+HEAVY_MODULES = ('matplotlib', 'numpy')
+
+# Imports the module in a fresh interpreter and reports its cost and any heavy modules it loaded
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, runs=5):
+    """Return (median seconds, heavy modules loaded) for importing module"""
+    samples, heavy = [], []
+    for _ in range(runs):
+        probe = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                               cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        result = json.loads(probe.stdout)
+        samples.append(result['seconds'])
+        heavy = result['heavy']
+    return statistics.median(samples), heavy
+
+
+def time_command(command, runs=5):
+    """Return the median wall time of a CLI command, interpreter startup included.
+
+    The median is the warm time: list and validate cache their per-module
+    results, so only the first run parses the generator sources.
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], cwd=BASE_DIR, capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def time_startup(runs=5):
+    """Return the median wall time of a bare interpreter, as a baseline"""
+    return time_command(['-c', 'pass'], runs)
+
+
+def main(argv=None):
+    """Benchmark import and CLI startup times against a budget"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=5, help='runs per measurement (default: 5)')
+    parser.add_argument('--import-budget', type=float, default=50,
+                        help='max milliseconds to import any module (default: 50)')
+    parser.add_argument('--command-budget', type=float, default=100,
+                        help='max milliseconds for a CLI command beyond interpreter startup (default: 100)')
+    args = parser.parse_args(argv)
+
+    ok = True
+    print(f"{'Import':<40} {'ms':>8}  Heavy modules")
+    print('-' * 70)
+    for module in MODULES:
+        seconds, heavy = time_import(module, args.runs)
+        over = seconds * 1000 > args.import_budget or heavy
+        ok = ok and not over
+        print(f"{module:<40} {seconds * 1000:>8.1f}  {', '.join(heavy) or '-'}{'  ❌' if over else ''}")
+
+    startup = time_startup(args.runs)
+    print(f"\n{'Command':<40} {'ms':>8}  (interpreter startup {startup * 1000:.1f} ms)")
+    print('-' * 70)
+    for command in COMMANDS:
+        seconds = time_command(command, args.runs)
+        over = (seconds - startup) * 1000 > args.command_budget
+        ok = ok and not over
+        print(f"{' '.join(command):<40} {seconds * 1000:>8.1f}{'  ❌' if over else ''}")
+
+    print(f"\n{'✅ Within budget' if ok else '❌ Over budget'} "
+          f"(imports {args.import_budget:.0f} ms, commands {args.command_budget:.0f} ms + startup)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Latency Budget
+Composes the end-to-end latency of the eight request flow steps from a
+distribution per hop (DNS, TCP/TLS, Nginx, app, database), exactly by FFT
+convolution or by vectorized Monte Carlo, and reports p50/p95/p99, the step
+that dominates the tail and a per-step budget for an SLO.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'latency_budget.png')
+ENGINES = ('fft', 'montecarlo')
+PERCENTILES = (50, 95, 99)
+# Each lognormal is cut off this many sigmas above its median on the FFT grid
+TAIL_SIGMAS = 6.0
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+
+def default_hops(rtt_ms=40.0, reuse=0.6, dns_hit=0.85):
+    """Return the eight steps of the request flow as (name, label, components).
+
+    A hop's latency is a mixture of lognormals, one (weight, median ms,
+    sigma) per component; sigma 0 is a fixed delay. Network steps are
+    multiples of the client round trip: a new connection pays TCP, the
+    TLS 1.3 handshake and the request (2.5 RTT), a kept-alive one only the
+    request (0.5 RTT).
+    """
+    return [
+        ('client', '1. User enters the URL', [(1.0, 2.0, 0.3)]),
+        ('dns', '2. DNS resolves the domain', [(dns_hit, 0.5, 0.5), (1 - dns_hit, 40.0, 0.6)]),
+        ('connect', '3. TCP/TLS + request sent', [(1 - reuse, 2.5 * rtt_ms, 0.5), (reuse, 0.5 * rtt_ms, 0.5)]),
+        ('nginx', '4. Nginx receives request', [(1.0, 0.3, 0.4)]),
+        ('upstream', '5. Nginx → app server', [(1.0, 0.5, 0.5)]),
+        ('db', '6. App queries database', [(0.9, 3.0, 0.6), (0.1, 25.0, 0.8)]),
+        ('app', '7. Response generated', [(0.98, 12.0, 0.5), (0.02, 120.0, 0.4)]),
+        ('response', '8. Response sent to user', [(1.0, 0.5 * rtt_ms + 5.0, 0.6)]),
+    ]
+
+
+def _lognormal_cdf(x, median, sigma):
+    """CDF of a lognormal at x (ms); erf is only evaluated inside the ±TAIL_SIGMAS band"""
+    if sigma == 0:
+        return (x >= median).astype(float)
+    z = np.full(len(x), -np.inf)
+    positive = x > 0
+    z[positive] = (np.log(x[positive]) - np.log(median)) / sigma
+    cdf = (z >= TAIL_SIGMAS).astype(float)
+    band = np.abs(z) < TAIL_SIGMAS
+    cdf[band] = 0.5 * (1 + _erf(z[band] / math.sqrt(2)).astype(float))
+    return cdf
+
+
+def discretize(components, resolution):
+    """Return the hop's probability mass on the grid 0, resolution, 2·resolution, … (ms)"""
+    top = max(median * math.exp(TAIL_SIGMAS * sigma) for _, median, sigma in components)
+    size = int(math.ceil(top / resolution)) + 2
+    edges = (np.arange(size + 1) - 0.5) * resolution
+    pmf = np.zeros(size)
+    for weight, median, sigma in components:
+        if weight:
+            pmf += weight * np.diff(_lognormal_cdf(edges, median, sigma))
+    pmf[-1] += max(1.0 - pmf.sum(), 0.0)
+    return pmf
+
+
+def _percentile_index(cdf, p):
+    return int(min(np.searchsorted(cdf, p / 100.0), len(cdf) - 1))
+
+
+def _percentile_ms(cdf, p, resolution):
+    return round(_percentile_index(cdf, p) * resolution, 6)
+
+
+def compose_fft(hops, resolution=0.05, tail=99):
+    """Convolve the hop distributions by FFT and attribute the tail beyond p<tail> to each hop.
+
+    E[hop | total ≥ t] is exact on the grid: the rest of the request is the
+    convolution of every other hop, taken from prefix and suffix products
+    of the spectra so no spectrum is ever divided.
+    """
+    start = time.perf_counter()
+    pmfs = [discretize(components, resolution) for _, _, components in hops]
+    size = sum(len(p) for p in pmfs) - len(pmfs) + 1
+    n = 1 << int(size - 1).bit_length()
+    spectra = [np.fft.rfft(p, n) for p in pmfs]
+    prefix = [np.ones(n // 2 + 1, dtype=complex)]
+    for s in spectra:
+        prefix.append(prefix[-1] * s)
+    suffix = [np.ones(n // 2 + 1, dtype=complex)]
+    for s in reversed(spectra):
+        suffix.append(suffix[-1] * s)
+    suffix.reverse()
+
+    total = np.clip(np.fft.irfft(prefix[-1], n)[:size], 0, None)
+    total /= total.sum()
+    cdf = np.cumsum(total)
+    threshold = _percentile_index(cdf, tail)
+    tail_mass = total[threshold:].sum()
+    grid = np.arange(size) * resolution
+
+    means, tail_means, hop_percentiles = [], [], []
+    for i, pmf in enumerate(pmfs):
+        rest = np.clip(np.fft.irfft(prefix[i] * suffix[i + 1], n)[:size], 0, None)
+        rest /= rest.sum()
+        # P(rest ≥ j) for j = threshold - x; every x past the threshold is in the tail on its own
+        at_least = np.r_[1.0, 1.0 - np.cumsum(rest)[:-1]]
+        need = threshold - np.arange(len(pmf))
+        survival = np.where(need <= 0, 1.0, at_least[np.clip(need, 0, size - 1)])
+        values = grid[:len(pmf)]
+        means.append(float(values @ pmf))
+        tail_means.append(float(values @ (pmf * survival) / tail_mass))
+        hop_cdf = np.cumsum(pmf)
+        hop_percentiles.append([_percentile_ms(hop_cdf, p, resolution) for p in PERCENTILES])
+    return {'engine': 'fft', 'grid': grid, 'cdf': cdf, 'mean': float(grid @ total),
+            'percentiles': [_percentile_ms(cdf, p, resolution) for p in PERCENTILES],
+            'tail': tail, 'tail_ms': round(threshold * resolution, 6), 'tail_mean': float(grid[threshold:] @ total[threshold:] / tail_mass),
+            'hop_means': means, 'hop_tail_means': tail_means, 'hop_percentiles': hop_percentiles,
+            'samples': None, 'resolution': resolution, 'seconds': time.perf_counter() - start}
+
+
+def sample_hops(hops, samples, seed=0):
+    """Draw samples latencies (ms) per hop as a (hops, samples) float32 array"""
+    rng = np.random.default_rng(seed)
+    draws = np.empty((len(hops), samples), dtype=np.float32)
+    for i, (_, _, components) in enumerate(hops):
+        weights = np.cumsum([w for w, _, _ in components])
+        medians = np.array([m for _, m, _ in components])
+        sigmas = np.array([s for _, _, s in components])
+        pick = np.minimum(np.searchsorted(weights / weights[-1], rng.random(samples), 'right'), len(components) - 1)
+        draws[i] = medians[pick] * np.exp(sigmas[pick] * rng.standard_normal(samples))
+    return draws
+
+
+def compose_montecarlo(hops, samples=1000000, tail=99, seed=0):
+    """Sum sampled hop latencies and attribute the tail beyond p<tail> from the samples in it"""
+    start = time.perf_counter()
+    draws = sample_hops(hops, samples, seed)
+    total = draws.sum(axis=0, dtype=np.float64)
+    threshold = float(np.percentile(total, tail))
+    in_tail = total >= threshold
+    ordered = np.sort(total)
+    step = max(len(ordered) // 4000, 1)
+    return {'engine': 'montecarlo', 'grid': ordered[::step], 'cdf': np.arange(1, len(ordered) + 1)[::step] / len(ordered),
+            'mean': float(total.mean()), 'percentiles': [float(v) for v in np.percentile(total, PERCENTILES)],
+            'tail': tail, 'tail_ms': threshold, 'tail_mean': float(total[in_tail].mean()),
+            'hop_means': [float(v) for v in draws.mean(axis=1, dtype=np.float64)],
+            'hop_tail_means': [float(v) for v in draws[:, in_tail].mean(axis=1, dtype=np.float64)],
+            'hop_percentiles': np.percentile(draws, PERCENTILES, axis=1).T.tolist(),
+            'samples': samples, 'resolution': None, 'seconds': time.perf_counter() - start}
+
+
+def compose(hops, engine='fft', resolution=0.05, samples=1000000, tail=99, seed=0):
+    """Compose the hops with the chosen engine"""
+    if engine == 'fft':
+        return compose_fft(hops, resolution, tail)
+    return compose_montecarlo(hops, samples, tail, seed)
+
+
+def summarize(result, hops, slo=300.0):
+    """Return end-to-end percentiles, the SLO attainment and per-step tail shares and budgets.
+
+    A step's tail excess is how much longer it takes in the slowest
+    requests than on average; the excesses add up to the whole tail, and
+    the largest one marks the step to fix first. The SLO is split between
+    steps in proportion to their mean time in the tail requests.
+    """
+    excess = np.maximum(np.array(result['hop_tail_means']) - np.array(result['hop_means']), 0)
+    shares = excess / max(excess.sum(), 1e-12)
+    tail_total = max(sum(result['hop_tail_means']), 1e-12)
+    steps = {}
+    for i, (name, label, _) in enumerate(hops):
+        steps[name] = {
+            'label': label,
+            'mean_ms': result['hop_means'][i],
+            'percentiles_ms': {f"p{p}": float(v) for p, v in zip(PERCENTILES, result['hop_percentiles'][i])},
+            'tail_mean_ms': result['hop_tail_means'][i],
+            'tail_share': float(shares[i]),
+            'budget_ms': slo * result['hop_tail_means'][i] / tail_total,
+        }
+    return {
+        'engine': result['engine'],
+        'mean_ms': result['mean'],
+        'percentiles_ms': {f"p{p}": float(v) for p, v in zip(PERCENTILES, result['percentiles'])},
+        'tail': result['tail'],
+        'tail_ms': result['tail_ms'],
+        'tail_mean_ms': result['tail_mean'],
+        'slo_ms': slo,
+        'within_slo': float(np.interp(slo, result['grid'], result['cdf'], left=0.0, right=1.0)),
+        'dominant': hops[int(np.argmax(shares))][0],
+        'steps': steps,
+        'seconds': result['seconds'],
+    }
+
+
+def print_report(summary):
+    """Print the end-to-end percentiles and the per-step table"""
+    p = summary['percentiles_ms']
+    print(f"\n⏱️ End to end ({summary['engine']}, {summary['seconds'] * 1000:.0f} ms): mean {summary['mean_ms']:.1f} ms, "
+          f"p50 {p['p50']:.1f}, p95 {p['p95']:.1f}, p99 {p['p99']:.1f} ms")
+    print(f"   {summary['within_slo']:.2%} of requests within the {summary['slo_ms']:g} ms SLO; "
+          f"beyond p{summary['tail']:g} ({summary['tail_ms']:.1f} ms) requests average {summary['tail_mean_ms']:.1f} ms")
+    print(f"{'Step':<28} {'Mean':>7} {'p50':>7} {'p99':>7} {'In tail':>8} {'Share':>6} {'Budget':>7}")
+    print('-' * 76)
+    for name, s in summary['steps'].items():
+        mark = '  ← dominates the tail' if name == summary['dominant'] else ''
+        print(f"{s['label']:<28} {s['mean_ms']:>7.1f} {s['percentiles_ms']['p50']:>7.1f} "
+              f"{s['percentiles_ms']['p99']:>7.1f} {s['tail_mean_ms']:>8.1f} {s['tail_share']:>6.1%} "
+              f"{s['budget_ms']:>7.1f}{mark}")
+
+
+def create_latency_diagram(result, summary, title=None):
+    """Draw the step waterfall and the end-to-end tail beside the request flow diagram"""
+    import matplotlib.pyplot as plt
+    from diagram_generator import create_request_flow_diagram
+    from diagram_panels import add_side_panel
+
+    fig = create_request_flow_diagram()
+    flow_ax = fig.axes[0]
+    names = list(summary['steps'])
+    cmap = plt.get_cmap('Reds')
+    # Same step positions as create_request_flow_diagram
+    for name, y in zip(names, np.linspace(6.5, 1, len(names))):
+        s = summary['steps'][name]
+        dominant = name == summary['dominant']
+        flow_ax.text(9.4, y, f"{s['mean_ms']:.1f} / {s['percentiles_ms']['p99']:.0f} ms", fontsize=8, ha='right',
+                     va='center', color='darkred' if dominant else 'dimgray',
+                     fontweight='bold' if dominant else 'normal')
+    flow_ax.text(9.4, 6.78, 'mean / p99', fontsize=8, ha='right', color='dimgray')
+
+    p = summary['percentiles_ms']
+    waterfall_ax, tail_ax = add_side_panel(
+        fig, rows=2, width_ratio=0.9, pad=0.08, hspace=0.5,
+        title=title or f"Latency Budget: p50 {p['p50']:.0f} ms, p95 {p['p95']:.0f} ms, p99 {p['p99']:.0f} ms "
+                       f"({summary['steps'][summary['dominant']]['label'][3:]} dominates the tail)",
+        fontsize=13, fontweight='bold', y=0.99)
+    means = np.array([summary['steps'][n]['mean_ms'] for n in names])
+    tails = np.array([summary['steps'][n]['tail_mean_ms'] for n in names])
+    rows = np.arange(len(names))
+    colors = [cmap(0.25 + 0.75 * summary['steps'][n]['tail_share']) for n in names]
+    edges = ['red' if n == summary['dominant'] else 'black' for n in names]
+    waterfall_ax.barh(rows - 0.2, means, left=np.cumsum(means) - means, height=0.35, color='#90CAF9',
+                      edgecolor='black', linewidth=0.5, label='mean request')
+    waterfall_ax.barh(rows + 0.2, tails, left=np.cumsum(tails) - tails, height=0.35, color=colors,
+                      edgecolor=edges, linewidth=[2 if n == summary['dominant'] else 0.5 for n in names],
+                      label=f"requests beyond p{summary['tail']:g}")
+    for i, n in enumerate(names):
+        waterfall_ax.text(tails.sum() * 1.01, i + 0.2, f"{summary['steps'][n]['tail_share']:.0%}", va='center',
+                          fontsize=8, fontweight='bold' if n == summary['dominant'] else 'normal')
+    for key, style in (('p50', ':'), ('p95', '--'), ('p99', '-')):
+        waterfall_ax.axvline(p[key], color='gray', linestyle=style, linewidth=1)
+        waterfall_ax.text(p[key], -0.9, key, fontsize=7, ha='center', color='gray')
+    waterfall_ax.set_yticks(rows)
+    waterfall_ax.set_yticklabels([f"{i + 1}. {n}" for i, n in enumerate(names)], fontsize=8)
+    waterfall_ax.set_ylim(len(names) - 0.4, -1.1)
+    waterfall_ax.set_xlim(0, tails.sum() * 1.12)
+    waterfall_ax.set_xlabel('Cumulative latency (ms); label: share of the tail excess', fontsize=9)
+    waterfall_ax.set_title('Latency Waterfall per Step', fontsize=11, fontweight='bold')
+    waterfall_ax.grid(axis='x', alpha=0.3)
+    waterfall_ax.legend(fontsize=8, loc='upper center', bbox_to_anchor=(0.5, -0.2), ncol=2, frameon=False)
+
+    slower = np.clip(1 - result['cdf'], 1e-6, None)
+    tail_ax.plot(result['grid'], slower, color='#2196F3', linewidth=2)
+    for key, style in (('p50', ':'), ('p95', '--'), ('p99', '-')):
+        tail_ax.axvline(p[key], color='gray', linestyle=style, linewidth=1, label=f"{key} {p[key]:.0f} ms")
+    tail_ax.axvline(summary['slo_ms'], color='red', linewidth=2,
+                    label=f"SLO {summary['slo_ms']:g} ms: {summary['within_slo']:.2%} within")
+    tail_ax.set_yscale('log')
+    tail_ax.set_ylim(1e-4, 1.2)
+    tail_ax.set_xlim(0, max(summary['slo_ms'], p['p99']) * 1.5)
+    tail_ax.set_xlabel('End-to-end latency (ms)', fontsize=9)
+    tail_ax.set_ylabel('Requests slower', fontsize=9)
+    tail_ax.set_title('End-to-End Tail', fontsize=11, fontweight='bold')
+    tail_ax.grid(alpha=0.3, which='both')
+    tail_ax.legend(fontsize=8, loc='upper right')
+    return fig
+
+
+def benchmark(samples, resolution=0.05, seed=0):
+    """Time both engines on the default hops and check they agree"""
+    hops = default_hops()
+    summaries = {}
+    for engine in ENGINES:
+        result = compose(hops, engine, resolution, samples, seed=seed)
+        summaries[engine] = summarize(result, hops)
+        p = summaries[engine]['percentiles_ms']
+        print(f"⏱️ {engine:<10} {result['seconds']:6.3f}s  p50 {p['p50']:7.2f}  p95 {p['p95']:7.2f}  "
+              f"p99 {p['p99']:7.2f} ms, tail dominated by {summaries[engine]['dominant']}")
+    fft, mc = summaries['fft'], summaries['montecarlo']
+    # Monte Carlo percentiles carry sampling error, the grid half a step per hop
+    close = all(abs(fft['percentiles_ms'][k] - v) <= 0.02 * v + len(hops) * resolution
+                for k, v in mc['percentiles_ms'].items())
+    shares = max(abs(fft['steps'][n]['tail_share'] - mc['steps'][n]['tail_share']) for n in fft['steps'])
+    same = close and shares < 0.03 and fft['dominant'] == mc['dominant']
+    print(f"   {samples:,} samples, {resolution:g} ms grid; tail shares differ by at most {shares:.3f}")
+    print(f"   Engines agree: {'yes' if same else 'NO'}")
+    return same
+
+
+def _hop(value):
+    """Parse 'db=5' or 'db=5:0.8' into ('db', median ms, sigma)"""
+    name, sep, rest = value.partition('=')
+    median, _, sigma = rest.partition(':')
+    try:
+        return name.strip(), float(median), float(sigma or 0.5)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected name=median_ms[:sigma]: {value}") from None
+
+
+def main(argv=None):
+    """Compose the request flow latency, print the budget and draw it beside the flow diagram"""
+    names = [name for name, _, _ in default_hops()]
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engine', choices=ENGINES, default='fft', help='composition engine (default: fft)')
+    parser.add_argument('--resolution', type=float, default=0.05, help='FFT grid step (default: 0.05 ms)')
+    parser.add_argument('--samples', type=int, default=1000000, help='Monte Carlo samples (default: 1,000,000)')
+    parser.add_argument('--rtt', type=float, default=40.0, help='client round trip to the server (default: 40 ms)')
+    parser.add_argument('--reuse', type=float, default=0.6,
+                        help='share of requests on a kept-alive connection (default: 0.6)')
+    parser.add_argument('--dns-hit', type=float, default=0.85, help='share of DNS lookups answered from cache (default: 0.85)')
+    parser.add_argument('--hop', type=_hop, action='append', default=[],
+                        help=f"replace a step by one lognormal, name=median_ms[:sigma] ({', '.join(names)})")
+    parser.add_argument('--slo', type=float, default=300.0, help='end-to-end latency objective (default: 300 ms)')
+    parser.add_argument('--tail', type=float, default=99.0, help='percentile whose tail is attributed (default: 99)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/latency_budget.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    parser.add_argument('--benchmark', type=int, metavar='SAMPLES', help='time both engines and compare them')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark, args.resolution, args.seed)
+    if min(args.resolution, args.samples, args.rtt, args.slo) <= 0:
+        parser.error('--resolution, --samples, --rtt and --slo must be positive')
+    if not (0 <= args.reuse <= 1 and 0 <= args.dns_hit <= 1 and 0 < args.tail < 100):
+        parser.error('--reuse and --dns-hit must be within 0-1 and --tail within 0-100')
+    hops = default_hops(args.rtt, args.reuse, args.dns_hit)
+    for name, median, sigma in args.hop:
+        if name not in names or median <= 0 or sigma < 0:
+            parser.error(f"--hop needs a step ({', '.join(names)}), a positive median and sigma ≥ 0: {name}")
+        i = names.index(name)
+        hops[i] = (name, hops[i][1], [(1.0, median, sigma)])
+
+    result = compose(hops, args.engine, args.resolution, args.samples, args.tail, args.seed)
+    summary = summarize(result, hops, args.slo)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return True
+    print_report(summary)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_latency_diagram(result, summary)
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Load-Balancing Simulator
+Replays synthetic or recorded requests against N backends under round robin,
+weighted, least-connections and consistent-hash policies with NumPy arrays,
+and reports per-backend utilization and queueing latency percentiles.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'lb_simulation.png')
+
+# HAProxy 'balance' keywords and the policy each one is simulated with
+POLICIES = ('roundrobin', 'leastconn', 'hash')
+# HAProxy's roundrobin and static-rr are both weighted; 'weighted' is kept for older command lines
+POLICY_ALIASES = {'static-rr': 'roundrobin', 'weighted': 'roundrobin', 'source': 'hash', 'uri': 'hash'}
+# The two web servers in haproxy_config.cfg
+DEFAULT_BACKENDS = ['web1 10.0.0.2', 'web2 10.0.0.3']
+PERCENTILES = (50, 95, 99, 99.9)
+HASH_REPLICAS = 160
+
+
+def synthetic_workload(requests, rate, service_ms, distribution='exp', sigma=1.0,
+                       clients=10000, skew=0.8, seed=0):
+    """Return {'arrivals', 'services', 'clients'} arrays for a synthetic run.
+
+    Arrivals are a Poisson process at rate requests/s, service times are
+    exponential or lognormal with mean service_ms, and client ids follow a
+    Zipf law with exponent skew over the client population, so a few heavy
+    clients dominate, as real source-IP traffic does.
+    """
+    rng = np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, requests))
+    mean = service_ms / 1000.0
+    if distribution == 'lognormal':
+        # Pick mu so the lognormal mean is exactly service_ms
+        services = rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, requests)
+    else:
+        services = rng.exponential(mean, requests)
+    popularity = 1.0 / np.arange(1, clients + 1) ** skew
+    client_ids = rng.choice(clients, requests, p=popularity / popularity.sum())
+    return {'arrivals': arrivals, 'services': services, 'clients': client_ids.astype(np.uint64)}
+
+
+def load_trace(path):
+    """Load a recorded CSV of arrival seconds, service milliseconds and an optional client id"""
+    with open(path, encoding='utf-8') as trace:
+        header = trace.readline()
+    skip = 1 if any(c.isalpha() for c in header) else 0
+    data = np.loadtxt(path, delimiter=',', skiprows=skip, ndmin=2)
+    order = np.argsort(data[:, 0], kind='stable')
+    data = data[order]
+    clients = data[:, 2] if data.shape[1] > 2 else np.arange(len(data))
+    return {'arrivals': data[:, 0] - data[0, 0], 'services': data[:, 1] / 1000.0,
+            'clients': clients.astype(np.uint64)}
+
+
+def mix64(values):
+    """SplitMix64 finalizer: a fast, well-spread 64-bit hash of integer arrays"""
+    x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def assign_roundrobin(requests, weights):
+    """Backend index per request under smooth weighted round robin.
+
+    Backend j gets weight_j slots per cycle placed at (k + 0.5) / weight_j,
+    so one cycle interleaves the backends evenly instead of sending each
+    backend's whole share in a burst. Equal weights give plain round robin.
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    weights = weights // np.gcd.reduce(weights)
+    owners = np.repeat(np.arange(len(weights)), weights)
+    slots = (np.arange(len(owners)) - np.repeat(np.cumsum(weights) - weights, weights) + 0.5) / weights[owners]
+    cycle = owners[np.lexsort((owners, slots))]
+    return np.resize(cycle, requests)
+
+
+def assign_hash(clients, weights, replicas=HASH_REPLICAS):
+    """Backend index per request on a consistent-hash ring keyed by client.
+
+    Each backend owns replicas * weight / mean(weight) points on the ring
+    (none at weight 0); a
+    request goes to the first point at or after its client's hash.
+    """
+    weights = np.asarray(weights, dtype=float)
+    points = np.where(weights > 0, np.maximum(1, np.round(replicas * weights / weights.mean())), 0).astype(np.int64)
+    owners = np.repeat(np.arange(len(weights)), points)
+    ring = mix64((owners.astype(np.uint64) << np.uint64(32)) + np.arange(len(owners), dtype=np.uint64))
+    order = np.argsort(ring)
+    ring, owners = ring[order], owners[order]
+    slot = np.searchsorted(ring, mix64(clients)) % len(ring)
+    return owners[slot]
+
+
+def lindley_waits(backend, arrivals, services):
+    """Return each request's queueing delay at single-server FCFS backends.
+
+    Uses the closed form of the Lindley recursion,
+    W[n] = Y[n] - min(0, min(Y[0..n])) with Y the running sum of
+    (service - interarrival). It is evaluated for every backend at once.
+    Requests are grouped by backend, and each group's running min is kept
+    apart by offsetting it below the previous groups.
+    """
+    if len(backend) == 0:
+        return np.zeros(0)
+    order = np.argsort(backend, kind='stable')
+    b, a, s = backend[order], arrivals[order], services[order]
+    starts = np.empty(len(b), dtype=bool)
+    starts[0] = True
+    starts[1:] = b[1:] != b[:-1]
+    group = np.cumsum(starts) - 1
+
+    increments = np.zeros(len(b))
+    increments[1:] = s[:-1] - np.diff(a)
+    increments[starts] = 0.0
+    y = np.cumsum(increments)
+    y -= y[starts][group]
+
+    spread = (y.max() - y.min() + 1.0) * 2
+    running_min = np.minimum.accumulate(y - group * spread) + group * spread
+
+    waits = np.empty(len(b))
+    waits[order] = y - np.minimum(running_min, 0.0)
+    return waits
+
+
+def simulate_leastconn(arrivals, services, speeds, weights):
+    """Return (backend, waits) under weighted least connections.
+
+    Like HAProxy, each request goes to the backend with the lowest
+    (connections + 1) / weight, and ties rotate round robin: the scan
+    starts after the last backend picked. Weight 0 servers (drained) are
+    never picked. Every choice depends on
+    the completions of all earlier ones, so this is the one policy solved by
+    an event loop rather than array operations: each backend keeps a deque
+    of its open connections' departure times (non-decreasing under FCFS), so
+    a request costs O(backends) amortized with no sorting or heap.
+    """
+    from collections import deque
+
+    count = len(speeds)
+    eligible = [j for j in range(count) if weights[j] > 0]
+    inverse_weights = [1.0 / w if w > 0 else 0.0 for w in weights]
+    speeds = [float(v) for v in speeds]
+    open_until = [deque() for _ in range(count)]
+    free_at = [0.0] * count
+    backend = np.empty(len(arrivals), dtype=np.int64)
+    waits = np.empty(len(arrivals))
+    # The scan covers eligible[rotor:] then wraps; position maps a backend to its index in eligible
+    order = eligible * 2
+    position = {j: k for k, j in enumerate(eligible)}
+    rotor = 0
+    for i, (now, service) in enumerate(zip(arrivals.tolist(), services.tolist())):
+        best, best_load = 0, float('inf')
+        for j in order[rotor:rotor + len(eligible)]:
+            connections = open_until[j]
+            while connections and connections[0] <= now:
+                connections.popleft()
+            load = (len(connections) + 1) * inverse_weights[j]
+            if load < best_load:
+                best, best_load = j, load
+        start = max(now, free_at[best])
+        free_at[best] = start + service / speeds[best]
+        open_until[best].append(free_at[best])
+        backend[i], waits[i] = best, start - now
+        rotor = position[best] + 1 if position[best] + 1 < len(eligible) else 0
+    return backend, waits
+
+
+def simulate(workload, policy, weights, speeds):
+    """Run one policy over a workload and return its raw result arrays"""
+    policy = POLICY_ALIASES.get(policy, policy)
+    if not any(w > 0 for w in weights):
+        raise ValueError('every server has weight 0, so there is nothing to balance across')
+    arrivals, services = workload['arrivals'], workload['services']
+    speeds = np.asarray(speeds, dtype=float)
+    start = time.perf_counter()
+    if policy == 'leastconn':
+        backend, waits = simulate_leastconn(arrivals, services, speeds, weights)
+    else:
+        if policy == 'roundrobin':
+            backend = assign_roundrobin(len(arrivals), weights)
+        elif policy == 'hash':
+            backend = assign_hash(workload['clients'], weights)
+        else:
+            raise ValueError(f"unknown policy {policy!r} (choose from {', '.join(POLICIES)})")
+        waits = lindley_waits(backend, arrivals, services / speeds[backend])
+    return {
+        'policy': policy,
+        'backend': backend,
+        'waits': waits,
+        'services': services / speeds[backend],
+        'span': arrivals[-1] - arrivals[0] if len(arrivals) > 1 else 1.0,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def summarize(result, count):
+    """Return per-backend and overall statistics for a simulation result"""
+    backend, waits = result['backend'], result['waits']
+    requests = np.bincount(backend, minlength=count)
+    busy = np.bincount(backend, weights=result['services'], minlength=count)
+
+    # Per-backend percentiles from one sort: waits ordered within each backend
+    order = np.lexsort((waits, backend))
+    offsets = np.cumsum(requests) - requests
+    per_backend = {}
+    for q in PERCENTILES:
+        index = offsets + np.floor(q / 100 * np.maximum(requests - 1, 0)).astype(np.int64)
+        per_backend[q] = np.where(requests > 0, waits[order][np.minimum(index, len(waits) - 1)], 0.0)
+
+    return {
+        'policy': result['policy'],
+        'requests': requests,
+        'share': requests / max(1, len(backend)),
+        'utilization': busy / result['span'],
+        'mean_wait': np.bincount(backend, weights=waits, minlength=count) / np.maximum(requests, 1),
+        'percentiles': per_backend,
+        'overall': {q: float(np.percentile(waits, q)) for q in PERCENTILES},
+        'response_p99': float(np.percentile(waits + result['services'], 99)),
+        'seconds': result['seconds'],
+    }
+
+
+def print_report(summary, names):
+    """Print one policy's per-backend table and overall percentiles"""
+    print(f"\n⚖️ {summary['policy']} ({summary['seconds']:.2f}s)")
+    print(f"{'Backend':<22} {'Requests':>10} {'Share':>7} {'Util':>7} {'Mean ms':>8} "
+          + ' '.join(f"{f'p{q:g} ms':>9}" for q in PERCENTILES))
+    print('-' * (60 + 10 * len(PERCENTILES)))
+    for j, name in enumerate(names):
+        flag = '  ❌ overloaded' if summary['utilization'][j] >= 1 else ''
+        print(f"{name:<22} {summary['requests'][j]:>10} {summary['share'][j]:>7.1%} "
+              f"{summary['utilization'][j]:>7.1%} {summary['mean_wait'][j] * 1000:>8.2f} "
+              + ' '.join(f"{summary['percentiles'][q][j] * 1000:>9.2f}" for q in PERCENTILES) + flag)
+    print(f"{'all backends':<22} {summary['requests'].sum():>10} {'':>7} {'':>7} {'':>8} "
+          + ' '.join(f"{summary['overall'][q] * 1000:>9.2f}" for q in PERCENTILES))
+    print(f"   p99 response time (queueing + service): {summary['response_p99'] * 1000:.1f} ms")
+
+
+def create_distribution_diagram(summaries, names, title=None):
+    """Plot per-backend share/utilization and queueing percentiles for each policy"""
+    import matplotlib.pyplot as plt
+
+    fig, (load_ax, latency_ax) = plt.subplots(1, 2, figsize=(16, 7))
+    colors = ['#2196F3', '#FF9800', '#4CAF50', '#9C27B0']
+    width = 0.8 / len(summaries)
+    x = np.arange(len(names))
+
+    for i, summary in enumerate(summaries):
+        load_ax.bar(x + (i - (len(summaries) - 1) / 2) * width, summary['utilization'] * 100, width,
+                    color=colors[i % len(colors)], label=summary['policy'], edgecolor='black', linewidth=0.5)
+    load_ax.axhline(100, color='red', linestyle='--', linewidth=1.5, label='saturation')
+    load_ax.set_xticks(x)
+    load_ax.set_xticklabels([name.replace(' ', '\n', 1) for name in names] if len(names) <= 12
+                            else [''] * len(names), fontsize=9)
+    load_ax.set_ylabel('Utilization (%)', fontsize=11)
+    load_ax.set_title('Per-Backend Utilization', fontsize=13, fontweight='bold')
+    load_ax.legend(fontsize=9)
+    load_ax.grid(axis='y', alpha=0.3)
+
+    q = np.arange(len(PERCENTILES))
+    for i, summary in enumerate(summaries):
+        values = [summary['overall'][p] * 1000 for p in PERCENTILES]
+        latency_ax.bar(q + (i - (len(summaries) - 1) / 2) * width, values, width,
+                       color=colors[i % len(colors)], label=summary['policy'], edgecolor='black', linewidth=0.5)
+    latency_ax.set_xticks(q)
+    latency_ax.set_xticklabels([f"p{p:g}" for p in PERCENTILES])
+    latency_ax.set_ylabel('Queueing delay (ms)', fontsize=11)
+    latency_ax.set_title('Queueing Latency Percentiles', fontsize=13, fontweight='bold')
+    latency_ax.legend(fontsize=9)
+    latency_ax.grid(axis='y', alpha=0.3)
+
+    fig.suptitle(title or 'Load-Balancing Simulation', fontsize=16, fontweight='bold')
+    plt.tight_layout()
+    return fig
+
+
+def _numbers(value, cast=float):
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    """Simulate load-balancing policies and render their distribution"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-p', '--policy', default='roundrobin',
+                        help=f"comma-separated policies or 'all': {', '.join(POLICIES)} "
+                             f"(HAProxy aliases: {', '.join(POLICY_ALIASES)}; default: roundrobin)")
+    parser.add_argument('-n', '--requests', type=int, default=1_000_000,
+                        help='synthetic requests to replay (default: 1,000,000)')
+    parser.add_argument('-b', '--backends', type=int, help='number of backends (default: the 2 in haproxy_config.cfg)')
+    parser.add_argument('--config', help='take backends, weights and policy from an HAProxy config')
+    parser.add_argument('--backend', help='backend (or listen) section in --config (default: the first with servers)')
+    parser.add_argument('-w', '--weights', type=lambda v: _numbers(v, int),
+                        help='comma-separated server weights, e.g. 100,150')
+    parser.add_argument('--speeds', type=_numbers, help='relative backend speeds (default: all 1)')
+    parser.add_argument('--rate', type=float, help='arrivals per second (default: 70%% of pool capacity)')
+    parser.add_argument('--service-ms', type=float, default=20.0, help='mean service time (default: 20 ms)')
+    parser.add_argument('--distribution', choices=('exp', 'lognormal'), default='exp',
+                        help='service time distribution (default: exp)')
+    parser.add_argument('--clients', type=int, default=10000, help='distinct clients for hashing (default: 10000)')
+    parser.add_argument('--skew', type=float, default=0.8,
+                        help='Zipf exponent of client popularity; 0 is uniform (default: 0.8)')
+    parser.add_argument('--trace', help='recorded CSV: arrival_s,service_ms[,client_id]')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/lb_simulation.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    args = parser.parse_args(argv)
+
+    names, config_weights = None, None
+    if args.config:
+        from haproxy_parser import load_topology
+        try:
+            topology = load_topology([args.config])
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        proxies = {**topology['listens'], **topology['backends']}
+        proxy = proxies.get(args.backend) if args.backend else next(
+            (p for p in proxies.values() if p['servers']), None)
+        if proxy is None or not proxy['servers']:
+            parser.error(f"{args.config}: no backend {args.backend or 'with servers'}")
+        servers = [s for s in proxy['servers'] if not s['backup'] and not s['disabled']]
+        names = [f"{s['name']} {s['address']}" for s in servers]
+        config_weights = [s['weight'] for s in servers]
+        if args.policy == 'roundrobin':
+            args.policy = proxy['balance'].split()[0]
+
+    count = args.backends or len(names or args.weights or args.speeds or DEFAULT_BACKENDS)
+    if names is None or len(names) != count:
+        names = DEFAULT_BACKENDS[:count] if count <= len(DEFAULT_BACKENDS) else [f"web{j + 1}" for j in range(count)]
+        config_weights = None
+    weights = args.weights or config_weights or [1] * count
+    speeds = args.speeds or [1.0] * count
+    if not len(weights) == len(speeds) == count:
+        parser.error('--weights and --speeds need one value per backend')
+    if not any(w > 0 for w in weights):
+        parser.error('every server has weight 0; at least one needs a positive weight')
+    policies = POLICIES if args.policy == 'all' else [p.strip() for p in args.policy.split(',')]
+    unknown = [p for p in policies if POLICY_ALIASES.get(p, p) not in POLICIES]
+    if unknown:
+        parser.error(f"unknown policy: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    if args.trace:
+        workload = load_trace(args.trace)
+    else:
+        rate = args.rate or 0.7 * sum(speeds) / (args.service_ms / 1000)
+        workload = synthetic_workload(args.requests, rate, args.service_ms, args.distribution,
+                                      clients=args.clients, skew=args.skew, seed=args.seed)
+    print(f"🎲 {len(workload['arrivals']):,} requests over {workload['arrivals'][-1]:.0f}s "
+          f"({len(workload['arrivals']) / max(workload['arrivals'][-1], 1e-9):.0f} req/s) "
+          f"against {count} backend(s) in {time.perf_counter() - start:.2f}s")
+
+    summaries = []
+    for policy in policies:
+        summaries.append(summarize(simulate(workload, policy, weights, speeds), count))
+        print_report(summaries[-1], names)
+
+    if not args.no_diagram:
+        from headless import use_headless
+        use_headless()
+        import matplotlib.pyplot as plt
+        from vector_output import save_figure
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        fig = create_distribution_diagram(
+            summaries, names, f"Load-Balancing Simulation: {len(workload['arrivals']):,} Requests, "
+                              f"{count} Backends")
+        save_figure(fig, args.output, dpi=args.dpi)
+        plt.close(fig)
+        print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,769 @@
+#!/usr/bin/env python3
+"""
+Access Log Analytics
+Streams HAProxy and Nginx access logs (plain or gzip) in large chunks, parses
+whole chunks at once with NumPy byte operations, and reports QPS, status-code
+mix and latency percentiles per backend and QPS and unique clients per host.
+Logs are sharded across a process pool and the mergeable per-shard summaries
+combined, in memory independent of the number of lines.
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from sketches import HyperLogLog, LatencySketch
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'monitoring_live.png')
+CHUNK_BYTES = 16 * 1024 * 1024
+# Plain files are split for workers into ranges of at least this size
+SHARD_BYTES = 64 * 1024 * 1024
+# Per-second counts cover at most this long a time range (4 bytes per second)
+MAX_SPAN_S = 366 * 86400
+PERCENTILES = (50, 95, 99)
+MAX_STATUS = 600
+# Backend names are told apart by their length and first TOKEN_BYTES bytes
+TOKEN_BYTES = 32
+# Longest client address looked for (an IPv6 address is at most 39 characters)
+CLIENT_BYTES = 48
+NUMBER_WIDTH = 8
+PAD_BYTES = 160
+# HAProxy's frontend, backend/server, timers and status must fit in this many bytes
+FIELDS_BYTES = 96
+FORMATS = ('nginx', 'haproxy')
+HAPROXY_DATE = re.compile(rb'\[\d\d/\w{3}/\d{4}:\d\d:\d\d:\d\d\.\d{3}\] ')
+
+MONTHS = (b'Jan', b'Feb', b'Mar', b'Apr', b'May', b'Jun', b'Jul', b'Aug', b'Sep', b'Oct', b'Nov', b'Dec')
+_MONTH_KEYS = np.array([m[0] << 16 | m[1] << 8 | m[2] for m in MONTHS], dtype=np.int64)
+_MONTH_ORDER = np.argsort(_MONTH_KEYS)
+_POWERS = 10.0 ** np.arange(-NUMBER_WIDTH, NUMBER_WIDTH)
+_DATE_MASK = np.array([255] * 20 + [0] * 4, dtype=np.uint8).view(np.uint64)
+
+
+def read_chunks(path, chunk_bytes=CHUNK_BYTES, start=0, stop=None):
+    """Yield a log file as uint8 arrays that each end on a line boundary.
+
+    Plain files are memory-mapped, gzip files decompressed a block at a time,
+    so memory stays at about one chunk whatever the file size. For plain
+    files, start and stop select the lines that begin in that byte range.
+    """
+    with open(path, 'rb') as log:
+        gzipped = log.read(2) == b'\x1f\x8b'
+    if gzipped:
+        if start or stop is not None:
+            raise ValueError(f'{path}: a gzip file can only be read whole')
+        with gzip.open(path, 'rb') as stream:
+            tail = b''
+            while True:
+                block = stream.read(chunk_bytes)
+                if not block:
+                    break
+                block = tail + block
+                cut = block.rfind(b'\n') + 1
+                tail = block[cut:]
+                if cut:
+                    yield np.frombuffer(block, dtype=np.uint8, count=cut)
+        if tail:
+            yield np.frombuffer(tail + b'\n', dtype=np.uint8)
+        return
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as log, mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        size = len(mapped)
+        if start:
+            start = mapped.find(b'\n', start - 1) + 1 or size
+        if stop is not None and stop < size:
+            size = mapped.find(b'\n', stop - 1) + 1 or size
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                # Cut after the last newline, or after the next one for a line longer than a chunk
+                cut = mapped.rfind(b'\n', start, end)
+                cut = cut if cut >= 0 else mapped.find(b'\n', end)
+                end = cut + 1 if cut >= 0 else size
+            block = mapped[start:end]
+            yield np.frombuffer(block if block.endswith(b'\n') else block + b'\n', dtype=np.uint8)
+            start = end
+
+
+def detect_format(chunk):
+    """Return 'haproxy' if the first line has HAProxy's millisecond accept date, else 'nginx'"""
+    first = bytes(chunk[:4096]).split(b'\n', 1)[0]
+    return 'haproxy' if HAPROXY_DATE.search(first) else 'nginx'
+
+
+def _padded(a):
+    """Append zeros so fixed-width reads near the end of a chunk stay in bounds"""
+    return np.concatenate([a, np.zeros(PAD_BYTES, dtype=np.uint8)])
+
+
+def _gather(a, positions, width):
+    """Return the width bytes starting at each position as a (rows, width) array.
+
+    Rows are copied out of a strided view, which is several times faster than
+    indexing with a (rows, width) array of positions. a must be _padded.
+    """
+    return np.lib.stride_tricks.sliding_window_view(a, width)[np.clip(positions, 0, len(a) - width)]
+
+
+def _fixed_int(a, positions, width):
+    """Parse fixed-width decimal integers; return (values, all-digits mask)"""
+    positions = np.clip(positions, 0, len(a) - width)
+    value = np.zeros(len(positions), dtype=np.int64)
+    ok = np.ones(len(positions), dtype=bool)
+    for i in range(width):
+        # Bytes below '0' wrap around in uint8, so one comparison checks both ends
+        digit = a[positions + i] - np.uint8(48)
+        ok &= digit <= 9
+        value = value * 10 + digit
+    return value, ok
+
+
+def _trailing_int(a, ends):
+    """Parse the unsigned integer that ends right before each position.
+
+    Returns (values, starts); rows with no digits there give NaN and their
+    start is the end position itself.
+    """
+    columns = np.ascontiguousarray(_gather(a, ends - NUMBER_WIDTH, NUMBER_WIDTH)[:, ::-1].T)
+    digit = np.logical_and.accumulate((columns >= 48) & (columns <= 57), axis=0)
+    value = ((columns - 48.0) * digit * _POWERS[NUMBER_WIDTH:, None]).sum(axis=0)
+    widths = digit.sum(axis=0)
+    return np.where(widths > 0, value, np.nan), ends - widths
+
+
+def _decimal(window):
+    """Parse the number at the start of each window row, e.g. 0.067 or 109.
+
+    Returns (values, widths); rows that do not start with a digit, such as
+    HAProxy's -1 for aborted timers, give NaN. The window is transposed first
+    so the per-column loop reads contiguous memory.
+    """
+    columns = np.ascontiguousarray(window.T)
+    digit = (columns >= 48) & (columns <= 57)
+    dot = columns == 46
+    inside = np.logical_and.accumulate(digit | dot, axis=0)
+    value = np.zeros(columns.shape[1])
+    fraction = np.zeros(columns.shape[1], dtype=np.int64)
+    after_dot = np.zeros(columns.shape[1], dtype=bool)
+    for j in range(columns.shape[0]):
+        step = inside[j] & digit[j]
+        value = np.where(step, value * 10 + (columns[j] - 48.0), value)
+        fraction += step & after_dot
+        after_dot |= inside[j] & dot[j]
+    return np.where(digit[0], value * _POWERS[NUMBER_WIDTH - fraction], np.nan), inside.sum(axis=0)
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for proleptic Gregorian dates (element-wise)"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _epoch_seconds(a, positions):
+    """Parse dd/Mon/yyyy:HH:MM:SS at each position into Unix seconds; return (seconds, valid mask).
+
+    Log lines arrive in time order, so only rows whose timestamp differs from
+    the previous row are parsed and the rest reuse that result.
+    """
+    window = _gather(a, positions, 24)
+    changed = np.ones(len(window), dtype=bool)
+    # Compare the 20 date bytes only; HAProxy's milliseconds follow them
+    words = window.view(np.uint64) & _DATE_MASK
+    changed[1:] = (words[1:] != words[:-1]).any(axis=1)
+    seconds, ok = _parse_timestamps(window[changed, :20].astype(np.int64))
+    row = np.cumsum(changed) - 1
+    return seconds[row], ok[row]
+
+
+def _parse_timestamps(window):
+    """Parse rows of dd/Mon/yyyy:HH:MM:SS bytes into (Unix seconds, valid mask)"""
+    d = window - 48
+    numeric = [0, 1, 7, 8, 9, 10, 12, 13, 15, 16, 18, 19]
+    ok = ((d[:, numeric] >= 0) & (d[:, numeric] <= 9)).all(axis=1)
+    key = window[:, 3] << 16 | window[:, 4] << 8 | window[:, 5]
+    slot = np.minimum(np.searchsorted(_MONTH_KEYS[_MONTH_ORDER], key), len(MONTHS) - 1)
+    ok &= _MONTH_KEYS[_MONTH_ORDER][slot] == key
+    month = _MONTH_ORDER[slot] + 1
+    year = d[:, 7] * 1000 + d[:, 8] * 100 + d[:, 9] * 10 + d[:, 10]
+    days = _days_from_civil(year, month, d[:, 0] * 10 + d[:, 1])
+    seconds = days * 86400 + (d[:, 12] * 10 + d[:, 13]) * 3600 + (d[:, 15] * 10 + d[:, 16]) * 60 \
+        + d[:, 18] * 10 + d[:, 19]
+    return seconds, ok
+
+
+def _token_hash(a, starts, ends):
+    """Hash the bytes [start, end) of each row; 0 for empty tokens"""
+    lengths = np.clip(ends - starts, 0, None)
+    window = _gather(a, starts, TOKEN_BYTES)
+    window[np.arange(TOKEN_BYTES) >= lengths[:, None]] = 0
+    words = np.ascontiguousarray(window).view(np.uint64)
+    hashes = lengths.astype(np.uint64)
+    for column in words.T:
+        hashes = hashes * np.uint64(0x100000001B3) ^ column
+    return np.where(lengths > 0, hashes | np.uint64(1), np.uint64(0))
+
+
+def _first(mask):
+    """Column of the first True in each row, or the row width if there is none"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+
+def _line_bounds(a):
+    ends = np.flatnonzero(a == 10)
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    return starts, ends
+
+
+def _names(a, hashes, starts, ends, source):
+    """Map each distinct hash to the text it stands for; 0 (no token) maps to source"""
+    keys, first = np.unique(hashes, return_index=True)
+    return {int(key): source if key == 0 else bytes(a[starts[i]:ends[i]]).decode('utf-8', 'replace')
+            for key, i in zip(keys, first)}
+
+
+def parse_nginx(a, source='nginx'):
+    """Parse a chunk of combined-format lines, optionally followed by $request_time $upstream_addr.
+
+    Fields are found from the six quotes of each line: the timestamp sits
+    before the first, the status after the second, and the optional timing
+    fields after the last. Lines without $upstream_addr are attributed to
+    source. Returns (columns, names, total lines).
+    """
+    starts, ends = _line_bounds(a)
+    a = _padded(a)
+    quotes = np.flatnonzero(a == 34)
+    if len(quotes) < 6:
+        return _empty(), {}, len(ends)
+    # A sentinel past the end lets every line look at the quote after its sixth
+    quotes = np.append(quotes, len(a))
+    first = np.minimum(np.searchsorted(quotes, starts), len(quotes) - 7)
+    ok = (quotes[first] >= starts) & (quotes[first + 5] < ends) & (quotes[first + 6] > ends)
+    request_open, request_close, agent_close = quotes[first], quotes[first + 1], quotes[first + 5]
+
+    # "[10/Oct/2024:13:55:36 +0000] " ends right before the request quote
+    stamp = request_open - 28
+    ok &= (stamp - 1 >= starts) & (a[np.maximum(stamp - 1, 0)] == 91)
+    seconds, valid = _epoch_seconds(a, stamp)
+    ok &= valid
+    zone, valid = _fixed_int(a, stamp + 22, 4)
+    sign = np.where(a[np.minimum(stamp + 21, len(a) - 1)] == 45, -1, 1)
+    seconds = seconds - sign * (zone // 100 * 3600 + zone % 100 * 60) * valid
+    status, valid = _fixed_int(a, request_close + 2, 3)
+    ok &= valid
+
+    extended = a[np.minimum(agent_close + 1, len(a) - 1)] == 32
+    request_time, widths = _decimal(_gather(a, agent_close + 2, NUMBER_WIDTH))
+    latency = np.where(extended, request_time * 1000, np.nan)
+    backend_start = agent_close + 3 + widths
+    backend_start = np.where(extended & (backend_start < ends), backend_start, ends)
+    hashes = _token_hash(a, backend_start, ends)
+    # The client address is the first field
+    client = _token_hash(a, starts, starts + _first(_gather(a, starts, CLIENT_BYTES) == 32))
+
+    columns = {'second': seconds[ok], 'status': status[ok], 'latency_ms': latency[ok], 'backend': hashes[ok],
+               'client': client[ok]}
+    return columns, _names(a, columns['backend'], backend_start[ok], ends[ok], source), len(ends)
+
+
+def parse_haproxy(a, source='haproxy'):
+    """Parse a chunk of HAProxy HTTP log lines ('option httplog').
+
+    The accept date is the bracket with milliseconds; after it come the
+    frontend, backend/server, the timers (the last one is the total time in
+    ms) and the status. Returns (columns, names, total lines).
+    """
+    starts, ends = _line_bounds(a)
+    a = _padded(a)
+    closes = np.flatnonzero(a == 93)
+    closes = closes[closes >= 25]
+    closes = closes[(a[closes - 4] == 46) & (a[closes - 25] == 91)]
+    line = np.searchsorted(ends, closes)
+    keep = np.ones(len(closes), dtype=bool)
+    keep[1:] = line[1:] != line[:-1]
+    closes, line = closes[keep], line[keep]
+    if len(closes) == 0:
+        return _empty(), {}, len(ends)
+
+    seconds, ok = _epoch_seconds(a, closes - 24)
+    # Find the four spaces after the frontend in a window behind the date
+    # rather than scanning the whole chunk, where most spaces are irrelevant
+    hits = np.flatnonzero(_gather(a, closes + 2, FIELDS_BYTES) == 32)
+    hits = np.append(hits, np.full(4, len(closes) * FIELDS_BYTES))
+    index = np.minimum(np.searchsorted(hits, np.arange(len(closes)) * FIELDS_BYTES), len(hits) - 4)
+    ok &= hits[index + 3] // FIELDS_BYTES == np.arange(len(closes))
+    fields = closes + 2 - np.arange(len(closes)) * FIELDS_BYTES
+    backend_start, backend_end = fields + hits[index] + 1, fields + hits[index + 1]
+    timers_end, status_end = fields + hits[index + 2], fields + hits[index + 3]
+    ok &= (a[np.minimum(closes + 1, len(a) - 1)] == 32) & (status_end < ends[line])
+    ok &= status_end - timers_end == 4
+
+    # The total time closes the timers, e.g. 10/0/30/69/109, or +109 with logasap
+    latency, total_start = _trailing_int(a, timers_end)
+    before = a[total_start - 1]
+    latency = np.where((before == 47) | (before == 43), latency, np.nan)
+    status, valid = _fixed_int(a, timers_end + 1, 3)
+    ok &= valid
+    hashes = _token_hash(a, backend_start, backend_end)
+    # The client ip:port ends at the space before the date; only the ip is kept
+    window = _gather(a, closes - 26 - CLIENT_BYTES, CLIENT_BYTES)[:, ::-1]
+    colon, space = _first(window == 58), _first(window == 32)
+    client_start = closes - 26 - space
+    client_end = np.where(colon < space, closes - 27 - colon, closes - 26)
+    client = _token_hash(a, client_start, client_end)
+
+    columns = {'second': seconds[ok], 'status': status[ok], 'latency_ms': latency[ok], 'backend': hashes[ok],
+               'client': client[ok]}
+    return columns, _names(a, columns['backend'], backend_start[ok], backend_end[ok], source), len(ends)
+
+
+def _empty():
+    return {'second': np.zeros(0, dtype=np.int64), 'status': np.zeros(0, dtype=np.int64),
+            'latency_ms': np.zeros(0), 'backend': np.zeros(0, dtype=np.uint64),
+            'client': np.zeros(0, dtype=np.uint64)}
+
+
+PARSERS = {'nginx': parse_nginx, 'haproxy': parse_haproxy}
+
+
+class SecondCounts:
+    """Requests per second over a growing time range.
+
+    Counts are kept in a dense array covering first..last, 4 bytes per second
+    whatever the number of lines, so shards covering the same seconds merge
+    by adding. Lines more than MAX_SPAN_S from the first second seen are
+    refused rather than growing the array, which guards against a corrupt
+    date in an otherwise sane log.
+    """
+
+    def __init__(self):
+        self.first = None
+        self.counts = np.zeros(0, dtype=np.int32)
+
+    @property
+    def last(self):
+        return None if self.first is None else self.first + len(self.counts) - 1
+
+    def _cover(self, low, high):
+        """Grow the array to cover [low, high], at least doubling it so that growth stays amortized"""
+        if self.first is None:
+            self.first, self.counts = low, np.zeros(high - low + 1, dtype=np.int32)
+            return
+        if low >= self.first and high <= self.last:
+            return
+        grow = max(len(self.counts), 1)
+        new_first = min(low, self.first - grow) if low < self.first else self.first
+        new_last = max(high, self.last + grow) if high > self.last else self.last
+        counts = np.zeros(new_last - new_first + 1, dtype=np.int32)
+        counts[self.first - new_first:self.first - new_first + len(self.counts)] = self.counts
+        self.first, self.counts = new_first, counts
+
+    def add(self, seconds):
+        """Count sorted or unsorted Unix seconds; return the mask of those accepted"""
+        anchor = self.first if self.first is not None else int(seconds.min())
+        ok = np.abs(seconds - anchor) <= MAX_SPAN_S
+        seconds = seconds[ok]
+        if len(seconds):
+            low, high = int(seconds.min()), int(seconds.max())
+            self._cover(low, high)
+            self.counts[low - self.first:high - self.first + 1] += np.bincount(seconds - low).astype(np.int32)
+        return ok
+
+    def merge(self, other):
+        if other.first is not None:
+            used = np.flatnonzero(other.counts)
+            if len(used):
+                self._cover(other.first + int(used[0]), other.first + int(used[-1]))
+                offset = other.first - self.first
+                self.counts[offset + used[0]:offset + used[-1] + 1] += other.counts[used[0]:used[-1] + 1]
+        return self
+
+    def busy(self):
+        """Return the per-second counts from the first to the last second with a request"""
+        used = np.flatnonzero(self.counts)
+        return self.counts[used[0]:used[-1] + 1] if len(used) else self.counts[:0]
+
+    def summary(self):
+        busy = self.busy()
+        if not len(busy):
+            return {'mean': 0.0, 'peak': 0, **{f"p{p}": 0.0 for p in PERCENTILES}}
+        return {'mean': float(busy.mean()), 'peak': int(busy.max()),
+                **{f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(busy, PERCENTILES))}}
+
+
+class LogStats:
+    """Per-backend request, status and latency aggregates plus per-host QPS and clients.
+
+    Every part merges: status histograms and request counts add, latencies
+    live in a LatencySketch and unique clients in a HyperLogLog, and
+    per-second counts in a SecondCounts. Memory depends on the number of
+    backends and hosts and on the time span, not on the number of lines, so
+    shards of a log set can be summarized in separate processes and merged.
+    """
+
+    def __init__(self):
+        self.backends = {}
+        self.hosts = {}
+        self.lines = 0
+        self.malformed = 0
+        self._buckets = LatencySketch()
+
+    def _backend(self, name):
+        if name not in self.backends:
+            self.backends[name] = {'requests': 0, 'status': np.zeros(MAX_STATUS, dtype=np.int64),
+                                   'latency': LatencySketch(), 'latency_sum': 0.0, 'timed': 0}
+        return self.backends[name]
+
+    def _host(self, name, log_format):
+        if name not in self.hosts:
+            self.hosts[name] = {'format': log_format, 'requests': 0, 'clients': HyperLogLog(),
+                                'seconds': SecondCounts()}
+        return self.hosts[name]
+
+    def add(self, columns, names, lines, host='logs', log_format=None):
+        """Fold one parsed chunk from host into the aggregates"""
+        self.lines += lines
+        if len(columns['second']) == 0:
+            self.malformed += lines
+            return
+        stats = self._host(host, log_format)
+        ok = stats['seconds'].add(columns['second'])
+        if not ok.all():
+            columns = {name: values[ok] for name, values in columns.items()}
+        count = len(columns['second'])
+        self.malformed += lines - count
+        stats['requests'] += count
+        stats['clients'].add(columns['client'])
+        if count == 0:
+            return
+
+        keys, inverse = np.unique(columns['backend'], return_inverse=True)
+        groups = len(keys)
+        requests = np.bincount(inverse, minlength=groups)
+        status = np.bincount(inverse * MAX_STATUS + np.clip(columns['status'], 0, MAX_STATUS - 1),
+                             minlength=groups * MAX_STATUS).reshape(groups, MAX_STATUS)
+        latency = columns['latency_ms']
+        timed = ~np.isnan(latency)
+        group = inverse[timed]
+        bucket = self._buckets.bucket(latency[timed])
+        zero = bucket < 0
+        size = len(self._buckets.counts)
+        buckets = np.bincount(group[~zero] * size + bucket[~zero], minlength=groups * size).reshape(groups, size)
+        zeros = np.bincount(group[zero], minlength=groups)
+        sums = np.bincount(group, weights=latency[timed], minlength=groups)
+        timed_counts = np.bincount(group, minlength=groups)
+        for k, key in enumerate(keys.tolist()):
+            stats = self._backend(names[key])
+            stats['requests'] += int(requests[k])
+            stats['status'] += status[k]
+            stats['latency'].add_counts(buckets[k], zeros[k])
+            stats['latency_sum'] += float(sums[k])
+            stats['timed'] += int(timed_counts[k])
+
+    def merge(self, other):
+        """Fold the aggregates of another LogStats, e.g. from another shard, into this one"""
+        self.lines += other.lines
+        self.malformed += other.malformed
+        for name, theirs in other.backends.items():
+            ours = self._backend(name)
+            for key in ('requests', 'status', 'latency_sum', 'timed'):
+                ours[key] += theirs[key]
+            ours['latency'].merge(theirs['latency'])
+        for name, theirs in other.hosts.items():
+            ours = self._host(name, theirs['format'])
+            ours['requests'] += theirs['requests']
+            ours['clients'].merge(theirs['clients'])
+            ours['seconds'].merge(theirs['seconds'])
+        return self
+
+    def summary(self):
+        """Return the aggregates as plain values.
+
+        Overall QPS adds the per-second counts of every host, so a request
+        logged by both the load balancer and a web server counts twice.
+        """
+        requests = sum(stats['requests'] for stats in self.backends.values())
+        seconds, clients = SecondCounts(), HyperLogLog()
+        for host in self.hosts.values():
+            seconds.merge(host['seconds'])
+            clients.merge(host['clients'])
+        busy = seconds.busy()
+        first = seconds.first + int(np.flatnonzero(seconds.counts)[0]) if len(busy) else None
+        summary = {
+            'lines': self.lines, 'malformed': self.malformed, 'requests': requests,
+            'first': None if first is None else time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(first)),
+            'last': None if first is None else time.strftime('%Y-%m-%d %H:%M:%S',
+                                                             time.gmtime(first + len(busy) - 1)),
+            'span_s': len(busy),
+            'clients': round(clients.estimate()),
+            'qps': seconds.summary(),
+            'hosts': {},
+            'backends': {},
+        }
+        for name, host in sorted(self.hosts.items()):
+            summary['hosts'][name] = {'format': host['format'], 'requests': host['requests'],
+                                      'clients': round(host['clients'].estimate()),
+                                      'qps': host['seconds'].summary()}
+        for name, stats in sorted(self.backends.items(), key=lambda item: -item[1]['requests']):
+            classes = stats['status'].reshape(-1, 100).sum(axis=1)
+            summary['backends'][name] = {
+                'requests': stats['requests'],
+                'share': stats['requests'] / requests if requests else 0.0,
+                'status': {f"{c}xx": int(classes[c]) for c in range(1, 6) if classes[c]},
+                'top_status': {str(code): int(stats['status'][code])
+                               for code in np.argsort(stats['status'])[::-1][:3] if stats['status'][code]},
+                'latency_ms': {'mean': stats['latency_sum'] / stats['timed'] if stats['timed'] else None,
+                               **{f"p{p}": (stats['latency'].quantile(p / 100) if stats['timed'] else None)
+                                  for p in PERCENTILES}},
+            }
+        return summary
+
+
+def host_name(path):
+    """The host a log came from: its file name up to the first dot, e.g. web-01 for web-01.access.log.gz"""
+    return os.path.basename(path).split('.')[0]
+
+
+def analyze_shard(path, start=0, stop=None, log_format='auto', chunk_bytes=CHUNK_BYTES):
+    """Summarize the lines of path that start in [start, stop); return (LogStats, bytes read)"""
+    stats = LogStats()
+    host = host_name(path)
+    total_bytes = 0
+    parse_format = None
+    for chunk in read_chunks(path, chunk_bytes, start, stop):
+        if parse_format is None:
+            parse_format = detect_format(chunk) if log_format == 'auto' else log_format
+        stats.add(*PARSERS[parse_format](chunk, host), host=host, log_format=parse_format)
+        total_bytes += len(chunk)
+    return stats, total_bytes
+
+
+def plan_shards(paths, workers, shard_bytes=SHARD_BYTES):
+    """Split the logs into (path, start, stop) byte ranges for workers.
+
+    Gzip files cannot be entered midway, so each is one shard; plain files
+    bigger than shard_bytes are cut into about one range per worker. Ranges
+    are refined to line boundaries when they are read.
+    """
+    shards = []
+    for path in paths:
+        with open(path, 'rb') as log:
+            gzipped = log.read(2) == b'\x1f\x8b'
+        size = os.path.getsize(path)
+        pieces = 1 if gzipped else max(1, min(workers, size // shard_bytes))
+        bounds = [size * i // pieces for i in range(pieces)] + [None]
+        shards.extend((path, bounds[i], bounds[i + 1]) for i in range(pieces))
+    # Largest first so one big gzip file does not start last
+    return sorted(shards, key=lambda shard: -((shard[2] or os.path.getsize(shard[0])) - shard[1]))
+
+
+def analyze(paths, log_format='auto', chunk_bytes=CHUNK_BYTES, workers=1):
+    """Summarize every file, in a process pool when workers > 1; return (stats, bytes read).
+
+    Each shard is summarized into its own LogStats and the results are
+    merged, so the totals match a single pass over the same files.
+    """
+    shards = plan_shards(paths, workers) if workers > 1 else [(path, 0, None) for path in paths]
+    stats, total_bytes = LogStats(), 0
+    if workers <= 1 or len(shards) == 1:
+        for path, start, stop in shards:
+            shard, size = analyze_shard(path, start, stop, log_format, chunk_bytes)
+            stats.merge(shard)
+            total_bytes += size
+        return stats, total_bytes
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        futures = [pool.submit(analyze_shard, path, start, stop, log_format, chunk_bytes)
+                   for path, start, stop in shards]
+        for future in futures:
+            shard, size = future.result()
+            stats.merge(shard)
+            total_bytes += size
+    return stats, total_bytes
+
+
+def print_report(summary):
+    """Print QPS and the per-backend status mix and latency percentiles"""
+    qps = summary['qps']
+    print(f"\n📈 {summary['requests']:,} requests from {summary['first']} to {summary['last']} "
+          f"({summary['malformed']:,} malformed lines skipped)")
+    print(f"   QPS mean {qps['mean']:,.1f}, " + ', '.join(f"p{p} {qps[f'p{p}']:,.0f}" for p in PERCENTILES)
+          + f", peak {qps['peak']:,}; ~{summary['clients']:,} unique clients")
+    print(f"\n{'Host':<20} {'Format':<8} {'Requests':>10} {'Clients':>9} {'QPS mean':>9} {'QPS p99':>8} {'Peak':>7}")
+    print('-' * 76)
+    for name, host in summary['hosts'].items():
+        print(f"{name[:20]:<20} {host['format'] or '-':<8} {host['requests']:>10,} {host['clients']:>9,} "
+              f"{host['qps']['mean']:>9,.1f} {host['qps']['p99']:>8,.0f} {host['qps']['peak']:>7,}")
+    print(f"\n{'Backend':<32} {'Requests':>10} {'Share':>6} {'2xx':>6} {'3xx':>6} {'4xx':>6} {'5xx':>6} "
+          + ' '.join(f"{f'p{p} ms':>8}" for p in PERCENTILES))
+    print('-' * (76 + 9 * len(PERCENTILES)))
+    for name, backend in summary['backends'].items():
+        mix = ' '.join(f"{backend['status'].get(f'{c}xx', 0) / backend['requests']:>6.1%}" for c in range(2, 6))
+        latency = ' '.join(f"{backend['latency_ms'][f'p{p}']:>8.1f}" if backend['latency_ms'][f'p{p}'] is not None
+                           else f"{'-':>8}" for p in PERCENTILES)
+        print(f"{name[:32]:<32} {backend['requests']:>10,} {backend['share']:>6.1%} {mix} {latency}")
+
+
+def host_boxes(hosts):
+    """Match hosts to the agent boxes of the monitoring diagram: HAProxy logs to the
+    load balancer, Nginx logs to the web servers in name order"""
+    boxes = {}
+    for kind, names in (('haproxy', ['Load Balancer']), ('nginx', ['Web Server 1', 'Web Server 2'])):
+        matching = sorted(name for name, host in hosts.items() if host['format'] == kind)
+        boxes.update(zip(names, matching))
+    return boxes
+
+
+def monitoring_annotations(summary, limit=4):
+    """Return {diagram box: text} with the live numbers for the monitoring flow diagram"""
+    qps = summary['qps']
+    qps_text = (f"{summary['requests']:,} requests\n~{summary['clients']:,} unique clients\n"
+                f"mean {qps['mean']:,.1f} QPS\np99 {qps['p99']:,.0f} / peak {qps['peak']:,} QPS")
+    rows = []
+    for name, backend in list(summary['backends'].items())[:limit]:
+        errors = backend['status'].get('5xx', 0) / backend['requests']
+        p99 = backend['latency_ms']['p99']
+        rows.append(f"{name[:24]}: {backend['share']:.0%}, 5xx {errors:.1%}"
+                    + (f", p99 {p99:,.0f} ms" if p99 is not None else ''))
+    if len(summary['backends']) > limit:
+        rows.append(f"+{len(summary['backends']) - limit} more backend(s)")
+    annotations = {'QPS Monitoring': qps_text, 'Log Analysis': '\n'.join(rows)}
+    for box, name in host_boxes(summary['hosts']).items():
+        host = summary['hosts'][name]
+        annotations[box] = (f"{name}: {host['qps']['mean']:,.0f} QPS, peak {host['qps']['peak']:,}\n"
+                            f"~{host['clients']:,} clients")
+    return annotations
+
+
+def write_sample_logs(directory, lines, seed=0):
+    """Write an Nginx and an HAProxy log of the given length, plain and gzipped; return their paths"""
+    rng = np.random.default_rng(seed)
+    start = 1728568536
+    seconds = start + np.sort(rng.integers(0, max(lines // 500, 1), lines))
+    statuses = rng.choice([200, 200, 200, 200, 301, 304, 404, 500, 502], lines)
+    latencies = rng.lognormal(np.log(0.02), 0.8, lines)
+    servers = rng.integers(2, 4, lines)
+    paths = np.array(['/', '/index.php', '/static/app.js', '/api/users?id=42', '/login'])[rng.integers(0, 5, lines)]
+    stamps = {}
+    os.makedirs(directory, exist_ok=True)
+    nginx_path = os.path.join(directory, 'web-01.access.log')
+    haproxy_path = os.path.join(directory, 'lb-01.haproxy.log')
+    with open(nginx_path, 'w', encoding='utf-8') as nginx, open(haproxy_path, 'w', encoding='utf-8') as haproxy:
+        for i in range(lines):
+            second = int(seconds[i])
+            if second not in stamps:
+                stamps[second] = time.strftime('%d/%b/%Y:%H:%M:%S', time.gmtime(second))
+            stamp, latency, status = stamps[second], latencies[i], statuses[i]
+            nginx.write(f'10.0.{i % 7}.{i % 250 + 1} - - [{stamp} +0000] "GET {paths[i]} HTTP/1.1" {status} '
+                        f'{612 + i % 4000} "-" "Mozilla/5.0 (X11; Linux x86_64) Firefox/128.0" '
+                        f'{latency:.3f} 10.0.0.{servers[i]}:9000\n')
+            haproxy.write(f'Oct 10 14:08:{second % 60:02d} lb-01 haproxy[1432]: 203.0.113.{i % 250 + 1}:{40000 + i % 20000} '
+                          f'[{stamp}.{i % 1000:03d}] web_frontend web_servers/web{servers[i] - 1} '
+                          f'0/0/1/{int(latency * 1000)}/{int(latency * 1000) + 1} {status} {612 + i % 4000} - - '
+                          f'---- 12/12/3/1/0 0/0 "GET {paths[i]} HTTP/1.1"\n')
+    outputs = [nginx_path, haproxy_path]
+    for path in list(outputs):
+        with open(path, 'rb') as plain, gzip.open(path + '.gz', 'wb', compresslevel=6) as packed:
+            packed.write(plain.read())
+        outputs.append(path + '.gz')
+    return outputs
+
+
+def benchmark(lines, workers=None):
+    """Time each parser on generated plain and gzipped logs, then all of them sharded over workers"""
+    import tempfile
+
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"📝 Writing {lines:,}-line sample logs...")
+        paths = write_sample_logs(directory, lines)
+        serial = LogStats()
+        start_all = time.perf_counter()
+        for path in paths:
+            start = time.perf_counter()
+            stats, size = analyze([path], workers=1)
+            seconds = time.perf_counter() - start
+            serial.merge(stats)
+            print(f"⏱️ {os.path.basename(path):<24} {stats.lines / seconds / 1e6:5.2f}M lines/s "
+                  f"{size / seconds / 1e6:7.0f} MB/s ({stats.malformed} malformed)")
+        serial_seconds = time.perf_counter() - start_all
+        start = time.perf_counter()
+        stats, size = analyze(paths, workers=workers)
+        seconds = time.perf_counter() - start
+        same = stats.summary() == serial.summary()
+        print(f"⏱️ {'all, ' + str(workers) + ' worker(s)':<24} {stats.lines / seconds / 1e6:5.2f}M lines/s "
+              f"{size / seconds / 1e6:7.0f} MB/s ({serial_seconds / seconds:.1f}x one process, "
+              f"{'same' if same else 'DIFFERENT'} summary)")
+    return same
+
+
+def main(argv=None):
+    """Analyze access logs and annotate the monitoring flow diagram with the results"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('logs', nargs='*', help='access logs, plain or .gz')
+    parser.add_argument('-f', '--format', choices=('auto',) + FORMATS, default='auto',
+                        help='log format (default: detected per file)')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // 2 ** 20, help='read size (default: 16)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='worker processes; files and large plain logs are sharded (default: CPU count)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='annotated monitoring diagram (default: build/monitoring_live.png)')
+    parser.add_argument('--no-diagram', action='store_true', help='print the report only')
+    parser.add_argument('--benchmark', type=int, metavar='LINES', help='time the parsers on generated logs')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark, args.workers)
+    if not args.logs:
+        parser.error('give at least one log file (or --benchmark LINES)')
+
+    start = time.perf_counter()
+    try:
+        stats, size = analyze(args.logs, args.format, args.chunk_mb * 2 ** 20, args.workers)
+    except OSError as e:
+        print(f"❌ {e}")
+        return False
+    seconds = time.perf_counter() - start
+    summary = stats.summary()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return True
+    print(f"📄 {stats.lines:,} lines ({size / 1e6:,.0f} MB) in {seconds:.2f}s: "
+          f"{stats.lines / seconds / 1e6:.2f}M lines/s")
+    print_report(summary)
+    if args.no_diagram or not summary['requests']:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from secured_diagram_generator import create_monitoring_flow_diagram
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_monitoring_flow_diagram(monitoring_annotations(summary))
+    save_figure(fig, args.output, dpi=150)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
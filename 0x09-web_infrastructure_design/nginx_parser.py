@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Nginx Config Parser
+Parses nginx configuration files into block trees, resolves include directives,
+builds an indexed model of servers, locations and upstreams, and renders the
+request routing as a diagram. Each file's parse is cached by mtime/content hash,
+so a snippet shared by hundreds of vhosts is only read once.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from render_cache import DEFAULT_CACHE_DIR, cached_parse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(BASE_DIR, 'nginx_config.conf')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'nginx_routing.png')
+PARSE_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'nginx')
+# Bump when the per-file parse format changes so stale cache entries are ignored
+PARSER_VERSION = 1
+
+# Quoted strings, the ; { } delimiters, comments and bare words (which may contain # and quotes)
+TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|([;{}])|(#.*)|((?:[^\s;{}"\'\\]|\\.)+)')
+LOCATION_MODIFIERS = ('=', '~', '~*', '^~', '@')
+# Directives that hand a request to another process, in the order nginx prefers them
+PASS_DIRECTIVES = {'proxy_pass': 'proxy', 'fastcgi_pass': 'fastcgi', 'uwsgi_pass': 'uwsgi',
+                   'scgi_pass': 'scgi', 'grpc_pass': 'grpc', 'memcached_pass': 'memcached'}
+
+ROUTING_STYLES = {
+    'client': {'facecolor': 'lightblue', 'edgecolor': 'blue'},
+    'server': {'facecolor': 'orange', 'edgecolor': 'darkorange'},
+    'redirect': {'facecolor': 'lightgray', 'edgecolor': 'gray'},
+    'location': {'facecolor': 'lightyellow', 'edgecolor': 'orange'},
+    'handler': {'facecolor': 'lightgreen', 'edgecolor': 'green'},
+    'upstream': {'facecolor': 'plum', 'edgecolor': 'purple'},
+    'deny': {'facecolor': 'lightcoral', 'edgecolor': 'red'},
+}
+
+# Longest line that fits a layout box at its 7pt font
+LABEL_WIDTH = 22
+
+_file_cache = {}
+
+
+def iter_directives(path):
+    """Return a file's directives as a tree of {'name', 'args', 'file', 'line', 'block'} dicts.
+
+    The file is read line by line; a directive may span lines (gzip_types
+    lists usually do) and block is None for simple directives. Raises
+    ValueError with the file and line for unbalanced braces.
+    """
+    root, stack, words, start = [], [], [], None
+    current = root
+    with open(path, encoding='utf-8', errors='replace') as config:
+        for number, line in enumerate(config, 1):
+            for match in TOKEN.finditer(line):
+                double, single, delimiter, comment, word = match.groups()
+                if comment is not None:
+                    break
+                if delimiter is None:
+                    if not words:
+                        start = number
+                    words.append(word if word is not None else
+                                 re.sub(r'\\(["\'\\])', r'\1', double if double is not None else single))
+                elif delimiter == '}':
+                    if words or not stack:
+                        raise ValueError(f"{path}:{number}: unexpected '}}'")
+                    current = stack.pop()
+                else:
+                    if not words:
+                        raise ValueError(f"{path}:{number}: unexpected '{delimiter}'")
+                    directive = {'name': words[0], 'args': words[1:], 'file': path, 'line': start,
+                                 'block': [] if delimiter == '{' else None}
+                    current.append(directive)
+                    if delimiter == '{':
+                        stack.append(current)
+                        current = directive['block']
+                    words = []
+    if words or stack:
+        raise ValueError(f"{path}: unexpected end of file")
+    return root
+
+
+def parse_file(path, cache_dir=PARSE_CACHE_DIR):
+    """Return a file's directive tree, reusing earlier parses.
+
+    An unchanged mtime and size hit the in-memory cache without reading the
+    file; otherwise the content hash is looked up on disk. cache_dir=None
+    skips the disk cache.
+    """
+    return cached_parse(path, iter_directives, cache_dir, PARSER_VERSION, _file_cache)
+
+
+def config_files(paths):
+    """Expand files and directories (every regular file inside, sorted) like sites-enabled/"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(p for p in glob.glob(os.path.join(path, '*')) if os.path.isfile(p)))
+        else:
+            files.append(path)
+    return files
+
+
+def resolve_includes(path, prefix, cache_dir=PARSE_CACHE_DIR, expanded=None, unresolved=None, active=()):
+    """Return path's directive tree with every include replaced by the included directives.
+
+    Relative include patterns are resolved against prefix (the nginx conf
+    directory) and may be globs. Includes that match nothing or would loop
+    are recorded in unresolved instead of failing. expanded memoizes whole
+    expanded files, so a shared snippet is expanded once per load. Cached
+    trees are never modified.
+    """
+    expanded = {} if expanded is None else expanded
+    unresolved = [] if unresolved is None else unresolved
+    if path in expanded:
+        return expanded[path]
+    active = active + (path,)
+
+    def expand(directives):
+        result = []
+        for directive in directives:
+            if directive['name'] == 'include' and directive['args']:
+                pattern = os.path.join(prefix, directive['args'][0])
+                matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else \
+                    [pattern] if os.path.isfile(pattern) else []
+                if not matches:
+                    unresolved.append({'include': directive['args'][0], 'file': directive['file'],
+                                       'line': directive['line'], 'reason': 'not found'})
+                for match in matches:
+                    if match in active:
+                        unresolved.append({'include': directive['args'][0], 'file': directive['file'],
+                                           'line': directive['line'], 'reason': 'include cycle'})
+                        continue
+                    result.extend(resolve_includes(match, prefix, cache_dir, expanded, unresolved, active))
+            elif directive['block'] is not None:
+                result.append({**directive, 'block': expand(directive['block'])})
+            else:
+                result.append(directive)
+        return result
+
+    expanded[path] = expand(parse_file(path, cache_dir))
+    return expanded[path]
+
+
+def listen_port(args):
+    """Return the port (or unix: socket) a listen directive's address binds"""
+    address = args[0] if args else '80'
+    if address.isdigit() or address.startswith('unix:'):
+        return address
+    if address.endswith(']'):
+        return '80'
+    host, sep, port = address.rpartition(':')
+    return port if sep and port.isdigit() else '80'
+
+
+def location_handler(directives, root):
+    """Return (handler, target) for a location or server block's directives"""
+    passes = {}
+    try_files = None
+    for directive in directives:
+        name, args = directive['name'], directive['args']
+        if name == 'return' and args:
+            code = args[0]
+            target = ' '.join(args[1:])
+            return ('redirect', f"{code} {target}") if code in ('301', '302', '303', '307', '308') \
+                else ('return', f"{code} {target}".strip())
+        if name in PASS_DIRECTIVES and args:
+            passes.setdefault(PASS_DIRECTIVES[name], args[0])
+        elif name == 'deny' and args[:1] == ['all']:
+            return 'deny', '403'
+        elif name == 'root' and args:
+            root = args[0]
+        elif name == 'try_files' and args:
+            try_files = args
+    for handler in PASS_DIRECTIVES.values():
+        if handler in passes:
+            return handler, passes[handler]
+    if try_files and not try_files[-1].startswith('='):
+        return 'static', f"{root or 'html'} → {try_files[-1]}"
+    return 'static', root or 'html'
+
+
+def build_location(directive, root, parent=None):
+    """Turn a location block into records, one per (possibly nested) location"""
+    args = directive['args']
+    modifier, pattern = (args[0], ' '.join(args[1:])) if args[0] in LOCATION_MODIFIERS and len(args) > 1 \
+        else ('', ' '.join(args))
+    if modifier == '' and pattern.startswith('@'):
+        modifier, pattern = '@', pattern[1:]
+    own = [d for d in directive['block'] if d['name'] != 'location']
+    root = next((d['args'][0] for d in own if d['name'] in ('root', 'alias') and d['args']), root)
+    handler, target = location_handler(own, root)
+    records = [{'modifier': modifier, 'pattern': pattern, 'handler': handler, 'target': target,
+                'parent': parent, 'file': directive['file'], 'line': directive['line']}]
+    for child in directive['block']:
+        if child['name'] == 'location' and child['block'] is not None and child['args']:
+            records.extend(build_location(child, root, pattern))
+    return records
+
+
+def build_server(directive, root=None):
+    """Turn a server block into a record with its listens, names and locations"""
+    server = {'names': [], 'listen': [], 'default': False, 'default_listen': [], 'ssl': False, 'root': root, 'return': None,
+              'locations': [], 'file': directive['file'], 'line': directive['line']}
+    for child in directive['block']:
+        name, args = child['name'], child['args']
+        if name == 'listen' and args:
+            server['listen'].append(listen_port(args))
+            if 'default_server' in args or 'default' in args:
+                server['default'] = True
+                server['default_listen'].append(server['listen'][-1])
+            server['ssl'] = server['ssl'] or 'ssl' in args
+        elif name == 'server_name':
+            server['names'].extend(args)
+        elif name == 'root' and args:
+            server['root'] = args[0]
+        elif name == 'ssl' and args[:1] == ['on']:
+            server['ssl'] = True
+    server['listen'] = list(dict.fromkeys(server['listen'] or ['80']))
+    own = [d for d in directive['block'] if d['name'] != 'location']
+    if any(d['name'] == 'return' for d in own):
+        server['return'] = location_handler(own, server['root'])[1]
+    for child in directive['block']:
+        if child['name'] == 'location' and child['block'] is not None and child['args']:
+            server['locations'].extend(build_location(child, server['root']))
+    return server
+
+
+def build_upstream(directive):
+    """Turn an upstream block into a record with its balancing method and members"""
+    upstream = {'name': directive['args'][0] if directive['args'] else '', 'balance': 'round_robin',
+                'servers': [], 'file': directive['file'], 'line': directive['line']}
+    for child in directive['block']:
+        name, args = child['name'], child['args']
+        if name == 'server' and args:
+            options = dict(arg.split('=', 1) if '=' in arg else (arg, True) for arg in args[1:])
+            upstream['servers'].append({'address': args[0], 'weight': int(options.get('weight', 1)),
+                                        'backup': 'backup' in options, 'down': 'down' in options})
+        elif name in ('least_conn', 'ip_hash', 'random', 'least_time', 'hash'):
+            upstream['balance'] = ' '.join([name, *args])
+    return upstream
+
+
+def build_model(directives, model=None, root=None):
+    """Collect servers and upstreams from an expanded tree into model.
+
+    Server blocks are found at the top level (sites-available files) or
+    inside http; a server without a block is an upstream member, not a vhost.
+    """
+    model = model or {'servers': [], 'upstreams': {}}
+    for directive in directives:
+        if directive['block'] is None:
+            if directive['name'] == 'root' and directive['args']:
+                root = directive['args'][0]
+            continue
+        if directive['name'] == 'server':
+            model['servers'].append(build_server(directive, root))
+        elif directive['name'] == 'upstream':
+            model['upstreams'][directive['args'][0] if directive['args'] else ''] = build_upstream(directive)
+        elif directive['name'] in ('http', 'stream'):
+            build_model(directive['block'], model, root)
+    return model
+
+
+def index_model(model):
+    """Add by_name, wildcard, by_listen and default_for indexes over the model's servers.
+
+    As in nginx, names and defaults are per listening port: by_name maps
+    port -> name -> server, and default_for maps each port to its
+    default_server, or to the first server listening there.
+    """
+    by_name, wildcards, regexes, by_listen, default_for = {}, [], [], {}, {}
+    for i, server in enumerate(model['servers']):
+        for port in server['listen']:
+            by_listen.setdefault(port, []).append(i)
+            names = by_name.setdefault(port, {})
+            for name in server['names']:
+                if not (name.startswith(('~', '*.', '.')) or name.endswith('.*')):
+                    names.setdefault(name.lower(), i)
+        for port in server['default_listen']:
+            default_for.setdefault(port, i)
+        for name in server['names']:
+            if name.startswith('~'):
+                regexes.append([name[1:], i])
+            elif name.startswith('*.') or name.startswith('.') or name.endswith('.*'):
+                wildcards.append([name, i])
+    for port, listening in by_listen.items():
+        default_for.setdefault(port, listening[0])
+    # nginx tries the longest matching wildcard first
+    wildcards.sort(key=lambda item: -len(item[0]))
+    model.update({'by_name': by_name, 'wildcards': wildcards, 'regexes': regexes, 'by_listen': by_listen,
+                  'default_for': default_for})
+    return model
+
+
+def load_model(paths=(DEFAULT_CONFIG,), prefix=None, cache_dir=PARSE_CACHE_DIR):
+    """Parse configs (files or directories) into the indexed routing model.
+
+    prefix is the directory relative includes are resolved against; it
+    defaults to the first config's directory.
+    """
+    files = config_files(paths)
+    if prefix is None:
+        first = paths[0] if paths else DEFAULT_CONFIG
+        prefix = first if os.path.isdir(first) else os.path.dirname(os.path.abspath(first))
+    expanded, unresolved = {}, []
+    model = {'servers': [], 'upstreams': {}}
+    for path in files:
+        build_model(resolve_includes(path, prefix, cache_dir, expanded, unresolved), model)
+    model['files'] = sorted(expanded)
+    model['unresolved'] = unresolved
+    return index_model(model)
+
+
+def find_server(model, host, port='80'):
+    """Return the index of the server block nginx picks for a Host header and port"""
+    port = str(port)
+    candidates = set(model['by_listen'].get(port, []))
+    host = host.split(':')[0].lower()
+    exact = model['by_name'].get(port, {}).get(host)
+    if exact is not None:
+        return exact
+    for name, i in model['wildcards']:
+        if i not in candidates:
+            continue
+        if name.startswith('.') and (host == name[1:] or host.endswith(name)):
+            return i
+        if name.startswith('*.') and host.endswith(name[1:]):
+            return i
+        if name.endswith('.*') and host.startswith(name[:-1]):
+            return i
+    for pattern, i in model['regexes']:
+        if i in candidates and re.search(pattern, host):
+            return i
+    return model['default_for'].get(port)
+
+
+def match_location(server, uri):
+    """Return the location record nginx picks for a URI, or None.
+
+    Exact matches win, then the longest prefix if it is ^~, then the first
+    matching regex in config order, then the longest prefix.
+    """
+    longest = None
+    for location in server['locations']:
+        modifier, pattern = location['modifier'], location['pattern']
+        if modifier == '=' and uri == pattern:
+            return location
+        if modifier in ('', '^~') and uri.startswith(pattern):
+            if longest is None or len(pattern) > len(longest['pattern']):
+                longest = location
+    if longest is not None and longest['modifier'] == '^~':
+        return longest
+    for location in server['locations']:
+        if location['modifier'] in ('~', '~*') and location['parent'] is None:
+            if re.search(location['pattern'], uri, re.IGNORECASE if location['modifier'] == '~*' else 0):
+                return location
+    return longest
+
+
+def route(model, url):
+    """Return (server, location) for a URL such as http://www.foobar.com/index.php"""
+    scheme, _, rest = url.rpartition('://')
+    authority, _, path = rest.partition('/')
+    host, _, port = authority.partition(':')
+    i = find_server(model, host, port or ('443' if scheme == 'https' else '80'))
+    if i is None:
+        return None, None
+    server = model['servers'][i]
+    return server, (None if server['return'] else match_location(server, '/' + path.split('?')[0]))
+
+
+def label(text, width=LABEL_WIDTH):
+    """Shorten each line to fit a box and escape $ so matplotlib does not read regex anchors as math"""
+    half = (width - 1) // 2
+    lines = [line if len(line) <= width else f"{line[:half]}…{line[-half:]}" for line in text.split('\n')]
+    return '\n'.join(lines).replace('$', r'\$')
+
+
+def target_node(handler, target, upstreams):
+    """Return (node id, node) for the process or files a location hands requests to"""
+    host = re.sub(r'^\w+://', '', target).split('/')[0]
+    if handler in PASS_DIRECTIVES.values() and host in upstreams:
+        return f"upstream:{host}", {'label': f"upstream {host}\n{upstreams[host]['balance']}",
+                                    'style': 'upstream', 'tier': 3}
+    names = {'fastcgi': 'FastCGI', 'proxy': 'Proxy', 'uwsgi': 'uWSGI', 'scgi': 'SCGI', 'grpc': 'gRPC',
+             'memcached': 'memcached', 'static': 'Static files', 'redirect': 'Redirect', 'return': 'Return',
+             'deny': 'Deny'}
+    style = 'deny' if handler == 'deny' else 'redirect' if handler in ('redirect', 'return') else 'handler'
+    text = target.replace(' ', '\n', 1) if handler == 'redirect' else target.replace(' → ', '\n→ ')
+    return f"{handler}:{target}", {'label': label(f"{names[handler]}\n{text}"), 'style': style, 'tier': 3}
+
+
+def routing_graph(model):
+    """Return (nodes, edges) for auto_layout: clients → servers → locations → handlers → upstream members.
+
+    Locations are shared across servers when modifier, pattern and handler
+    match, so a fleet of vhosts with the same layout aggregates cleanly.
+    """
+    nodes = {'clients': {'label': 'Clients\n(Internet)', 'style': 'client', 'tier': 0}}
+    edges = []
+    for i, server in enumerate(model['servers']):
+        server_id = f"server:{i}"
+        names = server['names'][0] if server['names'] else '_'
+        if len(server['names']) > 1:
+            names += f" +{len(server['names']) - 1}"
+        listen = ', '.join(server['listen']) + (' ssl' if server['ssl'] else '')
+        nodes[server_id] = {'label': label(f"{names}\nlisten {listen}"),
+                            'style': 'redirect' if server['return'] else 'server', 'tier': 1}
+        edges.append(('clients', server_id))
+        if server['return']:
+            handler = 'redirect' if server['return'].split()[0].startswith('30') else 'return'
+            node_id, node = target_node(handler, server['return'], model['upstreams'])
+            nodes[node_id] = node
+            edges.append((server_id, node_id))
+        for location in server['locations']:
+            location_id = f"location:{location['modifier']}:{location['pattern']}:{location['handler']}"
+            nodes[location_id] = {'label': label(f"location {location['modifier']}\n{location['pattern']}"
+                                           if location['modifier'] else f"location {location['pattern']}"),
+                                  'style': 'location', 'tier': 2}
+            node_id, node = target_node(location['handler'], location['target'], model['upstreams'])
+            nodes[node_id] = node
+            edges.extend([(server_id, location_id), (location_id, node_id)])
+    for name, upstream in model['upstreams'].items():
+        for member in upstream['servers']:
+            member_id = f"upstream:{name}/{member['address']}"
+            weight = f"\nweight {member['weight']}" if member['weight'] != 1 else ''
+            nodes[member_id] = {'label': f"{member['address']}{weight}",
+                                'style': 'deny' if member['down'] or member['backup'] else 'handler', 'tier': 4}
+            if f"upstream:{name}" in nodes:
+                edges.append((f"upstream:{name}", member_id))
+    return nodes, list(dict.fromkeys(edges))
+
+
+def routing_spec(model, title=None, max_width=12):
+    """Build a diagram_engine spec of the request routing"""
+    from auto_layout import layout_spec
+
+    nodes, edges = routing_graph(model)
+    locations = sum(len(s['locations']) for s in model['servers'])
+    title = title or f"Nginx Request Routing: {len(model['servers'])} server block(s), " \
+                     f"{locations} location(s), {len(model['upstreams'])} upstream(s)"
+    spec, _ = layout_spec(nodes, edges, title, max_width, ROUTING_STYLES)
+    spec['name'] = 'nginx_routing'
+    return spec
+
+
+def create_nginx_routing_diagram(paths=(DEFAULT_CONFIG,), model=None):
+    """Create the request routing diagram straight from the nginx config"""
+    from diagram_engine import render_spec
+
+    return render_spec(routing_spec(model or load_model(paths)))
+
+
+def summarize(model, detail_limit=20):
+    """Return one line per server block and upstream; locations are listed for small configs only"""
+    lines = []
+    for server in model['servers']:
+        names = ' '.join(server['names']) or '_'
+        detail = f"listen {', '.join(server['listen'])}{' ssl' if server['ssl'] else ''}"
+        if server['return']:
+            detail += f"; return {server['return']}"
+        for location in server['locations'] if len(model['servers']) <= detail_limit else []:
+            pattern = f"{location['modifier']} {location['pattern']}".strip()
+            detail += f"\n      location {pattern:<28} → {location['handler']} {location['target']}"
+        lines.append(f"server    {names:<32} {detail}")
+    for name, upstream in model['upstreams'].items():
+        lines.append(f"upstream  {name:<32} {upstream['balance']}, {len(upstream['servers'])} server(s)")
+    for include in model['unresolved']:
+        lines.append(f"⚠️ include {include['include']} ({os.path.basename(include['file'])}:{include['line']}): "
+                     f"{include['reason']}")
+    return lines
+
+
+def write_sample_fleet(directory, vhosts):
+    """Write a conf directory with vhosts sites sharing one snippet and upstream, for benchmarking"""
+    sites = os.path.join(directory, 'sites-enabled')
+    os.makedirs(os.path.join(directory, 'snippets'), exist_ok=True)
+    os.makedirs(sites, exist_ok=True)
+    with open(os.path.join(directory, 'nginx.conf'), 'w', encoding='utf-8') as config:
+        config.write("http {\n    upstream app {\n        least_conn;\n"
+                     "        server 10.0.0.2:8000 weight=2;\n        server 10.0.0.3:8000;\n    }\n"
+                     "    include sites-enabled/*.conf;\n}\n")
+    with open(os.path.join(directory, 'snippets', 'php.conf'), 'w', encoding='utf-8') as snippet:
+        snippet.write("location ~ \\.php$ {\n    fastcgi_pass unix:/var/run/php/php7.4-fpm.sock;\n}\n"
+                      "location ~ /\\. {\n    deny all;\n}\n")
+    for i in range(vhosts):
+        with open(os.path.join(sites, f"site{i:04d}.conf"), 'w', encoding='utf-8') as config:
+            config.write(f"server {{\n    listen 80;\n    server_name site{i}.example.com;\n"
+                         f"    root /var/www/site{i};\n    location / {{\n        try_files $uri /index.php;\n"
+                         f"    }}\n    location /api/ {{\n        proxy_pass http://app;\n    }}\n"
+                         f"    include snippets/php.conf;\n}}\n")
+
+
+def benchmark(vhosts):
+    """Time cold, cached and one-file-edited loads of a generated vhost fleet"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'cache')
+        write_sample_fleet(directory, vhosts)
+        main_config = os.path.join(directory, 'nginx.conf')
+        edited = os.path.join(directory, 'sites-enabled', 'site0000.conf')
+        for name in ('cold', 'memory cache', 'disk cache', 'one file edited'):
+            if name == 'disk cache':
+                # A fresh process: nothing in memory, every file found by hash on disk
+                _file_cache.clear()
+            elif name == 'one file edited':
+                with open(edited, 'a', encoding='utf-8') as config:
+                    config.write("server {\n    listen 8080;\n    server_name extra.example.com;\n}\n")
+            start = time.perf_counter()
+            model = load_model([main_config], cache_dir=cache_dir)
+            print(f"⏱️ {name:<16} {(time.perf_counter() - start) * 1000:8.1f} ms "
+                  f"({len(model['files'])} files, {len(model['servers'])} servers)")
+    return True
+
+
+def main(argv=None):
+    """Parse nginx configs, print the routing model and render its diagram"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('configs', nargs='*', default=[DEFAULT_CONFIG],
+                        help='config files or directories of vhosts (default: nginx_config.conf)')
+    parser.add_argument('-p', '--prefix',
+                        help='directory relative includes are resolved against (default: the first config\'s)')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='diagram file, .png/.svg/.pdf (default: build/nginx_routing.png)')
+    parser.add_argument('--route', metavar='URL', action='append',
+                        help='show which server and location handle a URL (repeatable)')
+    parser.add_argument('--spec', help='also write the diagram spec as JSON for diagram_engine.py')
+    parser.add_argument('--json', action='store_true', help='print the routing model as JSON')
+    parser.add_argument('--no-diagram', action='store_true', help='parse and summarize only')
+    parser.add_argument('--no-cache', action='store_true', help='always re-parse every file')
+    parser.add_argument('--benchmark', type=int, metavar='VHOSTS',
+                        help='time cold and cached loads of a generated vhost fleet')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark)
+
+    start = time.perf_counter()
+    try:
+        model = load_model(args.configs, args.prefix, None if args.no_cache else PARSE_CACHE_DIR)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    seconds = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(model, indent=2))
+        return True
+
+    print(f"📄 Parsed {len(model['files'])} file(s) in {seconds * 1000:.1f} ms")
+    for line in summarize(model):
+        print(f"   {line}")
+    for url in args.route or []:
+        server, location = route(model, url)
+        if server is None:
+            print(f"🔀 {url} → no server listens on that port")
+        elif location is None:
+            print(f"🔀 {url} → {server['names'][0] if server['names'] else '_'} "
+                  f"({os.path.basename(server['file'])}:{server['line']}) → {server['return'] or '404'}")
+        else:
+            pattern = f"{location['modifier']} {location['pattern']}".strip()
+            print(f"🔀 {url} → {server['names'][0] if server['names'] else '_'} → location {pattern} ({os.path.basename(location['file'])}:"
+                  f"{location['line']}) → {location['handler']} {location['target']}")
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    if args.spec:
+        with open(args.spec, 'w', encoding='utf-8') as spec_file:
+            json.dump(routing_spec(model), spec_file, indent=2)
+        print(f"📝 Spec saved to {args.spec}")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_nginx_routing_diagram(model=model)
+    save_figure(fig, args.output, dpi=150)
+    plt.close(fig)
+    print(f"📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
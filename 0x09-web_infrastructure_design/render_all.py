@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Batch Diagram Renderer
+Discovers every create_*_diagram function in the four generator modules and
+renders them concurrently in a process pool.
+"""
+
+import argparse
+import ast
+import os
+import re
+import sys
+import time
+
+from render_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, RenderCache, cached_parse, diagram_keys
+from vector_output import DEFAULT_DPI, parse_formats, with_format
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GENERATOR_MODULES = [
+    'diagram_generator',
+    'distributed_diagram_generator',
+    'secured_diagram_generator',
+    'scale_up_diagram_generator',
+]
+
+# Output file per diagram function, as written by each generator's __main__/main()
+OUTPUT_FILES = {
+    'create_infrastructure_diagram': 'simple_web_stack_diagram.png',
+    'create_request_flow_diagram': 'request_flow_diagram.png',
+    'create_distributed_infrastructure_diagram': 'distributed_infrastructure_diagram.png',
+    'create_load_balancing_diagram': 'load_balancing_diagram.png',
+    'create_database_replication_diagram': 'database_replication_diagram.png',
+    'create_infrastructure_issues_diagram': 'infrastructure_issues_diagram.png',
+    'create_secured_infrastructure_diagram': 'secured_infrastructure_diagram.png',
+    'create_security_features_diagram': 'security_layers_diagram.png',
+    'create_monitoring_flow_diagram': 'monitoring_flow_diagram.png',
+    'create_ssl_encryption_diagram': 'ssl_encryption_diagram.png',
+    'create_scale_up_infrastructure_diagram': 'scale_up_infrastructure_diagram.png',
+    'create_component_separation_diagram': 'component_separation_comparison.png',
+    'create_load_balancer_clustering_diagram': 'load_balancer_clustering_diagram.png',
+    'create_resource_optimization_diagram': 'resource_optimization_diagram.png',
+}
+
+DIAGRAM_FUNCTION = re.compile(r'^create_\w+_diagram$')
+DISCOVER_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'discover')
+_names_cache = {}
+
+
+def output_file_for(func_name, fmt='png'):
+    """Return the file name a diagram function renders to in fmt"""
+    return with_format(OUTPUT_FILES.get(func_name, func_name[len('create_'):] + '.png'), fmt)
+
+
+def _diagram_names(path):
+    with open(path, encoding='utf-8') as source:
+        tree = ast.parse(source.read(), filename=path)
+    return [node.name for node in tree.body
+            if isinstance(node, ast.FunctionDef) and DIAGRAM_FUNCTION.match(node.name)]
+
+
+def discover_diagrams(modules=None, base_dir=BASE_DIR):
+    """Find every create_*_diagram function by parsing the generator sources.
+
+    The modules are parsed rather than imported so discovery never pays for
+    matplotlib; the returned (module, function) pairs keep source order.
+    The names are cached by file contents, so unchanged modules are not
+    parsed again.
+    """
+    diagrams = []
+    for module_name in modules or GENERATOR_MODULES:
+        path = os.path.join(base_dir, module_name + '.py')
+        for func_name in cached_parse(path, _diagram_names, DISCOVER_CACHE_DIR, memory=_names_cache):
+            diagrams.append((module_name, func_name))
+    return diagrams
+
+
+def _init_worker(output_dir):
+    """Pin each worker to the Agg backend and the output directory"""
+    from headless import use_headless
+    use_headless()
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.chdir(output_dir)
+
+
+def render_diagram(module_name, func_name, output_dir, formats=('png',), dpi=DEFAULT_DPI):
+    """Render one diagram in each format and return its timing/memory record"""
+    import gc
+    import importlib
+    import matplotlib.pyplot as plt
+    from headless import peak_rss_mb, rss_mb
+    from vector_output import save_figure
+
+    module = importlib.import_module(module_name)
+    before = rss_mb()
+    start = time.perf_counter()
+    fig = getattr(module, func_name)()
+    outputs = []
+    for fmt in formats:
+        outputs.append(output_file_for(func_name, fmt))
+        save_figure(fig, os.path.join(output_dir, outputs[-1]), fmt, dpi)
+    # Free the figure before the worker takes its next diagram
+    plt.close(fig)
+    del fig
+    gc.collect()
+    return {
+        'module': module_name,
+        'diagram': func_name,
+        'output': ', '.join(outputs),
+        'outputs': outputs,
+        'seconds': time.perf_counter() - start,
+        'rss_mb': rss_mb(),
+        'rss_delta_mb': rss_mb() - before,
+        'peak_rss_mb': peak_rss_mb(),
+        'open_figures': len(plt.get_fignums()),
+        'pid': os.getpid(),
+    }
+
+
+def render_all(diagrams, output_dir=BASE_DIR, workers=None, formats=('png',), dpi=DEFAULT_DPI):
+    """Render diagrams across a process pool; return (results, failures)"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(diagrams)))
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(output_dir,)) as pool:
+        futures = {
+            pool.submit(render_diagram, module_name, func_name, output_dir, formats, dpi): (module_name, func_name)
+            for module_name, func_name in diagrams
+        }
+        for future in as_completed(futures):
+            module_name, func_name = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append((module_name, func_name, e))
+    return results, failures
+
+
+def print_summary(results, failures, wall_seconds, workers, cached=()):
+    """Print the per-diagram timing summary"""
+    print(f"\n{'Diagram':<45} {'Output':<40} {'Seconds':>8} {'RSS MB':>8} {'Δ MB':>7} {'Peak MB':>8}")
+    print('-' * 121)
+    for record in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        print(f"{record['diagram']:<45} {record['output']:<40} {record['seconds']:>8.2f} "
+              f"{record['rss_mb']:>8.0f} {record['rss_delta_mb']:>+7.1f} {record['peak_rss_mb']:>8.0f}")
+    for _, func_name, output in cached:
+        print(f"{func_name:<45} {output:<40} {'cached':>8}")
+    for module_name, func_name, error in failures:
+        print(f"❌ {module_name}.{func_name}: {error}")
+
+    serial = sum(r['seconds'] for r in results)
+    print('-' * 121)
+    print(f"Rendered {len(results)} diagram(s) with {workers} worker(s) in {wall_seconds:.2f}s "
+          f"(serial render time {serial:.2f}s)")
+    if results:
+        leaked = sum(r['open_figures'] for r in results)
+        peak = max(r['peak_rss_mb'] for r in results)
+        print(f"Peak worker RSS {peak:.0f} MB, {leaked} figure(s) left open")
+
+
+def main(argv=None):
+    """Render all discovered diagrams in parallel"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('diagrams', nargs='*',
+                        help='only render these diagram functions (default: all)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('-o', '--output-dir', default=BASE_DIR,
+                        help='directory for the rendered files (default: this directory)')
+    parser.add_argument('-F', '--format', default='png', type=parse_formats,
+                        help='comma-separated output formats: svg, pdf, png (default: png)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help='PNG resolution (default: 300)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='re-render every diagram even if its inputs are unchanged')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='bypass the render cache entirely')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='render cache directory (default: .render_cache)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='render cache size limit in MB, LRU-evicted (default: 64)')
+    args = parser.parse_args(argv)
+
+    diagrams = discover_diagrams()
+    if args.diagrams:
+        unknown = set(args.diagrams) - {func for _, func in diagrams}
+        if unknown:
+            parser.error(f"unknown diagram(s): {', '.join(sorted(unknown))}")
+        diagrams = [d for d in diagrams if d[1] in args.diagrams]
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    cache, cached, pending = None, [], diagrams
+    if not args.no_cache:
+        cache = RenderCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        keys = {fmt: diagram_keys(diagrams, dpi=args.dpi, fmt=fmt) for fmt in args.format}
+        if not args.force:
+            pending = []
+            for diagram in diagrams:
+                # A diagram is only skipped when every requested format is cached
+                hits = [fmt for fmt in args.format
+                        if cache.fetch(keys[fmt][diagram],
+                                       os.path.join(output_dir, output_file_for(diagram[1], fmt)))]
+                if len(hits) == len(args.format):
+                    cached.append((*diagram, ', '.join(output_file_for(diagram[1], f) for f in hits)))
+                else:
+                    pending.append(diagram)
+
+    workers = max(1, min(args.workers or 1, len(pending)))
+    results, failures = [], []
+    if pending:
+        print(f"🎨 Rendering {len(pending)} diagram(s) with {workers} worker(s)...")
+        results, failures = render_all(pending, output_dir, workers, args.format, args.dpi)
+    else:
+        print("✅ All diagrams are up to date")
+
+    if cache is not None:
+        for record in results:
+            for fmt, output in zip(args.format, record['outputs']):
+                key = keys[fmt][(record['module'], record['diagram'])]
+                cache.store(key, os.path.join(output_dir, output))
+        cache.save()
+
+    print_summary(results, failures, time.perf_counter() - start, workers, cached)
+    if cache is not None:
+        print(cache.report())
+
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
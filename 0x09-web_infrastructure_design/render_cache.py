@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Render Cache
+Keys each diagram on a hash of its inputs so unchanged diagrams are copied
+from a local cache instead of being re-rasterized.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, '.render_cache')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _matplotlib_version():
+    """Return the installed matplotlib version without importing it"""
+    from importlib import metadata
+
+    try:
+        return metadata.version('matplotlib')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def _sibling_sources(node, base_dir):
+    """Return AST dumps of sibling modules imported anywhere inside node"""
+    dumps = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.ImportFrom):
+            names = [child.module]
+        elif isinstance(child, ast.Import):
+            names = [alias.name for alias in child.names]
+        else:
+            continue
+        for name in names:
+            helper = os.path.join(base_dir, f"{name}.py")
+            if name and os.path.exists(helper):
+                with open(helper, encoding='utf-8') as source:
+                    dumps.append(ast.dump(ast.parse(source.read(), filename=helper)))
+    return dumps
+
+
+def _module_inputs(path):
+    """Split a generator module into its shared preamble and per-function ASTs.
+
+    The preamble is every top-level statement that is not a create_*_diagram
+    function or the main()/__main__ driver: imports, style and rcParams setup
+    and any shared helpers. Sibling modules (such as batch_draw) count as
+    inputs of whichever part imports them, at module level or inside a
+    function. ast.dump() drops line numbers and comments, so reformatting a
+    file does not invalidate its diagrams.
+    """
+    with open(path, encoding='utf-8') as source:
+        tree = ast.parse(source.read(), filename=path)
+
+    base_dir = os.path.dirname(path)
+    preamble, functions = [], {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            if node.name.startswith('create_') and node.name.endswith('_diagram'):
+                functions[node.name] = '\n'.join([ast.dump(node), *_sibling_sources(node, base_dir)])
+                continue
+            if node.name == 'main':
+                continue
+        if isinstance(node, ast.If) and '__main__' in ast.dump(node.test):
+            continue
+        preamble.append(ast.dump(node))
+        preamble.extend(_sibling_sources(node, base_dir))
+    return '\n'.join(preamble), functions
+
+
+def diagram_keys(diagrams, base_dir=BASE_DIR, dpi=300, fmt='png'):
+    """Return {(module, function): cache key} for the given diagrams"""
+    version = _matplotlib_version()
+    parsed, keys = {}, {}
+    for module_name, func_name in diagrams:
+        if module_name not in parsed:
+            parsed[module_name] = _module_inputs(os.path.join(base_dir, module_name + '.py'))
+        preamble, functions = parsed[module_name]
+        payload = json.dumps({
+            'module': module_name,
+            'function': func_name,
+            'body': functions[func_name],
+            'preamble': preamble,
+            'matplotlib': version,
+            'dpi': dpi,
+            'format': fmt,
+        }, sort_keys=True)
+        keys[(module_name, func_name)] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return keys
+
+
+def file_digest(path):
+    """Return the SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as artifact:
+        for block in iter(lambda: artifact.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_parse(path, parse, cache_dir=None, version=1, memory=None):
+    """Return parse(path), reusing an earlier result for the same file.
+
+    memory maps path -> ((mtime_ns, size), result), so an untouched file
+    costs a single stat. On a miss the content hash is looked up under
+    cache_dir, so touched or reverted files are not parsed again either.
+    Results are pickled (much faster to load than JSON) and keyed on path,
+    contents and version.
+    """
+    import pickle
+
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if memory is not None and path in memory and memory[path][0] == stamp:
+        return memory[path][1]
+
+    result, cache_path = None, None
+    if cache_dir:
+        key = hashlib.sha256(f"{version}:{os.path.abspath(path)}:{file_digest(path)}".encode('utf-8'))
+        cache_path = os.path.join(cache_dir, key.hexdigest() + '.pickle')
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                result = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            result = None
+    if result is None:
+        result = parse(path)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as cache_file:
+                pickle.dump(result, cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+    if memory is not None:
+        memory[path] = (stamp, result)
+    return result
+
+
+class RenderCache:
+    """Size-bounded LRU store of rendered artifacts keyed by input hash"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose artifact vanished from disk
+        return {key: entry for key, entry in index.items()
+                if os.path.exists(self._artifact_path(key, entry['suffix']))}
+
+    def _artifact_path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def save(self):
+        """Persist the index atomically"""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as index_file:
+            json.dump(self.index, index_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self.index.values())
+
+    def fetch(self, key, dest):
+        """Restore a cached artifact to dest; return True on a hit.
+
+        dest is only rewritten when its contents differ from the cached copy,
+        so unchanged PNGs keep their mtime.
+        """
+        entry = self.index.get(key)
+        if entry is None:
+            self.misses += 1
+            return False
+
+        if not (os.path.exists(dest) and os.path.getsize(dest) == entry['size']
+                and file_digest(dest) == entry['sha256']):
+            shutil.copyfile(self._artifact_path(key, entry['suffix']), dest)
+        entry['last_access'] = time.time()
+        self.hits += 1
+        return True
+
+    def store(self, key, src):
+        """Copy a freshly rendered artifact into the cache and evict as needed"""
+        suffix = os.path.splitext(src)[1]
+        shutil.copyfile(src, self._artifact_path(key, suffix))
+        self.index[key] = {
+            'suffix': suffix,
+            'size': os.path.getsize(src),
+            'sha256': file_digest(src),
+            'source': os.path.basename(src),
+            'last_access': time.time(),
+        }
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used artifacts until the cache fits max_bytes"""
+        total = self.total_bytes
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._artifact_path(key, entry['suffix']))
+            except OSError:
+                pass
+            total -= entry['size']
+            del self.index[key]
+            self.evictions += 1
+
+    def report(self):
+        """Return a one-line hit/miss summary"""
+        return (f"Cache: {self.hits} hit(s), {self.misses} miss(es), {self.evictions} eviction(s), "
+                f"{len(self.index)} entr(ies) using {self.total_bytes / 1024 / 1024:.1f} MB "
+                f"of {self.max_bytes / 1024 / 1024:.0f} MB")
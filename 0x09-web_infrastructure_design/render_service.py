@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Diagram Render Service
+Local HTTP service that renders any create_*_diagram on request: an asyncio
+front end hands renders to a pool of pre-warmed worker processes and keeps
+the results in a bounded in-memory LRU with ETag/If-None-Match revalidation.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from render_all import BASE_DIR, GENERATOR_MODULES, discover_diagrams, output_file_for
+from render_cache import DEFAULT_MAX_BYTES, diagram_keys
+from vector_output import FORMATS, VECTOR_FORMATS, parse_formats
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8089
+DEFAULT_DPI = 100
+DPI_RANGE = (20, 600)
+WIDTH_RANGE = (100, 10000)
+PERCENTILES = (50, 95, 99)
+WARM_UP_TIMEOUT = 300
+# Latencies kept per outcome for the metrics percentiles
+LATENCY_WINDOW = 10000
+CONTENT_TYPES = {'svg': 'image/svg+xml', 'pdf': 'application/pdf', 'png': 'image/png', 'json': 'application/json'}
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """An error answered with its status and a JSON message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ArtifactCache:
+    """Byte-bounded in-memory LRU of rendered artifacts"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store entry = (etag, data, render seconds), evicting the least recently used"""
+        if len(entry[1]) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old[1])
+        self.entries[key] = entry
+        self.bytes += len(entry[1])
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted[1])
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def _init_worker(barrier):
+    """Import matplotlib and every generator, and draw once, before the first request"""
+    import importlib
+    import signal
+    from watch import warm_up
+
+    # Ctrl-C reaches the whole process group; the service shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    warm_up()
+    for module_name in GENERATOR_MODULES:
+        importlib.import_module(module_name)
+    barrier.wait()
+
+
+def _worker_ready():
+    pass
+
+
+def render_artifact(module_name, func_name, fmt, dpi, width=None):
+    """Render one diagram in a worker; return (bytes, seconds).
+
+    width (pixels) picks the dpi from the figure's width, so a PNG comes out
+    about that wide before the tight bounding box trims the margins.
+    """
+    import importlib
+    import matplotlib.pyplot as plt
+    from vector_output import render_bytes
+
+    start = time.perf_counter()
+    fig = getattr(importlib.import_module(module_name), func_name)()
+    try:
+        if width:
+            dpi = width / fig.get_size_inches()[0]
+        return render_bytes(fig, fmt, dpi), time.perf_counter() - start
+    finally:
+        plt.close(fig)
+
+
+def _percentiles_ms(values):
+    if not values:
+        return None
+    ms = np.array(values) * 1000
+    summary = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))}
+    summary.update(count=len(ms), max=float(ms.max()))
+    return summary
+
+
+class RenderService:
+    """Routes requests to the cache or the worker pool and keeps the metrics"""
+
+    def __init__(self, workers=2, cache_bytes=DEFAULT_MAX_BYTES, default_dpi=DEFAULT_DPI):
+        self.workers = workers
+        self.default_dpi = default_dpi
+        self.cache = ArtifactCache(cache_bytes)
+        self.pool = None
+        self.pending = {}
+        self.diagrams = {}
+        for module_name, func_name in discover_diagrams():
+            name = os.path.splitext(output_file_for(func_name))[0]
+            self.diagrams[name] = self.diagrams[func_name] = (module_name, func_name, name)
+        # Input hashes (sources, helpers, matplotlib) behind every ETag; restart after editing a generator
+        self.sources = diagram_keys({entry[:2] for entry in self.diagrams.values()}, dpi=0, fmt='')
+        self.latency = {}
+        self.render_seconds = {}
+        self.requests = 0
+        self.started = time.time()
+        self.warm_seconds = None
+
+    def start_pool(self):
+        """Start the workers and wait until every one has finished warming up"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        start = time.perf_counter()
+        # No worker takes a task before all are warm, so each submit starts a new process
+        barrier = multiprocessing.Barrier(self.workers + 1)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(barrier,))
+        for _ in range(self.workers):
+            self.pool.submit(_worker_ready)
+        barrier.wait(timeout=WARM_UP_TIMEOUT)
+        self.warm_seconds = time.perf_counter() - start
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def etag(self, module_name, func_name, fmt, dpi, width):
+        key = f"{self.sources[(module_name, func_name)]}:{fmt}:{dpi}:{width}"
+        return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+
+    def _parameters(self, path, query):
+        """Return (module, function, name, format, dpi, width) for /diagrams/<name>.<format>"""
+        name, _, fmt = path[len('/diagrams/'):].rpartition('.')
+        if name not in self.diagrams:
+            raise HTTPError(404, f"unknown diagram: {name or path}")
+        if fmt not in FORMATS:
+            raise HTTPError(404, f"unsupported format: {fmt} (choose from {', '.join(FORMATS)})")
+        values = {}
+        for option, (lo, hi) in (('dpi', DPI_RANGE), ('width', WIDTH_RANGE)):
+            if option in query:
+                try:
+                    values[option] = int(query[option][-1])
+                except ValueError:
+                    raise HTTPError(400, f"{option} must be an integer") from None
+                if not lo <= values[option] <= hi:
+                    raise HTTPError(400, f"{option} must be within {lo}-{hi}")
+        if len(values) == 2:
+            raise HTTPError(400, 'give dpi or width, not both')
+        module_name, func_name, name = self.diagrams[name]
+        if fmt in VECTOR_FORMATS:
+            # Vectors scale in the browser; one artifact serves every size
+            return module_name, func_name, name, fmt, self.default_dpi, None
+        width = values.get('width')
+        return module_name, func_name, name, fmt, None if width else values.get('dpi', self.default_dpi), width
+
+    async def artifact(self, module_name, func_name, fmt, dpi, width):
+        """Return ((etag, bytes, render seconds), outcome), rendering once per key however many ask"""
+        key = (func_name, fmt, dpi, width)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry, 'hit'
+        task = self.pending.get(key)
+        outcome = 'coalesced' if task else 'miss'
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(self._render(key, module_name, func_name, fmt, dpi, width))
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(task), outcome
+
+    async def _render(self, key, module_name, func_name, fmt, dpi, width):
+        loop = asyncio.get_running_loop()
+        data, seconds = await loop.run_in_executor(self.pool, render_artifact, module_name, func_name, fmt, dpi, width)
+        entry = (self.etag(module_name, func_name, fmt, dpi, width), data, seconds)
+        self.cache.put(key, entry)
+        self.render_seconds.setdefault(func_name, []).append(seconds)
+        return entry
+
+    def metrics(self):
+        return {
+            'uptime_s': time.time() - self.started,
+            'requests': self.requests,
+            'workers': self.workers,
+            'warm_up_s': self.warm_seconds,
+            'cache': self.cache.stats(),
+            'latency_ms': {outcome: _percentiles_ms(values) for outcome, values in self.latency.items()},
+            'render_ms': {func: _percentiles_ms(values) for func, values in sorted(self.render_seconds.items())},
+        }
+
+    def index(self):
+        return [{'name': name, 'module': module_name, 'function': func_name,
+                 'urls': [f"/diagrams/{name}.{fmt}" for fmt in FORMATS]}
+                for key, (module_name, func_name, name) in self.diagrams.items() if key == name]
+
+    async def respond(self, method, target, headers):
+        """Return (status, headers, body, outcome) for one request"""
+        if method not in ('GET', 'HEAD'):
+            raise HTTPError(405, f"{method} not allowed")
+        url = urlsplit(target)
+        if url.path in ('/', '/diagrams'):
+            return 200, {'Content-Type': CONTENT_TYPES['json']}, json.dumps(self.index(), indent=1).encode(), 'index'
+        if url.path == '/metrics':
+            return 200, {'Content-Type': CONTENT_TYPES['json']}, json.dumps(self.metrics(), indent=1).encode(), 'metrics'
+        if not url.path.startswith('/diagrams/'):
+            raise HTTPError(404, f"not found: {url.path}")
+
+        module_name, func_name, name, fmt, dpi, width = self._parameters(url.path, parse_qs(url.query))
+        etag = self.etag(module_name, func_name, fmt, dpi, width)
+        common = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        # The ETag hashes the inputs, so a match needs no render even after an eviction
+        match = headers.get('if-none-match', '')
+        if match.strip() == '*' or etag in (tag.strip().removeprefix('W/') for tag in match.split(',')):
+            return 304, common, b'', 'not_modified'
+        try:
+            (_, data, seconds), outcome = await self.artifact(module_name, func_name, fmt, dpi, width)
+        except Exception as e:
+            raise HTTPError(500, f"{func_name} failed: {e}") from e
+        common.update({'Content-Type': CONTENT_TYPES[fmt], 'X-Cache': outcome, 'X-Render-Ms': f"{seconds * 1000:.1f}",
+                       'Content-Disposition': f'inline; filename="{name}.{fmt}"'})
+        return 200, common, data, outcome
+
+    async def handle(self, reader, writer):
+        """Serve requests on one keep-alive connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(_response(400, {'Content-Type': CONTENT_TYPES['json']},
+                                           b'{"error": "request headers too large"}', close=True))
+                    break
+                start = time.perf_counter()
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    writer.write(_response(400, {}, b'', close=True))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    field, sep, value = line.partition(':')
+                    if sep:
+                        headers[field.strip().lower()] = value.strip()
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                try:
+                    status, response_headers, body, outcome = await self.respond(method, target, headers)
+                except HTTPError as e:
+                    status, outcome = e.status, 'error'
+                    response_headers = {'Content-Type': CONTENT_TYPES['json']}
+                    body = json.dumps({'error': str(e)}).encode()
+                writer.write(_response(status, response_headers, body, close, head_only=method == 'HEAD'))
+                await writer.drain()
+                self.requests += 1
+                self.latency.setdefault(outcome, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start)
+                if close:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away, or the server is shutting down with the connection open
+            pass
+        finally:
+            writer.close()
+
+
+def _response(status, headers, body, close=False, head_only=False):
+    lines = [f"HTTP/1.1 {status} {STATUS[status]}", f"Content-Length: {len(body)}",
+             f"Connection: {'close' if close else 'keep-alive'}"]
+    lines.extend(f"{field}: {value}" for field, value in headers.items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (b'' if head_only or status == 304 else body)
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, preload=(), ready=None):
+    """Run the HTTP front end until cancelled; ready(port) is called once it listens"""
+    server = await asyncio.start_server(service.handle, host, port)
+    port = server.sockets[0].getsockname()[1]
+    if preload:
+        start = time.perf_counter()
+        diagrams = {entry[:2] for entry in service.diagrams.values()}
+        await asyncio.gather(*(service.artifact(module_name, func_name, fmt, service.default_dpi, None)
+                               for module_name, func_name in sorted(diagrams) for fmt in preload))
+        print(f"📦 Preloaded {len(diagrams) * len(preload)} artifact(s) in {time.perf_counter() - start:.1f}s")
+    if ready:
+        ready(port)
+    async with server:
+        await server.serve_forever()
+
+
+async def _fetch(reader, writer, path, headers=None):
+    """Send one GET on a keep-alive connection; return (status, headers, body, seconds)"""
+    start = time.perf_counter()
+    extra = ''.join(f"{field}: {value}\r\n" for field, value in (headers or {}).items())
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode('latin-1'))
+    await writer.drain()
+    lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    response = {}
+    for line in lines[1:]:
+        field, sep, value = line.partition(':')
+        if sep:
+            response[field.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(response.get('content-length', 0)))
+    return int(lines[0].split(' ')[1]), response, body, time.perf_counter() - start
+
+
+async def _benchmark(service, requests, fmt):
+    """Cold renders of every diagram, then cached hits and revalidations over keep-alive"""
+    loop = asyncio.get_running_loop()
+    listening = loop.create_future()
+    server = asyncio.ensure_future(serve(service, port=0, ready=listening.set_result))
+    port = await listening
+    names = sorted(name for name, entry in service.diagrams.items() if entry[2] == name)
+    paths = [f"/diagrams/{name}.{fmt}" for name in names]
+
+    async def cold(path):
+        reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+        try:
+            return await _fetch(reader, writer, path)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    first = await asyncio.gather(*(cold(path) for path in paths))
+    cold_wall = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+    hits, revalidated, same = [], [], all(status == 200 for status, _, _, _ in first)
+    for i in range(requests):
+        status, headers, body, seconds = await _fetch(reader, writer, paths[i % len(paths)])
+        hits.append(seconds)
+        same &= status == 200 and headers.get('x-cache') == 'hit' and body == first[i % len(paths)][2]
+    for i in range(requests):
+        etag = first[i % len(paths)][1]['etag']
+        status, _, body, seconds = await _fetch(reader, writer, paths[i % len(paths)], {'If-None-Match': etag})
+        revalidated.append(seconds)
+        same &= status == 304 and not body
+    writer.close()
+    server.cancel()
+    return first, cold_wall, hits, revalidated, same
+
+
+def benchmark(requests, workers, fmt='png'):
+    """Time cold renders, cache hits and 304s end to end, and check hits stay under a millisecond"""
+    service = RenderService(workers)
+    service.start_pool()
+    print(f"🔥 {service.workers} worker(s) warmed up in {service.warm_seconds:.2f}s")
+    try:
+        first, cold_wall, hits, revalidated, same = asyncio.run(_benchmark(service, requests, fmt))
+    finally:
+        service.close()
+    renders = [float(headers['x-render-ms']) for _, headers, _, _ in first]
+    print(f"⏱️ {len(first)} cold {fmt} renders in {cold_wall:.2f}s wall "
+          f"(render {min(renders):.0f}-{max(renders):.0f} ms each, {sum(len(b) for *_, b, _ in first) / 1024:,.0f} KB)")
+    server = service.metrics()['latency_ms']
+    for label, values, outcome in (('cache hits', hits, 'hit'), ('304 replies', revalidated, 'not_modified')):
+        client, inside = _percentiles_ms(values), server[outcome]
+        print(f"⏱️ {len(values):,} {label:<11} round trip p50 {client['p50']:.3f} p99 {client['p99']:.3f} ms; "
+              f"server p50 {inside['p50']:.3f} p99 {inside['p99']:.3f} ms")
+    fast = server['hit']['p99'] < 1.0
+    print(f"   Cached hits under 1 ms at p99: {'yes' if fast else 'NO'}; "
+          f"responses identical and revalidated: {'yes' if same else 'NO'}")
+    return same and fast
+
+
+def main(argv=None):
+    """Serve the diagrams over HTTP"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     epilog='GET /diagrams lists the diagrams, /diagrams/<name>.<svg|pdf|png>'
+                                            '?dpi=N or ?width=PX renders one, /metrics reports cache and latency.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument('-j', '--workers', type=int, default=min(os.cpu_count() or 1, 4),
+                        help='render worker processes (default: CPU count, at most 4)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='in-memory cache limit in MB, LRU-evicted (default: 64)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help=f"PNG resolution without ?dpi= (default: {DEFAULT_DPI})")
+    parser.add_argument('--preload', type=parse_formats, default=(),
+                        help='render every diagram in these formats before serving, e.g. svg,png')
+    parser.add_argument('--benchmark', type=int, metavar='REQUESTS', help='measure cold, cached and 304 latency')
+    args = parser.parse_args(argv)
+    if args.workers <= 0 or args.cache_size <= 0 or not DPI_RANGE[0] <= args.dpi <= DPI_RANGE[1]:
+        parser.error(f"--workers and --cache-size must be positive and --dpi within {DPI_RANGE[0]}-{DPI_RANGE[1]}")
+
+    if args.benchmark:
+        return benchmark(args.benchmark, args.workers)
+    service = RenderService(args.workers, args.cache_size * 1024 * 1024, args.dpi)
+    service.start_pool()
+    print(f"🔥 {service.workers} worker(s) warmed up in {service.warm_seconds:.2f}s")
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.preload,
+                          ready=lambda port: print(f"🌐 Serving {len(service.index())} diagrams on "
+                                                   f"http://{args.host}:{port}/diagrams")))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        service.close()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
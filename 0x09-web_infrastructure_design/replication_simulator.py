@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Replication Lag Simulator
+Simulates MySQL primary-replica binlog shipping and parallel replica apply
+for millions of transactions, and reports replication lag over time and the
+probability that a read right after a write misses it on a replica.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'replication_lag.png')
+PERCENTILES = (50, 95, 99, 99.9)
+# Read-after-write delays reported in the table (ms)
+READ_DELAYS_MS = (0, 1, 5, 10, 50, 100, 500, 1000)
+# Reads slow the applier by 1 / (1 - read utilization), capped at this factor
+MAX_SLOWDOWN = 20
+ENGINES = ('vector', 'events')
+
+
+def primary_workload(rate, duration, apply_ms, sigma=1.0, bursts=(), seed=0):
+    """Return {'commit', 'apply'} arrays: primary commit times (s) and replica apply costs (s).
+
+    Commits are a Poisson process at rate transactions/s, multiplied by each
+    (at, seconds, factor) burst while it lasts; apply costs are lognormal with
+    mean apply_ms.
+    """
+    rng = np.random.default_rng(seed)
+    edges = sorted({0.0, float(duration)} | {min(max(b[0], 0.0), duration) for b in bursts}
+                   | {min(max(b[0] + b[1], 0.0), duration) for b in bursts})
+    times = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        factor = np.prod([b[2] for b in bursts if b[0] <= start < b[0] + b[1]] or [1.0])
+        count = rng.poisson(rate * factor * (end - start))
+        times.append(np.sort(rng.uniform(start, end, count)))
+    commit = np.concatenate(times)
+    mean = apply_ms / 1000.0
+    costs = rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, len(commit))
+    return {'commit': commit, 'apply': costs}
+
+
+def group_commits(commit, group_ms):
+    """Return (group per transaction, flush time per group) for binlog group commit.
+
+    Transactions committing in the same group_ms window are flushed together
+    at its end, like binlog_group_commit_sync_delay; with LOGICAL_CLOCK a
+    replica may apply one group's transactions in parallel. group_ms 0 makes
+    every transaction its own group.
+    """
+    if group_ms <= 0:
+        return np.arange(len(commit)), commit.copy()
+    window = np.floor(commit / (group_ms / 1000.0)).astype(np.int64)
+    starts = np.ones(len(window), dtype=bool)
+    starts[1:] = window[1:] != window[:-1]
+    group = np.cumsum(starts) - 1
+    return group, (window[starts] + 1) * (group_ms / 1000.0)
+
+
+def ship_groups(flush, network_ms, jitter_ms, rng):
+    """Return when each group reaches the replica's relay log.
+
+    Each group takes network_ms plus an exponential jitter; the replication
+    stream is one TCP connection, so a group never arrives before the one
+    flushed before it.
+    """
+    delay = network_ms / 1000.0 + (rng.exponential(jitter_ms / 1000.0, len(flush)) if jitter_ms > 0 else 0.0)
+    return np.maximum.accumulate(flush + delay)
+
+
+def schedule_groups(group, costs, workers):
+    """Return each transaction's finish offset from its group's start, and each group's makespan.
+
+    A group's transactions go in commit order to whichever worker frees up
+    first (greedy list scheduling, as the replica coordinator does). The
+    first `workers` of every group start at once; the rest are placed round
+    by round, each round handling the next transaction of every group that
+    still has one, so the loop runs as many times as the largest group has
+    transactions, not once per transaction.
+    """
+    if len(group) == 0:
+        return costs.copy(), np.zeros(0)
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    sizes = np.diff(np.r_[first, len(group)])
+    offsets = costs.copy()
+    big = np.flatnonzero(sizes > workers)
+    if len(big):
+        big = big[np.argsort(-sizes[big], kind='stable')]
+        heads = first[big]
+        free = costs[heads[:, None] + np.arange(workers)]
+        remaining = sizes[big]
+        for j in range(workers, int(remaining[0])):
+            rows = int(np.searchsorted(-remaining, -j, side='left'))
+            index = heads[:rows] + j
+            slot = free[:rows].argmin(axis=1)
+            row = np.arange(rows)
+            free[row, slot] += costs[index]
+            offsets[index] = free[row, slot]
+    return offsets, np.maximum.reduceat(offsets, first)
+
+
+def apply_vector(group, arrival, costs, workers):
+    """Return each transaction's visibility time on the replica, solved with array operations.
+
+    Groups are applied one after another (LOGICAL_CLOCK): group g starts at
+    max(arrival[g], end of group g-1), a Lindley recursion solved in closed
+    form as S[g] = C[g] + max(arrival[j] - C[j] for j <= g) with C the
+    running makespan. With replica_preserve_commit_order a transaction
+    becomes visible only once every earlier one has.
+    """
+    offsets, makespan = schedule_groups(group, costs, workers)
+    before = np.concatenate([[0.0], np.cumsum(makespan)[:-1]])
+    start = before + np.maximum.accumulate(arrival - before)
+    return np.maximum.accumulate(start[group] + offsets)
+
+
+def applier_busy(group, costs, workers):
+    """Seconds the applier spends on groups; above the simulated span it can never catch up.
+
+    This is more than the total apply time over workers, because workers
+    left idle at the end of a small group wait for the next one.
+    """
+    return float(schedule_groups(group, costs, workers)[1].sum())
+
+
+def apply_events(group, arrival, costs, workers):
+    """Return each transaction's visibility time on the replica from a discrete-event run.
+
+    The reference for apply_vector. The only pending events are the running
+    transactions' completions, kept in a heap of at most `workers` entries;
+    group arrivals are already time-ordered so they are read in sequence
+    rather than queued.
+    """
+    if len(group) == 0:
+        return np.zeros(0)
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]).tolist() + [len(group)]
+    arrival, costs = arrival.tolist(), costs.tolist()
+    finish = [0.0] * len(costs)
+    done = 0.0
+    for g in range(len(first) - 1):
+        now = max(arrival[g], done)
+        next_txn, end = first[g], first[g + 1]
+        running = []
+        for worker in range(min(workers, end - next_txn)):
+            heapq.heappush(running, (now + costs[next_txn], worker, next_txn))
+            next_txn += 1
+        while running:
+            now, worker, txn = heapq.heappop(running)
+            finish[txn] = now
+            if next_txn < end:
+                heapq.heappush(running, (now + costs[next_txn], worker, next_txn))
+                next_txn += 1
+        done = now
+    return np.maximum.accumulate(np.array(finish))
+
+
+def read_slowdown(read_qps, read_ms, cores, replicas):
+    """Factor by which reads stretch apply time on each replica (processor sharing)"""
+    utilization = read_qps / max(replicas, 1) * read_ms / 1000.0 / cores
+    return min(1.0 / max(1.0 - utilization, 1.0 / MAX_SLOWDOWN), MAX_SLOWDOWN)
+
+
+def simulate(workload, replicas=1, workers=4, group_ms=1.0, network_ms=0.5, jitter_ms=0.2,
+             slowdown=1.0, engine='vector', seed=0):
+    """Replay a primary workload on each replica; return {'lag': (replicas, n) seconds, ...}"""
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r} (choose from {', '.join(ENGINES)})")
+    commit, costs = workload['commit'], workload['apply'] * slowdown
+    group, flush = group_commits(commit, group_ms)
+    apply = apply_vector if engine == 'vector' else apply_events
+    lag = np.empty((replicas, len(commit)))
+    start = time.perf_counter()
+    for replica in range(replicas):
+        # Replicas share the transactions but each has its own network path
+        arrival = ship_groups(flush, network_ms, jitter_ms, np.random.default_rng([seed, replica]))
+        lag[replica] = apply(group, arrival, costs, workers) - commit
+    seconds = time.perf_counter() - start
+    return {'lag': lag, 'commit': commit, 'groups': len(flush), 'engine': engine,
+            'busy': applier_busy(group, costs, workers), 'work': costs.sum() / workers, 'seconds': seconds}
+
+
+def staleness(lag, delays_ms):
+    """P(a read delay_ms after a write, on a random replica, does not see it) for each delay"""
+    if lag.size == 0:
+        return np.zeros(len(delays_ms))
+    ordered = np.sort(lag, axis=None)
+    seen = np.searchsorted(ordered, np.asarray(delays_ms) / 1000.0, side='right')
+    return 1.0 - seen / len(ordered)
+
+
+def lag_timeline(result, bins=200):
+    """Return (bin start times, per-replica max lag per bin) over the commit timeline"""
+    commit = result['commit']
+    span = max(commit[-1], 1e-9) if len(commit) else 1.0
+    index = np.minimum((commit / span * bins).astype(np.int64), bins - 1)
+    first = np.flatnonzero(np.r_[True, index[1:] != index[:-1]]) if len(index) else np.zeros(0, dtype=np.int64)
+    peaks = np.full((len(result['lag']), bins), np.nan)
+    if len(first):
+        peaks[:, index[first]] = np.maximum.reduceat(result['lag'], first, axis=1)
+    return np.arange(bins) * span / bins, peaks
+
+
+def summarize(result, duration):
+    """Return lag percentiles, apply utilization and the read-after-write staleness table.
+
+    An empty run (no commits in the window) reports zero lag.
+    """
+    lag = result['lag']
+    percentiles = np.percentile(lag, PERCENTILES) if lag.size else np.zeros(len(PERCENTILES))
+    return {
+        'transactions': lag.shape[1],
+        'groups': result['groups'],
+        'replicas': lag.shape[0],
+        'engine': result['engine'],
+        'apply_utilization': result['busy'] / duration,
+        'worker_utilization': result['work'] / duration,
+        'lag_ms': {f"p{p:g}": float(v) * 1000 for p, v in zip(PERCENTILES, percentiles)},
+        'max_lag_ms': float(lag.max()) * 1000 if lag.size else 0.0,
+        'replica_p99_ms': [float(v) * 1000 for v in np.percentile(lag, 99, axis=1)] if lag.size
+        else [0.0] * lag.shape[0],
+        'stale': {str(d): float(p) for d, p in zip(READ_DELAYS_MS, staleness(lag, READ_DELAYS_MS))},
+        'seconds': result['seconds'],
+    }
+
+
+def print_report(summary):
+    """Print lag percentiles and the staleness table"""
+    print(f"\n🔁 {summary['transactions']:,} transactions in {summary['groups']:,} commit groups, "
+          f"{summary['replicas']} replica(s), {summary['engine']} engine "
+          f"({summary['transactions'] * summary['replicas'] / max(summary['seconds'], 1e-9) / 1e6:.1f}M "
+          f"transactions/s)")
+    flag = '  ❌ applier saturated: lag grows without bound' if summary['apply_utilization'] >= 1 else ''
+    print(f"   Applier busy {summary['apply_utilization']:.0%} of the time, workers "
+          f"{summary['worker_utilization']:.0%} busy on average{flag}")
+    print('   Lag ' + ', '.join(f"{name} {value:,.1f} ms" for name, value in summary['lag_ms'].items())
+          + f", max {summary['max_lag_ms']:,.1f} ms")
+    if summary['replicas'] > 1:
+        print('   p99 per replica: ' + ', '.join(f"{v:,.1f} ms" for v in summary['replica_p99_ms']))
+    print(f"\n{'Read after write':<18} {'P(stale)':>9}")
+    print('-' * 28)
+    for delay, p in summary['stale'].items():
+        print(f"{delay + ' ms':<18} {p:>9.2%}")
+
+
+def create_replication_lag_diagram(result, summary, title=None):
+    """Draw lag over time and read-after-write staleness beside the replication diagram"""
+    import matplotlib.pyplot as plt
+    from diagram_panels import add_side_panel
+    from distributed_diagram_generator import create_database_replication_diagram
+
+    fig = create_database_replication_diagram()
+    lag_ax, stale_ax = add_side_panel(fig, rows=2, width_ratio=0.8, title=title or 'Replication Lag Simulation',
+                                      fontsize=14, fontweight='bold', y=0.98)
+    colors = ['#9C27B0', '#2196F3', '#FF9800', '#4CAF50']
+
+    times, peaks = lag_timeline(result)
+    for replica, series in enumerate(peaks):
+        lag_ax.plot(times, series * 1000, color=colors[replica % len(colors)], linewidth=1.2,
+                    label=f"replica {replica + 1}")
+    lag_ax.set_yscale('log')
+    lag_ax.set_xlabel('Time since start (s)', fontsize=10)
+    lag_ax.set_ylabel('Max lag (ms)', fontsize=10)
+    lag_ax.set_title('Replication Lag Over Time', fontsize=12, fontweight='bold')
+    lag_ax.grid(alpha=0.3, which='both')
+    if len(peaks) > 1:
+        lag_ax.legend(fontsize=8)
+
+    high = max(summary['max_lag_ms'], 1.0) * 2
+    delays = np.geomspace(max(summary['lag_ms']['p50'] / 30, 0.01), high, 200)
+    stale_ax.plot(delays, staleness(result['lag'], delays) * 100, color='#F44336', linewidth=2)
+    labelled = 0.0
+    for name in ('p50', 'p99'):
+        value = summary['lag_ms'][name]
+        stale_ax.axvline(value, color='gray', linestyle=':', linewidth=1)
+        if value > labelled * 3:
+            stale_ax.text(value, 95, f" {name} lag", fontsize=8, color='gray', va='top')
+            labelled = value
+    stale_ax.set_xscale('log')
+    stale_ax.set_ylim(0, 100)
+    stale_ax.set_xlabel('Read issued this long after the write (ms)', fontsize=10)
+    stale_ax.set_ylabel('P(read is stale) %', fontsize=10)
+    stale_ax.set_title('Read-After-Write Staleness', fontsize=12, fontweight='bold')
+    stale_ax.grid(alpha=0.3, which='both')
+    return fig
+
+
+def benchmark(transactions, workers=4, seed=0):
+    """Time both engines on the same workload and check they agree"""
+    rate = 20000
+    workload = primary_workload(rate, transactions / rate, 0.15, seed=seed)
+    print(f"🎲 {len(workload['commit']):,} transactions at {rate:,}/s, {workers} apply workers")
+    results = {}
+    for engine in ENGINES:
+        results[engine] = simulate(workload, workers=workers, engine=engine, seed=seed)
+        print(f"⏱️ {engine:<7} {results[engine]['seconds']:6.2f}s "
+              f"{len(workload['commit']) / results[engine]['seconds'] / 1e6:6.2f}M transactions/s")
+    difference = float(np.abs(results['vector']['lag'] - results['events']['lag']).max())
+    print(f"   Largest difference between engines: {difference * 1e9:.3f} ns")
+    return difference < 1e-9
+
+
+def _burst(value):
+    """Parse AT:SECONDS:FACTOR, e.g. 120:30:4 for four times the write rate from 120s to 150s"""
+    try:
+        at, seconds, factor = (float(v) for v in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected AT:SECONDS:FACTOR, got {value!r}")
+    return at, seconds, factor
+
+
+def main(argv=None):
+    """Simulate replication lag and render it beside the replication diagram"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=3000, help='primary commits per second (default: 3000)')
+    parser.add_argument('--duration', type=float, default=600, help='simulated seconds (default: 600)')
+    parser.add_argument('--burst', type=_burst, action='append', default=[], metavar='AT:SECONDS:FACTOR',
+                        help='multiply the write rate for a while, e.g. 120:30:4 (repeatable)')
+    parser.add_argument('--apply-ms', type=float, default=0.4, help='mean replica apply time (default: 0.4 ms)')
+    parser.add_argument('--apply-sigma', type=float, default=1.0,
+                        help='lognormal spread of apply times (default: 1.0)')
+    parser.add_argument('--workers', type=int, default=4, help='replica_parallel_workers (default: 4)')
+    parser.add_argument('--group-ms', type=float, default=1.0,
+                        help='binlog group commit window; 0 for one transaction per group (default: 1 ms)')
+    parser.add_argument('--network-ms', type=float, default=0.5, help='one-way network delay (default: 0.5 ms)')
+    parser.add_argument('--jitter-ms', type=float, default=0.2, help='mean exponential jitter (default: 0.2 ms)')
+    parser.add_argument('--replicas', type=int, default=1, help='replicas sharing the reads (default: 1)')
+    parser.add_argument('--read-qps', type=float, default=0, help='reads per second across replicas (default: 0)')
+    parser.add_argument('--read-ms', type=float, default=2.0, help='CPU time per read (default: 2 ms)')
+    parser.add_argument('--cores', type=int, default=8, help='cores per replica (default: 8, the scale-up database)')
+    parser.add_argument('--engine', choices=ENGINES, default='vector', help='solver (default: vector)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='diagram file (default: build/replication_lag.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    parser.add_argument('--benchmark', type=int, metavar='TRANSACTIONS',
+                        help='time both engines on this many transactions and compare them')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark, args.workers, args.seed)
+    if min(args.rate, args.duration, args.apply_ms, args.workers, args.replicas, args.cores) <= 0:
+        parser.error('--rate, --duration, --apply-ms, --workers, --replicas and --cores must be positive')
+
+    workload = primary_workload(args.rate, args.duration, args.apply_ms, args.apply_sigma, args.burst, args.seed)
+    slowdown = read_slowdown(args.read_qps, args.read_ms, args.cores, args.replicas)
+    result = simulate(workload, args.replicas, args.workers, args.group_ms, args.network_ms, args.jitter_ms,
+                      slowdown, args.engine, args.seed)
+    summary = summarize(result, args.duration)
+    summary['read_slowdown'] = slowdown
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return True
+    if slowdown > 1:
+        print(f"📖 {args.read_qps:,.0f} reads/s over {args.replicas} replica(s) stretch apply time {slowdown:.2f}x")
+    print_report(summary)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_replication_lag_diagram(
+        result, summary, f"Replication Lag: {args.rate:,.0f} writes/s, {args.workers} apply workers, "
+                         f"{args.replicas} replica(s)")
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
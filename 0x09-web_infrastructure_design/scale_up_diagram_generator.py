@@ -4,18 +4,34 @@ Diagram Generator for Scale Up Web Infrastructure (Task 3)
 Generates visual diagrams for separated components and load balancer clustering
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, Circle, ConnectionPatch
-import numpy as np
+from headless import format_memory, headless_requested, render_measured, use_headless
 
-# Set up the plotting style
-plt.style.use('default')
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
+# Per-node resources of each separated component; capacity_planner.py sizes the tiers from these
+COMPONENTS = ['Load Balancer', 'Web Servers', 'App Server', 'Database']
+CPU_CORES = [2, 4, 8, 8]
+RAM_GB = [2, 4, 8, 16]
+STORAGE_TYPE = ['Standard', 'SSD', 'Standard', 'High-Perf SSD']
+COMPONENT_COLORS = ['#FF9800', '#9C27B0', '#E91E63', '#795548']
+
+def _apply_style():
+    """Set up the plotting style; runs on first draw, not at import"""
+    import matplotlib.pyplot as plt
+    plt.style.use('default')
+    plt.rcParams['figure.facecolor'] = 'white'
+    plt.rcParams['axes.facecolor'] = 'white'
 
 def create_scale_up_infrastructure_diagram():
     """Create the main scale up infrastructure diagram"""
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from matplotlib.patches import FancyBboxPatch, Circle, ConnectionPatch
+    from topology import scale_up_infrastructure
+
+    _apply_style()
+    infra = scale_up_infrastructure()
+    user, dns, vip, lb1, lb2, web1, web2, app, db = (infra[n] for n in ('user', 'dns', 'vip', 'lb1', 'lb2', 'web1', 'web2',
+                                                                       'app', 'db'))
+
     fig, ax = plt.subplots(1, 1, figsize=(16, 14))
     
     # Colors for different components
@@ -33,13 +49,13 @@ def create_scale_up_infrastructure_diagram():
     user_box = FancyBboxPatch((7, 12), 2, 1, boxstyle="round,pad=0.1", 
                               facecolor=colors['user'], edgecolor='black', linewidth=2)
     ax.add_patch(user_box)
-    ax.text(8, 12.5, '👤 User\n(HTTPS Client)', ha='center', va='center', fontsize=10, fontweight='bold')
+    ax.text(8, 12.5, f"{user.icon} {user.label}\n({user.detail})", ha='center', va='center', fontsize=10, fontweight='bold')
     
     # Draw Internet/DNS
     internet_box = FancyBboxPatch((7, 10), 2, 1, boxstyle="round,pad=0.1",
                                   facecolor=colors['internet'], edgecolor='black', linewidth=2)
     ax.add_patch(internet_box)
-    ax.text(8, 10.5, '🌐 Internet/DNS\nwww.foobar.com\nVIP: 8.8.8.8', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(8, 10.5, f"{dns.icon} {dns.label}\n{dns.detail}\nVIP: {vip.ip}", ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw Load Balancer Cluster
     lb_cluster_box = FancyBboxPatch((5, 7.5), 6, 2, boxstyle="round,pad=0.2",
@@ -51,13 +67,13 @@ def create_scale_up_infrastructure_diagram():
     lb_master_box = FancyBboxPatch((5.5, 8), 2, 0.8, boxstyle="round,pad=0.1",
                                    facecolor=colors['lb_cluster'], edgecolor='black', linewidth=2)
     ax.add_patch(lb_master_box)
-    ax.text(6.5, 8.4, '🔧 LB Master\n10.0.0.10\n(Active)', ha='center', va='center', fontsize=8, fontweight='bold')
+    ax.text(6.5, 8.4, lb1.text(f"({lb1.detail})"), ha='center', va='center', fontsize=8, fontweight='bold')
     
     # Backup LB
     lb_backup_box = FancyBboxPatch((8.5, 8), 2, 0.8, boxstyle="round,pad=0.1",
                                    facecolor=colors['lb_cluster'], edgecolor='black', linewidth=2)
     ax.add_patch(lb_backup_box)
-    ax.text(9.5, 8.4, '🔧 LB Backup\n10.0.0.11\n(Standby)', ha='center', va='center', fontsize=8, fontweight='bold')
+    ax.text(9.5, 8.4, lb2.text(f"({lb2.detail})"), ha='center', va='center', fontsize=8, fontweight='bold')
     
     # Virtual IP indicator
     vip_circle = Circle((8, 7.8), 0.2, facecolor='gold', edgecolor='black', linewidth=2)
@@ -74,13 +90,13 @@ def create_scale_up_infrastructure_diagram():
     web1_box = FancyBboxPatch((2, 5.2), 3, 1, boxstyle="round,pad=0.1",
                               facecolor=colors['web_server'], edgecolor='black', linewidth=2)
     ax.add_patch(web1_box)
-    ax.text(3.5, 5.7, '🌐 Web Server 1\n10.0.0.20\nNginx Only', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(3.5, 5.7, web1.text(web1.software), ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Web Server 2
     web2_box = FancyBboxPatch((11, 5.2), 3, 1, boxstyle="round,pad=0.1",
                               facecolor=colors['web_server'], edgecolor='black', linewidth=2)
     ax.add_patch(web2_box)
-    ax.text(12.5, 5.7, '🌐 Web Server 2\n10.0.0.21\nNginx Only', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(12.5, 5.7, web2.text(web2.software), ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw Application Server Tier
     app_tier_box = FancyBboxPatch((5, 2.5), 6, 1.5, boxstyle="round,pad=0.2",
@@ -92,7 +108,7 @@ def create_scale_up_infrastructure_diagram():
     app_box = FancyBboxPatch((6, 2.7), 4, 1, boxstyle="round,pad=0.1",
                              facecolor=colors['app_server'], edgecolor='black', linewidth=2)
     ax.add_patch(app_box)
-    ax.text(8, 3.2, '🚀 Application Server\n10.0.0.30\nPHP-FPM Only\nBusiness Logic', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(8, 3.2, app.text(app.software, 'Business Logic'), ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw Database Server Tier
     db_tier_box = FancyBboxPatch((5, 0), 6, 1.5, boxstyle="round,pad=0.2",
@@ -104,18 +120,18 @@ def create_scale_up_infrastructure_diagram():
     db_box = FancyBboxPatch((6, 0.2), 4, 1, boxstyle="round,pad=0.1",
                             facecolor=colors['database'], edgecolor='black', linewidth=2)
     ax.add_patch(db_box)
-    ax.text(8, 0.7, '🗄️ Database Server\n10.0.0.40\nMySQL Only\nPrimary + Replica', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(8, 0.7, db.text(db.software, 'Primary + Replica'), ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw connections with different styles
     # User to Internet
     ax.annotate('', xy=(8, 10.8), xytext=(8, 11.8), 
                 arrowprops=dict(arrowstyle='->', lw=3, color='green'))
-    ax.text(8.5, 11.3, 'HTTPS', fontsize=8, rotation=90, va='center')
+    ax.text(8.5, 11.3, infra.edge('user', 'dns'), fontsize=8, rotation=90, va='center')
     
     # Internet to LB Cluster (VIP)
     ax.annotate('', xy=(8, 9.3), xytext=(8, 9.8), 
                 arrowprops=dict(arrowstyle='->', lw=3, color='blue'))
-    ax.text(8.5, 9.5, 'VIP', fontsize=8, rotation=90, va='center')
+    ax.text(8.5, 9.5, infra.edge('dns', 'vip'), fontsize=8, rotation=90, va='center')
     
     # LB Cluster to Web Servers
     ax.annotate('', xy=(3.5, 6), xytext=(6.5, 7.8), 
@@ -166,11 +182,15 @@ def create_scale_up_infrastructure_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('scale_up_infrastructure_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
 def create_component_separation_diagram():
     """Create diagram showing component separation benefits"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+
+    _apply_style()
+
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
     colors = {
@@ -274,11 +294,18 @@ def create_component_separation_diagram():
     ax2.axis('off')
     
     plt.tight_layout()
-    plt.savefig('component_separation_comparison.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
 def create_load_balancer_clustering_diagram():
     """Create detailed load balancer clustering diagram"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, Circle, ConnectionPatch
+    from topology import scale_up_infrastructure
+
+    _apply_style()
+    infra = scale_up_infrastructure()
+    vip, lb1, lb2 = infra['vip'], infra['lb1'], infra['lb2']
+
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
     
     colors = {
@@ -296,20 +323,22 @@ def create_load_balancer_clustering_diagram():
     # Virtual IP cloud
     vip_circle = Circle((7, 8), 0.8, facecolor=colors['vip'], edgecolor='black', linewidth=3)
     ax.add_patch(vip_circle)
-    ax.text(7, 8, 'Virtual IP\n8.8.8.8\n(Floating)', ha='center', va='center', fontsize=10, fontweight='bold')
+    ax.text(7, 8, f"{vip.label}\n{vip.ip}\n({vip.detail})", ha='center', va='center', fontsize=10, fontweight='bold')
     
     # Master Load Balancer
     master_box = FancyBboxPatch((2, 5.5), 3, 2, boxstyle="round,pad=0.2",
                                 facecolor=colors['master'], edgecolor='black', linewidth=2)
     ax.add_patch(master_box)
-    ax.text(3.5, 6.5, '🔧 Master LB\n10.0.0.10\n\n• HAproxy Active\n• Keepalived Master\n• Priority: 100\n• State: MASTER', 
+    ax.text(3.5, 6.5, f"{lb1.icon} Master LB\n{lb1.ip}\n\n"
+            '• HAproxy Active\n• Keepalived Master\n• Priority: 100\n• State: MASTER', 
             ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Backup Load Balancer
     backup_box = FancyBboxPatch((9, 5.5), 3, 2, boxstyle="round,pad=0.2",
                                 facecolor=colors['backup'], edgecolor='black', linewidth=2)
     ax.add_patch(backup_box)
-    ax.text(10.5, 6.5, '🔧 Backup LB\n10.0.0.11\n\n• HAproxy Standby\n• Keepalived Backup\n• Priority: 90\n• State: BACKUP', 
+    ax.text(10.5, 6.5, f"{lb2.icon} Backup LB\n{lb2.ip}\n\n"
+            '• HAproxy Standby\n• Keepalived Backup\n• Priority: 90\n• State: BACKUP', 
             ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Keepalived communication
@@ -331,8 +360,8 @@ def create_load_balancer_clustering_diagram():
     
     # Web servers
     web_servers = [
-        (2, 2, '🌐 Web Server 1\n10.0.0.20'),
-        (6, 2, '🌐 Web Server 2\n10.0.0.21'),
+        (2, 2, infra['web1'].text()),
+        (6, 2, infra['web2'].text()),
         (10, 2, '🌐 Additional\nWeb Servers...')
     ]
     
@@ -363,7 +392,7 @@ def create_load_balancer_clustering_diagram():
             ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Traffic flow indicators
-    ax.text(1, 8.5, '📈 Normal Traffic Flow:\nUser → VIP (8.8.8.8) → Master LB → Web Servers', 
+    ax.text(1, 8.5, f"📈 Normal Traffic Flow:\nUser → VIP ({vip.ip}) → Master LB → Web Servers", 
             ha='left', va='center', fontsize=9, 
             bbox=dict(boxstyle="round,pad=0.3", facecolor='lightgreen', alpha=0.7))
     
@@ -373,26 +402,21 @@ def create_load_balancer_clustering_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('load_balancer_clustering_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
 def create_resource_optimization_diagram():
     """Create diagram showing resource optimization per component"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+
+    _apply_style()
+
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
     
-    # Create resource allocation charts
-    components = ['Load Balancer', 'Web Servers', 'App Server', 'Database']
-    cpu_cores = [2, 4, 8, 8]
-    ram_gb = [2, 4, 8, 16]
-    storage_type = ['Standard', 'SSD', 'Standard', 'High-Perf SSD']
-    
-    # Color coding for components
-    colors = ['#FF9800', '#9C27B0', '#E91E63', '#795548']
-    
     # Create subplot layout
     x_positions = [2, 5, 8, 11]
     
-    for i, (component, cpu, ram, storage, color) in enumerate(zip(components, cpu_cores, ram_gb, storage_type, colors)):
+    for i, (component, cpu, ram, storage, color) in enumerate(zip(COMPONENTS, CPU_CORES, RAM_GB, STORAGE_TYPE, COMPONENT_COLORS)):
         x = x_positions[i]
         
         # Component box
@@ -482,25 +506,34 @@ def create_resource_optimization_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('resource_optimization_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
-def main():
-    """Generate all Task 3 diagrams"""
+def main(headless=False):
+    """Generate all Task 3 diagrams; headless saves without opening windows"""
+    if headless:
+        use_headless()
     print("🎨 Generating Task 3: Scale Up Infrastructure Diagrams...")
     
     try:
         print("📊 Creating main scale up infrastructure diagram...")
-        create_scale_up_infrastructure_diagram()
+        report = render_measured(create_scale_up_infrastructure_diagram, 'scale_up_infrastructure_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("🏗️ Creating component separation comparison...")
-        create_component_separation_diagram()
+        report = render_measured(create_component_separation_diagram, 'component_separation_comparison.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("⚖️ Creating load balancer clustering diagram...")
-        create_load_balancer_clustering_diagram()
+        report = render_measured(create_load_balancer_clustering_diagram, 'load_balancer_clustering_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("📈 Creating resource optimization diagram...")
-        create_resource_optimization_diagram()
+        report = render_measured(create_resource_optimization_diagram, 'resource_optimization_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("✅ All Task 3 diagrams generated successfully!")
         print("\nGenerated files:")
@@ -516,4 +549,4 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    main(headless=headless_requested())
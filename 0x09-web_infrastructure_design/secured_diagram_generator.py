@@ -4,18 +4,26 @@ Diagram Generator for Secured and Monitored Web Infrastructure (Task 2)
 Generates visual diagrams for infrastructure with firewalls, SSL, and monitoring
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, Circle
-import numpy as np
+from headless import format_memory, headless_requested, render_measured, use_headless
 
-# Set up the plotting style
-plt.style.use('default')
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
+def _apply_style():
+    """Set up the plotting style; runs on first draw, not at import"""
+    import matplotlib.pyplot as plt
+    plt.style.use('default')
+    plt.rcParams['figure.facecolor'] = 'white'
+    plt.rcParams['axes.facecolor'] = 'white'
 
 def create_secured_infrastructure_diagram():
     """Create the main secured infrastructure diagram"""
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from matplotlib.patches import FancyBboxPatch, Circle
+    from topology import secured_infrastructure
+
+    _apply_style()
+    infra = secured_infrastructure()
+    user, dns, firewall1, lb, db = (infra[n] for n in ('user', 'dns', 'firewall1', 'lb', 'db'))
+
     fig, ax = plt.subplots(1, 1, figsize=(16, 12))
     
     # Colors
@@ -34,25 +42,25 @@ def create_secured_infrastructure_diagram():
     user_box = FancyBboxPatch((1, 10), 2, 1, boxstyle="round,pad=0.1", 
                               facecolor=colors['user'], edgecolor='black', linewidth=2)
     ax.add_patch(user_box)
-    ax.text(2, 10.5, '👤 User\n(HTTPS Client)', ha='center', va='center', fontsize=10, fontweight='bold')
+    ax.text(2, 10.5, f"{user.icon} {user.label}\n({user.detail})", ha='center', va='center', fontsize=10, fontweight='bold')
     
     # Draw Internet/DNS
     internet_box = FancyBboxPatch((1, 8), 2, 1, boxstyle="round,pad=0.1",
                                   facecolor=colors['internet'], edgecolor='black', linewidth=2)
     ax.add_patch(internet_box)
-    ax.text(2, 8.5, '🌐 Internet/DNS\nwww.foobar.com', ha='center', va='center', fontsize=10, fontweight='bold')
+    ax.text(2, 8.5, f"{dns.icon} {dns.label}\n{dns.detail}", ha='center', va='center', fontsize=10, fontweight='bold')
     
     # Draw Public Firewall (Firewall 1)
     firewall1_box = FancyBboxPatch((5, 8), 3, 1, boxstyle="round,pad=0.1",
                                    facecolor=colors['firewall'], edgecolor='black', linewidth=2)
     ax.add_patch(firewall1_box)
-    ax.text(6.5, 8.5, '🔒 Firewall 1 (Public)\nDMZ Protection\nPorts: 80, 443, 8404', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(6.5, 8.5, f"{firewall1.icon} {firewall1.label} (Public)\nDMZ Protection\nPorts: {firewall1.detail}", ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw Load Balancer with SSL
     lb_box = FancyBboxPatch((5, 6), 3, 1.5, boxstyle="round,pad=0.1",
                             facecolor=colors['load_balancer'], edgecolor='black', linewidth=2)
     ax.add_patch(lb_box)
-    ax.text(6.5, 6.75, '⚖️ Load Balancer\nHAproxy + SSL\n🔐 SSL Certificate\n📊 Monitoring Agent', 
+    ax.text(6.5, 6.75, f"{lb.icon} {lb.label}\n{lb.software}\n🔐 SSL Certificate\n📊 Monitoring Agent", 
             ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw SSL Certificate symbol
@@ -64,31 +72,31 @@ def create_secured_infrastructure_diagram():
     firewall2_box = FancyBboxPatch((1, 4), 2.5, 1, boxstyle="round,pad=0.1",
                                    facecolor=colors['firewall'], edgecolor='black', linewidth=2)
     ax.add_patch(firewall2_box)
-    ax.text(2.25, 4.5, '🔒 Firewall 2\nPrivate Network\nWeb Server 1', ha='center', va='center', fontsize=8, fontweight='bold')
+    ax.text(2.25, 4.5, f"{infra['firewall2'].icon} {infra['firewall2'].label}\nPrivate Network\n{infra['firewall2'].detail}", ha='center', va='center', fontsize=8, fontweight='bold')
     
     firewall3_box = FancyBboxPatch((9.5, 4), 2.5, 1, boxstyle="round,pad=0.1",
                                    facecolor=colors['firewall'], edgecolor='black', linewidth=2)
     ax.add_patch(firewall3_box)
-    ax.text(10.75, 4.5, '🔒 Firewall 3\nPrivate Network\nWeb Server 2', ha='center', va='center', fontsize=8, fontweight='bold')
+    ax.text(10.75, 4.5, f"{infra['firewall3'].icon} {infra['firewall3'].label}\nPrivate Network\n{infra['firewall3'].detail}", ha='center', va='center', fontsize=8, fontweight='bold')
     
     # Draw Web Servers
     web1_box = FancyBboxPatch((1, 2), 2.5, 1.5, boxstyle="round,pad=0.1",
                               facecolor=colors['web_server'], edgecolor='black', linewidth=2)
     ax.add_patch(web1_box)
-    ax.text(2.25, 2.75, '🌐 Web Server 1\n10.0.0.2\nNginx + PHP-FPM\n📊 Monitoring Agent', 
+    ax.text(2.25, 2.75, infra['web1'].text(infra['web1'].software, '📊 Monitoring Agent'), 
             ha='center', va='center', fontsize=8, fontweight='bold')
     
     web2_box = FancyBboxPatch((9.5, 2), 2.5, 1.5, boxstyle="round,pad=0.1",
                               facecolor=colors['web_server'], edgecolor='black', linewidth=2)
     ax.add_patch(web2_box)
-    ax.text(10.75, 2.75, '🌐 Web Server 2\n10.0.0.3\nNginx + PHP-FPM\n📊 Monitoring Agent', 
+    ax.text(10.75, 2.75, infra['web2'].text(infra['web2'].software, '📊 Monitoring Agent'), 
             ha='center', va='center', fontsize=8, fontweight='bold')
     
     # Draw Database Server
     db_box = FancyBboxPatch((5, 0.5), 3, 1.5, boxstyle="round,pad=0.1",
                             facecolor=colors['database'], edgecolor='black', linewidth=2)
     ax.add_patch(db_box)
-    ax.text(6.5, 1.25, '🗄️ Database Server\n10.0.0.4\nMySQL Primary + Replica\n📊 Monitoring Agent', 
+    ax.text(6.5, 1.25, db.text(db.software, '📊 Monitoring Agent'), 
             ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw Monitoring symbols
@@ -102,12 +110,12 @@ def create_secured_infrastructure_diagram():
     # User to Internet
     ax.annotate('', xy=(2, 8.8), xytext=(2, 9.7), 
                 arrowprops=dict(arrowstyle='->', lw=2, color='green'))
-    ax.text(2.5, 9.2, 'HTTPS Request', fontsize=8, rotation=90, va='center')
+    ax.text(2.5, 9.2, infra.edge('user', 'dns'), fontsize=8, rotation=90, va='center')
     
     # Internet to Public Firewall
     ax.annotate('', xy=(5, 8.5), xytext=(3, 8.5), 
                 arrowprops=dict(arrowstyle='->', lw=2, color='blue'))
-    ax.text(4, 8.8, 'Filtered Traffic', fontsize=8, ha='center')
+    ax.text(4, 8.8, infra.edge('dns', 'firewall1'), fontsize=8, ha='center')
     
     # Public Firewall to Load Balancer
     ax.annotate('', xy=(6.5, 7.3), xytext=(6.5, 7.8), 
@@ -153,11 +161,17 @@ def create_secured_infrastructure_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('secured_infrastructure_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
 def create_security_features_diagram():
     """Create diagram showing security features in detail"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+    from topology import secured_infrastructure
+
+    _apply_style()
+    firewall1, firewall2, firewall3 = secured_infrastructure().by_role('firewall')
+
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
     
     # Security layers diagram
@@ -192,12 +206,12 @@ def create_security_features_diagram():
     
     # Add security controls
     security_controls = [
-        (3, 8, '🔒 Firewall 1\nPublic Access Control'),
+        (3, 8, f"{firewall1.icon} {firewall1.label}\nPublic Access Control"),
         (10, 8, '🔐 SSL/TLS\nEncryption'),
         (3, 6, '⚖️ Load Balancer\nTraffic Distribution'),
         (10, 6, '📊 Monitoring\nSumo Logic'),
-        (3, 3.5, '🔒 Firewall 2\nWeb Server 1'),
-        (10, 3.5, '🔒 Firewall 3\nWeb Server 2'),
+        (3, 3.5, f"{firewall2.icon} {firewall2.label}\n{firewall2.detail}"),
+        (10, 3.5, f"{firewall3.icon} {firewall3.label}\n{firewall3.detail}"),
         (6.5, 1, '🛡️ Database Firewall\nMySQL Access Control')
     ]
     
@@ -216,12 +230,37 @@ def create_security_features_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('security_layers_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
+
+# Where live numbers for a box are written: (x, y, ha, va), beside or under it
+ANNOTATION_ANCHORS = {
+    'QPS Monitoring': (9.1, 1, 'right', 'center'),
+    'Log Analysis': (12.9, 0.35, 'right', 'top'),
+    'Load Balancer': (2, 6.32, 'center', 'top'),
+    'Web Server 1': (2, 4.32, 'center', 'top'),
+    'Web Server 2': (2, 2.32, 'center', 'top'),
+    'Database Server': (2, 0.32, 'center', 'top'),
+}
+
+def create_monitoring_flow_diagram(annotations=None):
+    """Create diagram showing monitoring data flow.
+
+    annotations maps a dashboard or server name in ANNOTATION_ANCHORS to text
+    drawn next to it, e.g. the live numbers from log_analytics.py.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+    import numpy as np
+    from batch_draw import add_arrows, add_boxes, add_circles
+    from topology import secured_infrastructure
+
+    _apply_style()
+    infra = secured_infrastructure()
 
-def create_monitoring_flow_diagram():
-    """Create diagram showing monitoring data flow"""
     fig, ax = plt.subplots(1, 1, figsize=(14, 10))
+    ax.set_xlim(0, 14)
+    ax.set_ylim(0, 9)
+    ax.set_aspect('equal')
     
     colors = {
         'server': '#4CAF50',
@@ -232,21 +271,19 @@ def create_monitoring_flow_diagram():
     
     # Draw servers with monitoring agents
     servers = [
-        (2, 7, 'Load Balancer\n📊 Sumo Agent\nHAproxy Logs'),
-        (2, 5, 'Web Server 1\n📊 Sumo Agent\nNginx Logs'),
-        (2, 3, 'Web Server 2\n📊 Sumo Agent\nNginx + PHP Logs'),
-        (2, 1, 'Database Server\n📊 Sumo Agent\nMySQL Logs')
+        (2, 7, f"{infra['lb'].label}\n📊 Sumo Agent\nHAproxy Logs"),
+        (2, 5, f"{infra['web1'].label}\n📊 Sumo Agent\nNginx Logs"),
+        (2, 3, f"{infra['web2'].label}\n📊 Sumo Agent\nNginx + PHP Logs"),
+        (2, 1, f"{infra['db'].label}\n📊 Sumo Agent\nMySQL Logs")
     ]
     
+    server_xy = np.array([(x, y) for x, y, _ in servers], dtype=float)
+    add_boxes(ax, server_xy - (1, 0.5), (2, 1), pad=0.1,
+              facecolors=colors['server'], edgecolors='black', linewidths=2)
+    # Add monitoring agent symbols
+    add_circles(ax, server_xy + (0.7, 0.3), 0.15, facecolors=colors['agent'], edgecolors='black')
     for x, y, text in servers:
-        server_box = FancyBboxPatch((x-1, y-0.5), 2, 1, boxstyle="round,pad=0.1",
-                                    facecolor=colors['server'], edgecolor='black', linewidth=2)
-        ax.add_patch(server_box)
         ax.text(x, y, text, ha='center', va='center', fontsize=9, fontweight='bold')
-        
-        # Add monitoring agent symbol
-        agent_circle = Circle((x+0.7, y+0.3), 0.15, facecolor=colors['agent'], edgecolor='black')
-        ax.add_patch(agent_circle)
         ax.text(x+0.7, y+0.3, '📊', ha='center', va='center', fontsize=8)
     
     # Draw data collection flow
@@ -271,42 +308,46 @@ def create_monitoring_flow_diagram():
         (12, 1, '🔍 Log\nAnalysis')
     ]
     
+    dashboard_xy = np.array([(x, y) for x, y, _ in dashboard_positions], dtype=float)
+    add_boxes(ax, dashboard_xy - (0.7, 0.4), (1.4, 0.8), pad=0.1,
+              facecolors=colors['dashboard'], edgecolors='black', linewidths=1)
     for x, y, text in dashboard_positions:
-        dash_box = FancyBboxPatch((x-0.7, y-0.4), 1.4, 0.8, boxstyle="round,pad=0.1",
-                                  facecolor=colors['dashboard'], edgecolor='black', linewidth=1)
-        ax.add_patch(dash_box)
         ax.text(x, y, text, ha='center', va='center', fontsize=8, fontweight='bold')
     
-    # Draw arrows for data flow
-    # Servers to Collection
-    for y in [7, 5, 3, 1]:
-        ax.annotate('', xy=(5, 4.5), xytext=(3, y), 
-                    arrowprops=dict(arrowstyle='->', lw=2, color='darkgreen'))
-    
-    # Collection to Cloud
-    ax.annotate('', xy=(10, 4.5), xytext=(8, 4.5), 
-                arrowprops=dict(arrowstyle='->', lw=3, color='blue'))
+    # Draw arrows for data flow in one batch:
+    # servers to collection, collection to cloud, cloud to dashboards
+    starts = [(3, y) for y in [7, 5, 3, 1]] + [(8, 4.5)] + [(11.5, 4.5)] * len(dashboard_positions)
+    ends = [(5, 4.5)] * 4 + [(10, 4.5)] + [(x, y) for x, y, _ in dashboard_positions]
+    add_arrows(ax, starts, ends,
+               colors=['darkgreen'] * 4 + ['blue'] + ['orange'] * len(dashboard_positions),
+               linewidths=[2] * 4 + [3] + [1] * len(dashboard_positions),
+               arrowstyle='->', mutation_scale=10)
     ax.text(9, 5, 'HTTPS\nSecure Transfer', ha='center', va='center', fontsize=8)
-    
-    # Cloud to Dashboards
-    for x, y, _ in dashboard_positions:
-        ax.annotate('', xy=(x, y), xytext=(11.5, 4.5), 
-                    arrowprops=dict(arrowstyle='->', lw=1, color='orange'))
-    
-    ax.set_title('Monitoring and Data Flow Architecture\nSumo Logic Integration', 
+
+    for name, text in (annotations or {}).items():
+        x, y, ha, va = ANNOTATION_ANCHORS[name]
+        ax.text(x, y, text, ha=ha, va=va, multialignment='left', fontsize=8, family='monospace',
+                bbox=dict(boxstyle='round,pad=0.4', facecolor='lightyellow', edgecolor='gray'))
+    if annotations:
+        ax.set_ylim(-1.2, 9)
+
+    ax.set_title('Monitoring and Data Flow Architecture\nSumo Logic Integration',
                  fontsize=16, fontweight='bold', pad=20)
     
-    ax.set_xlim(0, 14)
-    ax.set_ylim(0, 9)
-    ax.set_aspect('equal')
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('monitoring_flow_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
 def create_ssl_encryption_diagram():
     """Create diagram showing SSL encryption flow"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch
+    from topology import secured_infrastructure
+
+    _apply_style()
+    infra = secured_infrastructure()
+
     fig, ax = plt.subplots(1, 1, figsize=(14, 8))
     
     colors = {
@@ -344,12 +385,12 @@ def create_ssl_encryption_diagram():
     web1_box = FancyBboxPatch((1, 1), 2, 1, boxstyle="round,pad=0.1",
                               facecolor=colors['server'], edgecolor='black', linewidth=2)
     ax.add_patch(web1_box)
-    ax.text(2, 1.5, '🌐 Web Server 1\n10.0.0.2', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(2, 1.5, infra['web1'].text(), ha='center', va='center', fontsize=9, fontweight='bold')
     
     web2_box = FancyBboxPatch((11, 1), 2, 1, boxstyle="round,pad=0.1",
                               facecolor=colors['server'], edgecolor='black', linewidth=2)
     ax.add_patch(web2_box)
-    ax.text(12, 1.5, '🌐 Web Server 2\n10.0.0.3', ha='center', va='center', fontsize=9, fontweight='bold')
+    ax.text(12, 1.5, infra['web2'].text(), ha='center', va='center', fontsize=9, fontweight='bold')
     
     # Draw arrows
     # Client to encrypted channel
@@ -386,25 +427,34 @@ def create_ssl_encryption_diagram():
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('ssl_encryption_diagram.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
 
-def main():
-    """Generate all Task 2 diagrams"""
+def main(headless=False):
+    """Generate all Task 2 diagrams; headless saves without opening windows"""
+    if headless:
+        use_headless()
     print("🎨 Generating Task 2: Secured and Monitored Infrastructure Diagrams...")
     
     try:
         print("📊 Creating main secured infrastructure diagram...")
-        create_secured_infrastructure_diagram()
+        report = render_measured(create_secured_infrastructure_diagram, 'secured_infrastructure_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("🔒 Creating security layers diagram...")
-        create_security_features_diagram()
+        report = render_measured(create_security_features_diagram, 'security_layers_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("📡 Creating monitoring flow diagram...")
-        create_monitoring_flow_diagram()
+        report = render_measured(create_monitoring_flow_diagram, 'monitoring_flow_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("🔐 Creating SSL encryption diagram...")
-        create_ssl_encryption_diagram()
+        report = render_measured(create_ssl_encryption_diagram, 'ssl_encryption_diagram.png', headless)
+        if headless:
+            print(format_memory(report))
         
         print("✅ All Task 2 diagrams generated successfully!")
         print("\nGenerated files:")
@@ -420,4 +470,4 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    main(headless=headless_requested())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Mergeable Summaries
+Fixed-size sketches for streaming statistics: LatencySketch keeps quantiles of
+any positive values (latencies, per-second request counts) to a relative error,
+and HyperLogLog counts distinct items, both in memory independent of how many
+values they have seen.
+"""
+
+import numpy as np
+
+
+class LatencySketch:
+    """Quantile sketch with log-spaced buckets (the DDSketch scheme).
+
+    Every value in [min_value, max_value] is reported within
+    relative_accuracy of its true quantile; smaller values land in a zero
+    bucket and larger ones in the top bucket. Two sketches with the same
+    parameters merge by adding their bucket counts, so shards can be
+    summarized separately and combined exactly.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3, max_value=1e7):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self._offset = int(np.floor(np.log(min_value) / self._log_gamma))
+        size = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._offset + 1
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.zero_count = 0
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.zero_count
+
+    def bucket(self, values):
+        """Return each value's bucket index; -1 for the zero bucket (NaNs must be removed first)"""
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide='ignore'):
+            index = np.ceil(np.log(np.maximum(values, self.min_value)) / self._log_gamma).astype(np.int64)
+        index = np.clip(index - self._offset, 0, len(self.counts) - 1)
+        return np.where(values < self.min_value, -1, index)
+
+    def add(self, values):
+        """Add an array of values; NaNs are ignored"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        index = self.bucket(values[~np.isnan(values)])
+        self.zero_count += int(np.count_nonzero(index < 0))
+        self.counts += np.bincount(index[index >= 0], minlength=len(self.counts))
+
+    def add_counts(self, counts, zero_count=0):
+        """Add per-bucket counts computed elsewhere, e.g. a grouped np.bincount of bucket()"""
+        self.counts += counts
+        self.zero_count += int(zero_count)
+
+    def merge(self, other):
+        """Add another sketch's counts into this one"""
+        if (other.relative_accuracy, other.min_value, other.max_value) != \
+                (self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError('can only merge sketches with the same accuracy and range')
+        self.counts += other.counts
+        self.zero_count += other.zero_count
+        return self
+
+    def quantile(self, q):
+        """Return the q-quantile (0 <= q <= 1), or NaN for an empty sketch"""
+        total = self.count
+        if total == 0:
+            return float('nan')
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        # The bucket's midpoint in relative terms keeps the error within relative_accuracy
+        return float(2 * self.gamma ** (index + self._offset) / (self.gamma + 1))
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+
+def _mix64(hashes):
+    """Scramble 64-bit hashes so every output bit depends on every input bit (MurmurHash3's finalizer)"""
+    h = np.asarray(hashes, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        h = h ^ (h >> np.uint64(33))
+        h = h * np.uint64(0xFF51AFD7ED558CCD)
+        h = h ^ (h >> np.uint64(33))
+        h = h * np.uint64(0xC4CEB9FE1A85EC53)
+        return h ^ (h >> np.uint64(33))
+
+
+class HyperLogLog:
+    """Distinct-count sketch with 2**precision one-byte registers.
+
+    The standard error is about 1.04 / sqrt(2**precision): 0.8% for the
+    default 16 KB. Items are given as 64-bit hashes, which are re-mixed here,
+    so a cheap hash of the item bytes is enough. Two sketches with the same
+    precision merge by taking the larger of each register.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError('precision must be between 4 and 18')
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        """Add an array of 64-bit item hashes"""
+        h = _mix64(hashes)
+        if len(h) == 0:
+            return
+        index = (h >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = h << np.uint64(self.precision)
+        # The rank is the position of the first 1 bit in the remaining bits;
+        # frexp finds it exactly from the high 32 bits, or the low ones if those are all zero
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        rank = np.where(high > 0, 33 - np.frexp(high)[1], 65 - np.frexp(low)[1])
+        rank = np.minimum(rank, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError('can only merge HyperLogLogs with the same precision')
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Return the estimated number of distinct items added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Small cardinalities are counted more precisely from the empty registers
+        if raw <= 2.5 * m and zeros:
+            return m * float(np.log(m / zeros))
+        return float(raw)
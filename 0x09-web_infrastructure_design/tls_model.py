@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+TLS Termination Model
+Predicts the CPU the load balancer spends terminating TLS: replays a client
+request stream (synthetic or from access logs) through keep-alive
+connections and a session cache or session tickets, counts full and resumed
+handshakes, and prices them per cipher suite to size the LB cores.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'tls_model.png')
+ENGINES = ('vector', 'events')
+MODES = ('cache', 'tickets')
+PERCENTILES = (50, 99)
+
+# Server CPU per operation on one modern x86 core with AES-NI, in ms, from
+# the order of magnitude `openssl speed` reports; scale with --cpu-scale
+KEY_EXCHANGE_MS = {'x25519': 0.05, 'p256': 0.09, 'p384': 0.55, 'ffdhe2048': 1.2}
+SIGNATURE_MS = {'ecdsa-p256': 0.03, 'rsa-2048': 0.55, 'rsa-3072': 1.6, 'rsa-4096': 3.6}
+# Bulk encryption throughput, GB/s per core
+CIPHER_GBPS = {'aes128-gcm': 4.0, 'aes256-gcm': 3.2, 'chacha20-poly1305': 1.6}
+# Hashing, record layer and state setup in every handshake
+HANDSHAKE_BASE_MS = 0.03
+
+# name: (protocol, key exchange, certificate, cipher). TLS 1.3 resumption
+# (psk_dhe_ke) still runs the key exchange; TLS 1.2 resumption skips it.
+SUITES = {
+    'tls13-x25519-ecdsa-aes128': ('TLS1.3', 'x25519', 'ecdsa-p256', 'aes128-gcm'),
+    'tls13-x25519-rsa2048-aes128': ('TLS1.3', 'x25519', 'rsa-2048', 'aes128-gcm'),
+    'tls13-p256-ecdsa-chacha20': ('TLS1.3', 'p256', 'ecdsa-p256', 'chacha20-poly1305'),
+    'tls13-p384-rsa3072-aes256': ('TLS1.3', 'p384', 'rsa-3072', 'aes256-gcm'),
+    'tls13-x25519-rsa4096-aes256': ('TLS1.3', 'x25519', 'rsa-4096', 'aes256-gcm'),
+    'tls12-ecdhe-rsa2048-aes128': ('TLS1.2', 'p256', 'rsa-2048', 'aes128-gcm'),
+    'tls12-dhe-rsa2048-aes128': ('TLS1.2', 'ffdhe2048', 'rsa-2048', 'aes128-gcm'),
+}
+
+
+def suite_costs(suite, cpu_scale=1.0):
+    """Return (full handshake ms, resumed handshake ms, bulk GB/s) for a suite"""
+    protocol, exchange, certificate, cipher = SUITES[suite]
+    full = HANDSHAKE_BASE_MS + KEY_EXCHANGE_MS[exchange] + SIGNATURE_MS[certificate]
+    resumed = HANDSHAKE_BASE_MS + (KEY_EXCHANGE_MS[exchange] if protocol == 'TLS1.3' else 0.0)
+    return full * cpu_scale, resumed * cpu_scale, CIPHER_GBPS[cipher] / cpu_scale
+
+
+def synthetic_stream(rate, duration, clients, skew=1.0, visit_requests=8, think_s=2.0, seed=0):
+    """Return {'time', 'client'} for rate requests/s over duration seconds, sorted by time.
+
+    Visits start as a Poisson process and pick their client by Zipf
+    popularity over clients, so a few return often and most rarely. Each
+    visit is a geometric number of requests with exponential think times.
+    """
+    rng = np.random.default_rng(seed)
+    visits = rng.poisson(rate * duration / visit_requests)
+    if not visits:
+        return {'time': np.zeros(0), 'client': np.zeros(0, dtype=np.uint64)}
+    weights = np.cumsum(1.0 / np.arange(1, clients + 1) ** skew)
+    client = np.searchsorted(weights, rng.random(visits) * weights[-1])
+    sizes = rng.geometric(1.0 / visit_requests, visits)
+    start = rng.uniform(0, duration, visits)
+    gaps = rng.exponential(think_s, sizes.sum())
+    first = np.r_[0, np.cumsum(sizes)[:-1]]
+    gaps[first] = 0.0
+    offsets = np.cumsum(gaps)
+    offsets -= np.repeat(offsets[first], sizes)
+    times = np.repeat(start, sizes) + offsets
+    clients_of = np.repeat(client, sizes)
+    keep = times < duration
+    order = np.argsort(times[keep], kind='stable')
+    return {'time': times[keep][order], 'client': clients_of[keep][order].astype(np.uint64)}
+
+
+def log_stream(paths, log_format='auto', seed=0):
+    """Return {'time', 'client'} from access logs, spreading each second's requests uniformly over it"""
+    from log_analytics import PARSERS, detect_format, host_name, read_chunks
+
+    rng = np.random.default_rng(seed)
+    seconds, clients = [], []
+    for path in paths:
+        parse_format = None
+        for chunk in read_chunks(path):
+            if parse_format is None:
+                parse_format = detect_format(chunk) if log_format == 'auto' else log_format
+            columns = PARSERS[parse_format](chunk, host_name(path))[0]
+            seconds.append(columns['second'])
+            clients.append(columns['client'])
+    if not seconds or not sum(len(s) for s in seconds):
+        return {'time': np.zeros(0), 'client': np.zeros(0, dtype=np.uint64)}
+    second = np.concatenate(seconds)
+    times = (second - second.min()) + rng.random(len(second))
+    order = np.argsort(times, kind='stable')
+    return {'time': times[order], 'client': np.concatenate(clients)[order]}
+
+
+def handshakes(stream, keepalive):
+    """Return the indices of requests that open a connection, in time order.
+
+    A client's request reuses its connection when its previous request was
+    at most keepalive seconds earlier (timeout http-keep-alive); otherwise
+    the connection was closed and a new one needs a TLS handshake. The
+    stream is in time order, so a stable sort by client keeps each client's
+    requests in order.
+    """
+    order = np.argsort(stream['client'], kind='stable')
+    client, times = stream['client'][order], stream['time'][order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (client[1:] != client[:-1]) | (times[1:] - times[:-1] > keepalive)
+    return np.sort(order[new])
+
+
+def previous_access(keys):
+    """Index of each key's previous occurrence, -1 for the first"""
+    order = np.argsort(keys, kind='stable')
+    previous = np.full(len(keys), -1, dtype=np.int64)
+    same = keys[order[1:]] == keys[order[:-1]]
+    previous[order[1:][same]] = order[:-1][same]
+    return previous
+
+
+def stack_distances(keys, previous=None):
+    """Distinct other keys accessed since each key's previous access; -1 for first accesses.
+
+    An LRU cache of capacity C hits exactly when this distance is below C,
+    so one pass gives the hit rate of every cache size. The distance of
+    access i with previous access p is the number of accesses j in (p, i)
+    whose own previous access is before p. Counting the j < i with
+    previous[j] < p for all i at once is a dominance count, done level by
+    level like a bottom-up merge sort: at each level, accesses in the right
+    half of a block count the smaller values in the already sorted left half
+    with one search, then the halves are merged.
+    """
+    previous = previous_access(keys) if previous is None else previous
+    n = len(keys)
+    counts = np.zeros(n, dtype=np.int64)
+    index = np.arange(n)
+    values = previous + 1
+    # values sorted within every block of the current size, as a bottom-up merge sort keeps them
+    merged = values.copy()
+    span = n + 2
+    half = 1
+    while half < n:
+        block = index // (2 * half)
+        right = (index // half) % 2 == 1
+        keys = block * span + merged
+        left_keys = keys[~right]
+        query = right & (previous >= 0)
+        base = block[query] * span
+        counts[query] += (np.searchsorted(left_keys, base + values[query], 'left')
+                          - np.searchsorted(left_keys, base, 'left'))
+        # Sorted runs merge in linear time
+        keys.sort(kind='stable')
+        merged = keys - block * span
+        half *= 2
+    return np.where(previous >= 0, counts - previous - 1, -1)
+
+
+def resumable_sessions(times, previous, lifetime, supported):
+    """True for handshakes whose client's previous session is still within its lifetime.
+
+    TLS 1.3 stores a fresh session on every handshake, so a handshake can
+    resume from the client's previous one. With tickets that is enough; a
+    server-side cache must also not have evicted it.
+    """
+    resumable = (previous >= 0) & supported
+    resumable[resumable] = times[resumable] - times[previous[resumable]] <= lifetime
+    return resumable
+
+
+def resumption_events(times, clients, lifetime, supported, capacity):
+    """Replay the handshakes through an LRU session cache; return resumed per handshake (reference engine)"""
+    cache = OrderedDict()
+    resumed = np.zeros(len(times), dtype=bool)
+    for i, (moment, client) in enumerate(zip(times.tolist(), clients.tolist())):
+        stored = cache.pop(client, None)
+        resumed[i] = stored is not None and supported[i] and moment - stored <= lifetime
+        cache[client] = moment
+        if len(cache) > capacity:
+            cache.popitem(last=False)
+    return resumed
+
+
+def simulate(stream, keepalive=10.0, lifetime=300.0, capacity=20000, support=1.0, engine='vector', seed=0):
+    """Find the handshakes in stream and which of them resume from the cache and from tickets"""
+    if not len(stream['time']):
+        raise ValueError('the request stream is empty')
+    start = time.perf_counter()
+    opened = handshakes(stream, keepalive)
+    times, clients = stream['time'][opened], stream['client'][opened]
+    # A client either offers resumption or never does (curl, bots, privacy modes)
+    from lb_simulator import mix64
+    supported = (mix64(clients ^ np.uint64(seed)) >> np.uint64(11)) / 2.0 ** 53 < support
+    previous = previous_access(clients)
+    resumable = resumable_sessions(times, previous, lifetime, supported)
+    if engine == 'events':
+        distance = None
+        cache_resumed = resumption_events(times, clients, lifetime, supported, capacity)
+    else:
+        distance = stack_distances(clients, previous)
+        cache_resumed = resumable & (distance < capacity)
+    return {'requests': len(stream['time']), 'start': float(stream['time'][0]),
+            'duration': float(stream['time'][-1] - stream['time'][0]), 'request_times': stream['time'],
+            'times': times, 'clients': clients, 'distance': distance, 'resumable': resumable, 'cache_resumed': cache_resumed,
+            'tickets_resumed': resumable, 'capacity': capacity, 'seconds': time.perf_counter() - start}
+
+
+def hit_rate_curve(result, capacities):
+    """Cache resumption rate (share of handshakes) for each capacity, from the stack distances"""
+    if result['distance'] is None:
+        result['distance'] = stack_distances(result['clients'])
+    distances = np.sort(result['distance'][result['resumable']])
+    return np.searchsorted(distances, capacities, 'left') / max(len(result['times']), 1)
+
+
+def cpu_load(result, suite, mode='cache', response_kb=50.0, proxy_ms=0.03, cpu_scale=1.0):
+    """Return per-second CPU seconds spent on handshakes and on requests for one suite"""
+    full_ms, resumed_ms, gbps = suite_costs(suite, cpu_scale)
+    resumed = result[f"{mode}_resumed"]
+    bins = int(np.ceil(result['duration'])) + 1
+    second = (result['times'] - result['start']).astype(np.int64)
+    full = np.bincount(second[~resumed], minlength=bins)
+    quick = np.bincount(second[resumed], minlength=bins)
+    requests = np.bincount((result['request_times'] - result['start']).astype(np.int64), minlength=bins)
+    handshake_cpu = (full * full_ms + quick * resumed_ms) / 1000.0
+    request_cpu = requests * (response_kb * 1024 / (gbps * 1e9) + proxy_ms * cpu_scale / 1000.0)
+    return handshake_cpu, request_cpu
+
+
+def summarize(result, mode='cache', response_kb=50.0, proxy_ms=0.03, cpu_scale=1.0, target=0.7):
+    """Return stream, handshake and resumption figures and the cores each suite needs"""
+    count = len(result['times'])
+    duration = max(result['duration'], 1.0)
+    summary = {
+        'requests': result['requests'],
+        'duration_s': duration,
+        'requests_per_s': result['requests'] / duration,
+        'handshakes': count,
+        'handshakes_per_s': count / duration,
+        'requests_per_connection': result['requests'] / max(count, 1),
+        'cache_capacity': result['capacity'],
+        'resumption': {m: float(result[f"{m}_resumed"].mean()) if count else 0.0 for m in MODES},
+        'resumable_share': float(result['resumable'].mean()) if count else 0.0,
+        'mode': mode,
+        'suites': {},
+        'seconds': result['seconds'],
+    }
+    for suite in SUITES:
+        full_ms, resumed_ms, gbps = suite_costs(suite, cpu_scale)
+        handshake_cpu, request_cpu = cpu_load(result, suite, mode, response_kb, proxy_ms, cpu_scale)
+        total = handshake_cpu + request_cpu
+        summary['suites'][suite] = {
+            'full_ms': full_ms, 'resumed_ms': resumed_ms, 'bulk_gbps': gbps,
+            'handshake_cores': float(handshake_cpu.mean()),
+            'request_cores': float(request_cpu.mean()),
+            'peak_cores': float(np.percentile(total, 99)),
+            'cores_needed': int(np.ceil(np.percentile(total, 99) / target)),
+        }
+    return summary
+
+
+def print_report(summary):
+    """Print the connection and resumption figures and the per-suite core table"""
+    print(f"\n🔐 {summary['requests']:,} requests over {summary['duration_s']:,.0f}s "
+          f"({summary['requests_per_s']:,.0f}/s) open {summary['handshakes']:,} TLS connections "
+          f"({summary['handshakes_per_s']:,.0f}/s, {summary['requests_per_connection']:.1f} requests each)")
+    r = summary['resumption']
+    print(f"   Resumed: {r['cache']:.1%} with a {summary['cache_capacity']:,}-session cache, "
+          f"{r['tickets']:.1%} with tickets ({summary['resumable_share']:.1%} within the lifetime); "
+          f"sized for the {summary['mode']}")
+    print(f"{'Suite':<30} {'Full ms':>8} {'Resume ms':>9} {'GB/s':>5} {'Handshake':>10} {'Bulk':>6} "
+          f"{'p99 cores':>9} {'Cores':>6}")
+    print('-' * 90)
+    for suite, s in summary['suites'].items():
+        print(f"{suite:<30} {s['full_ms']:>8.2f} {s['resumed_ms']:>9.2f} {s['bulk_gbps']:>5.1f} "
+              f"{s['handshake_cores']:>10.2f} {s['request_cores']:>6.2f} {s['peak_cores']:>9.2f} "
+              f"{s['cores_needed']:>6}")
+
+
+def create_tls_diagram(result, summary, suite, title=None):
+    """Plot resumption against cache size and the cores per suite beside the SSL encryption diagram"""
+    import matplotlib.pyplot as plt
+    from diagram_panels import add_side_panel
+    from secured_diagram_generator import create_ssl_encryption_diagram
+
+    fig = create_ssl_encryption_diagram()
+    hit_ax, cores_ax = add_side_panel(
+        fig, rows=2, width_ratio=0.8, hspace=0.55,
+        title=title or f"TLS at the LB: {summary['requests_per_s']:,.0f} req/s, "
+                       f"{summary['handshakes_per_s']:,.0f} handshakes/s",
+        fontsize=13, fontweight='bold', y=0.99)
+
+    capacities = np.unique(np.geomspace(10, max(summary['handshakes'], 100), 200).astype(int))
+    hit_ax.plot(capacities, hit_rate_curve(result, capacities) * 100, color='#2196F3', linewidth=2,
+                label='session cache (LRU)')
+    hit_ax.axhline(summary['resumption']['tickets'] * 100, color='#4CAF50', linestyle='--', linewidth=1.5,
+                   label='session tickets')
+    hit_ax.axvline(summary['cache_capacity'], color='gray', linestyle=':', linewidth=1)
+    hit_ax.scatter([summary['cache_capacity']], [summary['resumption']['cache'] * 100], color='red', zorder=5)
+    hit_ax.annotate(f"{summary['resumption']['cache']:.0%} at {summary['cache_capacity']:,}",
+                    (summary['cache_capacity'], summary['resumption']['cache'] * 100),
+                    textcoords='offset points', xytext=(-8, -14), ha='right', fontsize=8, color='red')
+    hit_ax.set_xscale('log')
+    hit_ax.set_ylim(0, 100)
+    hit_ax.set_xlabel('Session cache size (tune.ssl.cachesize)', fontsize=9)
+    hit_ax.set_ylabel('Handshakes resumed (%)', fontsize=9)
+    hit_ax.set_title('Session Resumption', fontsize=11, fontweight='bold')
+    hit_ax.grid(alpha=0.3, which='both')
+    hit_ax.legend(fontsize=8, loc='upper left')
+
+    names = list(summary['suites'])
+    handshake = [summary['suites'][n]['handshake_cores'] for n in names]
+    bulk = [summary['suites'][n]['request_cores'] for n in names]
+    edges = ['red' if n == suite else 'black' for n in names]
+    widths = [2.5 if n == suite else 1 for n in names]
+    cores_ax.barh(names, handshake, color='#FF9800', edgecolor=edges, linewidth=widths, label='handshakes')
+    cores_ax.barh(names, bulk, left=handshake, color='#FFD700', edgecolor=edges, linewidth=widths,
+                  label='encryption + proxying')
+    for i, n in enumerate(names):
+        s = summary['suites'][n]
+        cores_ax.text(s['handshake_cores'] + s['request_cores'], i, f"  {s['cores_needed']} cores",
+                      va='center', fontsize=8, fontweight='bold' if n == suite else 'normal')
+    cores_ax.invert_yaxis()
+    cores_ax.tick_params(axis='y', labelsize=8)
+    cores_ax.set_xlim(0, max(h + b for h, b in zip(handshake, bulk)) * 1.35)
+    cores_ax.set_xlabel(f"Mean LB cores ({summary['mode']}; label: cores for the p99 second at 70% load)", fontsize=9)
+    cores_ax.set_title('TLS Termination CPU per Cipher Suite', fontsize=11, fontweight='bold')
+    cores_ax.grid(axis='x', alpha=0.3)
+    cores_ax.legend(fontsize=8, loc='lower right')
+    return fig
+
+
+def benchmark(requests, seed=0):
+    """Time both engines on a synthetic stream and check they resume the same handshakes"""
+    rate = 5000
+    stream = synthetic_stream(rate, requests / rate, max(requests // 20, 100), seed=seed)
+    capacity = 5000
+    print(f"🎲 {len(stream['time']):,} requests from {max(requests // 20, 100):,} clients, cache of {capacity:,}")
+    results = {}
+    for engine in ENGINES:
+        results[engine] = simulate(stream, capacity=capacity, engine=engine, seed=seed)
+        print(f"⏱️ {engine:<7} {results[engine]['seconds']:6.2f}s "
+              f"{len(results[engine]['times']) / results[engine]['seconds'] / 1e6:6.2f}M handshakes/s, "
+              f"{results[engine]['cache_resumed'].mean():.2%} resumed")
+    same = np.array_equal(results['vector']['cache_resumed'], results['events']['cache_resumed'])
+    print(f"   Engines agree on every handshake: {'yes' if same else 'NO'}")
+    return same
+
+
+def main(argv=None):
+    """Replay a client stream through TLS termination and size the LB cores"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--log', nargs='+', help='access logs (nginx or HAProxy) to take client arrivals from')
+    parser.add_argument('--format', choices=('auto', 'nginx', 'haproxy'), default='auto', help='log format (default: auto)')
+    parser.add_argument('--rate', type=float, default=2000, help='synthetic requests per second (default: 2000)')
+    parser.add_argument('--duration', type=float, default=600, help='synthetic seconds (default: 600)')
+    parser.add_argument('--clients', type=int, default=200000, help='synthetic client population (default: 200,000)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of client popularity (default: 1.0)')
+    parser.add_argument('--keepalive', type=float, default=10.0,
+                        help='idle seconds before a connection closes (timeout http-keep-alive, default: 10)')
+    parser.add_argument('--lifetime', type=float, default=300.0,
+                        help='session/ticket lifetime in seconds (tune.ssl.lifetime, default: 300)')
+    parser.add_argument('--cache-size', type=int, default=20000,
+                        help='sessions in the cache (tune.ssl.cachesize, default: 20000)')
+    parser.add_argument('--mode', choices=MODES, default='cache', help='resumption the cores are sized for (default: cache)')
+    parser.add_argument('--support', type=float, default=0.95,
+                        help='share of clients that attempt resumption (default: 0.95)')
+    parser.add_argument('--suite', choices=tuple(SUITES), default='tls13-x25519-ecdsa-aes128',
+                        help='suite highlighted in the diagram (default: tls13-x25519-ecdsa-aes128)')
+    parser.add_argument('--response-kb', type=float, default=50.0, help='mean response size (default: 50 KB)')
+    parser.add_argument('--proxy-ms', type=float, default=0.03, help='CPU per proxied request besides crypto (default: 0.03 ms)')
+    parser.add_argument('--cpu-scale', type=float, default=1.0, help='multiply every crypto cost, for slower cores (default: 1)')
+    parser.add_argument('--engine', choices=ENGINES, default='vector', help='cache solver (default: vector)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='diagram file (default: build/tls_model.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='diagram resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    parser.add_argument('--benchmark', type=int, metavar='REQUESTS', help='time both engines and compare them')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark, args.seed)
+    if min(args.rate, args.duration, args.clients, args.cache_size, args.cpu_scale) <= 0:
+        parser.error('--rate, --duration, --clients, --cache-size and --cpu-scale must be positive')
+    if args.log:
+        stream = log_stream(args.log, args.format, args.seed)
+        if not len(stream['time']):
+            parser.error('no requests found in the logs')
+    else:
+        stream = synthetic_stream(args.rate, args.duration, args.clients, args.skew, seed=args.seed)
+        if not len(stream['time']):
+            parser.error('no requests drawn; raise --rate or --duration')
+    result = simulate(stream, args.keepalive, args.lifetime, args.cache_size, args.support, args.engine, args.seed)
+    summary = summarize(result, args.mode, args.response_kb, args.proxy_ms, args.cpu_scale)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return True
+    print_report(summary)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_tls_diagram(result, summary, args.suite)
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Diagram saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Topology Graph
+One in-memory model of the four infrastructure designs: every component is
+defined once with its role, tier, zone and address, plus the links between
+components, and the diagram generators draw from it. Nodes and edges are
+stored column-wise and indexed by tier, IP, role, zone and host. That keeps
+queries fast on fleets of 100k nodes, such as every path from the user to
+the database or the neighbours of the load balancer.
+"""
+
+import argparse
+import ipaddress
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+DOMAIN = 'www.foobar.com'
+PUBLIC_IP = '8.8.8.8'
+# Per-node attributes, one list per column
+COLUMNS = ('label', 'role', 'tier', 'zone', 'ip', 'host', 'icon', 'software', 'detail')
+INDEXED = ('role', 'tier', 'zone', 'host')
+# Edges that carry user requests, starting with the DNS lookup; the others
+# (replication, heartbeats, metrics) are ignored by paths()
+REQUEST_KINDS = ('dns', 'request')
+# fleet() addresses: (subnet, first host offset) per role, so no two roles overlap
+FLEET_SUBNETS = {
+    'lb': ('10.0.0.0/24', 10),
+    'db': ('10.0.1.0/24', 40),
+    'app': ('10.0.16.0/20', 1),
+    'web': ('10.64.0.0/10', 1),
+}
+
+
+class Node:
+    """A view of one node of a Topology; holds only the graph and the node's index"""
+
+    __slots__ = ('topology', 'index')
+
+    def __init__(self, topology, index):
+        self.topology = topology
+        self.index = index
+
+    @property
+    def id(self):
+        return self.topology.ids[self.index]
+
+    def text(self, *lines):
+        """Return '<icon> <label>' over the IP and any extra lines, as the diagrams label a box"""
+        head = f"{self.icon} {self.label}" if self.icon else self.label
+        return '\n'.join([head] + ([self.ip] if self.ip else []) + list(lines))
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and other.topology is self.topology and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.topology), self.index))
+
+    def __repr__(self):
+        return f"Node({self.id!r}, role={self.role!r}, tier={self.tier}, ip={self.ip!r})"
+
+
+def _column(name):
+    return property(lambda self: self.topology.columns[name][self.index], doc=f"the node's {name}")
+
+
+for _name in COLUMNS:
+    setattr(Node, _name, _column(_name))
+
+
+class Topology:
+    """Directed graph of infrastructure components with column storage and lookup indexes.
+
+    Node attributes live in one list per column and edges in two integer
+    arrays, so a node costs a few list slots rather than an object.
+    Adjacency is built on first query as compressed rows (CSR) with numpy,
+    and rebuilt only after the graph changes. Node views (Node) are created
+    on demand.
+    """
+
+    def __init__(self, name, title=''):
+        self.name = name
+        self.title = title
+        self.ids = []
+        self.columns = {column: [] for column in COLUMNS}
+        self._index = {}
+        self._indexes = {column: defaultdict(list) for column in INDEXED}
+        self._by_ip = {}
+        self._src = array('q')
+        self._dst = array('q')
+        self.edge_kinds = []
+        self.edge_labels = []
+        self._csr = None
+
+    def add_node(self, node_id, label, role, tier, zone=None, ip=None, host=None, icon='', software='', detail=''):
+        """Add a node and return its view; host is the id of the server it runs on, if any"""
+        if node_id in self._index:
+            raise ValueError(f"duplicate node '{node_id}'")
+        if ip is not None and ip in self._by_ip:
+            raise ValueError(f"'{node_id}' reuses {ip} of '{self.ids[self._by_ip[ip]]}'")
+        index = len(self.ids)
+        self.ids.append(node_id)
+        self._index[node_id] = index
+        values = {'label': label, 'role': role, 'tier': tier, 'zone': zone, 'ip': ip, 'host': host, 'icon': icon,
+                  'software': software, 'detail': detail}
+        for column in COLUMNS:
+            self.columns[column].append(values[column])
+        for column in INDEXED:
+            if values[column] is not None:
+                self._indexes[column][values[column]].append(index)
+        if ip is not None:
+            self._by_ip[ip] = index
+        return Node(self, index)
+
+    def add_edge(self, src, dst, kind='request', label=''):
+        """Link two nodes by id"""
+        self._src.append(self._index[src])
+        self._dst.append(self._index[dst])
+        self.edge_kinds.append(kind)
+        self.edge_labels.append(label)
+        self._csr = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node_id):
+        return node_id in self._index
+
+    def __getitem__(self, node_id):
+        return Node(self, self._index[node_id])
+
+    def nodes(self):
+        return [Node(self, i) for i in range(len(self.ids))]
+
+    def by_role(self, role):
+        return [Node(self, i) for i in self._indexes['role'].get(role, ())]
+
+    def by_tier(self, tier):
+        return [Node(self, i) for i in self._indexes['tier'].get(tier, ())]
+
+    def by_zone(self, zone):
+        return [Node(self, i) for i in self._indexes['zone'].get(zone, ())]
+
+    def hosted(self, host):
+        """Return the components running on a server"""
+        return [Node(self, i) for i in self._indexes['host'].get(host, ())]
+
+    def by_ip(self, ip):
+        """Return the node with this address, or None"""
+        index = self._by_ip.get(ip)
+        return None if index is None else Node(self, index)
+
+    def edges(self, kinds=None):
+        """Return (src id, dst id, kind, label) for every edge, optionally only of the given kinds"""
+        return [(self.ids[s], self.ids[d], kind, label)
+                for s, d, kind, label in zip(self._src, self._dst, self.edge_kinds, self.edge_labels)
+                if kinds is None or kind in kinds]
+
+    def edge(self, src, dst):
+        """Return the label of the first edge from src to dst (KeyError if there is none)"""
+        s, d = self._index[src], self._index[dst]
+        for i, (a, b) in enumerate(zip(self._src, self._dst)):
+            if a == s and b == d:
+                return self.edge_labels[i]
+        raise KeyError(f"no edge {src} -> {dst}")
+
+    def _adjacency(self):
+        """Return (out_offsets, out_targets, out_kinds, in_offsets, in_sources, in_kinds) as CSR arrays"""
+        if self._csr is None:
+            src = np.frombuffer(self._src, dtype=np.int64) if len(self._src) else np.zeros(0, dtype=np.int64)
+            dst = np.frombuffer(self._dst, dtype=np.int64) if len(self._dst) else np.zeros(0, dtype=np.int64)
+            names = sorted(set(self.edge_kinds))
+            kinds = np.array([names.index(k) for k in self.edge_kinds], dtype=np.int8) if names else \
+                np.zeros(0, dtype=np.int8)
+            csr = []
+            for a, b in ((src, dst), (dst, src)):
+                order = np.argsort(a, kind='stable')
+                offsets = np.searchsorted(a[order], np.arange(len(self.ids) + 1))
+                csr += [offsets, b[order], kinds[order]]
+            self._csr = (names, csr)
+        return self._csr
+
+    def _kind_mask(self, names, kinds, wanted):
+        if wanted is None:
+            return np.ones(len(kinds), dtype=bool)
+        return np.isin(kinds, [names.index(k) for k in wanted if k in names])
+
+    def _linked(self, node_id, kinds, reverse):
+        """Return the indices of node_id's successors (or predecessors) over edges of the given kinds"""
+        names, csr = self._adjacency()
+        offsets, targets, edge_kinds = csr[3:] if reverse else csr[:3]
+        i = self._index[node_id]
+        edges = slice(offsets[i], offsets[i + 1])
+        return targets[edges][self._kind_mask(names, edge_kinds[edges], kinds)]
+
+    def successors(self, node_id, kinds=None):
+        return [Node(self, j) for j in self._linked(node_id, kinds, False).tolist()]
+
+    def predecessors(self, node_id, kinds=None):
+        return [Node(self, j) for j in self._linked(node_id, kinds, True).tolist()]
+
+    def neighbors(self, node_id, kinds=None):
+        """Return the nodes linked to node_id in either direction, each once"""
+        linked = np.concatenate([self._linked(node_id, kinds, True), self._linked(node_id, kinds, False)])
+        return [Node(self, j) for j in np.unique(linked).tolist()]
+
+    def _reach(self, start, reverse, kinds):
+        """Return a mask of the nodes reachable from start (or reaching it when reverse), a frontier at a time"""
+        names, csr = self._adjacency()
+        offsets, targets, edge_kinds = csr[3:] if reverse else csr[:3]
+        usable = self._kind_mask(names, edge_kinds, kinds)
+        seen = np.zeros(len(self.ids), dtype=bool)
+        seen[start] = True
+        frontier = np.array([start])
+        while len(frontier):
+            counts = offsets[frontier + 1] - offsets[frontier]
+            # Every edge position of every frontier node, without a Python loop over the nodes
+            positions = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            nxt = np.unique(targets[positions[usable[positions]]])
+            frontier = nxt[~seen[nxt]]
+            seen[frontier] = True
+        return seen
+
+    def reachable(self, node_id, kinds=REQUEST_KINDS):
+        """Return the ids of every node reachable from node_id"""
+        return [self.ids[i] for i in np.flatnonzero(self._reach(self._index[node_id], False, kinds))]
+
+    def paths(self, src, dst, kinds=REQUEST_KINDS, limit=None):
+        """Yield every simple path from src to dst as a list of ids.
+
+        Only nodes that can reach dst are explored, so the work is
+        proportional to the paths found rather than the size of the graph.
+        """
+        names, (offsets, targets, edge_kinds, *_) = self._adjacency()
+        usable = self._kind_mask(names, edge_kinds, kinds)
+        start, goal = self._index[src], self._index[dst]
+        useful = self._reach(goal, True, kinds)
+        if not useful[start]:
+            return
+        found = 0
+        path, on_path = [start], {start}
+        stack = [iter(targets[offsets[start]:offsets[start + 1]][usable[offsets[start]:offsets[start + 1]]].tolist())]
+        while stack:
+            nxt = next(stack[-1], None)
+            if nxt is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if nxt == goal:
+                yield [self.ids[i] for i in path] + [dst]
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+            elif useful[nxt] and nxt not in on_path:
+                path.append(nxt)
+                on_path.add(nxt)
+                edges = slice(offsets[nxt], offsets[nxt + 1])
+                stack.append(iter(targets[edges][usable[edges]].tolist()))
+
+    def layout_input(self, exclude_roles=(), kinds=REQUEST_KINDS):
+        """Return (nodes, edges) for auto_layout: each node labelled with its label and IP, styled by role"""
+        nodes = {node.id: {'label': f"{node.label}\n{node.ip}" if node.ip else node.label, 'style': node.role}
+                 for node in self.nodes() if node.role not in exclude_roles and node.host is None}
+        edges = [(s, d) for s, d, _, _ in self.edges(kinds) if s in nodes and d in nodes]
+        return nodes, edges
+
+
+def simple_web_stack():
+    """Task 0: one server running Nginx, the application and MySQL"""
+    t = Topology('simple_web_stack', 'Simple Web Stack Infrastructure')
+    t.add_node('user', "User's Computer", 'client', 0, zone='internet')
+    t.add_node('dns', 'DNS/Internet', 'dns', 1, zone='internet', detail=DOMAIN)
+    t.add_node('server', 'Server', 'host', 2, zone='public', ip=PUBLIC_IP)
+    t.add_node('nginx', 'Nginx Web Server', 'web', 3, host='server', software='Nginx', detail='Port 80/443')
+    t.add_node('app', 'Application Server', 'app', 4, host='server', detail='PHP/Python/Node.js')
+    t.add_node('files', 'Application Files', 'code', 5, host='server', detail='Code Base')
+    t.add_node('db', 'MySQL Database', 'db', 6, host='server', software='MySQL', detail='Port 3306')
+    t.add_edge('user', 'dns', 'dns', 'DNS Query')
+    t.add_edge('dns', 'server', label='HTTP Request')
+    t.add_edge('server', 'nginx')
+    t.add_edge('nginx', 'app')
+    t.add_edge('app', 'files')
+    t.add_edge('app', 'db')
+    return t
+
+
+def distributed_infrastructure():
+    """Task 1: a load balancer in front of two web servers and a replicated database"""
+    t = Topology('distributed_infrastructure', 'Distributed Web Infrastructure')
+    t.add_node('user', "User's Computer", 'client', 0, zone='internet')
+    t.add_node('dns', 'Internet/DNS', 'dns', 1, zone='internet', detail=DOMAIN)
+    t.add_node('lb', 'Load Balancer Server', 'lb', 2, zone='public', ip=PUBLIC_IP, software='HAproxy',
+               detail='Round Robin Distribution')
+    for n, ip in ((1, '10.0.0.2'), (2, '10.0.0.3')):
+        t.add_node(f"web{n}", f"Web Server {n}", 'web', 3, zone='private', ip=ip, software='Nginx + PHP-FPM')
+        t.add_node(f"nginx{n}", 'Nginx', 'nginx', 3, host=f"web{n}", detail='80/443')
+        t.add_node(f"php{n}", 'PHP-FPM', 'php', 3, host=f"web{n}")
+        t.add_node(f"files{n}", 'Application Files', 'code', 3, host=f"web{n}")
+    t.add_node('db', 'Database Server', 'db_host', 4, zone='private', ip='10.0.0.4')
+    t.add_node('db_primary', 'MySQL Primary', 'db', 4, host='db', detail='Master')
+    t.add_node('db_replica', 'MySQL Replica', 'db_replica', 4, host='db', detail='Slave')
+    t.add_edge('user', 'dns', 'dns', 'DNS Query')
+    t.add_edge('dns', 'lb', label='HTTP Request')
+    for n in (1, 2):
+        t.add_edge('lb', f"web{n}")
+        t.add_edge(f"web{n}", 'db')
+    t.add_edge('db', 'db_primary')
+    t.add_edge('db_primary', 'db_replica', 'replication', 'Replication')
+    return t
+
+
+def secured_infrastructure():
+    """Task 2: the distributed design behind three firewalls, with HTTPS and monitoring"""
+    t = Topology('secured_infrastructure', 'Secured and Monitored Web Infrastructure')
+    t.add_node('user', 'User', 'client', 0, zone='internet', icon='👤', detail='HTTPS Client')
+    t.add_node('dns', 'Internet/DNS', 'dns', 1, zone='internet', icon='🌐', detail=DOMAIN)
+    t.add_node('firewall1', 'Firewall 1', 'firewall', 2, zone='public', icon='🔒', detail='80, 443, 8404')
+    t.add_node('lb', 'Load Balancer', 'lb', 3, zone='dmz', ip=PUBLIC_IP, icon='⚖️', software='HAproxy + SSL')
+    for n, ip in ((1, '10.0.0.2'), (2, '10.0.0.3')):
+        t.add_node(f"firewall{n + 1}", f"Firewall {n + 1}", 'firewall', 4, zone='private', icon='🔒',
+                   detail=f"Web Server {n}")
+        t.add_node(f"web{n}", f"Web Server {n}", 'web', 5, zone='private', ip=ip, icon='🌐',
+                   software='Nginx + PHP-FPM')
+    t.add_node('db', 'Database Server', 'db', 6, zone='database', ip='10.0.0.4', icon='🗄️',
+               software='MySQL Primary + Replica')
+    t.add_node('monitoring', 'Sumo Logic Cloud', 'monitoring', 7, zone='cloud', icon='☁️')
+    t.add_edge('user', 'dns', label='HTTPS Request')
+    t.add_edge('dns', 'firewall1', label='Filtered Traffic')
+    t.add_edge('firewall1', 'lb')
+    for n in (1, 2):
+        t.add_edge('lb', f"firewall{n + 1}")
+        t.add_edge(f"firewall{n + 1}", f"web{n}")
+        t.add_edge(f"web{n}", 'db')
+    for server in ('lb', 'web1', 'web2', 'db'):
+        t.add_edge(server, 'monitoring', 'metrics')
+    return t
+
+
+def scale_up_infrastructure():
+    """Task 3: a Keepalived load balancer pair and separate web, application and database tiers"""
+    t = Topology('scale_up_infrastructure', 'Scale Up Web Infrastructure')
+    t.add_node('user', 'User', 'client', 0, zone='internet', icon='👤', detail='HTTPS Client')
+    t.add_node('dns', 'Internet/DNS', 'dns', 1, zone='internet', icon='🌐', detail=DOMAIN)
+    t.add_node('vip', 'Virtual IP', 'vip', 2, zone='public', ip=PUBLIC_IP, detail='Floating')
+    t.add_node('lb1', 'LB Master', 'lb', 3, zone='dmz', ip='10.0.0.10', icon='🔧', software='HAproxy',
+               detail='Active')
+    t.add_node('lb2', 'LB Backup', 'lb', 3, zone='dmz', ip='10.0.0.11', icon='🔧', software='HAproxy',
+               detail='Standby')
+    t.add_node('web1', 'Web Server 1', 'web', 4, zone='private', ip='10.0.0.20', icon='🌐', software='Nginx Only')
+    t.add_node('web2', 'Web Server 2', 'web', 4, zone='private', ip='10.0.0.21', icon='🌐', software='Nginx Only')
+    t.add_node('app', 'Application Server', 'app', 5, zone='private', ip='10.0.0.30', icon='🚀',
+               software='PHP-FPM Only')
+    t.add_node('db', 'Database Server', 'db', 6, zone='private', ip='10.0.0.40', icon='🗄️', software='MySQL Only')
+    t.add_edge('user', 'dns', label='HTTPS')
+    t.add_edge('dns', 'vip', label='VIP')
+    for lb in ('lb1', 'lb2'):
+        t.add_edge('vip', lb)
+        for web in ('web1', 'web2'):
+            t.add_edge(lb, web, label='Load Balanced')
+    t.add_edge('lb1', 'lb2', 'heartbeat', 'Keepalived')
+    t.add_edge('lb2', 'lb1', 'heartbeat', 'Keepalived')
+    for web in ('web1', 'web2'):
+        t.add_edge(web, 'app', label='PHP Requests')
+    t.add_edge('app', 'db', label='SQL Queries')
+    return t
+
+
+DESIGNS = {
+    'simple': simple_web_stack,
+    'distributed': distributed_infrastructure,
+    'secured': secured_infrastructure,
+    'scale_up': scale_up_infrastructure,
+}
+
+
+def fleet_addresses(role, count):
+    """Return count addresses for a fleet role from its subnet; ValueError when they do not fit"""
+    subnet, offset = FLEET_SUBNETS[role]
+    network = ipaddress.ip_network(subnet)
+    if count > network.num_addresses - 1 - offset:
+        raise ValueError(f"{count:,} {role} servers do not fit in {subnet} "
+                         f"(at most {network.num_addresses - 1 - offset:,})")
+    hosts = int(network.network_address) + offset + np.arange(count, dtype=np.int64)
+    octets = [(hosts >> shift & 255).tolist() for shift in (24, 16, 8, 0)]
+    return [f"{a}.{b}.{c}.{d}" for a, b, c, d in zip(*octets)]
+
+
+def fleet(backends, lb_count=2, app_servers=1):
+    """Build the Task 3 design with any number of web and application servers"""
+    lb_ips, web_ips = fleet_addresses('lb', lb_count), fleet_addresses('web', backends)
+    app_ips, (db_ip,) = fleet_addresses('app', app_servers), fleet_addresses('db', 1)
+    t = Topology('fleet', f"Load Balancer Cluster with {backends} Web Servers")
+    t.add_node('user', 'User', 'client', 0, zone='internet')
+    t.add_node('dns', 'Internet/DNS', 'dns', 1, zone='internet', detail=DOMAIN)
+    t.add_node('vip', 'Virtual IP', 'vip', 2, zone='public', ip=PUBLIC_IP)
+    t.add_edge('user', 'dns')
+    t.add_edge('dns', 'vip')
+    lbs = [f"lb{i + 1}" for i in range(lb_count)]
+    for i, lb in enumerate(lbs):
+        t.add_node(lb, f"LB {'Master' if i == 0 else 'Backup'}", 'lb', 3, zone='dmz', ip=lb_ips[i])
+        t.add_edge('vip', lb)
+    apps = [f"app{i + 1}" for i in range(app_servers)]
+    for i in range(backends):
+        web = f"web{i + 1}"
+        t.add_node(web, web, 'web', 4, zone='private', ip=web_ips[i])
+        for lb in lbs:
+            t.add_edge(lb, web)
+    for i, app in enumerate(apps):
+        t.add_node(app, f"App Server {i + 1}", 'app', 5, zone='private', ip=app_ips[i])
+        for w in range(backends):
+            t.add_edge(f"web{w + 1}", app)
+    t.add_node('db', 'MySQL', 'db', 6, zone='private', ip=db_ip)
+    for app in apps:
+        t.add_edge(app, 'db')
+    return t
+
+
+def describe(topology):
+    """Return printable lines: tiers, zones and the request paths from the user to the database"""
+    lines = []
+    for tier in sorted(topology._indexes['tier']):
+        members = [n for n in topology.by_tier(tier) if n.host is None]
+        if members:
+            lines.append(f"tier {tier}: " + ', '.join(f"{n.label}" + (f" ({n.ip})" if n.ip else '') for n in members))
+    lines.append('zones: ' + ', '.join(f"{zone} {len(topology.by_zone(zone))}" for zone in topology._indexes['zone']))
+    for path in topology.paths('user', topology.by_role('db')[0].id, limit=8):
+        lines.append('path: ' + ' → '.join(topology[p].label for p in path))
+    return lines
+
+
+def benchmark(backends):
+    """Time building a fleet and the indexed and path queries on it"""
+    start = time.perf_counter()
+    t = fleet(backends)
+    print(f"🏗️ {len(t):,} nodes, {len(t.edge_kinds):,} edges built in {time.perf_counter() - start:.2f}s")
+    queries = (
+        ('adjacency (CSR)', lambda: len(t._adjacency()[1][1])),
+        ('neighbors of lb1', lambda: len(t.neighbors('lb1'))),
+        ('web tier by role', lambda: len(t.by_role('web'))),
+        ('lookup by IP', lambda: t.by_ip(t[f"web{backends}"].ip).id),
+        ('private zone', lambda: len(t.by_zone('private'))),
+        ('reachable from user', lambda: len(t.reachable('user'))),
+        ('paths user → db', lambda: sum(1 for _ in t.paths('user', 'db'))),
+    )
+    for label, query in queries:
+        start = time.perf_counter()
+        result = query()
+        print(f"⏱️ {label:<20} {(time.perf_counter() - start) * 1000:9.1f} ms  → {result:,}"
+              if isinstance(result, int) else
+              f"⏱️ {label:<20} {(time.perf_counter() - start) * 1000:9.1f} ms  → {result}")
+    return True
+
+
+def main(argv=None):
+    """Print the shared topology of a design, or benchmark queries on a large fleet"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('design', nargs='?', choices=list(DESIGNS), help='design to describe (default: all)')
+    parser.add_argument('--benchmark', type=int, metavar='BACKENDS',
+                        help='time queries on a fleet with this many web servers')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        return benchmark(args.benchmark)
+    for name in [args.design] if args.design else DESIGNS:
+        topology = DESIGNS[name]()
+        print(f"🗺️ {topology.title}: {len(topology)} nodes, {len(topology.edge_kinds)} edges")
+        for line in describe(topology):
+            print(f"   {line}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Vector Output Pipeline
+Saves diagrams as SVG/PDF with subsetted, shared glyphs and rasterizes PNGs
+on demand at whatever resolution a page asks for.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMATS = ('svg', 'pdf', 'png')
+VECTOR_FORMATS = ('svg', 'pdf')
+DEFAULT_DPI = 300
+
+# Glyphs become paths defined once in <defs> and reused, PDFs embed TrueType
+# subsets holding only the glyphs used, and fixed ids/dates keep the bytes
+# identical between runs so caches and ETags stay stable.
+VECTOR_RC = {
+    'svg.fonttype': 'path',
+    'svg.hashsalt': 'web-infrastructure-diagrams',
+    'pdf.fonttype': 42,
+    'pdf.compression': 9,
+}
+METADATA = {
+    'svg': {'Date': None},
+    'pdf': {'CreationDate': None, 'ModDate': None},
+    'png': {},
+}
+
+
+def parse_formats(value):
+    """Parse a comma-separated format list such as 'svg,pdf' (an argparse type)"""
+    formats = [f.strip().lower().lstrip('.') for f in value.split(',') if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"unsupported format(s): {', '.join(sorted(unknown)) or value!r} "
+                         f"(choose from {', '.join(FORMATS)})")
+    return list(dict.fromkeys(formats))
+
+
+def with_format(filename, fmt):
+    """Swap a file name's extension for the given format"""
+    return os.path.splitext(filename)[0] + '.' + fmt
+
+
+def save_figure(fig, target, fmt=None, dpi=DEFAULT_DPI):
+    """Save fig to a path or binary file object in fmt (default: from the path)"""
+    import matplotlib
+
+    fmt = fmt or os.path.splitext(target)[1].lstrip('.').lower()
+    with matplotlib.rc_context(VECTOR_RC):
+        fig.savefig(target, format=fmt, dpi=dpi, bbox_inches='tight', metadata=METADATA[fmt])
+
+
+def render_bytes(fig, fmt='svg', dpi=DEFAULT_DPI):
+    """Encode fig in memory and return the artifact bytes"""
+    buffer = io.BytesIO()
+    save_figure(fig, buffer, fmt, dpi)
+    return buffer.getvalue()
+
+
+def _rasterize_svg(source, dpi):
+    """Convert an SVG to PNG bytes with cairosvg, or None when it is unavailable"""
+    try:
+        import cairosvg
+    except ImportError:
+        return None
+    # matplotlib writes SVG user units as points (72 per inch)
+    return cairosvg.svg2png(url=source, scale=dpi / 72)
+
+
+def _rerender(source, dpi):
+    """Re-render the diagram that produced source straight to PNG bytes.
+
+    Vector output is byte-for-byte reproducible, so the diagram is first
+    rendered again in source's format; if that differs, the generator has
+    changed since source was written and ValueError is raised rather than
+    returning a PNG of a different drawing.
+    """
+    import importlib
+    import warnings
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import render_all
+
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+
+    name = os.path.splitext(os.path.basename(source))[0] + '.png'
+    owners = [(module_name, func_name) for module_name, func_name in render_all.discover_diagrams()
+              if render_all.output_file_for(func_name) == name]
+    if not owners:
+        raise ValueError(f"{source}: no diagram function renders '{name}' and cairosvg is not installed")
+    module_name, func_name = owners[0]
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    fig = getattr(importlib.import_module(module_name), func_name)()
+    try:
+        fmt = os.path.splitext(source)[1].lstrip('.').lower()
+        with open(source, 'rb') as artifact:
+            if fmt not in VECTOR_FORMATS or render_bytes(fig, fmt) != artifact.read():
+                raise ValueError(f"{module_name}.{func_name} no longer draws this file; "
+                                 f"re-render it, or install cairosvg to convert it as it is")
+        return render_bytes(fig, 'png', dpi)
+    finally:
+        plt.close(fig)
+
+
+def rasterize(source, dpi, output=None, cache=None):
+    """Produce a PNG of a vector artifact at dpi, only when asked for.
+
+    SVGs are converted with cairosvg when it is installed. Otherwise the
+    owning diagram is re-rendered from its current generator at the
+    requested resolution, which is refused (ValueError) when the generator
+    no longer draws exactly what source contains. Results are kept in the
+    render cache keyed on the source bytes and dpi.
+    """
+    from render_cache import file_digest
+
+    output = output or f"{os.path.splitext(source)[0]}@{dpi}dpi.png"
+    key = hashlib.sha256(f"{file_digest(source)}:{dpi}".encode('utf-8')).hexdigest()
+    if cache is not None and cache.fetch(key, output):
+        return output, True
+
+    data = _rasterize_svg(source, dpi) if source.endswith('.svg') else None
+    if data is None:
+        data = _rerender(source, dpi)
+    with open(output, 'wb') as png:
+        png.write(data)
+    if cache is not None:
+        cache.store(key, output)
+    return output, False
+
+
+def main(argv=None):
+    """Rasterize vector diagrams to PNG at a requested resolution"""
+    from render_cache import DEFAULT_CACHE_DIR, RenderCache
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sources', nargs='+', help='SVG/PDF files rendered by render_all.py -F svg')
+    parser.add_argument('--dpi', type=int, default=96, help='PNG resolution (default: 96)')
+    parser.add_argument('-o', '--output-dir', help='directory for the PNGs (default: next to each source)')
+    parser.add_argument('--no-cache', action='store_true', help='bypass the render cache')
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else RenderCache(DEFAULT_CACHE_DIR)
+    ok = True
+    for source in args.sources:
+        output = None
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            output = os.path.join(args.output_dir, os.path.basename(with_format(source, 'png')))
+        try:
+            output, hit = rasterize(source, args.dpi, output, cache)
+            print(f"- {output} ({os.path.getsize(output) / 1024:.0f} KB{', cached' if hit else ''})")
+        except (OSError, ValueError) as e:
+            print(f"❌ {source}: {e}")
+            ok = False
+    if cache is not None:
+        cache.save()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
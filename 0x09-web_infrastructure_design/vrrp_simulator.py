@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+VRRP Failover Simulator
+Event-driven simulation of the Keepalived load balancer pair: VRRP
+advertisements, master-down timers, preemption, gratuitous ARP and split
+brain, swept over thousands of parameter combinations, reporting failover
+times and connections lost for a given request rate.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'vrrp_failover.png')
+SCENARIOS = ('crash', 'partition', 'check')
+VIP_STATES = ('VIP on 10.0.0.10', 'VIP on 10.0.0.11')
+PERCENTILES = (50, 95, 99)
+# The fault starts this long into each run, after the pair has settled
+FAULT_AT = 10.0
+# Runs continue this long after the fault ends, plus any preempt delay
+SETTLE = 30.0
+# Upstream ARP convergence after a gratuitous ARP is lognormal with this spread
+GARP_SIGMA = 0.75
+# Event columns: adverts and master-down timers of each node, the pending
+# ARP update, the router's ARP refresh and the scenario's four scheduled changes
+ADVERT, DOWN_TIMER, ARP, REFRESH, FAULT_START, PRIORITY_DROP, FAULT_END, PRIORITY_RESTORE = 0, 2, 4, 5, 6, 7, 8, 9
+
+# Parameters that take comma-separated lists; the sweep is their product
+DEFAULTS = {
+    'scenario': 'crash',
+    'advert_int': 1.0,        # seconds, keepalived advert_int
+    'priority_master': 100,
+    'priority_backup': 90,
+    'preempt': 1,             # 0 = nopreempt
+    'preempt_delay': 0.0,     # seconds
+    'loss': 0.0,              # probability an advertisement is lost
+    'garp_ms': 20.0,          # mean upstream ARP convergence
+    'arp_refresh': 30.0,      # seconds between the router's own ARP lookups of the VIP
+    'duration': 30.0,         # seconds the fault lasts
+    'weight': 20,             # vrrp_script weight subtracted when the check fails
+    'check_interval': 2.0,    # vrrp_script interval
+    'fall': 2,
+    'rise': 2,
+    'rate': 1000.0,           # requests per second through the VIP
+    'conn_ms': 100.0,         # mean time a request holds its connection
+}
+
+
+def combinations(grid):
+    """Return every combination of the grid's values as a list of parameter dicts"""
+    names = list(DEFAULTS)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid.get(n, [DEFAULTS[n]]) for n in names))]
+
+
+def expand(combos, trials):
+    """Return per-row parameter arrays: trials consecutive rows per combination"""
+    rows = {}
+    for name in DEFAULTS:
+        values = [c[name] for c in combos]
+        if name == 'scenario':
+            values = [SCENARIOS.index(v) for v in values]
+        rows[name] = np.repeat(np.array(values, dtype=float), trials)
+    return rows
+
+
+def master_down_interval(advert_int, priority):
+    """RFC 3768 Master_Down_Interval: three adverts plus a priority-dependent skew"""
+    return 3 * advert_int + (256 - priority) * advert_int / 256
+
+
+def simulate_rows(params, seed=0, trace=False):
+    """Run one VRRP pair per row of params through its scenario; return per-row outcome arrays.
+
+    Every row carries its own parameters, so a whole sweep advances in
+    lockstep: each step takes the earliest pending event of every row and
+    applies it with masked array updates. A node that is MASTER advertises
+    every advert_int; a BACKUP takes over when no advertisement it accepts
+    arrives for the master-down interval, and with preemption it ignores
+    adverts of lower priority. A new master sends a gratuitous ARP and the
+    upstream router moves the VIP after a random convergence time. A master
+    hearing a lower-priority advert answers with its own advert and ARP,
+    which ends a split brain; when the old backup yields first instead, the
+    VIP stays on it until the router looks the address up again. Requests
+    are lost while the VIP points at a node that is not a healthy master,
+    and every move of the VIP away from a serving node resets its in-flight
+    connections. Failover time is the longest such outage in the run.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(params['advert_int'])
+    index = np.arange(n)
+    scenario = params['scenario'].astype(int)
+    advert = params['advert_int']
+    preempt = params['preempt'] > 0
+    horizon = FAULT_AT + params['duration'] + SETTLE + params['preempt_delay']
+    garp_mu = np.log(params['garp_ms'] / 1000.0) - GARP_SIGMA ** 2 / 2
+    # The backup has the higher IP address, which wins a priority tie
+    priority = np.column_stack([params['priority_master'], params['priority_backup']])
+    tie = np.array([0.0, 0.5])
+
+    alive = np.ones((n, 2), dtype=bool)
+    healthy = np.ones((n, 2), dtype=bool)
+    master = np.zeros((n, 2), dtype=bool)
+    master[:, 0] = True
+    partition = np.zeros(n, dtype=bool)
+    owner = np.zeros(n, dtype=int)
+    next_advert = np.full((n, 2), np.inf)
+    next_advert[:, 0] = rng.uniform(0, advert)
+    down_at = np.full((n, 2), np.inf)
+    down_at[:, 1] = next_advert[:, 0] - advert + master_down_interval(advert, priority[:, 1])
+    arp_at = np.full(n, np.inf)
+    arp_to = np.zeros(n, dtype=int)
+    refresh_at = rng.uniform(0, params['arp_refresh'])
+
+    check = scenario == SCENARIOS.index('check')
+    detect = rng.uniform(0, params['check_interval']) + (params['fall'] - 1) * params['check_interval']
+    recover = rng.uniform(0, params['check_interval']) + (params['rise'] - 1) * params['check_interval']
+    end = FAULT_AT + params['duration']
+    scheduled = np.column_stack([np.full(n, FAULT_AT), np.where(check, FAULT_AT + detect, np.inf),
+                                 end, np.where(check, end + recover, np.inf)])
+
+    clock = np.zeros(n)
+    blackout = np.zeros(n)
+    split = np.zeros(n)
+    moves = np.zeros(n)
+    outage_start = np.zeros(n)
+    failover = np.zeros(n)
+    serving = np.ones(n, dtype=bool)
+    events = np.empty((n, 10))
+    steps = handled = 0
+    timeline = []
+
+    def garp(mask, node, at):
+        arp_at[mask] = at[mask] + rng.lognormal(garp_mu[mask], GARP_SIGMA)
+        arp_to[mask] = node
+
+    while True:
+        events[:, ADVERT:ADVERT + 2] = next_advert
+        events[:, DOWN_TIMER:DOWN_TIMER + 2] = down_at
+        events[:, ARP] = arp_at
+        events[:, REFRESH] = refresh_at
+        events[:, FAULT_START:] = scheduled
+        kind = events.argmin(axis=1)
+        t = events[index, kind]
+        active = t < horizon
+        now = np.minimum(t, horizon)
+        blackout += (now - clock) * ~serving
+        split += (now - clock) * master.all(axis=1)
+        clock = now
+        if not active.any():
+            break
+        steps += 1
+        handled += int(active.sum())
+        before = owner.copy()
+
+        for node in (0, 1):
+            peer = 1 - node
+            sent = active & (kind == ADVERT + node)
+            if sent.any():
+                next_advert[sent, node] = t[sent] + advert[sent]
+                heard = sent & alive[:, peer] & ~partition & (rng.random(n) >= params['loss'])
+                mine = priority[:, node] + tie[node]
+                theirs = priority[:, peer] + tie[peer]
+                accept = heard & ~master[:, peer] & ((mine >= theirs) | ~preempt)
+                down_at[accept, peer] = t[accept] + master_down_interval(advert[accept], priority[accept, peer])
+                yields = heard & master[:, peer] & (mine > theirs)
+                master[yields, peer] = False
+                next_advert[yields, peer] = np.inf
+                down_at[yields, peer] = t[yields] + master_down_interval(advert[yields], priority[yields, peer])
+                asserts = heard & master[:, peer] & (mine < theirs)
+                next_advert[asserts, peer] = t[asserts]
+                garp(asserts, peer, t)
+
+            expired = active & (kind == DOWN_TIMER + node)
+            if expired.any():
+                master[expired, node] = True
+                down_at[expired, node] = np.inf
+                next_advert[expired, node] = t[expired]
+                garp(expired, node, t)
+
+        learned = active & (kind == ARP)
+        owner[learned] = arp_to[learned]
+        arp_at[learned] = np.inf
+        lookup = active & (kind == REFRESH)
+        refresh_at[lookup] = t[lookup] + params['arp_refresh'][lookup]
+        answered = master & alive
+        answer = np.where(answered[index, owner], owner, np.argmax(answered, axis=1))
+        lookup &= answered.any(axis=1)
+        owner[lookup] = answer[lookup]
+
+        for column in range(FAULT_START, PRIORITY_RESTORE + 1):
+            due = active & (kind == column)
+            if not due.any():
+                continue
+            scheduled[due, column - FAULT_START] = np.inf
+            if column in (FAULT_START, FAULT_END):
+                starting = column == FAULT_START
+                crash = due & (scenario == SCENARIOS.index('crash'))
+                alive[crash, 0] = not starting
+                master[crash, 0] = False
+                next_advert[crash, 0] = np.inf
+                down_at[crash, 0] = np.inf if starting else (
+                    t[crash] + np.maximum(master_down_interval(advert[crash], priority[crash, 0]),
+                                          params['preempt_delay'][crash]))
+                partition[due & (scenario == SCENARIOS.index('partition'))] = starting
+                healthy[due & check, 0] = not starting
+            else:
+                sign = -1 if column == PRIORITY_DROP else 1
+                priority[due, 0] += sign * params['weight'][due]
+
+        now_serving = master[index, owner] & alive[index, owner] & healthy[index, owner]
+        moves += serving & (~now_serving | (owner != before))
+        stopped = serving & ~now_serving
+        back = ~serving & now_serving
+        serving = now_serving
+        outage_start[stopped] = clock[stopped]
+        failover[back] = np.maximum(failover[back], clock[back] - outage_start[back])
+        if trace and active[0]:
+            timeline.append((clock[0], master[0, 0], master[0, 1], alive[0, 0], healthy[0, 0], owner[0], serving[0]))
+
+    failover = np.where(serving, failover, np.maximum(failover, horizon - outage_start))
+    lost = params['rate'] * blackout + params['rate'] * params['conn_ms'] / 1000.0 * moves
+    return {'failover': failover, 'blackout': blackout, 'split': split, 'moves': moves, 'lost': lost,
+            'horizon': horizon, 'steps': steps, 'events': handled, 'timeline': timeline}
+
+
+def _run_chunk(combos, trials, seed):
+    result = simulate_rows(expand(combos, trials), seed)
+    return {name: result[name].reshape(len(combos), trials)
+            for name in ('failover', 'blackout', 'split', 'moves', 'lost')}, result['events']
+
+
+def sweep(combos, trials=1000, workers=1, seed=0, chunk=64):
+    """Simulate trials runs of every combination, chunks of combinations spread over worker processes"""
+    chunks = [combos[start:start + chunk] for start in range(0, len(combos), chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    start = time.perf_counter()
+    if workers > 1 and len(chunks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            parts = list(pool.map(_run_chunk, chunks, [trials] * len(chunks), seeds))
+    else:
+        parts = [_run_chunk(c, trials, s) for c, s in zip(chunks, seeds)]
+    results = {name: np.concatenate([p[0][name] for p in parts]) for name in parts[0][0]}
+    results['events'] = sum(p[1] for p in parts)
+    results['seconds'] = time.perf_counter() - start
+    return results
+
+
+def varying(combos):
+    """Names of the parameters that differ between combinations"""
+    return [name for name in DEFAULTS if len({c[name] for c in combos}) > 1]
+
+
+def label(combo, names):
+    """Short description of a combination by the parameters that vary"""
+    if not names:
+        return combo['scenario']
+    return ', '.join(f"{name}={combo[name]:g}" if not isinstance(combo[name], str) else str(combo[name])
+                     for name in names)
+
+
+def summarize(combos, results, trials):
+    """Return one summary per combination"""
+    summaries = []
+    for i, combo in enumerate(combos):
+        failover = results['failover'][i]
+        summaries.append({
+            'params': combo,
+            'failover_s': {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(failover, PERCENTILES))},
+            'failover_mean_s': float(failover.mean()),
+            'blackout_s': float(results['blackout'][i].mean()),
+            'split_brain_s': float(results['split'][i].mean()),
+            'vip_moves': float(results['moves'][i].mean()),
+            'connections_lost': float(results['lost'][i].mean()),
+            'connections_lost_p99': float(np.percentile(results['lost'][i], 99)),
+            'trials': trials,
+        })
+    return summaries
+
+
+def print_report(summaries, names, results, limit=20):
+    """Print a row per combination, or the best and worst ones for large sweeps"""
+    runs = sum(s['trials'] for s in summaries)
+    print(f"\n🔁 {len(summaries):,} combinations x {summaries[0]['trials']:,} runs = {runs:,} failovers, "
+          f"{results['events']:,} events in {results['seconds']:.1f}s "
+          f"({results['events'] / results['seconds'] / 1e6:.1f}M events/s)")
+    ranked = sorted(range(len(summaries)), key=lambda i: summaries[i]['connections_lost'])
+    shown = ranked if len(ranked) <= limit else ranked[:limit // 2] + [None] + ranked[-limit // 2:]
+    width = max([len(label(summaries[i]['params'], names)) for i in ranked] + [11])
+    print(f"{'Combination':<{width}} {'p50 s':>7} {'p99 s':>7} {'Down s':>7} {'Split s':>8} {'Moves':>6} "
+          f"{'Lost':>9} {'Lost p99':>9}")
+    print('-' * (width + 62))
+    for i in shown:
+        if i is None:
+            print(f"{'...':<{width}}")
+            continue
+        s = summaries[i]
+        print(f"{label(s['params'], names):<{width}} {s['failover_s']['p50']:>7.2f} {s['failover_s']['p99']:>7.2f} "
+              f"{s['blackout_s']:>7.2f} {s['split_brain_s']:>8.2f} {s['vip_moves']:>6.2f} "
+              f"{s['connections_lost']:>9,.0f} {s['connections_lost_p99']:>9,.0f}")
+
+
+def _segments(times, states, end):
+    """Turn (time, state) samples into {state: [(start, width)]} for broken_barh"""
+    spans = {}
+    for start, stop, state in zip(times, list(times[1:]) + [end], states):
+        if stop > start:
+            spans.setdefault(state, []).append((start, stop - start))
+    return spans
+
+
+def create_failover_timeline(trace, horizon, combo, summaries, results, names, title=None):
+    """Draw one run's VRRP states over time above failover-time and connection-loss plots of the sweep"""
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch
+
+    fig = plt.figure(figsize=(16, 10))
+    grid = fig.add_gridspec(2, 2, height_ratios=[1, 1.1], hspace=0.35, wspace=0.25)
+    timeline_ax = fig.add_subplot(grid[0, :])
+    cdf_ax = fig.add_subplot(grid[1, 0])
+    lost_ax = fig.add_subplot(grid[1, 1])
+
+    times = [0.0] + [row[0] for row in trace]
+    first = (True, False, True, True, 0, True)
+    rows = [first] + [row[1:] for row in trace]
+    colors = {'MASTER': '#4CAF50', 'BACKUP': '#B0BEC5', 'DOWN': '#212121', 'UNHEALTHY': '#FF9800',
+              VIP_STATES[0]: '#2196F3', VIP_STATES[1]: '#9C27B0', 'serving': '#4CAF50', 'lost': '#F44336'}
+    lanes = [
+        ('Master LB\n10.0.0.10', [('DOWN' if not r[2] else 'UNHEALTHY' if not r[3] else
+                                   'MASTER' if r[0] else 'BACKUP') for r in rows]),
+        ('Backup LB\n10.0.0.11', ['MASTER' if r[1] else 'BACKUP' for r in rows]),
+        ('VIP (router ARP)', [VIP_STATES[r[4]] for r in rows]),
+        ('Requests', ['serving' if r[5] else 'lost' for r in rows]),
+    ]
+    for lane, (name, states) in enumerate(reversed(lanes)):
+        for state, spans in _segments(times, states, horizon).items():
+            timeline_ax.broken_barh(spans, (lane - 0.35, 0.7), facecolors=colors[state], edgecolor='none', zorder=2)
+    timeline_ax.set_yticks(range(len(lanes)))
+    timeline_ax.set_yticklabels([name for name, _ in reversed(lanes)], fontsize=9)
+    timeline_ax.axvspan(FAULT_AT, FAULT_AT + combo['duration'], color='#FFEB3B', alpha=0.3, zorder=0)
+    timeline_ax.text(FAULT_AT, len(lanes) - 0.45, f"  {combo['scenario']} fault", fontsize=9, va='bottom')
+    timeline_ax.set_xlim(0, horizon)
+    timeline_ax.set_ylim(-0.6, len(lanes) - 0.1)
+    timeline_ax.set_xlabel('Time (s)', fontsize=10)
+    timeline_ax.set_title(f"One Run: advert_int {combo['advert_int']:g}s, priorities "
+                          f"{combo['priority_master']:g}/{combo['priority_backup']:g}, "
+                          f"{'preempt' if combo['preempt'] else 'nopreempt'}", fontsize=12, fontweight='bold')
+    timeline_ax.legend(handles=[Patch(color=colors[s], label=s) for s in
+                                ('MASTER', 'BACKUP', 'DOWN', 'UNHEALTHY') + VIP_STATES + ('serving', 'lost')],
+                       loc='upper right', fontsize=8, ncol=8, bbox_to_anchor=(1, -0.12))
+
+    ranked = sorted(range(len(summaries)), key=lambda i: summaries[i]['failover_mean_s'])
+    picks = ranked if len(ranked) <= 6 else [ranked[0], ranked[len(ranked) // 4], ranked[len(ranked) // 2],
+                                             ranked[3 * len(ranked) // 4], ranked[-1]]
+    for i in picks:
+        values = np.sort(results['failover'][i])
+        cdf_ax.step(values, np.arange(1, len(values) + 1) / len(values), where='post', linewidth=1.5,
+                    label=label(summaries[i]['params'], names))
+    cdf_ax.set_xlabel('Failover time: longest stretch of lost requests (s)', fontsize=10)
+    cdf_ax.set_ylabel('Fraction of runs', fontsize=10)
+    cdf_ax.set_title('Failover Time Distribution', fontsize=12, fontweight='bold')
+    cdf_ax.grid(alpha=0.3)
+    cdf_ax.legend(fontsize=8)
+
+    lost = [s['connections_lost'] for s in summaries]
+    if len(summaries) <= 12:
+        lost_ax.barh([label(s['params'], names) for s in summaries], lost, color='#F44336', edgecolor='black')
+        lost_ax.invert_yaxis()
+        lost_ax.tick_params(axis='y', labelsize=8)
+        lost_ax.set_xlabel(f"Connections lost per fault (at {summaries[0]['params']['rate']:,.0f} req/s)",
+                           fontsize=10)
+    else:
+        points = lost_ax.scatter([s['failover_mean_s'] for s in summaries], lost, s=12,
+                                 c=[s['params']['advert_int'] for s in summaries], cmap='viridis')
+        fig.colorbar(points, ax=lost_ax, label='advert_int (s)')
+        lost_ax.set_xlabel('Mean failover time (s)', fontsize=10)
+        lost_ax.set_ylabel('Connections lost per fault', fontsize=10)
+    lost_ax.set_title('Connection Loss', fontsize=12, fontweight='bold')
+    lost_ax.grid(alpha=0.3)
+
+    fig.suptitle(title or 'Keepalived / VRRP Failover Simulation', fontsize=15, fontweight='bold')
+    return fig
+
+
+def _values(name):
+    cast = str if name == 'scenario' else float
+
+    def parse(value):
+        values = [cast(v.strip()) for v in value.split(',') if v.strip()]
+        if name == 'scenario' and not set(values) <= set(SCENARIOS):
+            raise argparse.ArgumentTypeError(f"scenarios are {', '.join(SCENARIOS)}")
+        return values
+    return parse
+
+
+def main(argv=None):
+    """Sweep VRRP failover parameters, print the outcomes and render a failover timeline"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     epilog='Every parameter option takes a comma-separated list; '
+                                            'the sweep covers every combination.')
+    for name, default in DEFAULTS.items():
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=_values(name), default=[default],
+                            help=f"default: {default}" + (f" ({', '.join(SCENARIOS)})" if name == 'scenario' else ''))
+    parser.add_argument('-n', '--trials', type=int, default=1000, help='runs per combination (default: 1000)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the summaries as JSON')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='figure file (default: build/vrrp_failover.png)')
+    parser.add_argument('--dpi', type=int, default=150, help='figure resolution (default: 150)')
+    parser.add_argument('--no-diagram', action='store_true', help='print statistics only')
+    args = parser.parse_args(argv)
+    grid = {name: getattr(args, name) for name in DEFAULTS}
+    numbers = [v for name, values in grid.items() if name != 'scenario' for v in values]
+    if args.trials <= 0 or min(grid['advert_int'] + grid['garp_ms'] + grid['check_interval']) <= 0 or min(numbers) < 0:
+        parser.error('--trials, --advert-int, --garp-ms and --check-interval must be positive, the rest non-negative')
+    if max(grid['loss']) >= 1:
+        parser.error('--loss must be below 1')
+
+    combos = combinations(grid)
+    results = sweep(combos, args.trials, args.workers, args.seed)
+    summaries = summarize(combos, results, args.trials)
+    names = varying(combos)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return True
+    print_report(summaries, names, results)
+    if args.no_diagram:
+        return True
+
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    single = simulate_rows(expand(combos[:1], 1), args.seed, trace=True)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fig = create_failover_timeline(single['timeline'], float(single['horizon'][0]), combos[0], summaries,
+                                   results, names)
+    save_figure(fig, args.output, dpi=args.dpi)
+    plt.close(fig)
+    print(f"\n📊 Timeline saved to {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
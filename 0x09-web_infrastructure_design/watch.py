@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Incremental Diagram Watcher
+Polls the generator modules, their helpers and the spec files, and re-renders
+only the diagrams whose inputs changed in a warm, long-lived process.
+"""
+
+import argparse
+import ast
+import glob
+import hashlib
+import importlib
+import os
+import sys
+import time
+
+from render_all import BASE_DIR, GENERATOR_MODULES, discover_diagrams, output_file_for
+from render_cache import DEFAULT_CACHE_DIR, RenderCache, diagram_keys, file_digest
+from vector_output import parse_formats
+
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'build', 'watch')
+DEFAULT_INTERVAL = 0.2
+
+# Modules the spec renderer draws with; editing one re-renders every spec
+SPEC_HELPERS = ('diagram_engine', 'batch_draw', 'auto_layout', 'vector_output')
+# The watcher runs on these, so they are never reloaded; restart to pick up edits
+WATCHER_MODULES = ('watch', 'render_all', 'render_cache')
+
+
+def watched_paths(base_dir=BASE_DIR):
+    """Return every source and spec file whose edits can change a diagram"""
+    return sorted(glob.glob(os.path.join(base_dir, '*.py'))
+                  + glob.glob(os.path.join(base_dir, 'specs', '*.json')))
+
+
+def snapshot(paths):
+    """Return {path: mtime_ns}; a stat per file keeps each poll cheap"""
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def generator_keys(dpi, modules=GENERATOR_MODULES):
+    """Return ({(module, function): key}, {module: error}) for the generators.
+
+    A module that fails to parse is reported and left out, so its diagrams
+    keep their last good key until the file is fixed.
+    """
+    keys, errors = {}, {}
+    for module_name in modules:
+        try:
+            keys.update(diagram_keys(discover_diagrams([module_name]), dpi=dpi))
+        except (OSError, SyntaxError) as e:
+            errors[module_name] = e
+    return keys, errors
+
+
+def spec_keys(dpi):
+    """Return {spec path: key} hashing each spec with the renderer's sources.
+
+    Like the generator keys, helpers are hashed by AST so comment and
+    formatting edits do not re-render every spec.
+    """
+    from diagram_engine import spec_paths
+
+    helpers = []
+    for name in SPEC_HELPERS:
+        path = os.path.join(BASE_DIR, name + '.py')
+        with open(path, encoding='utf-8') as source:
+            helpers.append(ast.dump(ast.parse(source.read(), filename=path)))
+    helpers = hashlib.sha256('\n'.join(helpers).encode('utf-8')).hexdigest()
+    return {path: hashlib.sha256(f"{file_digest(path)}:{helpers}:{dpi}".encode('utf-8')).hexdigest()
+            for path in spec_paths()}
+
+
+def warm_up():
+    """Import matplotlib and draw some text once so fonts are cached before the first edit"""
+    from headless import use_headless
+    use_headless()
+    import matplotlib.pyplot as plt
+    import batch_draw  # noqa: F401  imports NumPy too
+
+    fig = plt.figure(figsize=(1, 1))
+    fig.text(0.5, 0.5, 'Warm-up', fontweight='bold')
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def reload_modules(changed_paths):
+    """Reload helpers, then generators, that changed and are already imported"""
+    names = [os.path.splitext(os.path.basename(path))[0] for path in changed_paths if path.endswith('.py')]
+    helpers = [n for n in names if n not in GENERATOR_MODULES and n not in WATCHER_MODULES]
+    for name in helpers + [n for n in names if n in GENERATOR_MODULES]:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    for name in names:
+        if name in WATCHER_MODULES:
+            print(f"⚠️ {name}.py changed; restart the watcher to pick it up")
+
+
+def render_generator(module_name, func_name, output_dir, formats, dpi):
+    """Render one generator diagram in the warm process; return its outputs"""
+    import matplotlib.pyplot as plt
+    from vector_output import save_figure
+
+    fig = getattr(importlib.import_module(module_name), func_name)()
+    try:
+        outputs = []
+        for fmt in formats:
+            outputs.append(os.path.join(output_dir, output_file_for(func_name, fmt)))
+            save_figure(fig, outputs[-1], fmt, dpi)
+        return outputs
+    finally:
+        plt.close(fig)
+
+
+def render_spec_file(path, output_dir, formats, dpi):
+    """Render one spec file in the warm process; return its outputs"""
+    import matplotlib.pyplot as plt
+    import diagram_engine
+    from vector_output import save_figure
+
+    spec = diagram_engine.load_spec(path)
+    fig = diagram_engine.render_spec(spec)
+    try:
+        outputs = []
+        for fmt in formats:
+            outputs.append(os.path.join(output_dir, diagram_engine.output_file_for(spec, fmt)))
+            save_figure(fig, outputs[-1], fmt, spec.get('dpi', dpi))
+        return outputs
+    finally:
+        plt.close(fig)
+
+
+class DiagramWatcher:
+    """Tracks per-diagram input keys and re-renders the ones that change"""
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, formats=('png',), dpi=100, specs=True, cache=None):
+        self.output_dir = output_dir
+        self.spec_output_dir = os.path.join(output_dir, 'specs')
+        self.formats = formats
+        self.dpi = dpi
+        self.specs = specs
+        self.cache = cache
+        self.keys = {}
+        self.errors = {}
+        os.makedirs(self.spec_output_dir if specs else output_dir, exist_ok=True)
+
+    def current_keys(self):
+        """Return {target: key} for every diagram, where a target is (module, function) or a spec path"""
+        keys, errors = generator_keys(self.dpi)
+        if self.specs:
+            try:
+                keys.update(spec_keys(self.dpi))
+            except (OSError, SyntaxError) as e:
+                errors['specs'] = e
+        # Report each error once, not on every poll until it is fixed
+        for source, error in errors.items():
+            if self.errors.get(source) != str(error):
+                print(f"❌ {source}: {error}")
+        self.errors = {source: str(error) for source, error in errors.items()}
+        return keys
+
+    def changed(self, keys):
+        return [target for target, key in keys.items() if self.keys.get(target) != key]
+
+    def _render(self, target):
+        if isinstance(target, tuple):
+            return render_generator(*target, self.output_dir, self.formats, self.dpi)
+        return render_spec_file(target, self.spec_output_dir, self.formats, self.dpi)
+
+    def _outputs(self, target):
+        if isinstance(target, tuple):
+            return [os.path.join(self.output_dir, output_file_for(target[1], fmt)) for fmt in self.formats]
+        from diagram_engine import load_spec, output_file_for as spec_output_file_for
+        spec = load_spec(target)
+        return [os.path.join(self.spec_output_dir, spec_output_file_for(spec, fmt)) for fmt in self.formats]
+
+    def update(self, targets, keys, edited_at=None):
+        """Re-render targets (restoring cached artifacts where possible); return the number rendered"""
+        rendered = 0
+        for target in targets:
+            name = target[1] if isinstance(target, tuple) else os.path.relpath(target, BASE_DIR)
+            start = time.perf_counter()
+            try:
+                outputs = self._outputs(target)
+                # Keys become cache file names, so no ':' (not allowed on Windows)
+                artifact_keys = [f"{keys[target]}-{fmt}" for fmt in self.formats]
+                hit = self.cache is not None and all(
+                    self.cache.fetch(key, output) for key, output in zip(artifact_keys, outputs))
+                if not hit:
+                    outputs = self._render(target)
+                    if self.cache is not None:
+                        for key, output in zip(artifact_keys, outputs):
+                            self.cache.store(key, output)
+            except Exception as e:
+                # Keep the old key so the diagram is retried after the next edit
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+                continue
+            self.keys[target] = keys[target]
+            rendered += 1
+            latency = f", edit→file {time.time() - edited_at:.2f}s" if edited_at else ''
+            print(f"- {', '.join(os.path.relpath(o, self.output_dir) for o in outputs)} "
+                  f"({'cached' if hit else f'{time.perf_counter() - start:.2f}s'}{latency})")
+        if self.cache is not None:
+            self.cache.save()
+        return rendered
+
+    def poll(self, changed_paths):
+        """Handle a batch of changed files; return the number of diagrams affected"""
+        edited_at = max(os.path.getmtime(p) for p in changed_paths if os.path.exists(p)) if changed_paths else None
+        try:
+            reload_modules(changed_paths)
+        except SyntaxError:
+            pass  # reported with the file and line by current_keys()
+        except Exception as e:
+            print(f"❌ reload failed: {type(e).__name__}: {e}")
+        keys = self.current_keys()
+        targets = self.changed(keys)
+        if targets:
+            self.update(targets, keys, edited_at)
+        return len(targets)
+
+
+def main(argv=None):
+    """Watch the diagram sources and re-render what changed"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='directory for the rendered files (default: build/watch)')
+    parser.add_argument('-F', '--format', default='png', type=parse_formats,
+                        help='comma-separated output formats: svg, pdf, png (default: png)')
+    parser.add_argument('--dpi', type=int, default=100, help='PNG resolution (default: 100)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between polls (default: 0.2)')
+    parser.add_argument('--initial', action='store_true', help='render every diagram at startup')
+    parser.add_argument('--no-specs', action='store_true', help='only watch the generator modules')
+    parser.add_argument('--no-cache', action='store_true', help='bypass the render cache')
+    args = parser.parse_args(argv)
+
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    print("🔥 Warming up matplotlib...")
+    start = time.perf_counter()
+    warm_up()
+    print(f"   ready in {time.perf_counter() - start:.2f}s")
+
+    cache = None if args.no_cache else RenderCache(DEFAULT_CACHE_DIR)
+    watcher = DiagramWatcher(os.path.abspath(args.output_dir), args.format, args.dpi, not args.no_specs, cache)
+    keys = watcher.current_keys()
+    if args.initial:
+        print(f"🎨 Rendering {len(keys)} diagram(s)...")
+        watcher.update(list(keys), keys)
+    else:
+        watcher.keys = keys
+
+    paths = watched_paths()
+    mtimes = snapshot(paths)
+    print(f"👀 Watching {len(paths)} file(s) every {args.interval}s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            # Pick up files created or deleted since the last poll
+            paths = watched_paths()
+            current = snapshot(paths)
+            changed = sorted(p for p in set(current) | set(mtimes) if current.get(p) != mtimes.get(p))
+            mtimes = current
+            if changed:
+                print(f"✏️ {', '.join(os.path.relpath(p, BASE_DIR) for p in changed)}")
+                if not watcher.poll(changed):
+                    print("   no diagram inputs changed")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)